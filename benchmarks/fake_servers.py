@@ -0,0 +1,274 @@
+import hashlib
+import random
+import threading
+import time
+from concurrent import futures
+from dataclasses import dataclass
+from typing import Optional
+
+import grpc
+from google.cloud import vision
+from google.cloud.vision_v1.services.image_annotator.transports import ImageAnnotatorGrpcTransport
+from yandex.cloud.ai.vision.v1.classification_pb2 import ClassAnnotation, Property
+from yandex.cloud.ai.vision.v1.vision_service_pb2 import (
+    AnalyzeResult,
+    BatchAnalyzeRequest,
+    BatchAnalyzeResponse,
+    FeatureResult,
+)
+from yandex.cloud.ai.vision.v1.vision_service_pb2_grpc import (
+    VisionServiceServicer,
+    VisionServiceStub,
+    add_VisionServiceServicer_to_server,
+)
+
+from datapipe_image_moderation.google_vision import ImageModerationGoogle
+from datapipe_image_moderation.yandex_vision import ImageModerationYandex
+
+GOOGLE_SERVICE_NAME = "google.cloud.vision.v1.ImageAnnotator"
+
+# Максимальный размер gRPC-сообщения тестовых серверов.
+MAX_MESSAGE_LENGTH = 64 * 1024 * 1024
+
+
+@dataclass
+class FakeServerConfig:
+    """
+    Поведение тестового сервера модерации.
+    """
+
+    latency: float = 0.0  # Задержка ответа на запрос в секундах.
+    latency_per_image: float = 0.0  # Дополнительная задержка на изображение в секундах.
+    error_rate: float = 0.0  # Доля запросов, завершающихся UNAVAILABLE.
+    image_error_rate: float = 0.0  # Доля изображений с ошибкой в успешном ответе.
+    requests_per_second: Optional[float] = None  # Квота запросов в секунду, сверх неё - RESOURCE_EXHAUSTED.
+    max_workers: int = 32  # Количество потоков gRPC-сервера.
+    seed: int = 0
+
+
+def get_score(image: bytes, salt: str) -> float:
+    """
+    Метод получения детерминированной оценки изображения от 0 до 1.
+
+    :param image: изображение в bytes или URI.
+    :param salt: название класса.
+    :return: оценка.
+    """
+
+    digest = hashlib.blake2b(image, digest_size=8, person=salt.encode()[:16]).digest()
+    return int.from_bytes(digest, "big") / 2**64
+
+
+class FakeVisionServer:
+    """
+    Базовый класс тестового gRPC-сервера модерации с настраиваемыми задержкой, ошибками и квотой.
+    """
+
+    def __init__(self, config: Optional[FakeServerConfig] = None) -> None:
+        self.config = config or FakeServerConfig()
+        self.requests = 0
+        self.images = 0
+        self.throttled = 0
+        self.failed = 0
+
+        self._lock = threading.Lock()
+        self._random = random.Random(self.config.seed)
+        self._quota_tokens = self.config.requests_per_second or 0.0
+        self._quota_updated_at = time.monotonic()
+        self._server: Optional[grpc.Server] = None
+        self.address = ""
+
+    def _add_handlers(self, server: grpc.Server) -> None:
+        raise NotImplementedError()
+
+    def start(self) -> str:
+        """
+        Метод запуска сервера на свободном локальном порту.
+
+        :return: адрес сервера.
+        """
+
+        self._server = grpc.server(
+            futures.ThreadPoolExecutor(max_workers=self.config.max_workers),
+            options=[
+                ("grpc.max_receive_message_length", MAX_MESSAGE_LENGTH),
+                ("grpc.max_send_message_length", MAX_MESSAGE_LENGTH),
+            ],
+        )
+        self._add_handlers(self._server)
+        port = self._server.add_insecure_port("127.0.0.1:0")
+        self._server.start()
+        self.address = f"127.0.0.1:{port}"
+        return self.address
+
+    def stop(self) -> None:
+        if self._server is not None:
+            self._server.stop(grace=None)
+            self._server = None
+
+    def __enter__(self) -> "FakeVisionServer":
+        self.start()
+        return self
+
+    def __exit__(self, *args: object) -> None:
+        self.stop()
+
+    def _take_quota(self) -> bool:
+        rate = self.config.requests_per_second
+        if rate is None:
+            return True
+
+        now = time.monotonic()
+        self._quota_tokens = min(self._quota_tokens + (now - self._quota_updated_at) * rate, max(rate, 1.0))
+        self._quota_updated_at = now
+        if self._quota_tokens < 1:
+            return False
+
+        self._quota_tokens -= 1
+        return True
+
+    def _before_request(self, context: grpc.ServicerContext, images_count: int) -> None:
+        """
+        Метод эмуляции квоты, ошибок и задержки сервиса.
+
+        :param context: контекст gRPC-запроса.
+        :param images_count: количество изображений в запросе.
+        """
+
+        with self._lock:
+            self.requests += 1
+            if not self._take_quota():
+                self.throttled += 1
+                context.abort(grpc.StatusCode.RESOURCE_EXHAUSTED, "Quota exceeded")
+
+            if self._random.random() < self.config.error_rate:
+                self.failed += 1
+                context.abort(grpc.StatusCode.UNAVAILABLE, "Service unavailable")
+
+            self.images += images_count
+
+        delay = self.config.latency + self.config.latency_per_image * images_count
+        if delay > 0:
+            time.sleep(delay)
+
+    def _is_image_error(self) -> bool:
+        with self._lock:
+            return self._random.random() < self.config.image_error_rate
+
+
+class FakeGoogleVisionServer(FakeVisionServer):
+    """
+    Тестовый сервер Google Cloud Vision: ImageAnnotator.BatchAnnotateImages с SafeSearch.
+    """
+
+    def _add_handlers(self, server: grpc.Server) -> None:
+        server.add_generic_rpc_handlers(
+            (
+                grpc.method_handlers_generic_handler(
+                    GOOGLE_SERVICE_NAME,
+                    {
+                        "BatchAnnotateImages": grpc.unary_unary_rpc_method_handler(
+                            self.batch_annotate_images,
+                            request_deserializer=vision.BatchAnnotateImagesRequest.deserialize,
+                            response_serializer=vision.BatchAnnotateImagesResponse.serialize,
+                        )
+                    },
+                ),
+            )
+        )
+
+    def batch_annotate_images(
+        self,
+        request: vision.BatchAnnotateImagesRequest,
+        context: grpc.ServicerContext,
+    ) -> vision.BatchAnnotateImagesResponse:
+        self._before_request(context, len(request.requests))
+
+        responses = []
+        for image_request in request.requests:
+            if self._is_image_error():
+                responses.append(vision.AnnotateImageResponse({"error": {"code": 13, "message": "Internal error"}}))
+                continue
+
+            image = image_request.image.content or image_request.image.source.image_uri.encode()
+            responses.append(
+                vision.AnnotateImageResponse(
+                    {
+                        "safe_search_annotation": {
+                            name: vision.Likelihood(1 + int(get_score(image, name) * 5))
+                            for name in ("adult", "spoof", "medical", "violence", "racy")
+                        }
+                    }
+                )
+            )
+
+        return vision.BatchAnnotateImagesResponse({"responses": responses})
+
+
+class FakeYandexVisionServer(FakeVisionServer, VisionServiceServicer):
+    """
+    Тестовый сервер Yandex Cloud Vision: VisionService.BatchAnalyze с классификатором moderation.
+    """
+
+    def _add_handlers(self, server: grpc.Server) -> None:
+        add_VisionServiceServicer_to_server(self, server)
+
+    def BatchAnalyze(  # pylint: disable=invalid-name
+        self,
+        request: BatchAnalyzeRequest,
+        context: grpc.ServicerContext,
+    ) -> BatchAnalyzeResponse:
+        self._before_request(context, len(request.analyze_specs))
+
+        results = []
+        for analyze_spec in request.analyze_specs:
+            if self._is_image_error():
+                results.append(AnalyzeResult(error={"code": 13, "message": "Internal error"}))
+                continue
+
+            properties = [
+                Property(name=name, probability=get_score(analyze_spec.content, name))
+                for name in ("adult", "gruesome", "text", "watermarks")
+            ]
+            results.append(
+                AnalyzeResult(results=[FeatureResult(classification=ClassAnnotation(properties=properties))])
+            )
+
+        return BatchAnalyzeResponse(results=results)
+
+
+def _create_channel(address: str) -> grpc.Channel:
+    return grpc.insecure_channel(
+        address,
+        options=[
+            ("grpc.max_receive_message_length", MAX_MESSAGE_LENGTH),
+            ("grpc.max_send_message_length", MAX_MESSAGE_LENGTH),
+        ],
+    )
+
+
+def create_google_client(address: str) -> ImageModerationGoogle:
+    """
+    Метод создания клиента модерации Google Cloud Vision, подключённого к тестовому серверу.
+
+    :param address: адрес тестового сервера.
+    :return: ImageModerationGoogle.
+    """
+
+    transport = ImageAnnotatorGrpcTransport(channel=_create_channel(address))
+    return ImageModerationGoogle(vision_client=vision.ImageAnnotatorClient(transport=transport))
+
+
+def create_yandex_client(address: str) -> ImageModerationYandex:
+    """
+    Метод создания клиента модерации Yandex Cloud Vision, подключённого к тестовому серверу.
+
+    :param address: адрес тестового сервера.
+    :return: ImageModerationYandex.
+    """
+
+    return ImageModerationYandex(
+        oauth_token="benchmark",
+        folder_id="benchmark",
+        vision_client=VisionServiceStub(_create_channel(address)),
+    )
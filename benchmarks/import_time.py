@@ -0,0 +1,87 @@
+"""
+Бенчмарк времени импорта модулей пакета в новом процессе интерпретатора.
+
+Запуск:
+
+    python -m benchmarks.import_time --repeat 5
+"""
+
+import argparse
+import json
+import subprocess
+import sys
+from typing import Dict, List, Optional
+
+# Модули, импорт которых замеряется.
+MODULES = [
+    "datapipe_image_moderation.pipeline",
+    "datapipe_image_moderation.clients",
+    "datapipe_image_moderation.google_vision",
+    "datapipe_image_moderation.yandex_vision",
+]
+
+# SDK сервисов модерации, которые не должны импортироваться вместе с шагами пайплайна.
+PROVIDER_SDK_MODULES = ["google.cloud.vision", "yandexcloud", "yandex.cloud", "onnxruntime"]
+
+_MEASURE_SCRIPT = """
+import json, sys, time
+started_at = time.perf_counter()
+import {module}
+seconds = time.perf_counter() - started_at
+print(json.dumps({{"seconds": seconds, "modules": sorted(sys.modules)}}))
+"""
+
+
+def measure_import(module: str) -> Dict:
+    """
+    Метод замера импорта модуля в новом процессе.
+
+    :param module: название модуля.
+    :return: время импорта в секундах (seconds) и импортированные модули (modules).
+    """
+
+    output = subprocess.run(
+        [sys.executable, "-c", _MEASURE_SCRIPT.format(module=module)],
+        check=True,
+        capture_output=True,
+        text=True,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def get_imported_sdk_modules(module: str) -> List[str]:
+    """
+    Метод получения SDK сервисов модерации, импортированных вместе с модулем.
+
+    :param module: название модуля.
+    :return: список SDK из PROVIDER_SDK_MODULES.
+    """
+
+    modules = set(measure_import(module)["modules"])
+    return [sdk_module for sdk_module in PROVIDER_SDK_MODULES if sdk_module in modules]
+
+
+def main(argv: Optional[List[str]] = None) -> Dict[str, Dict]:
+    parser = argparse.ArgumentParser(description="Бенчмарк времени импорта модулей пакета")
+    parser.add_argument("--modules", nargs="+", default=MODULES)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args(argv)
+
+    results = {}
+    for module in args.modules:
+        measurements = [measure_import(module) for _ in range(args.repeat)]
+        imported = set(measurements[0]["modules"])
+        results[module] = {
+            "min_seconds": min(measurement["seconds"] for measurement in measurements),
+            "sdk_modules": [sdk_module for sdk_module in PROVIDER_SDK_MODULES if sdk_module in imported],
+        }
+        print(
+            f"{module}: {results[module]['min_seconds'] * 1000:.0f} ms, "
+            f"SDK: {', '.join(results[module]['sdk_modules']) or '-'}"
+        )
+
+    return results
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,385 @@
+"""
+Бенчмарк модерации изображений на тестовых gRPC-серверах и файловой системе memory://.
+
+Запуск:
+
+    python -m benchmarks.run --providers google yandex --modes batch step --concurrency 1 4 16
+
+Результаты сохраняются в benchmarks/results/<время>.json, для сравнения с предыдущим запуском:
+
+    python -m benchmarks.run --compare benchmarks/results/<время>.json
+"""
+
+import argparse
+import itertools
+import json
+import os
+import platform
+import random
+import resource
+import subprocess
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional
+
+import fsspec
+import numpy as np
+import pandas as pd
+import sqlalchemy as sa
+from datapipe.compute import Catalog, Pipeline, Table, build_compute, run_steps
+from datapipe.datatable import DataStore
+from datapipe.store.database import DBConn, TableStoreDB
+
+from benchmarks.fake_servers import (
+    FakeGoogleVisionServer,
+    FakeServerConfig,
+    FakeVisionServer,
+    FakeYandexVisionServer,
+    create_google_client,
+    create_yandex_client,
+)
+from datapipe_image_moderation.base import ImageModerationBase
+from datapipe_image_moderation.clients import client_registry
+from datapipe_image_moderation.pipeline import GoogleImageClassificationStep, YandexImageClassificationStep
+from datapipe_image_moderation.rate_limit import RetryPolicy
+from datapipe_image_moderation.result import ImageModerationError
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+
+# Быстрые повторы, чтобы сценарии с ошибками не упирались в паузы по умолчанию.
+BENCHMARK_RETRY_POLICY = RetryPolicy(max_retries=3, rpc_timeout=30.0, initial_backoff=0.01, max_backoff=0.1)
+
+
+@dataclass
+class Scenario:
+    """
+    Параметры сценария бенчмарка.
+    """
+
+    provider: str  # google или yandex.
+    mode: str  # batch - вызовы moderate_batch, step - шаг *ImageClassificationStep.
+    images: int  # Количество изображений.
+    image_size: int  # Размер изображения в байтах.
+    batch_size: int  # Изображений в вызове moderate_batch (batch) или строк в chunk (step).
+    concurrency: int  # Параллельных вызовов moderate_batch (batch) или max_parallel_batches (step).
+    latency: float  # Задержка ответа сервера в секундах.
+    error_rate: float  # Доля запросов, завершающихся UNAVAILABLE.
+    quota: Optional[float]  # Квота сервера в запросах в секунду.
+
+    @property
+    def name(self) -> str:
+        return (
+            f"{self.provider}-{self.mode}-n{self.images}-s{self.image_size}-b{self.batch_size}-c{self.concurrency}"
+            f"-l{self.latency}-e{self.error_rate}-q{self.quota}"
+        )
+
+
+class PeakRSSMonitor:
+    """
+    Замер пикового RSS процесса за время сценария (по /proc/self/statm, иначе ru_maxrss).
+    """
+
+    def __init__(self, interval: float = 0.01) -> None:
+        self._interval = interval
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._page_size = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+        self.peak_bytes = 0
+
+    def _get_rss(self) -> int:
+        try:
+            with open("/proc/self/statm", encoding="utf-8") as statm:
+                return int(statm.read().split()[1]) * self._page_size
+        except OSError:
+            # ru_maxrss - пик за всё время процесса (КБ в Linux).
+            return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            self.peak_bytes = max(self.peak_bytes, self._get_rss())
+            self._stop.wait(self._interval)
+
+    def __enter__(self) -> "PeakRSSMonitor":
+        self.peak_bytes = self._get_rss()
+        self._thread.start()
+        return self
+
+    def __exit__(self, *args: object) -> None:
+        self._stop.set()
+        self._thread.join()
+        self.peak_bytes = max(self.peak_bytes, self._get_rss())
+
+
+def create_corpus(images: int, image_size: int) -> List[str]:
+    """
+    Метод создания корпуса изображений в memory:// (случайные bytes, тестовые серверы их не декодируют).
+
+    :param images: количество изображений.
+    :param image_size: размер изображения в байтах.
+    :return: список URL изображений.
+    """
+
+    file_system = fsspec.filesystem("memory")
+    random_generator = random.Random(image_size)
+    image_urls = []
+    for i in range(images):
+        image_url = f"memory://benchmark/{image_size}/{i}.jpg"
+        if not file_system.exists(image_url):
+            file_system.pipe_file(image_url, random_generator.randbytes(image_size))
+
+        image_urls.append(image_url)
+
+    return image_urls
+
+
+def _time_batches(client: ImageModerationBase, latencies: List[float]) -> None:
+    # Замеряем задержку каждого батча (загрузка + запрос к сервису) на экземпляре клиента.
+    moderate_batch_results = client.moderate_batch_results
+    lock = threading.Lock()
+
+    def timed(*args: Any, **kwargs: Any) -> Any:
+        started_at = time.perf_counter()
+        try:
+            return moderate_batch_results(*args, **kwargs)
+        finally:
+            with lock:
+                latencies.append(time.perf_counter() - started_at)
+
+    client.moderate_batch_results = timed  # type: ignore
+
+
+def run_batch_mode(client: ImageModerationBase, scenario: Scenario, image_urls: List[str]) -> int:
+    """
+    Метод запуска сценария через параллельные вызовы moderate_batch.
+
+    :return: количество изображений с ошибкой.
+    """
+
+    batch_size = min(scenario.batch_size, client.max_batch_size)
+    batches = [image_urls[i : i + batch_size] for i in range(0, len(image_urls), batch_size)]
+
+    def moderate(batch: List[str]) -> int:
+        try:
+            client.moderate_batch(images=batch, file_system_name="memory", retry_policy=BENCHMARK_RETRY_POLICY)
+        except ImageModerationError as exception:
+            return sum(not result.ok for result in exception.results)
+
+        return 0
+
+    with ThreadPoolExecutor(max_workers=scenario.concurrency) as executor:
+        return sum(executor.map(moderate, batches))
+
+
+def run_step_mode(client: ImageModerationBase, scenario: Scenario, image_urls: List[str]) -> int:
+    """
+    Метод запуска сценария через шаг пайплайна на SQLite.
+
+    :return: количество изображений с ошибкой.
+    """
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        dbconn = DBConn(f"sqlite:///{tmp_dir}/benchmark.db")
+        ds = DataStore(dbconn, create_meta_table=True)
+        catalog = Catalog(
+            {
+                "benchmark_input": Table(
+                    store=TableStoreDB(
+                        dbconn=dbconn,
+                        name="benchmark_input",
+                        data_sql_schema=[
+                            sa.Column("image_id", sa.String, primary_key=True),
+                            sa.Column("image_url", sa.String),
+                        ],
+                        create_table=True,
+                    )
+                )
+            }
+        )
+
+        step_params: Dict[str, Any] = dict(
+            input="benchmark_input",
+            output="benchmark_output",
+            dbconn=dbconn,
+            file_system_name="memory",
+            chunk_size=scenario.batch_size,
+            max_parallel_batches=scenario.concurrency,
+            retry_policy=BENCHMARK_RETRY_POLICY,
+            status_field="status",
+        )
+        if scenario.provider == "google":
+            client_registry.register_google(client)  # type: ignore
+            step = GoogleImageClassificationStep(**step_params)
+        else:
+            client_registry.register_yandex(client, oauth_token="benchmark", folder_id="benchmark")  # type: ignore
+            step = YandexImageClassificationStep(
+                folder_id="benchmark", yandex_oauth_token="benchmark", **step_params
+            )  # type: ignore
+
+        steps = build_compute(ds, catalog, Pipeline([step]))
+        ds.get_table("benchmark_input").store_chunk(
+            pd.DataFrame({"image_id": [str(i) for i in range(len(image_urls))], "image_url": image_urls})
+        )
+        run_steps(ds, steps)
+
+        # Строки chunk, завершившегося исключением, не попадают в выходную таблицу - считаем их ошибками.
+        output_df = ds.get_table("benchmark_output").get_data()
+        return len(image_urls) - int((output_df["status"] == "ok").sum())
+
+
+MODES: Dict[str, Callable[[ImageModerationBase, Scenario, List[str]], int]] = {
+    "batch": run_batch_mode,
+    "step": run_step_mode,
+}
+
+
+def run_scenario(scenario: Scenario) -> Dict[str, Any]:
+    """
+    Метод запуска сценария бенчмарка.
+
+    :param scenario: параметры сценария.
+    :return: результат сценария.
+    """
+
+    image_urls = create_corpus(scenario.images, scenario.image_size)
+    config = FakeServerConfig(
+        latency=scenario.latency,
+        error_rate=scenario.error_rate,
+        requests_per_second=scenario.quota,
+    )
+    server: FakeVisionServer
+    if scenario.provider == "google":
+        server = FakeGoogleVisionServer(config)
+        create_client = create_google_client
+    else:
+        server = FakeYandexVisionServer(config)
+        create_client = create_yandex_client  # type: ignore
+
+    latencies: List[float] = []
+    with server:
+        client = create_client(server.address)
+        _time_batches(client, latencies)
+
+        with PeakRSSMonitor() as rss_monitor:
+            started_at = time.perf_counter()
+            errors = MODES[scenario.mode](client, scenario, image_urls)
+            seconds = time.perf_counter() - started_at
+
+    client_registry.clear()
+
+    return {
+        "name": scenario.name,
+        **asdict(scenario),
+        "seconds": seconds,
+        "images_per_second": scenario.images / seconds,
+        "p50_ms": float(np.percentile(latencies, 50) * 1000) if latencies else None,
+        "p99_ms": float(np.percentile(latencies, 99) * 1000) if latencies else None,
+        "peak_rss_mb": rss_monitor.peak_bytes / 1024 / 1024,
+        "errors": errors,
+        "requests": server.requests,
+        "throttled": server.throttled,
+    }
+
+
+def get_git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results: List[Dict[str, Any]], baseline_path: str) -> None:
+    """
+    Метод вывода сравнения с результатами предыдущего запуска.
+
+    :param results: результаты текущего запуска.
+    :param baseline_path: путь к JSON с результатами предыдущего запуска.
+    """
+
+    with open(baseline_path, encoding="utf-8") as baseline_file:
+        baseline = {result["name"]: result for result in json.load(baseline_file)["results"]}
+
+    print(f"\nСравнение с {baseline_path}:")
+    for result in results:
+        base = baseline.get(result["name"])
+        if base is None:
+            print(f"{result['name']}: нет в предыдущем запуске")
+            continue
+
+        throughput = (result["images_per_second"] / base["images_per_second"] - 1) * 100
+        p99 = (result["p99_ms"] / base["p99_ms"] - 1) * 100 if result["p99_ms"] and base["p99_ms"] else 0.0
+        print(f"{result['name']}: images/sec {throughput:+.1f}%, p99 {p99:+.1f}%")
+
+
+def main(argv: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+    parser = argparse.ArgumentParser(description="Бенчмарк модерации изображений на тестовых gRPC-серверах")
+    parser.add_argument("--providers", nargs="+", default=["google", "yandex"], choices=["google", "yandex"])
+    parser.add_argument("--modes", nargs="+", default=["batch", "step"], choices=list(MODES))
+    parser.add_argument("--images", type=int, default=300)
+    parser.add_argument("--image-sizes", nargs="+", type=int, default=[20 * 1024, 1024 * 1024])
+    parser.add_argument("--batch-sizes", nargs="+", type=int, default=[5, 15, 500])
+    parser.add_argument("--concurrency", nargs="+", type=int, default=[1, 4, 16])
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--quota", type=float, default=None)
+    parser.add_argument("--output", default=None, help="Путь к JSON с результатами (по умолчанию benchmarks/results)")
+    parser.add_argument("--compare", default=None, help="Путь к JSON с результатами предыдущего запуска")
+    args = parser.parse_args(argv)
+
+    scenarios = [
+        Scenario(
+            provider=provider,
+            mode=mode,
+            images=args.images,
+            image_size=image_size,
+            batch_size=batch_size,
+            concurrency=concurrency,
+            latency=args.latency,
+            error_rate=args.error_rate,
+            quota=args.quota,
+        )
+        for provider, mode, image_size, batch_size, concurrency in itertools.product(
+            args.providers, args.modes, args.image_sizes, args.batch_sizes, args.concurrency
+        )
+    ]
+
+    results = []
+    for scenario in scenarios:
+        result = run_scenario(scenario)
+        results.append(result)
+        print(
+            f"{result['name']}: {result['images_per_second']:.1f} images/sec, "
+            f"p50 {result['p50_ms']:.1f} ms, p99 {result['p99_ms']:.1f} ms, "
+            f"peak RSS {result['peak_rss_mb']:.0f} MB, errors {result['errors']}"
+        )
+
+    created_at = datetime.now(timezone.utc)
+    output_path = args.output or os.path.join(RESULTS_DIR, f"{created_at:%Y%m%dT%H%M%S}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+    with open(output_path, "w", encoding="utf-8") as output_file:
+        json.dump(
+            {
+                "created_at": created_at.isoformat(),
+                "git_commit": get_git_commit(),
+                "python": platform.python_version(),
+                "cpu_count": os.cpu_count(),
+                "results": results,
+            },
+            output_file,
+            indent=2,
+        )
+    print(f"\nРезультаты сохранены в {output_path}")
+
+    if args.compare is not None:
+        compare(results, args.compare)
+
+    return results
+
+
+if __name__ == "__main__":
+    main()
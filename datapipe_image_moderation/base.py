@@ -0,0 +1,1183 @@
+import abc
+import asyncio
+import weakref
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, FrozenSet, List, Optional, Tuple, Union
+
+from datapipe_image_moderation import metrics
+from datapipe_image_moderation.batching import DEFAULT_MAX_INFLIGHT_BYTES, AsyncByteBudget, ByteBudget, plan_batches
+from datapipe_image_moderation.byte_cache import DiskByteCache
+from datapipe_image_moderation.cache import ModerationResultCache, get_image_hash
+from datapipe_image_moderation.preprocess import ImagePreprocessor
+from datapipe_image_moderation.rate_limit import (
+    RetryPolicy,
+    RpcCall,
+    call_with_retries,
+    call_with_retries_async,
+    get_rate_limiter,
+    get_status_code,
+)
+from datapipe_image_moderation.result import ModerationResult, get_details
+from datapipe_image_moderation.screening import ImageScreening
+from datapipe_image_moderation.utils import (
+    DEFAULT_FETCH_CONCURRENCY,
+    fetch_images,
+    fetch_images_async,
+    get_gcs_uri,
+    get_image_sizes,
+    get_image_sizes_async,
+)
+
+# Количество одновременно выполняемых запросов к сервису по умолчанию.
+DEFAULT_MAX_PARALLEL_BATCHES = 4
+
+# Количество повторных раундов для изображений с повторяемыми ошибками внутри chunk по умолчанию.
+DEFAULT_MAX_IMAGE_RETRIES = 1
+
+# Политика повторов запросов к сервису по умолчанию.
+DEFAULT_RETRY_POLICY = RetryPolicy()
+
+# Изображение для запроса: bytes или URI, по которому сервис прочитает его сам.
+ImageInput = Union[bytes, str]
+
+
+class ImageModerationBase(abc.ABC):
+    """
+    Базовый класс клиента модерации изображений.
+
+    Наследники задают название сервиса, лимит батча и метод модерации списка изображений.
+    """
+
+    provider_name: str
+    max_batch_size: int
+    # Лимит суммарного размера изображений в одном запросе к сервису в байтах.
+    max_request_bytes: Optional[int] = None
+    # Лимит размера одного изображения в байтах (для проверки до загрузки, см. ImageScreening).
+    max_image_bytes: Optional[int] = None
+    # Форматы изображений, которые принимает сервис (см. screening.sniff_image_format).
+    supported_formats: Optional[FrozenSet[str]] = None
+    # Умеет ли сервис читать изображения из GCS по URI.
+    supports_gcs_uri: bool = False
+    # Асинхронные клиенты по event loop.
+    _loop_clients: Optional["weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Any]"] = None
+
+    @abc.abstractmethod
+    def _moderate_images(self, images: List[ImageInput], timeout: Optional[float] = None) -> List[ModerationResult]:
+        """
+        Метод модерации изображений одним запросом к сервису.
+
+        :param images: список изображений в формате bytes или URI (если supports_gcs_uri).
+        :param timeout: дедлайн запроса в секундах (опционально).
+        :return: результат модерации по каждому изображению.
+        """
+
+    @abc.abstractmethod
+    async def _moderate_images_async(
+        self,
+        images: List[ImageInput],
+        timeout: Optional[float] = None,
+    ) -> List[ModerationResult]:
+        """
+        Асинхронный метод модерации изображений одним запросом к сервису.
+
+        :param images: список изображений в формате bytes или URI (если supports_gcs_uri).
+        :param timeout: дедлайн запроса в секундах (опционально).
+        :return: результат модерации по каждому изображению.
+        """
+
+    def _start_moderate_images(
+        self, images: List[ImageInput], timeout: Optional[float] = None
+    ) -> Optional[RpcCall[List[ModerationResult]]]:
+        """
+        Метод отправки запроса к сервису без ожидания ответа (для дублирования запросов, см. HedgingPolicy).
+
+        :param images: список изображений в формате bytes или URI (если supports_gcs_uri).
+        :param timeout: дедлайн запроса в секундах (опционально).
+        :return: отправленный запрос или None, если сервис так не умеет.
+        """
+
+        return None
+
+    def _call_moderate_images(
+        self,
+        images: List[ImageInput],
+        retry_policy: Optional[RetryPolicy] = None,
+    ) -> List[ModerationResult]:
+        """
+        Метод запроса к сервису с общим для процесса ограничителем скорости, дедлайном и повторами.
+
+        Если запрос так и не выполнился, ошибка записывается в результат каждого изображения запроса.
+
+        :param images: список изображений в формате bytes или URI.
+        :param retry_policy: политика повторов (опционально).
+        :return: результат модерации по каждому изображению.
+        """
+
+        self._record_request(images)
+        try:
+            return call_with_retries(
+                lambda timeout: self._moderate_images(images, timeout=timeout),
+                images_count=len(images),
+                rate_limiter=get_rate_limiter(self.provider_name),
+                retry_policy=retry_policy or DEFAULT_RETRY_POLICY,
+                start_func=lambda timeout: self._start_moderate_images(images, timeout=timeout),
+            )
+        except Exception as exception:  # pylint: disable=broad-except
+            if get_status_code(exception) is None:
+                raise
+
+            return [ModerationResult.from_api_exception(exception) for _ in images]
+
+    async def _call_moderate_images_async(
+        self,
+        images: List[ImageInput],
+        retry_policy: Optional[RetryPolicy] = None,
+    ) -> List[ModerationResult]:
+        """
+        Асинхронный метод запроса к сервису с общим для процесса ограничителем скорости, дедлайном и повторами.
+
+        :param images: список изображений в формате bytes или URI.
+        :param retry_policy: политика повторов (опционально).
+        :return: результат модерации по каждому изображению.
+        """
+
+        self._record_request(images)
+        try:
+            return await call_with_retries_async(
+                lambda timeout: self._moderate_images_async(images, timeout=timeout),
+                images_count=len(images),
+                rate_limiter=get_rate_limiter(self.provider_name),
+                retry_policy=retry_policy or DEFAULT_RETRY_POLICY,
+            )
+        except Exception as exception:  # pylint: disable=broad-except
+            if get_status_code(exception) is None:
+                raise
+
+            return [ModerationResult.from_api_exception(exception) for _ in images]
+
+    def _record_request(self, images: List[ImageInput]) -> None:
+        if metrics.is_enabled():
+            metrics.record("images_per_rpc", len(images), provider=self.provider_name)
+            metrics.record("bytes_sent", sum(len(image) for image in images), provider=self.provider_name)
+
+    def _record_fetched(self, fetched_images: List[Union[bytes, Exception]]) -> None:
+        if metrics.is_enabled():
+            fetched_bytes = sum(len(image) for image in fetched_images if isinstance(image, bytes))
+            metrics.record("bytes_fetched", fetched_bytes, provider=self.provider_name)
+
+    def _record_statuses(self, results: List[ModerationResult]) -> None:
+        if metrics.is_enabled():
+            for status, count in Counter(result.status.value for result in results).items():
+                metrics.record("images", count, provider=self.provider_name, status=status)
+
+    def _get_loop_client(self, factory: Callable[[], Any]) -> Any:
+        """
+        Метод получения асинхронного клиента, привязанного к текущему event loop.
+
+        Каналы grpc.aio нельзя использовать из другого event loop, поэтому клиент создаётся один раз на loop.
+
+        :param factory: функция создания клиента.
+        :return: клиент для текущего event loop.
+        """
+
+        loop = asyncio.get_running_loop()
+        if self._loop_clients is None:
+            self._loop_clients = weakref.WeakKeyDictionary()
+
+        if loop not in self._loop_clients:
+            self._loop_clients[loop] = factory()
+
+        return self._loop_clients[loop]
+
+    def _prepare_images(
+        self,
+        images: List[ImageInput],
+        result_cache: Optional[ModerationResultCache] = None,
+    ) -> Tuple[List[str], Dict[str, ImageInput], Dict[str, ModerationResult]]:
+        """
+        Метод дедупликации изображений и поиска ранее полученных результатов в кэше.
+
+        :param images: список изображений в формате bytes или URI.
+        :param result_cache: кэш результатов модерации (опционально).
+        :return: ключи изображений, уникальные изображения по ключу, найденные в кэше результаты.
+        """
+
+        image_keys = [get_image_hash(image) if isinstance(image, bytes) else image for image in images]
+
+        # Оставляем по одному изображению на каждый ключ.
+        unique_images: Dict[str, ImageInput] = {}
+        for image_key, image in zip(image_keys, images):
+            unique_images.setdefault(image_key, image)
+
+        results: Dict[str, ModerationResult] = {}
+        if result_cache is not None:
+            image_hashes = {image_key: image for image_key, image in unique_images.items() if isinstance(image, bytes)}
+            with metrics.stage("cache_lookup", self.provider_name):
+                cached_details = result_cache.get_many_images(self.provider_name, image_hashes)  # type: ignore
+
+            for image_key, details in cached_details.items():
+                results[image_key] = ModerationResult.from_details(details)
+
+            metrics.record("cache_hits", len(cached_details), provider=self.provider_name)
+            metrics.record("cache_misses", len(image_hashes) - len(cached_details), provider=self.provider_name)
+
+        return image_keys, unique_images, results
+
+    def _save_results(
+        self,
+        unique_images: Dict[str, ImageInput],
+        unseen_results: Dict[str, ModerationResult],
+        result_cache: Optional[ModerationResultCache] = None,
+    ) -> None:
+        """
+        Метод сохранения новых успешных результатов модерации изображений в bytes в кэш.
+
+        :param unique_images: уникальные изображения по ключу.
+        :param unseen_results: новые результаты модерации по ключу.
+        :param result_cache: кэш результатов модерации (опционально).
+        """
+
+        if result_cache is None:
+            return
+
+        results = {
+            image_key: result.details
+            for image_key, result in unseen_results.items()
+            if result.ok and isinstance(unique_images[image_key], bytes)
+        }
+        with metrics.stage("cache_save", self.provider_name):
+            result_cache.set_many_images(
+                self.provider_name,
+                results,  # type: ignore
+                {image_key: unique_images[image_key] for image_key in results},  # type: ignore
+            )
+
+    def _plan_requests(
+        self,
+        image_keys: List[str],
+        images: List[ImageInput],
+        max_request_bytes: Optional[int] = None,
+    ) -> List[List[str]]:
+        """
+        Метод разбиения изображений на запросы к сервису по размеру загруженных изображений.
+
+        :param image_keys: ключи изображений.
+        :param images: изображения в формате bytes или URI по каждому ключу.
+        :param max_request_bytes: лимит суммарного размера изображений в запросе (опционально).
+        :return: ключи изображений по каждому запросу.
+        """
+
+        sizes = {image_key: len(image) for image_key, image in zip(image_keys, images)}
+        if max_request_bytes is None or sum(sizes.values()) <= max_request_bytes:
+            return [image_keys]
+
+        return plan_batches(image_keys, sizes, self.max_batch_size, max_request_bytes)
+
+    def moderate_images_results(
+        self,
+        images: List[ImageInput],
+        result_cache: Optional[ModerationResultCache] = None,
+        retry_policy: Optional[RetryPolicy] = None,
+        preprocessor: Optional[ImagePreprocessor] = None,
+        max_request_bytes: Optional[int] = None,
+    ) -> List[ModerationResult]:
+        """
+        Метод модерации изображений с дедупликацией по content-hash (для bytes) или URI.
+
+        Одинаковые изображения отправляются в сервис один раз, ранее промодерированные bytes берутся из кэша.
+        Кэш использует content-hash исходного изображения, поэтому preprocessor применяется только к промахам кэша.
+
+        :param images: список изображений в формате bytes или URI.
+        :param result_cache: кэш результатов модерации (опционально).
+        :param retry_policy: политика повторов запросов к сервису (опционально).
+        :param preprocessor: уменьшение и перекодирование изображений перед отправкой (опционально).
+        :param max_request_bytes: лимит суммарного размера изображений в запросе (опционально).
+        :return: результат модерации по каждому изображению.
+        """
+
+        image_keys, unique_images, results = self._prepare_images(images, result_cache)
+
+        unseen_keys = [image_key for image_key in unique_images if image_key not in results]
+        if len(unseen_keys) > 0:
+            unseen_images = [unique_images[image_key] for image_key in unseen_keys]
+            if preprocessor is not None:
+                with metrics.stage("preprocess", self.provider_name):
+                    unseen_images = preprocessor.process(unseen_images)
+
+            unseen_inputs = dict(zip(unseen_keys, unseen_images))
+            unseen_results: Dict[str, ModerationResult] = {}
+            for request_keys in self._plan_requests(unseen_keys, unseen_images, max_request_bytes):
+                request_results = self._call_moderate_images(
+                    [unseen_inputs[image_key] for image_key in request_keys], retry_policy=retry_policy
+                )
+                unseen_results.update(zip(request_keys, request_results))
+            self._save_results(unique_images, unseen_results, result_cache)
+            results.update(unseen_results)
+
+        return [results[image_key] for image_key in image_keys]
+
+    async def moderate_images_results_async(
+        self,
+        images: List[ImageInput],
+        result_cache: Optional[ModerationResultCache] = None,
+        retry_policy: Optional[RetryPolicy] = None,
+        preprocessor: Optional[ImagePreprocessor] = None,
+        max_request_bytes: Optional[int] = None,
+    ) -> List[ModerationResult]:
+        """
+        Асинхронный метод модерации изображений с дедупликацией по content-hash (для bytes) или URI.
+
+        Обращения к кэшу выполняются в пуле потоков, чтобы кэш в БД не блокировал event loop.
+
+        :param images: список изображений в формате bytes или URI.
+        :param result_cache: кэш результатов модерации (опционально).
+        :param retry_policy: политика повторов запросов к сервису (опционально).
+        :param preprocessor: уменьшение и перекодирование изображений перед отправкой (опционально).
+        :param max_request_bytes: лимит суммарного размера изображений в запросе (опционально).
+        :return: результат модерации по каждому изображению.
+        """
+
+        image_keys, unique_images, results = await asyncio.to_thread(self._prepare_images, images, result_cache)
+
+        unseen_keys = [image_key for image_key in unique_images if image_key not in results]
+        if len(unseen_keys) > 0:
+            unseen_images = [unique_images[image_key] for image_key in unseen_keys]
+            if preprocessor is not None:
+                with metrics.stage("preprocess", self.provider_name):
+                    unseen_images = await preprocessor.process_async(unseen_images)
+
+            unseen_inputs = dict(zip(unseen_keys, unseen_images))
+            unseen_results: Dict[str, ModerationResult] = {}
+            for request_keys in self._plan_requests(unseen_keys, unseen_images, max_request_bytes):
+                request_results = await self._call_moderate_images_async(
+                    [unseen_inputs[image_key] for image_key in request_keys], retry_policy=retry_policy
+                )
+                unseen_results.update(zip(request_keys, request_results))
+            await asyncio.to_thread(self._save_results, unique_images, unseen_results, result_cache)
+            results.update(unseen_results)
+
+        return [results[image_key] for image_key in image_keys]
+
+    def moderate_images(
+        self,
+        images: List[ImageInput],
+        result_cache: Optional[ModerationResultCache] = None,
+        retry_policy: Optional[RetryPolicy] = None,
+        preprocessor: Optional[ImagePreprocessor] = None,
+    ) -> List[Dict]:
+        """
+        Метод модерации изображений с дедупликацией по content-hash (для bytes) или URI.
+
+        :param images: список изображений в формате bytes или URI.
+        :param result_cache: кэш результатов модерации (опционально).
+        :param retry_policy: политика повторов запросов к сервису (опционально).
+        :param preprocessor: уменьшение и перекодирование изображений перед отправкой (опционально).
+        :return: результат модерации (ImageModerationError, если хотя бы одно изображение не обработано).
+        """
+
+        return get_details(
+            self.moderate_images_results(
+                images=images, result_cache=result_cache, retry_policy=retry_policy, preprocessor=preprocessor
+            )
+        )
+
+    async def moderate_images_async(
+        self,
+        images: List[ImageInput],
+        result_cache: Optional[ModerationResultCache] = None,
+        retry_policy: Optional[RetryPolicy] = None,
+        preprocessor: Optional[ImagePreprocessor] = None,
+    ) -> List[Dict]:
+        """
+        Асинхронный метод модерации изображений с дедупликацией по content-hash (для bytes) или URI.
+
+        :param images: список изображений в формате bytes или URI.
+        :param result_cache: кэш результатов модерации (опционально).
+        :param retry_policy: политика повторов запросов к сервису (опционально).
+        :param preprocessor: уменьшение и перекодирование изображений перед отправкой (опционально).
+        :return: результат модерации (ImageModerationError, если хотя бы одно изображение не обработано).
+        """
+
+        return get_details(
+            await self.moderate_images_results_async(
+                images=images, result_cache=result_cache, retry_policy=retry_policy, preprocessor=preprocessor
+            )
+        )
+
+    def _get_image_inputs(
+        self,
+        images: List[str],
+        file_system_name: str,
+        use_gcs_uri: bool = False,
+    ) -> Tuple[List[Optional[ImageInput]], List[int]]:
+        """
+        Метод проверки батча и определения изображений, которые нужно скачать.
+
+        :param images: список изображений в виде URL.
+        :param file_system_name: файловая система, где находится изображение.
+        :param use_gcs_uri: передавать изображения из GCS по URI без скачивания (если сервис поддерживает).
+        :return: изображения для запроса (None - нужно скачать) и индексы изображений для скачивания.
+        """
+
+        # Проверяем количество переданных изображений на соответствие лимитам сервиса.
+        if len(images) > self.max_batch_size:
+            raise ValueError(f"Количество изображений должно быть меньше или равно {self.max_batch_size}!")
+
+        # Изображения из GCS передаём по ссылке, остальные скачиваем.
+        image_inputs: List[Optional[ImageInput]] = [None] * len(images)
+        if use_gcs_uri and self.supports_gcs_uri:
+            for i, image in enumerate(images):
+                image_inputs[i] = get_gcs_uri(image, file_system_name)
+
+        download_indexes = [i for i, image_input in enumerate(image_inputs) if image_input is None]
+
+        return image_inputs, download_indexes
+
+    @staticmethod
+    def _merge_results(
+        image_inputs: List[Optional[ImageInput]],
+        download_indexes: List[int],
+        fetched_images: List[Union[bytes, Exception]],
+    ) -> Tuple[List[ModerationResult], List[int]]:
+        """
+        Метод подстановки загруженных изображений и формирования результатов для незагруженных.
+
+        :param image_inputs: изображения для запроса (None - нужно скачать).
+        :param download_indexes: индексы скачиваемых изображений.
+        :param fetched_images: изображение в bytes или исключение загрузки по каждому индексу.
+        :return: результаты (заполнены только ошибки загрузки) и индексы изображений для запроса к сервису.
+        """
+
+        results: List[ModerationResult] = [None] * len(image_inputs)  # type: ignore
+        for i, fetched_image in zip(download_indexes, fetched_images):
+            if isinstance(fetched_image, Exception):
+                results[i] = ModerationResult.from_fetch_error(fetched_image)
+            else:
+                image_inputs[i] = fetched_image
+
+        request_indexes = [i for i, result in enumerate(results) if result is None]
+
+        return results, request_indexes
+
+    def moderate_batch_results(
+        self,
+        images: List[str],
+        file_system_name: str,
+        file_system_creds_path: Optional[str] = None,
+        fetch_concurrency: int = DEFAULT_FETCH_CONCURRENCY,
+        fetch_timeout: Optional[float] = None,
+        result_cache: Optional[ModerationResultCache] = None,
+        use_gcs_uri: bool = False,
+        retry_policy: Optional[RetryPolicy] = None,
+        preprocessor: Optional[ImagePreprocessor] = None,
+        byte_cache: Optional[DiskByteCache] = None,
+        max_request_bytes: Optional[int] = None,
+    ) -> List[ModerationResult]:
+        """
+        Метод массовой модерации изображений с результатом и статусом по каждому изображению.
+
+        Ошибка загрузки или модерации одного изображения не влияет на остальные изображения батча.
+
+        :param images: список изображений в виде URL или Bytes.
+        :param file_system_name: файловая система, где находится изображение.
+        :param file_system_creds_path: путь к credentials для файловой системы (опционально).
+        :param fetch_concurrency: максимальное количество одновременных загрузок изображений.
+        :param fetch_timeout: таймаут загрузки одного изображения в секундах (опционально).
+        :param result_cache: кэш результатов модерации (опционально).
+        :param use_gcs_uri: передавать изображения из GCS по URI без скачивания (если сервис поддерживает).
+        :param retry_policy: политика повторов запросов к сервису (опционально).
+        :param preprocessor: уменьшение и перекодирование изображений перед отправкой (опционально).
+        :param byte_cache: кэш загруженных изображений на локальном диске (опционально).
+        :param max_request_bytes: лимит суммарного размера изображений в запросе (опционально).
+        :return: результат модерации по каждому изображению.
+        """
+
+        image_inputs, download_indexes = self._get_image_inputs(images, file_system_name, use_gcs_uri)
+
+        # Получаем список изображений в формате bytes.
+        with metrics.stage("fetch", self.provider_name):
+            fetched_images = fetch_images(
+                image_url_list=[images[i] for i in download_indexes],
+                file_system_name=file_system_name,
+                file_system_creds_path=file_system_creds_path,
+                max_concurrency=fetch_concurrency,
+                timeout=fetch_timeout,
+                byte_cache=byte_cache,
+            )
+
+        self._record_fetched(fetched_images)
+        results, request_indexes = self._merge_results(image_inputs, download_indexes, fetched_images)
+
+        if len(request_indexes) > 0:
+            request_results = self.moderate_images_results(
+                images=[image_inputs[i] for i in request_indexes],  # type: ignore
+                result_cache=result_cache,
+                retry_policy=retry_policy,
+                preprocessor=preprocessor,
+                max_request_bytes=max_request_bytes,
+            )
+            for i, result in zip(request_indexes, request_results):
+                results[i] = result
+
+        return results
+
+    async def moderate_batch_results_async(
+        self,
+        images: List[str],
+        file_system_name: str,
+        file_system_creds_path: Optional[str] = None,
+        fetch_concurrency: int = DEFAULT_FETCH_CONCURRENCY,
+        fetch_timeout: Optional[float] = None,
+        result_cache: Optional[ModerationResultCache] = None,
+        use_gcs_uri: bool = False,
+        retry_policy: Optional[RetryPolicy] = None,
+        preprocessor: Optional[ImagePreprocessor] = None,
+        byte_cache: Optional[DiskByteCache] = None,
+        max_request_bytes: Optional[int] = None,
+    ) -> List[ModerationResult]:
+        """
+        Асинхронный метод массовой модерации изображений с результатом и статусом по каждому изображению.
+
+        :param images: список изображений в виде URL или Bytes.
+        :param file_system_name: файловая система, где находится изображение.
+        :param file_system_creds_path: путь к credentials для файловой системы (опционально).
+        :param fetch_concurrency: максимальное количество одновременных загрузок изображений.
+        :param fetch_timeout: таймаут загрузки одного изображения в секундах (опционально).
+        :param result_cache: кэш результатов модерации (опционально).
+        :param use_gcs_uri: передавать изображения из GCS по URI без скачивания (если сервис поддерживает).
+        :param retry_policy: политика повторов запросов к сервису (опционально).
+        :param preprocessor: уменьшение и перекодирование изображений перед отправкой (опционально).
+        :param byte_cache: кэш загруженных изображений на локальном диске (опционально).
+        :param max_request_bytes: лимит суммарного размера изображений в запросе (опционально).
+        :return: результат модерации по каждому изображению.
+        """
+
+        image_inputs, download_indexes = self._get_image_inputs(images, file_system_name, use_gcs_uri)
+
+        # Получаем список изображений в формате bytes.
+        with metrics.stage("fetch", self.provider_name):
+            fetched_images = await fetch_images_async(
+                image_url_list=[images[i] for i in download_indexes],
+                file_system_name=file_system_name,
+                file_system_creds_path=file_system_creds_path,
+                max_concurrency=fetch_concurrency,
+                timeout=fetch_timeout,
+                byte_cache=byte_cache,
+            )
+
+        self._record_fetched(fetched_images)
+        results, request_indexes = self._merge_results(image_inputs, download_indexes, fetched_images)
+
+        if len(request_indexes) > 0:
+            request_results = await self.moderate_images_results_async(
+                images=[image_inputs[i] for i in request_indexes],  # type: ignore
+                result_cache=result_cache,
+                retry_policy=retry_policy,
+                preprocessor=preprocessor,
+                max_request_bytes=max_request_bytes,
+            )
+            for i, result in zip(request_indexes, request_results):
+                results[i] = result
+
+        return results
+
+    def moderate_batch(
+        self,
+        images: List[str],
+        file_system_name: str,
+        file_system_creds_path: Optional[str] = None,
+        fetch_concurrency: int = DEFAULT_FETCH_CONCURRENCY,
+        fetch_timeout: Optional[float] = None,
+        result_cache: Optional[ModerationResultCache] = None,
+        use_gcs_uri: bool = False,
+        retry_policy: Optional[RetryPolicy] = None,
+        preprocessor: Optional[ImagePreprocessor] = None,
+        byte_cache: Optional[DiskByteCache] = None,
+    ) -> List:
+        """
+        Метод массовой модерации изображений.
+
+        :param images: список изображений в виде URL или Bytes.
+        :param file_system_name: файловая система, где находится изображение.
+        :param file_system_creds_path: путь к credentials для файловой системы (опционально).
+        :param fetch_concurrency: максимальное количество одновременных загрузок изображений.
+        :param fetch_timeout: таймаут загрузки одного изображения в секундах (опционально).
+        :param result_cache: кэш результатов модерации (опционально).
+        :param use_gcs_uri: передавать изображения из GCS по URI без скачивания (если сервис поддерживает).
+        :param retry_policy: политика повторов запросов к сервису (опционально).
+        :param preprocessor: уменьшение и перекодирование изображений перед отправкой (опционально).
+        :param byte_cache: кэш загруженных изображений на локальном диске (опционально).
+        :return: результат модерации (ImageModerationError, если хотя бы одно изображение не обработано).
+        """
+
+        return get_details(
+            self.moderate_batch_results(
+                images=images,
+                file_system_name=file_system_name,
+                file_system_creds_path=file_system_creds_path,
+                fetch_concurrency=fetch_concurrency,
+                fetch_timeout=fetch_timeout,
+                result_cache=result_cache,
+                use_gcs_uri=use_gcs_uri,
+                retry_policy=retry_policy,
+                preprocessor=preprocessor,
+                byte_cache=byte_cache,
+            )
+        )
+
+    async def moderate_batch_async(
+        self,
+        images: List[str],
+        file_system_name: str,
+        file_system_creds_path: Optional[str] = None,
+        fetch_concurrency: int = DEFAULT_FETCH_CONCURRENCY,
+        fetch_timeout: Optional[float] = None,
+        result_cache: Optional[ModerationResultCache] = None,
+        use_gcs_uri: bool = False,
+        retry_policy: Optional[RetryPolicy] = None,
+        preprocessor: Optional[ImagePreprocessor] = None,
+        byte_cache: Optional[DiskByteCache] = None,
+    ) -> List:
+        """
+        Асинхронный метод массовой модерации изображений.
+
+        :param images: список изображений в виде URL или Bytes.
+        :param file_system_name: файловая система, где находится изображение.
+        :param file_system_creds_path: путь к credentials для файловой системы (опционально).
+        :param fetch_concurrency: максимальное количество одновременных загрузок изображений.
+        :param fetch_timeout: таймаут загрузки одного изображения в секундах (опционально).
+        :param result_cache: кэш результатов модерации (опционально).
+        :param use_gcs_uri: передавать изображения из GCS по URI без скачивания (если сервис поддерживает).
+        :param retry_policy: политика повторов запросов к сервису (опционально).
+        :param preprocessor: уменьшение и перекодирование изображений перед отправкой (опционально).
+        :param byte_cache: кэш загруженных изображений на локальном диске (опционально).
+        :return: результат модерации (ImageModerationError, если хотя бы одно изображение не обработано).
+        """
+
+        return get_details(
+            await self.moderate_batch_results_async(
+                images=images,
+                file_system_name=file_system_name,
+                file_system_creds_path=file_system_creds_path,
+                fetch_concurrency=fetch_concurrency,
+                fetch_timeout=fetch_timeout,
+                result_cache=result_cache,
+                use_gcs_uri=use_gcs_uri,
+                retry_policy=retry_policy,
+                preprocessor=preprocessor,
+                byte_cache=byte_cache,
+            )
+        )
+
+    def _get_uri_sizes(
+        self,
+        images: List[str],
+        file_system_name: str,
+        use_gcs_uri: bool = False,
+        known_sizes: Optional[Dict[str, int]] = None,
+    ) -> Tuple[Dict[str, int], List[str]]:
+        """
+        Метод определения размера изображений, которые передаются по URI или уже известны, и списка изображений,
+        размер которых нужно запросить.
+
+        :param images: список изображений в виде URL.
+        :param file_system_name: файловая система, где находится изображение.
+        :param use_gcs_uri: передавать изображения из GCS по URI без скачивания (если сервис поддерживает).
+        :param known_sizes: размер скачиваемых изображений, полученный при проверке до загрузки (опционально).
+        :return: известный размер изображений и изображения для запроса размера.
+        """
+
+        known_sizes = known_sizes or {}
+        sizes: Dict[str, int] = {}
+        download_images: List[str] = []
+        for image in images:
+            gcs_uri = get_gcs_uri(image, file_system_name) if use_gcs_uri and self.supports_gcs_uri else None
+            if gcs_uri is not None:
+                sizes[image] = len(gcs_uri)
+            elif image in known_sizes:
+                sizes[image] = known_sizes[image]
+            else:
+                download_images.append(image)
+
+        return sizes, download_images
+
+    def _get_image_sizes(
+        self,
+        images: List[str],
+        file_system_name: str,
+        file_system_creds_path: Optional[str] = None,
+        fetch_concurrency: int = DEFAULT_FETCH_CONCURRENCY,
+        fetch_timeout: Optional[float] = None,
+        use_gcs_uri: bool = False,
+        known_sizes: Optional[Dict[str, int]] = None,
+        byte_cache: Optional[DiskByteCache] = None,
+    ) -> Dict[str, int]:
+        """
+        Метод получения размера изображений в запросе к сервису до скачивания.
+
+        Размер неизвестен для изображений, info которых завершился ошибкой, - для них используется 0
+        (ошибка будет получена при загрузке).
+
+        :param images: список уникальных изображений в виде URL.
+        :param file_system_name: файловая система, где находится изображение.
+        :param file_system_creds_path: путь к credentials для файловой системы (опционально).
+        :param fetch_concurrency: максимальное количество одновременных запросов к файловой системе.
+        :param fetch_timeout: таймаут запроса для одного изображения в секундах (опционально).
+        :param use_gcs_uri: передавать изображения из GCS по URI без скачивания (если сервис поддерживает).
+        :param known_sizes: размер изображений, полученный при проверке до загрузки (опционально).
+        :param byte_cache: кэш загруженных изображений на локальном диске (опционально).
+        :return: размер изображения в байтах по изображению.
+        """
+
+        sizes, download_images = self._get_uri_sizes(images, file_system_name, use_gcs_uri, known_sizes)
+        download_sizes = get_image_sizes(
+            image_url_list=download_images,
+            file_system_name=file_system_name,
+            file_system_creds_path=file_system_creds_path,
+            max_concurrency=fetch_concurrency,
+            timeout=fetch_timeout,
+            byte_cache=byte_cache,
+        )
+        sizes.update((image, size or 0) for image, size in zip(download_images, download_sizes))
+
+        return sizes
+
+    async def _get_image_sizes_async(
+        self,
+        images: List[str],
+        file_system_name: str,
+        file_system_creds_path: Optional[str] = None,
+        fetch_concurrency: int = DEFAULT_FETCH_CONCURRENCY,
+        fetch_timeout: Optional[float] = None,
+        use_gcs_uri: bool = False,
+        known_sizes: Optional[Dict[str, int]] = None,
+        byte_cache: Optional[DiskByteCache] = None,
+    ) -> Dict[str, int]:
+        """
+        Асинхронный метод получения размера изображений в запросе к сервису до скачивания.
+
+        :param images: список уникальных изображений в виде URL.
+        :param file_system_name: файловая система, где находится изображение.
+        :param file_system_creds_path: путь к credentials для файловой системы (опционально).
+        :param fetch_concurrency: максимальное количество одновременных запросов к файловой системе.
+        :param fetch_timeout: таймаут запроса для одного изображения в секундах (опционально).
+        :param use_gcs_uri: передавать изображения из GCS по URI без скачивания (если сервис поддерживает).
+        :param known_sizes: размер изображений, полученный при проверке до загрузки (опционально).
+        :param byte_cache: кэш загруженных изображений на локальном диске (опционально).
+        :return: размер изображения в байтах по изображению.
+        """
+
+        sizes, download_images = self._get_uri_sizes(images, file_system_name, use_gcs_uri, known_sizes)
+        download_sizes = await get_image_sizes_async(
+            image_url_list=download_images,
+            file_system_name=file_system_name,
+            file_system_creds_path=file_system_creds_path,
+            max_concurrency=fetch_concurrency,
+            timeout=fetch_timeout,
+            byte_cache=byte_cache,
+        )
+        sizes.update((image, size or 0) for image, size in zip(download_images, download_sizes))
+
+        return sizes
+
+    def _get_screening_limits(self, preprocessor: Optional[ImagePreprocessor] = None) -> Dict[str, Any]:
+        # Preprocessor уменьшает и перекодирует изображения, поэтому лимиты размера и форматов сервиса к ним
+        # не применяются (явные лимиты ImageScreening применяются).
+        if preprocessor is not None:
+            return dict(provider_max_image_bytes=None, provider_formats=None)
+
+        return dict(provider_max_image_bytes=self.max_image_bytes, provider_formats=self.supported_formats)
+
+    def _apply_screening(
+        self,
+        images: List[str],
+        screened: List[Tuple[Optional[int], Optional[str]]],
+        results: Dict[str, ModerationResult],
+    ) -> Tuple[List[str], Dict[str, int]]:
+        """
+        Метод записи результатов для изображений, отклонённых проверкой до загрузки.
+
+        :param images: список изображений в виде URL.
+        :param screened: размер и причина отклонения по каждому изображению.
+        :param results: результаты модерации по URL (дополняются).
+        :return: изображения для модерации и их размер, полученный при проверке.
+        """
+
+        pending_images: List[str] = []
+        sizes: Dict[str, int] = {}
+        reasons: Counter = Counter()
+        for image, (size, rejection) in zip(images, screened):
+            if rejection is not None:
+                results[image] = ModerationResult.from_rejection(rejection)
+                reasons[rejection.split(":")[0]] += 1
+                continue
+
+            pending_images.append(image)
+            if size is not None:
+                sizes[image] = size
+
+        if metrics.is_enabled():
+            for reason, count in reasons.items():
+                metrics.record("images_rejected", count, provider=self.provider_name, reason=reason)
+
+        return pending_images, sizes
+
+    def moderate_chunk_results(
+        self,
+        images: List[str],
+        file_system_name: str,
+        file_system_creds_path: Optional[str] = None,
+        fetch_concurrency: int = DEFAULT_FETCH_CONCURRENCY,
+        fetch_timeout: Optional[float] = None,
+        result_cache: Optional[ModerationResultCache] = None,
+        use_gcs_uri: bool = False,
+        max_parallel_batches: int = DEFAULT_MAX_PARALLEL_BATCHES,
+        retry_policy: Optional[RetryPolicy] = None,
+        preprocessor: Optional[ImagePreprocessor] = None,
+        max_image_retries: int = DEFAULT_MAX_IMAGE_RETRIES,
+        max_request_bytes: Optional[int] = None,
+        max_inflight_bytes: Optional[int] = DEFAULT_MAX_INFLIGHT_BYTES,
+        screening: Optional[ImageScreening] = None,
+        byte_cache: Optional[DiskByteCache] = None,
+        size_lookup: bool = False,
+    ) -> List[ModerationResult]:
+        """
+        Метод модерации произвольного количества изображений с результатом и статусом по каждому изображению.
+
+        Изображения упаковываются в батчи по лимиту сервиса на количество, после скачивания батч делится на
+        запросы по лимиту суммарного размера. С size_lookup размер берётся из info файловой системы до скачивания,
+        и батчи сразу упаковываются по обоим лимитам. Батчи отправляются параллельно в пределах лимита памяти
+        (учитывается размер, известный до скачивания), результаты возвращаются в исходном порядке. Изображения
+        с повторяемыми ошибками собираются в новые батчи и отправляются повторно, остальные изображения не повторяются.
+
+        :param images: список изображений в виде URL или Bytes.
+        :param file_system_name: файловая система, где находится изображение.
+        :param file_system_creds_path: путь к credentials для файловой системы (опционально).
+        :param fetch_concurrency: максимальное количество одновременных загрузок изображений.
+        :param fetch_timeout: таймаут загрузки одного изображения в секундах (опционально).
+        :param result_cache: кэш результатов модерации (опционально).
+        :param use_gcs_uri: передавать изображения из GCS по URI без скачивания (если сервис поддерживает).
+        :param max_parallel_batches: максимальное количество одновременно выполняемых запросов к сервису.
+        :param retry_policy: политика повторов запросов к сервису (опционально).
+        :param preprocessor: уменьшение и перекодирование изображений перед отправкой (опционально).
+        :param max_image_retries: количество повторных раундов для изображений с повторяемыми ошибками.
+        :param max_request_bytes: лимит суммарного размера изображений в запросе (опционально, по умолчанию лимит сервиса).
+        :param max_inflight_bytes: лимит суммарного размера одновременно загруженных изображений (опционально).
+        :param screening: проверка размера и формата изображений до загрузки (опционально).
+        :param byte_cache: кэш загруженных изображений на локальном диске (опционально).
+        :param size_lookup: запрашивать размер изображений у файловой системы до скачивания.
+        :return: результат модерации по каждому изображению.
+        """
+
+        # Одинаковые URL модерируем один раз на весь chunk.
+        pending_images = list(dict.fromkeys(images))
+        results: Dict[str, ModerationResult] = {}
+
+        screened_sizes: Dict[str, int] = {}
+        if screening is not None:
+            with metrics.stage("screening", self.provider_name):
+                screened = screening.screen(
+                    image_url_list=pending_images,
+                    file_system_name=file_system_name,
+                    file_system_creds_path=file_system_creds_path,
+                    max_concurrency=fetch_concurrency,
+                    timeout=fetch_timeout,
+                    byte_cache=byte_cache,
+                    **self._get_screening_limits(preprocessor),
+                )
+            pending_images, screened_sizes = self._apply_screening(pending_images, screened, results)
+
+        if max_request_bytes is None:
+            max_request_bytes = self.max_request_bytes
+
+        sizes = dict.fromkeys(pending_images, 0)
+        sizes.update(screened_sizes)
+        if size_lookup and (max_request_bytes is not None or max_inflight_bytes is not None):
+            with metrics.stage("size_lookup", self.provider_name):
+                sizes = self._get_image_sizes(
+                    images=pending_images,
+                    file_system_name=file_system_name,
+                    file_system_creds_path=file_system_creds_path,
+                    fetch_concurrency=fetch_concurrency,
+                    fetch_timeout=fetch_timeout,
+                    use_gcs_uri=use_gcs_uri,
+                    known_sizes=screened_sizes,
+                    byte_cache=byte_cache,
+                )
+
+        byte_budget = ByteBudget(max_inflight_bytes)
+
+        def moderate(batch: List[str]) -> List[ModerationResult]:
+            with byte_budget.reserve(sum(sizes[image] for image in batch)):
+                return self.moderate_batch_results(
+                    images=batch,
+                    file_system_name=file_system_name,
+                    file_system_creds_path=file_system_creds_path,
+                    fetch_concurrency=fetch_concurrency,
+                    fetch_timeout=fetch_timeout,
+                    result_cache=result_cache,
+                    use_gcs_uri=use_gcs_uri,
+                    retry_policy=retry_policy,
+                    preprocessor=preprocessor,
+                    byte_cache=byte_cache,
+                    max_request_bytes=max_request_bytes,
+                )
+
+        for _ in range(max_image_retries + 1):
+            batches = plan_batches(pending_images, sizes, self.max_batch_size, max_request_bytes)
+            if len(batches) <= 1 or max_parallel_batches <= 1:
+                batches_results = [moderate(batch) for batch in batches]
+            else:
+                with ThreadPoolExecutor(max_workers=min(max_parallel_batches, len(batches))) as executor:
+                    batches_results = list(executor.map(moderate, batches))
+
+            for batch, batch_results in zip(batches, batches_results):
+                results.update(zip(batch, batch_results))
+
+            pending_images = [image for image in pending_images if results[image].retryable]
+            if len(pending_images) == 0:
+                break
+
+        chunk_results = [results[image] for image in images]
+        self._record_statuses(chunk_results)
+
+        return chunk_results
+
+    async def moderate_chunk_results_async(
+        self,
+        images: List[str],
+        file_system_name: str,
+        file_system_creds_path: Optional[str] = None,
+        fetch_concurrency: int = DEFAULT_FETCH_CONCURRENCY,
+        fetch_timeout: Optional[float] = None,
+        result_cache: Optional[ModerationResultCache] = None,
+        use_gcs_uri: bool = False,
+        max_parallel_batches: int = DEFAULT_MAX_PARALLEL_BATCHES,
+        retry_policy: Optional[RetryPolicy] = None,
+        preprocessor: Optional[ImagePreprocessor] = None,
+        max_image_retries: int = DEFAULT_MAX_IMAGE_RETRIES,
+        max_request_bytes: Optional[int] = None,
+        max_inflight_bytes: Optional[int] = DEFAULT_MAX_INFLIGHT_BYTES,
+        screening: Optional[ImageScreening] = None,
+        byte_cache: Optional[DiskByteCache] = None,
+        size_lookup: bool = False,
+    ) -> List[ModerationResult]:
+        """
+        Асинхронный метод модерации произвольного количества изображений с результатом по каждому изображению.
+
+        Аналог moderate_chunk_results: батчи выполняются корутинами на одном event loop без потока на батч.
+
+        :param images: список изображений в виде URL или Bytes.
+        :param file_system_name: файловая система, где находится изображение.
+        :param file_system_creds_path: путь к credentials для файловой системы (опционально).
+        :param fetch_concurrency: максимальное количество одновременных загрузок изображений в батче.
+        :param fetch_timeout: таймаут загрузки одного изображения в секундах (опционально).
+        :param result_cache: кэш результатов модерации (опционально).
+        :param use_gcs_uri: передавать изображения из GCS по URI без скачивания (если сервис поддерживает).
+        :param max_parallel_batches: максимальное количество одновременно выполняемых запросов к сервису.
+        :param retry_policy: политика повторов запросов к сервису (опционально).
+        :param preprocessor: уменьшение и перекодирование изображений перед отправкой (опционально).
+        :param max_image_retries: количество повторных раундов для изображений с повторяемыми ошибками.
+        :param max_request_bytes: лимит суммарного размера изображений в запросе (опционально, по умолчанию лимит сервиса).
+        :param max_inflight_bytes: лимит суммарного размера одновременно загруженных изображений (опционально).
+        :param screening: проверка размера и формата изображений до загрузки (опционально).
+        :param byte_cache: кэш загруженных изображений на локальном диске (опционально).
+        :param size_lookup: запрашивать размер изображений у файловой системы до скачивания.
+        :return: результат модерации по каждому изображению.
+        """
+
+        # Одинаковые URL модерируем один раз на весь chunk.
+        pending_images = list(dict.fromkeys(images))
+        results: Dict[str, ModerationResult] = {}
+
+        screened_sizes: Dict[str, int] = {}
+        if screening is not None:
+            with metrics.stage("screening", self.provider_name):
+                screened = await screening.screen_async(
+                    image_url_list=pending_images,
+                    file_system_name=file_system_name,
+                    file_system_creds_path=file_system_creds_path,
+                    max_concurrency=fetch_concurrency,
+                    timeout=fetch_timeout,
+                    byte_cache=byte_cache,
+                    **self._get_screening_limits(preprocessor),
+                )
+            pending_images, screened_sizes = self._apply_screening(pending_images, screened, results)
+
+        if max_request_bytes is None:
+            max_request_bytes = self.max_request_bytes
+
+        sizes = dict.fromkeys(pending_images, 0)
+        sizes.update(screened_sizes)
+        if size_lookup and (max_request_bytes is not None or max_inflight_bytes is not None):
+            with metrics.stage("size_lookup", self.provider_name):
+                sizes = await self._get_image_sizes_async(
+                    images=pending_images,
+                    file_system_name=file_system_name,
+                    file_system_creds_path=file_system_creds_path,
+                    fetch_concurrency=fetch_concurrency,
+                    fetch_timeout=fetch_timeout,
+                    use_gcs_uri=use_gcs_uri,
+                    known_sizes=screened_sizes,
+                    byte_cache=byte_cache,
+                )
+
+        semaphore = asyncio.Semaphore(max(max_parallel_batches, 1))
+        byte_budget = AsyncByteBudget(max_inflight_bytes)
+
+        async def moderate(batch: List[str]) -> List[ModerationResult]:
+            async with semaphore, byte_budget.reserve_async(sum(sizes[image] for image in batch)):
+                return await self.moderate_batch_results_async(
+                    images=batch,
+                    file_system_name=file_system_name,
+                    file_system_creds_path=file_system_creds_path,
+                    fetch_concurrency=fetch_concurrency,
+                    fetch_timeout=fetch_timeout,
+                    result_cache=result_cache,
+                    use_gcs_uri=use_gcs_uri,
+                    retry_policy=retry_policy,
+                    preprocessor=preprocessor,
+                    byte_cache=byte_cache,
+                    max_request_bytes=max_request_bytes,
+                )
+
+        for _ in range(max_image_retries + 1):
+            batches = plan_batches(pending_images, sizes, self.max_batch_size, max_request_bytes)
+            batches_results = await asyncio.gather(*[moderate(batch) for batch in batches])
+
+            for batch, batch_results in zip(batches, batches_results):
+                results.update(zip(batch, batch_results))
+
+            pending_images = [image for image in pending_images if results[image].retryable]
+            if len(pending_images) == 0:
+                break
+
+        chunk_results = [results[image] for image in images]
+        self._record_statuses(chunk_results)
+
+        return chunk_results
+
+    def moderate_chunk(
+        self,
+        images: List[str],
+        file_system_name: str,
+        file_system_creds_path: Optional[str] = None,
+        fetch_concurrency: int = DEFAULT_FETCH_CONCURRENCY,
+        fetch_timeout: Optional[float] = None,
+        result_cache: Optional[ModerationResultCache] = None,
+        use_gcs_uri: bool = False,
+        max_parallel_batches: int = DEFAULT_MAX_PARALLEL_BATCHES,
+        retry_policy: Optional[RetryPolicy] = None,
+        preprocessor: Optional[ImagePreprocessor] = None,
+        max_image_retries: int = DEFAULT_MAX_IMAGE_RETRIES,
+        max_request_bytes: Optional[int] = None,
+        max_inflight_bytes: Optional[int] = DEFAULT_MAX_INFLIGHT_BYTES,
+        screening: Optional[ImageScreening] = None,
+        byte_cache: Optional[DiskByteCache] = None,
+        size_lookup: bool = False,
+    ) -> List:
+        """
+        Метод модерации произвольного количества изображений.
+
+        :param images: список изображений в виде URL или Bytes.
+        :param file_system_name: файловая система, где находится изображение.
+        :param file_system_creds_path: путь к credentials для файловой системы (опционально).
+        :param fetch_concurrency: максимальное количество одновременных загрузок изображений.
+        :param fetch_timeout: таймаут загрузки одного изображения в секундах (опционально).
+        :param result_cache: кэш результатов модерации (опционально).
+        :param use_gcs_uri: передавать изображения из GCS по URI без скачивания (если сервис поддерживает).
+        :param max_parallel_batches: максимальное количество одновременно выполняемых запросов к сервису.
+        :param retry_policy: политика повторов запросов к сервису (опционально).
+        :param preprocessor: уменьшение и перекодирование изображений перед отправкой (опционально).
+        :param max_image_retries: количество повторных раундов для изображений с повторяемыми ошибками.
+        :param max_request_bytes: лимит суммарного размера изображений в запросе (опционально, по умолчанию лимит сервиса).
+        :param max_inflight_bytes: лимит суммарного размера одновременно загруженных изображений (опционально).
+        :param screening: проверка размера и формата изображений до загрузки (опционально).
+        :param byte_cache: кэш загруженных изображений на локальном диске (опционально).
+        :param size_lookup: запрашивать размер изображений у файловой системы до скачивания.
+        :return: результат модерации (ImageModerationError, если хотя бы одно изображение не обработано).
+        """
+
+        return get_details(
+            self.moderate_chunk_results(
+                images=images,
+                file_system_name=file_system_name,
+                file_system_creds_path=file_system_creds_path,
+                fetch_concurrency=fetch_concurrency,
+                fetch_timeout=fetch_timeout,
+                result_cache=result_cache,
+                use_gcs_uri=use_gcs_uri,
+                max_parallel_batches=max_parallel_batches,
+                retry_policy=retry_policy,
+                preprocessor=preprocessor,
+                max_image_retries=max_image_retries,
+                max_request_bytes=max_request_bytes,
+                max_inflight_bytes=max_inflight_bytes,
+                screening=screening,
+                byte_cache=byte_cache,
+                size_lookup=size_lookup,
+            )
+        )
+
+    async def moderate_chunk_async(
+        self,
+        images: List[str],
+        file_system_name: str,
+        file_system_creds_path: Optional[str] = None,
+        fetch_concurrency: int = DEFAULT_FETCH_CONCURRENCY,
+        fetch_timeout: Optional[float] = None,
+        result_cache: Optional[ModerationResultCache] = None,
+        use_gcs_uri: bool = False,
+        max_parallel_batches: int = DEFAULT_MAX_PARALLEL_BATCHES,
+        retry_policy: Optional[RetryPolicy] = None,
+        preprocessor: Optional[ImagePreprocessor] = None,
+        max_image_retries: int = DEFAULT_MAX_IMAGE_RETRIES,
+        max_request_bytes: Optional[int] = None,
+        max_inflight_bytes: Optional[int] = DEFAULT_MAX_INFLIGHT_BYTES,
+        screening: Optional[ImageScreening] = None,
+        byte_cache: Optional[DiskByteCache] = None,
+        size_lookup: bool = False,
+    ) -> List:
+        """
+        Асинхронный метод модерации произвольного количества изображений.
+
+        :param images: список изображений в виде URL или Bytes.
+        :param file_system_name: файловая система, где находится изображение.
+        :param file_system_creds_path: путь к credentials для файловой системы (опционально).
+        :param fetch_concurrency: максимальное количество одновременных загрузок изображений в батче.
+        :param fetch_timeout: таймаут загрузки одного изображения в секундах (опционально).
+        :param result_cache: кэш результатов модерации (опционально).
+        :param use_gcs_uri: передавать изображения из GCS по URI без скачивания (если сервис поддерживает).
+        :param max_parallel_batches: максимальное количество одновременно выполняемых запросов к сервису.
+        :param retry_policy: политика повторов запросов к сервису (опционально).
+        :param preprocessor: уменьшение и перекодирование изображений перед отправкой (опционально).
+        :param max_image_retries: количество повторных раундов для изображений с повторяемыми ошибками.
+        :param max_request_bytes: лимит суммарного размера изображений в запросе (опционально, по умолчанию лимит сервиса).
+        :param max_inflight_bytes: лимит суммарного размера одновременно загруженных изображений (опционально).
+        :param screening: проверка размера и формата изображений до загрузки (опционально).
+        :param byte_cache: кэш загруженных изображений на локальном диске (опционально).
+        :param size_lookup: запрашивать размер изображений у файловой системы до скачивания.
+        :return: результат модерации (ImageModerationError, если хотя бы одно изображение не обработано).
+        """
+
+        return get_details(
+            await self.moderate_chunk_results_async(
+                images=images,
+                file_system_name=file_system_name,
+                file_system_creds_path=file_system_creds_path,
+                fetch_concurrency=fetch_concurrency,
+                fetch_timeout=fetch_timeout,
+                result_cache=result_cache,
+                use_gcs_uri=use_gcs_uri,
+                max_parallel_batches=max_parallel_batches,
+                retry_policy=retry_policy,
+                preprocessor=preprocessor,
+                max_image_retries=max_image_retries,
+                max_request_bytes=max_request_bytes,
+                max_inflight_bytes=max_inflight_bytes,
+                screening=screening,
+                byte_cache=byte_cache,
+                size_lookup=size_lookup,
+            )
+        )
@@ -0,0 +1,115 @@
+import asyncio
+import threading
+from contextlib import asynccontextmanager, contextmanager
+from typing import AsyncIterator, Dict, Iterator, List, Optional
+
+# Максимальный суммарный размер изображений, одновременно находящихся в памяти воркера, по умолчанию.
+DEFAULT_MAX_INFLIGHT_BYTES = 256 * 1024 * 1024
+
+
+def plan_batches(
+    images: List[str],
+    sizes: Dict[str, int],
+    max_batch_size: int,
+    max_request_bytes: Optional[int] = None,
+) -> List[List[str]]:
+    """
+    Метод разбиения изображений на запросы к сервису с учётом лимита количества и размера запроса.
+
+    Используется упаковка First Fit Decreasing: изображения от больших к маленьким кладутся в первый запрос,
+    где хватает места. Изображение больше лимита размера отправляется отдельным запросом.
+
+    :param images: список изображений.
+    :param sizes: размер изображения в байтах по изображению.
+    :param max_batch_size: максимальное количество изображений в запросе.
+    :param max_request_bytes: максимальный суммарный размер изображений в запросе (опционально).
+    :return: список батчей изображений.
+    """
+
+    batches: List[List[str]] = []
+    batches_bytes: List[int] = []
+
+    for image in sorted(images, key=lambda image: sizes[image], reverse=True):
+        size = sizes[image]
+        for i, batch in enumerate(batches):
+            if len(batch) < max_batch_size and (
+                max_request_bytes is None or batches_bytes[i] + size <= max_request_bytes
+            ):
+                batch.append(image)
+                batches_bytes[i] += size
+                break
+        else:
+            batches.append([image])
+            batches_bytes.append(size)
+
+    return batches
+
+
+class ByteBudget:
+    """
+    Ограничение суммарного размера изображений, которые одновременно загружены в память.
+
+    Резерв больше всего бюджета разрешается, только когда других резервов нет.
+    """
+
+    def __init__(self, max_bytes: Optional[int] = None) -> None:
+        """
+        Метод инициализации класса ByteBudget.
+
+        :param max_bytes: максимальный суммарный размер в байтах (опционально, без ограничения).
+        """
+
+        self._max_bytes = max_bytes
+        self._used_bytes = 0
+        self._condition = threading.Condition()
+
+    def _can_reserve(self, size: int) -> bool:
+        return self._max_bytes is None or self._used_bytes == 0 or self._used_bytes + size <= self._max_bytes
+
+    @contextmanager
+    def reserve(self, size: int) -> Iterator[None]:
+        """
+        Метод резервирования бюджета на время обработки батча (ожидает освобождения бюджета).
+
+        :param size: размер батча в байтах.
+        """
+
+        with self._condition:
+            self._condition.wait_for(lambda: self._can_reserve(size))
+            self._used_bytes += size
+
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._used_bytes -= size
+                self._condition.notify_all()
+
+
+class AsyncByteBudget(ByteBudget):
+    """
+    Ограничение суммарного размера изображений, загруженных в память, для корутин одного event loop.
+    """
+
+    def __init__(self, max_bytes: Optional[int] = None) -> None:
+        super().__init__(max_bytes)
+        self._async_condition = asyncio.Condition()
+
+    @asynccontextmanager
+    async def reserve_async(self, size: int) -> AsyncIterator[None]:
+        """
+        Асинхронный метод резервирования бюджета на время обработки батча.
+
+        :param size: размер батча в байтах.
+        """
+
+        async with self._async_condition:
+            await self._async_condition.wait_for(lambda: self._can_reserve(size))
+            self._used_bytes += size
+
+        try:
+            yield
+        finally:
+            async with self._async_condition:
+                self._used_bytes -= size
+                self._async_condition.notify_all()
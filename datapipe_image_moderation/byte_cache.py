@@ -0,0 +1,241 @@
+import hashlib
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover
+    fcntl = None  # type: ignore
+
+# Доля max_bytes, записанная процессом с прошлой очистки, после которой кэш проверяется на превышение лимита.
+EVICTION_CHECK_FRACTION = 0.05
+
+# Доля max_bytes, которая освобождается при очистке (чтобы не очищать кэш после каждой записи).
+EVICTION_FREE_FRACTION = 0.1
+
+# Временные файлы старше этого возраста в секундах остались от упавших процессов и удаляются при очистке.
+STALE_TEMP_FILE_SECONDS = 3600.0
+
+_LOCK_FILE_NAME = ".lock"
+_TEMP_FILE_PREFIX = ".tmp-"
+
+
+class DiskByteCache:
+    """
+    Кэш загруженных изображений на локальном диске с лимитом размера и вытеснением давно не читавшихся (LRU).
+
+    Изображение хранится в отдельном файле, имя - sha256 от файловой системы и URL. Запись атомарная
+    (временный файл и os.replace), поэтому кэш в одной директории могут использовать несколько процессов-обработчиков
+    на узле: читатели не видят недописанных файлов, очистка выполняется под файловой блокировкой (flock).
+    Время последнего чтения хранится в mtime файла. Предполагается, что содержимое по URL не меняется.
+    """
+
+    def __init__(self, directory: str, max_bytes: int = 10 * 1024**3) -> None:
+        """
+        Метод инициализации класса DiskByteCache.
+
+        :param directory: директория кэша.
+        :param max_bytes: максимальный суммарный размер изображений в кэше в байтах.
+        """
+
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+        self._init_stats()
+
+    def _init_stats(self) -> None:
+        self.hits = 0
+        self.misses = 0
+        self.bytes_read = 0
+        self.evictions = 0
+        self._written_bytes = 0
+        self._stats_lock = threading.Lock()
+
+    def __getstate__(self) -> Dict[str, Any]:
+        # Статистика и блокировки не передаются в другие процессы.
+        return {"directory": self.directory, "max_bytes": self.max_bytes}
+
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        self.__dict__.update(state)
+        self._init_stats()
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total > 0 else 0.0
+
+    @staticmethod
+    def get_key(file_system_name: str, image_url: str) -> str:
+        return f"{file_system_name}:{image_url}"
+
+    def _get_path(self, key: str) -> str:
+        key_hash = hashlib.sha256(key.encode()).hexdigest()
+        return os.path.join(self.directory, key_hash[:2], key_hash)
+
+    def get(self, key: str) -> Optional[bytes]:
+        """
+        Метод получения изображения из кэша.
+
+        :param key: ключ изображения (см. get_key).
+        :return: изображение в bytes или None, если его нет в кэше.
+        """
+
+        path = self._get_path(key)
+        try:
+            with open(path, "rb") as file:
+                image = file.read()
+        except OSError:
+            with self._stats_lock:
+                self.misses += 1
+            return None
+
+        try:
+            # Время последнего чтения для LRU.
+            os.utime(path)
+        except OSError:
+            pass
+
+        with self._stats_lock:
+            self.hits += 1
+            self.bytes_read += len(image)
+
+        return image
+
+    def get_size(self, key: str) -> Optional[int]:
+        """
+        Метод получения размера изображения в кэше без чтения (статистика не меняется).
+
+        :param key: ключ изображения (см. get_key).
+        :return: размер в байтах или None, если изображения нет в кэше.
+        """
+
+        try:
+            return os.stat(self._get_path(key)).st_size
+        except OSError:
+            return None
+
+    def get_header(self, key: str, header_bytes: int) -> Optional[bytes]:
+        """
+        Метод чтения первых байт изображения в кэше (статистика не меняется).
+
+        :param key: ключ изображения (см. get_key).
+        :param header_bytes: количество байт.
+        :return: первые байты или None, если изображения нет в кэше.
+        """
+
+        try:
+            with open(self._get_path(key), "rb") as file:
+                return file.read(header_bytes)
+        except OSError:
+            return None
+
+    def set(self, key: str, image: bytes) -> None:
+        """
+        Метод сохранения изображения в кэш.
+
+        :param key: ключ изображения (см. get_key).
+        :param image: изображение в bytes.
+        """
+
+        if len(image) == 0 or len(image) > self.max_bytes:
+            return
+
+        path = self._get_path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        file_descriptor, temp_path = tempfile.mkstemp(prefix=_TEMP_FILE_PREFIX, dir=os.path.dirname(path))
+        try:
+            with os.fdopen(file_descriptor, "wb") as file:
+                file.write(image)
+            os.replace(temp_path, path)
+        except BaseException:
+            try:
+                os.remove(temp_path)
+            except OSError:
+                pass
+            raise
+
+        with self._stats_lock:
+            self._written_bytes += len(image)
+            check_eviction = self._written_bytes >= self.max_bytes * EVICTION_CHECK_FRACTION
+            if check_eviction:
+                self._written_bytes = 0
+
+        if check_eviction:
+            self.evict()
+
+    @contextmanager
+    def _file_lock(self) -> Iterator[None]:
+        with open(os.path.join(self.directory, _LOCK_FILE_NAME), "a") as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _list_files(self) -> List[Tuple[float, int, str]]:
+        now = time.time()
+        files = []
+        for root, _, names in os.walk(self.directory):
+            for name in names:
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+
+                if name.startswith(_TEMP_FILE_PREFIX):
+                    if now - stat.st_mtime > STALE_TEMP_FILE_SECONDS:
+                        self._remove(path)
+                elif name != _LOCK_FILE_NAME:
+                    files.append((stat.st_mtime, stat.st_size, path))
+
+        return files
+
+    @staticmethod
+    def _remove(path: str) -> bool:
+        try:
+            os.remove(path)
+            return True
+        except OSError:
+            return False
+
+    def evict(self) -> int:
+        """
+        Метод удаления давно не читавшихся изображений, если размер кэша превышает max_bytes.
+
+        :return: количество удалённых изображений.
+        """
+
+        evicted = 0
+        with self._file_lock():
+            files = self._list_files()
+            total_bytes = sum(size for _, size, _ in files)
+            if total_bytes > self.max_bytes:
+                target_bytes = self.max_bytes * (1 - EVICTION_FREE_FRACTION)
+                for _, size, path in sorted(files):
+                    if total_bytes <= target_bytes:
+                        break
+
+                    if self._remove(path):
+                        evicted += 1
+                    total_bytes -= size
+
+        with self._stats_lock:
+            self.evictions += evicted
+
+        return evicted
+
+    def get_total_bytes(self) -> int:
+        """
+        Метод получения суммарного размера изображений в кэше.
+
+        :return: размер в байтах.
+        """
+
+        return sum(size for _, size, _ in self._list_files())
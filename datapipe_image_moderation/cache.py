@@ -0,0 +1,249 @@
+import abc
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+import pandas as pd
+import sqlalchemy as sa
+from datapipe.store.database import DBConn, TableStoreDB
+
+
+def get_image_hash(image: bytes) -> str:
+    """
+    Метод для получения content-hash изображения.
+
+    :param image: изображение в bytes.
+    :return: sha256 в hex-формате.
+    """
+
+    return hashlib.sha256(image).hexdigest()
+
+
+class ModerationResultCache(abc.ABC):
+    """
+    Базовый класс кэша результатов модерации по content-hash изображения.
+    """
+
+    def __init__(self) -> None:
+        self.hits = 0
+        self.misses = 0
+        self._stats_lock = threading.Lock()
+
+    def __getstate__(self) -> Dict[str, Any]:
+        # Статистика и блокировки не передаются в другие процессы.
+        state = self.__dict__.copy()
+        state.update(hits=0, misses=0, _stats_lock=None)
+        return state
+
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        self.__dict__.update(state)
+        self._stats_lock = threading.Lock()
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total > 0 else 0.0
+
+    def _record(self, hits: int, misses: int) -> None:
+        with self._stats_lock:
+            self.hits += hits
+            self.misses += misses
+
+    @abc.abstractmethod
+    def _get_many(self, provider: str, image_hashes: List[str]) -> Dict[str, Dict]:
+        """
+        Метод чтения сохранённых результатов модерации без учёта статистики.
+
+        :param provider: название сервиса модерации.
+        :param image_hashes: список content-hash изображений.
+        :return: словарь content-hash -> результат модерации (только найденные).
+        """
+
+    def get_many(self, provider: str, image_hashes: List[str]) -> Dict[str, Dict]:
+        """
+        Метод получения ранее сохранённых результатов модерации.
+
+        :param provider: название сервиса модерации.
+        :param image_hashes: список content-hash изображений.
+        :return: словарь content-hash -> результат модерации (только найденные).
+        """
+
+        found = self._get_many(provider, image_hashes)
+        self._record(hits=len(found), misses=len(image_hashes) - len(found))
+        return found
+
+    @abc.abstractmethod
+    def set_many(self, provider: str, results: Dict[str, Dict]) -> None:
+        """
+        Метод сохранения результатов модерации.
+
+        :param provider: название сервиса модерации.
+        :param results: словарь content-hash -> результат модерации.
+        """
+
+    def get_many_images(self, provider: str, images: Dict[str, bytes]) -> Dict[str, Dict]:
+        """
+        Метод получения ранее сохранённых результатов модерации по изображениям.
+
+        Кэши, которым нужно содержимое изображения (например, поиск похожих изображений), переопределяют этот метод.
+
+        :param provider: название сервиса модерации.
+        :param images: словарь content-hash -> изображение в bytes.
+        :return: словарь content-hash -> результат модерации (только найденные).
+        """
+
+        return self.get_many(provider, list(images))
+
+    def set_many_images(self, provider: str, results: Dict[str, Dict], images: Dict[str, bytes]) -> None:
+        """
+        Метод сохранения результатов модерации вместе с изображениями.
+
+        :param provider: название сервиса модерации.
+        :param results: словарь content-hash -> результат модерации.
+        :param images: словарь content-hash -> изображение в bytes.
+        """
+
+        self.set_many(provider, results)
+
+
+class InMemoryResultCache(ModerationResultCache):
+    """
+    LRU-кэш результатов модерации в памяти процесса.
+    """
+
+    def __init__(self, max_size: int = 100_000, ttl: Optional[float] = None) -> None:
+        """
+        Метод инициализации класса InMemoryResultCache.
+
+        :param max_size: максимальное количество хранимых результатов.
+        :param ttl: время жизни результата в секундах (опционально).
+        """
+
+        super().__init__()
+        self._max_size = max_size
+        self._ttl = ttl
+        self._items: "OrderedDict[Tuple[str, str], Tuple[float, Dict]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __getstate__(self) -> Dict[str, Any]:
+        # Кэш в памяти у каждого процесса свой: результаты не копируются.
+        state = super().__getstate__()
+        state.update(_items=OrderedDict(), _lock=None)
+        return state
+
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        super().__setstate__(state)
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def _get_many(self, provider: str, image_hashes: List[str]) -> Dict[str, Dict]:
+        now = time.time()
+        found: Dict[str, Dict] = {}
+
+        with self._lock:
+            for image_hash in image_hashes:
+                key = (provider, image_hash)
+                item = self._items.get(key)
+                if item is None:
+                    continue
+
+                created_at, details = item
+                if self._ttl is not None and now - created_at > self._ttl:
+                    del self._items[key]
+                    continue
+
+                self._items.move_to_end(key)
+                found[image_hash] = details
+
+        return found
+
+    def set_many(self, provider: str, results: Dict[str, Dict]) -> None:
+        now = time.time()
+
+        with self._lock:
+            for image_hash, details in results.items():
+                key = (provider, image_hash)
+                self._items[key] = (now, details)
+                self._items.move_to_end(key)
+
+            while len(self._items) > self._max_size:
+                self._items.popitem(last=False)
+
+
+class DBResultCache(ModerationResultCache):
+    """
+    Кэш результатов модерации в таблице БД.
+    """
+
+    def __init__(
+        self,
+        dbconn: Union[DBConn, str],
+        table_name: str = "image_moderation_cache",
+        ttl: Optional[float] = None,
+        create_table: bool = True,
+    ) -> None:
+        """
+        Метод инициализации класса DBResultCache.
+
+        :param dbconn: коннектор к БД.
+        :param table_name: название таблицы кэша.
+        :param ttl: время жизни результата в секундах (опционально).
+        :param create_table: создавать ли таблицу кэша.
+        """
+
+        super().__init__()
+        self._ttl = ttl
+        self._table_store = TableStoreDB(
+            dbconn=dbconn,
+            name=table_name,
+            data_sql_schema=[
+                sa.Column("provider", sa.String, primary_key=True),
+                sa.Column("image_hash", sa.String, primary_key=True),
+                sa.Column("details", sa.JSON),
+                sa.Column("created_at", sa.Float),
+            ],
+            create_table=create_table,
+        )
+
+    def _get_many(self, provider: str, image_hashes: List[str]) -> Dict[str, Dict]:
+        if len(image_hashes) == 0:
+            return {}
+
+        rows = self._table_store.read_rows(
+            pd.DataFrame({"provider": [provider] * len(image_hashes), "image_hash": image_hashes})
+        )
+        if self._ttl is not None:
+            rows = rows[rows["created_at"] >= time.time() - self._ttl]
+
+        return dict(zip(rows["image_hash"], rows["details"]))
+
+    def set_many(self, provider: str, results: Dict[str, Dict]) -> None:
+        if len(results) == 0:
+            return
+
+        self._table_store.update_rows(
+            pd.DataFrame(
+                {
+                    "provider": provider,
+                    "image_hash": list(results.keys()),
+                    "details": list(results.values()),
+                    "created_at": time.time(),
+                }
+            )
+        )
+
+    def evict_expired(self) -> None:
+        """
+        Метод удаления просроченных результатов из таблицы кэша.
+        """
+
+        if self._ttl is None:
+            return
+
+        data_table = self._table_store.data_table
+        with self._table_store.dbconn.con.begin() as con:
+            con.execute(sa.delete(data_table).where(data_table.c.created_at < time.time() - self._ttl))
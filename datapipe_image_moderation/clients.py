@@ -0,0 +1,242 @@
+import importlib
+import threading
+from typing import TYPE_CHECKING, Any, Callable, Dict, Optional, Tuple
+
+from datapipe_image_moderation.base import ImageModerationBase
+from datapipe_image_moderation.providers import get_provider_class
+
+if TYPE_CHECKING:  # pragma: no cover
+    from datapipe_image_moderation.google_vision import ImageModerationGoogle
+    from datapipe_image_moderation.local_model import ImageModerationLocal
+    from datapipe_image_moderation.yandex_vision import ImageModerationYandex, YandexIamTokenRefresher
+
+# Классы и функции модулей сервисов, которые импортируются вместе с SDK сервиса при первом обращении.
+_LAZY_ATTRIBUTES: Dict[str, Callable[[], Any]] = {
+    "ImageModerationGoogle": lambda: get_provider_class("google"),
+    "ImageModerationYandex": lambda: get_provider_class("yandex"),
+    "YandexIamTokenRefresher": lambda: importlib.import_module(
+        "datapipe_image_moderation.yandex_vision"
+    ).YandexIamTokenRefresher,
+    "create_yandex_vision_client": lambda: importlib.import_module(
+        "datapipe_image_moderation.yandex_vision"
+    ).create_yandex_vision_client,
+}
+
+
+def __getattr__(name: str) -> Any:
+    if name not in _LAZY_ATTRIBUTES:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+    value = _LAZY_ATTRIBUTES[name]()
+    globals()[name] = value
+    return value
+
+
+def _get_attribute(name: str) -> Any:
+    # Атрибут модуля, в том числе подменённый в тестах, или импортируемый при первом обращении.
+    return globals()[name] if name in globals() else __getattr__(name)
+
+
+class ModerationClientRegistry:
+    """
+    Реестр клиентов модерации, общий для всех шагов и батчей процесса.
+
+    Клиенты создаются лениво при первом обращении и переиспользуются: credentials разбираются один раз,
+    gRPC-каналы остаются открытыми, IAM-токены Yandex Cloud обновляются в фоне.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._google_clients: Dict[Optional[str], "ImageModerationGoogle"] = {}
+        self._yandex_token_refreshers: Dict[str, "YandexIamTokenRefresher"] = {}
+        self._yandex_vision_clients: Dict[str, Any] = {}
+        self._yandex_clients: Dict[Tuple[str, str], "ImageModerationYandex"] = {}
+        self._clients: Dict[Tuple[str, Tuple], ImageModerationBase] = {}
+
+    def get_google(self, google_credentials_path: Optional[str] = None) -> "ImageModerationGoogle":
+        """
+        Метод получения клиента модерации Google Cloud Vision.
+
+        :param google_credentials_path: путь к credentials для Google Cloud Vision (опционально).
+        :return: ImageModerationGoogle.
+        """
+
+        client = self._google_clients.get(google_credentials_path)
+        if client is not None:
+            return client
+
+        with self._lock:
+            if google_credentials_path not in self._google_clients:
+                self._google_clients[google_credentials_path] = _get_attribute("ImageModerationGoogle")(
+                    google_credentials_path=google_credentials_path
+                )
+
+            return self._google_clients[google_credentials_path]
+
+    def get_yandex(self, oauth_token: str, folder_id: str) -> "ImageModerationYandex":
+        """
+        Метод получения клиента модерации Yandex Cloud Vision.
+
+        :param oauth_token: Yandex Passport OAuth Token пользовательского аккаунта.
+        :param folder_id: Идентификатор каталога в Yandex Cloud.
+        :return: ImageModerationYandex.
+        """
+
+        key = (oauth_token, folder_id)
+        client = self._yandex_clients.get(key)
+        if client is not None:
+            return client
+
+        with self._lock:
+            if key not in self._yandex_clients:
+                # Один gRPC-канал и один источник IAM-токена на OAuth-токен, независимо от каталога.
+                if oauth_token not in self._yandex_vision_clients:
+                    self._yandex_token_refreshers[oauth_token] = _get_attribute("YandexIamTokenRefresher")(
+                        oauth_token=oauth_token
+                    )
+                    self._yandex_vision_clients[oauth_token] = _get_attribute("create_yandex_vision_client")(
+                        self._yandex_token_refreshers[oauth_token]
+                    )
+
+                self._yandex_clients[key] = _get_attribute("ImageModerationYandex")(
+                    oauth_token=oauth_token,
+                    folder_id=folder_id,
+                    vision_client=self._yandex_vision_clients[oauth_token],
+                    token_refresher=self._yandex_token_refreshers[oauth_token],
+                )
+
+            return self._yandex_clients[key]
+
+    def get_client(self, provider_name: str, **client_params: Any) -> ImageModerationBase:
+        """
+        Метод получения клиента модерации сервиса из реестра сервисов (providers.PROVIDERS) по параметрам клиента.
+
+        :param provider_name: название сервиса модерации.
+        :param client_params: параметры конструктора клиента.
+        :return: клиент модерации.
+        """
+
+        key = (provider_name, tuple(sorted(client_params.items())))
+        client = self._clients.get(key)
+        if client is not None:
+            return client
+
+        with self._lock:
+            if key not in self._clients:
+                self._clients[key] = get_provider_class(provider_name)(**client_params)
+
+            return self._clients[key]
+
+    def get_local(self, model_path: str, **model_params: Any) -> "ImageModerationLocal":
+        """
+        Метод получения клиента модерации локальной ONNX-моделью (модель загружается один раз на процесс).
+
+        :param model_path: путь к ONNX-модели.
+        :param model_params: параметры модели (см. ImageModerationLocal).
+        :return: ImageModerationLocal.
+        """
+
+        return self.get_client("local", model_path=model_path, **model_params)  # type: ignore
+
+    def register_google(self, client: "ImageModerationGoogle", google_credentials_path: Optional[str] = None) -> None:
+        """
+        Метод регистрации готового клиента Google Cloud Vision (например, с другим endpoint).
+
+        :param client: клиент модерации Google Cloud Vision.
+        :param google_credentials_path: путь к credentials, по которому клиент будет выдаваться шагам.
+        """
+
+        with self._lock:
+            self._google_clients[google_credentials_path] = client
+
+    def register_yandex(self, client: "ImageModerationYandex", oauth_token: str, folder_id: str) -> None:
+        """
+        Метод регистрации готового клиента Yandex Cloud Vision (например, с другим endpoint).
+
+        :param client: клиент модерации Yandex Cloud Vision.
+        :param oauth_token: OAuth-токен, по которому клиент будет выдаваться шагам.
+        :param folder_id: Идентификатор каталога, по которому клиент будет выдаваться шагам.
+        """
+
+        with self._lock:
+            self._yandex_clients[(oauth_token, folder_id)] = client
+
+    def reset(self) -> None:
+        """
+        Метод сброса реестра без ожидания блокировки (в дочернем процессе после fork).
+        """
+
+        self.__init__()  # type: ignore  # pylint: disable=unnecessary-dunder-call
+
+    def clear(self) -> None:
+        """
+        Метод очистки реестра (например, после fork процесса).
+        """
+
+        with self._lock:
+            self._google_clients.clear()
+            self._yandex_token_refreshers.clear()
+            self._yandex_vision_clients.clear()
+            self._yandex_clients.clear()
+            self._clients.clear()
+
+
+# Реестр клиентов процесса.
+client_registry = ModerationClientRegistry()
+
+
+def get_image_moderation_google(google_credentials_path: Optional[str] = None) -> "ImageModerationGoogle":
+    """
+    Метод получения общего для процесса клиента модерации Google Cloud Vision.
+
+    :param google_credentials_path: путь к credentials для Google Cloud Vision (опционально).
+    :return: ImageModerationGoogle.
+    """
+
+    return client_registry.get_google(google_credentials_path=google_credentials_path)
+
+
+def get_image_moderation_yandex(oauth_token: str, folder_id: str) -> "ImageModerationYandex":
+    """
+    Метод получения общего для процесса клиента модерации Yandex Cloud Vision.
+
+    :param oauth_token: Yandex Passport OAuth Token пользовательского аккаунта.
+    :param folder_id: Идентификатор каталога в Yandex Cloud.
+    :return: ImageModerationYandex.
+    """
+
+    return client_registry.get_yandex(oauth_token=oauth_token, folder_id=folder_id)
+
+
+def get_image_moderation_local(model_path: str, **model_params: Any) -> "ImageModerationLocal":
+    """
+    Метод получения общего для процесса клиента модерации локальной ONNX-моделью.
+
+    :param model_path: путь к ONNX-модели.
+    :param model_params: параметры модели (см. ImageModerationLocal).
+    :return: ImageModerationLocal.
+    """
+
+    return client_registry.get_local(model_path, **model_params)
+
+
+def get_image_moderation(provider_name: str, **client_params: Any) -> ImageModerationBase:
+    """
+    Метод получения общего для процесса клиента модерации по названию сервиса.
+
+    :param provider_name: название сервиса модерации (google, yandex, local или зарегистрированный в providers).
+    :param client_params: параметры клиента (google_credentials_path, oauth_token и folder_id или model_path).
+    :return: клиент модерации.
+    """
+
+    if provider_name in _CLIENT_GETTERS:
+        return _CLIENT_GETTERS[provider_name](**client_params)
+
+    return client_registry.get_client(provider_name, **client_params)
+
+
+_CLIENT_GETTERS: Dict[str, Callable[..., ImageModerationBase]] = {
+    "google": get_image_moderation_google,
+    "yandex": get_image_moderation_yandex,
+    "local": get_image_moderation_local,
+}
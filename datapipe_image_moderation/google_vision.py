@@ -3,70 +3,177 @@ from typing import List, Optional
 from google.cloud import vision
 from google.oauth2 import service_account
 
-from datapipe_image_moderation.utils import get_bytes_images
+from datapipe_image_moderation import metrics
+from datapipe_image_moderation.base import ImageInput, ImageModerationBase
+from datapipe_image_moderation.providers import MAX_BATCH_SIZES, SAFE_SEARCH_CATEGORIES
+from datapipe_image_moderation.rate_limit import RpcCall
+from datapipe_image_moderation.result import ModerationResult
 
 
-class ImageModerationGoogle:
+class ImageModerationGoogle(ImageModerationBase):
     """
     Класс клиента модерации изображений в Google Cloud Vision gRPC.
     """
 
-    def __init__(self, google_credentials_path: Optional[str] = None) -> None:
-        if google_credentials_path is None:
-            self._google_vision_client = vision.ImageAnnotatorClient()
-        else:
-            google_credentials = service_account.Credentials.from_service_account_file(google_credentials_path)
-            self._google_vision_client = vision.ImageAnnotatorClient(credentials=google_credentials)
+    provider_name = "google"
+    # Лимит количества изображений в одном запросе Google Cloud Vision gRPC.
+    max_batch_size = MAX_BATCH_SIZES["google"]
+    # Лимит размера запроса Google Cloud Vision - 40 МБ, оставляем запас на служебные поля запроса.
+    max_request_bytes = 36 * 1024 * 1024
+    supports_gcs_uri = True
+    # Лимит размера одного изображения Google Cloud Vision - 20 МБ.
+    max_image_bytes = 20 * 1024 * 1024
+    # Форматы изображений, которые принимает images:annotate (PDF и TIFF - только через files:annotate).
+    supported_formats = frozenset({"jpeg", "png", "gif", "bmp", "webp", "ico"})
 
-    def moderate_batch(
+    def __init__(
         self,
-        images: List[str],
-        file_system_name: str,
-        file_system_creds_path: Optional[str] = None,
-    ) -> List:
+        google_credentials_path: Optional[str] = None,
+        vision_client: Optional[vision.ImageAnnotatorClient] = None,
+    ) -> None:
+        """
+        Метод инициализации класса ImageModerationGoogle.
+
+        :param google_credentials_path: путь к credentials для Google Cloud Vision (опционально).
+        :param vision_client: готовый клиент Google Cloud Vision (опционально).
+        """
+
+        self._google_credentials: Optional[service_account.Credentials] = None
+        if google_credentials_path is not None:
+            self._google_credentials = service_account.Credentials.from_service_account_file(google_credentials_path)
+
+        if vision_client is not None:
+            self._google_vision_client = vision_client
+        else:
+            self._google_vision_client = vision.ImageAnnotatorClient(credentials=self._google_credentials)
+
+    def _create_async_client(self) -> vision.ImageAnnotatorAsyncClient:
+        """
+        Метод создания асинхронного клиента Google Cloud Vision (grpc.aio) для текущего event loop.
+
+        :return: vision.ImageAnnotatorAsyncClient.
         """
-        Метод массовой модерации изображений с помощью Google Cloud Vision gRPC.
 
-        :param images: список изображений в виде URL или Bytes.
-        :param file_system_name: файловая система, где находится изображение.
-        :param file_system_creds_path: путь к credentials для файловой системы (опционально).
-        :return: результат модерации.
+        return vision.ImageAnnotatorAsyncClient(credentials=self._google_credentials)
+
+    @staticmethod
+    def _get_vision_image(image: ImageInput) -> vision.Image:
         """
+        Метод для получения изображения в формате vision.Image.
 
-        # Проверяем количество переданных изображений на соответствие лимитам Google Cloud Vision gRPC.
-        if len(images) > 15:
-            raise ValueError("Количество изображений должно быть меньше или равно 15!")
+        :param image: изображение в формате bytes или gs:// URI.
+        :return: vision.Image.
+        """
 
-        # Получаем список изображений в формате base64.
-        bytes_images = get_bytes_images(
-            image_url_list=images,
-            file_system_name=file_system_name,
-            file_system_creds_path=file_system_creds_path,
-        )
+        if isinstance(image, bytes):
+            return vision.Image({"content": image})
+
+        return vision.Image({"source": vision.ImageSource({"image_uri": image})})
+
+    def _get_request(self, images: List[ImageInput]) -> vision.BatchAnnotateImagesRequest:
+        """
+        Метод формирования запроса для получения модерации изображений в Google Cloud Vision gRPC.
+
+        :param images: список изображений в формате bytes или gs:// URI.
+        :return: vision.BatchAnnotateImagesRequest.
+        """
 
         # Формируем тип модерации в Google Cloud Vision gRPC.
         features = [{"type_": vision.Feature.Type.SAFE_SEARCH_DETECTION}]
 
         # Формируем список изображений в формате "vision.AnnotateImageRequest".
-        vision_images = [{"image": vision.Image({"content": image}), "features": features} for image in bytes_images]
+        vision_images = [{"image": self._get_vision_image(image), "features": features} for image in images]
 
-        # Формируем запрос для получения модерации изображений в Google Cloud Vision gRPC.
-        request = vision.BatchAnnotateImagesRequest({"requests": vision_images})
+        return vision.BatchAnnotateImagesRequest({"requests": vision_images})
 
-        # Получаем результат batch-модерации изображений в Google Cloud Vision gRPC.
-        response = self._google_vision_client.batch_annotate_images(request=request)
+    @staticmethod
+    def _parse_response(
+        response: vision.BatchAnnotateImagesResponse,
+    ) -> List[ModerationResult]:
+        """
+        Метод формирования результатов модерации из ответа Google Cloud Vision gRPC.
+
+        :param response: ответ Google Cloud Vision gRPC.
+        :return: результат модерации по каждому изображению.
+        """
 
-        # Формируем результаты модерации.
-        details = []
+        results = []
         for resp in response.responses:
-            details.append(
-                {
-                    "adult": resp.safe_search_annotation.adult.name,
-                    "spoof": resp.safe_search_annotation.spoof.name,
-                    "medical": resp.safe_search_annotation.medical.name,
-                    "violence": resp.safe_search_annotation.violence.name,
-                    "racy": resp.safe_search_annotation.racy.name,
-                }
+            # Ошибка обработки отдельного изображения (например, не удалось прочитать изображение по URI).
+            if resp.error.code != 0:
+                results.append(ModerationResult.from_api_error(resp.error.code, resp.error.message))
+                continue
+
+            annotation = resp.safe_search_annotation
+            results.append(
+                ModerationResult.from_details(
+                    {category: getattr(annotation, category).name for category in SAFE_SEARCH_CATEGORIES}
+                )
             )
 
-        return details
+        return results
+
+    def _moderate_images(self, images: List[ImageInput], timeout: Optional[float] = None) -> List[ModerationResult]:
+        """
+        Метод модерации изображений одним запросом к Google Cloud Vision gRPC.
+
+        :param images: список изображений в формате bytes или gs:// URI.
+        :param timeout: дедлайн запроса в секундах (опционально).
+        :return: результат модерации по каждому изображению.
+        """
+
+        with metrics.stage("request_build", self.provider_name):
+            request = self._get_request(images)
+
+        # Получаем результат batch-модерации изображений в Google Cloud Vision gRPC.
+        # Повторы выполняются ImageModerationBase, встроенные повторы клиента отключаем.
+        with metrics.stage("rpc", self.provider_name):
+            response = self._google_vision_client.batch_annotate_images(request=request, retry=None, timeout=timeout)
+
+        with metrics.stage("parse", self.provider_name):
+            return self._parse_response(response)
+
+    def _start_moderate_images(
+        self, images: List[ImageInput], timeout: Optional[float] = None
+    ) -> Optional[RpcCall[List[ModerationResult]]]:
+        """
+        Метод отправки запроса к Google Cloud Vision gRPC без ожидания ответа.
+
+        :param images: список изображений в формате bytes или gs:// URI.
+        :param timeout: дедлайн запроса в секундах (опционально).
+        :return: отправленный запрос или None, если транспорт клиента не gRPC.
+        """
+
+        # Метод future есть только у gRPC-вызова транспорта клиента (не у REST).
+        transport = getattr(self._google_vision_client, "transport", None)
+        rpc = getattr(transport, "batch_annotate_images", None)
+        if not hasattr(rpc, "future"):
+            return None
+
+        with metrics.stage("request_build", self.provider_name):
+            request = self._get_request(images)
+
+        return RpcCall(rpc.future(request, timeout=timeout), self._parse_response)  # type: ignore
+
+    async def _moderate_images_async(
+        self, images: List[ImageInput], timeout: Optional[float] = None
+    ) -> List[ModerationResult]:
+        """
+        Асинхронный метод модерации изображений одним запросом к Google Cloud Vision gRPC.
+
+        :param images: список изображений в формате bytes или gs:// URI.
+        :param timeout: дедлайн запроса в секундах (опционально).
+        :return: результат модерации по каждому изображению.
+        """
+
+        vision_async_client = self._get_loop_client(self._create_async_client)
+
+        with metrics.stage("request_build", self.provider_name):
+            request = self._get_request(images)
+
+        # Получаем результат batch-модерации изображений в Google Cloud Vision gRPC.
+        with metrics.stage("rpc", self.provider_name):
+            response = await vision_async_client.batch_annotate_images(request=request, retry=None, timeout=timeout)
+
+        with metrics.stage("parse", self.provider_name):
+            return self._parse_response(response)
@@ -0,0 +1,177 @@
+import asyncio
+import io
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import grpc
+import numpy as np
+
+from datapipe_image_moderation import metrics
+from datapipe_image_moderation.base import ImageInput, ImageModerationBase
+from datapipe_image_moderation.providers import DEFAULT_CLASS_NAMES
+from datapipe_image_moderation.result import ModerationResult
+
+try:
+    import onnxruntime
+    from PIL import Image
+except ImportError:  # pragma: no cover
+    onnxruntime = None  # type: ignore
+    Image = None  # type: ignore
+
+
+class ImageModerationLocal(ImageModerationBase):
+    """
+    Класс клиента модерации изображений локальной ONNX-моделью на CPU.
+
+    Изображения батча декодируются и уменьшаются до входа модели, нормализация выполняется одной операцией
+    над тензором батча, модель вызывается один раз на батч.
+    Требует onnxruntime и Pillow (pip install datapipe-image-moderation[local]).
+    """
+
+    provider_name = "local"
+
+    def __init__(
+        self,
+        model_path: str,
+        class_names: Sequence[str] = DEFAULT_CLASS_NAMES,
+        input_size: int = 224,
+        layout: str = "NHWC",
+        mean: Tuple[float, float, float] = (0.0, 0.0, 0.0),
+        std: Tuple[float, float, float] = (255.0, 255.0, 255.0),
+        softmax: bool = False,
+        num_threads: Optional[int] = None,
+        batch_size: int = 32,
+    ) -> None:
+        """
+        Метод инициализации класса ImageModerationLocal.
+
+        :param model_path: путь к ONNX-модели (вход - батч RGB-изображений, выход - оценки классов).
+        :param class_names: названия классов в порядке выхода модели.
+        :param input_size: сторона входного изображения модели в пикселях.
+        :param layout: расположение осей входа модели (NHWC или NCHW).
+        :param mean: среднее по каналам RGB, вычитается из значений пикселей 0-255.
+        :param std: стандартное отклонение по каналам RGB, на него делятся значения пикселей.
+        :param softmax: применять ли softmax к выходу модели (если модель возвращает logits).
+        :param num_threads: количество потоков onnxruntime (по умолчанию - количество CPU).
+        :param batch_size: количество изображений в одном вызове модели.
+        """
+
+        if onnxruntime is None or Image is None:
+            raise ImportError(
+                "Для ImageModerationLocal нужны onnxruntime и Pillow: pip install datapipe-image-moderation[local]"
+            )
+
+        if layout not in ("NHWC", "NCHW"):
+            raise ValueError(f"Неизвестное расположение осей входа модели: {layout}!")
+
+        self.class_names = tuple(class_names)
+        self.input_size = input_size
+        self.layout = layout
+        self.softmax = softmax
+        self.max_batch_size = batch_size
+        self._mean = np.asarray(mean, dtype=np.float32)
+        self._std = np.asarray(std, dtype=np.float32)
+
+        session_options = onnxruntime.SessionOptions()
+        if num_threads is not None:
+            session_options.intra_op_num_threads = num_threads
+            session_options.inter_op_num_threads = 1
+
+        self._session = onnxruntime.InferenceSession(
+            model_path, sess_options=session_options, providers=["CPUExecutionProvider"]
+        )
+        self._input_name = self._session.get_inputs()[0].name
+
+    def _decode_image(self, image: bytes) -> np.ndarray:
+        """
+        Метод декодирования изображения в RGB-массив размера входа модели.
+
+        :param image: изображение в bytes.
+        :return: массив uint8 формы (input_size, input_size, 3).
+        """
+
+        with Image.open(io.BytesIO(image)) as pil_image:
+            # Для JPEG декодируем сразу в уменьшенном масштабе (DCT scaling).
+            pil_image.draft("RGB", (self.input_size, self.input_size))
+            pil_image = pil_image.convert("RGB").resize((self.input_size, self.input_size), Image.BILINEAR)
+            return np.asarray(pil_image, dtype=np.uint8)
+
+    def _get_tensor(self, images: List[ImageInput]) -> Tuple[np.ndarray, Dict[int, ModerationResult]]:
+        """
+        Метод формирования входного тензора модели из батча изображений.
+
+        :param images: список изображений в формате bytes.
+        :return: тензор float32 по декодированным изображениям и ошибки по индексам остальных изображений.
+        """
+
+        arrays = []
+        errors: Dict[int, ModerationResult] = {}
+        for i, image in enumerate(images):
+            try:
+                arrays.append(self._decode_image(image))  # type: ignore
+            except Exception as exception:  # pylint: disable=broad-except
+                errors[i] = ModerationResult.from_api_error(
+                    grpc.StatusCode.INVALID_ARGUMENT.value[0], f"{type(exception).__name__}: {exception}"
+                )
+
+        if len(arrays) == 0:
+            return np.empty((0,), dtype=np.float32), errors
+
+        tensor = (np.stack(arrays).astype(np.float32) - self._mean) / self._std
+        if self.layout == "NCHW":
+            tensor = tensor.transpose(0, 3, 1, 2)
+
+        return np.ascontiguousarray(tensor), errors
+
+    def _get_scores(self, tensor: np.ndarray) -> np.ndarray:
+        """
+        Метод вызова модели.
+
+        :param tensor: входной тензор модели.
+        :return: оценки классов формы (количество изображений, количество классов).
+        """
+
+        scores = self._session.run(None, {self._input_name: tensor})[0].reshape(len(tensor), -1)
+        if self.softmax:
+            scores = np.exp(scores - scores.max(axis=1, keepdims=True))
+            scores /= scores.sum(axis=1, keepdims=True)
+
+        return scores
+
+    def _moderate_images(self, images: List[ImageInput], timeout: Optional[float] = None) -> List[ModerationResult]:
+        """
+        Метод модерации изображений одним вызовом модели.
+
+        :param images: список изображений в формате bytes.
+        :param timeout: не используется (модель вызывается локально).
+        :return: результат модерации по каждому изображению.
+        """
+
+        with metrics.stage("request_build", self.provider_name):
+            tensor, errors = self._get_tensor(images)
+
+        with metrics.stage("rpc", self.provider_name):
+            scores = self._get_scores(tensor) if len(tensor) > 0 else np.empty((0, len(self.class_names)))
+
+        with metrics.stage("parse", self.provider_name):
+            results = []
+            scores_iter = iter(scores.tolist())
+            for i in range(len(images)):
+                if i in errors:
+                    results.append(errors[i])
+                else:
+                    results.append(ModerationResult.from_details(dict(zip(self.class_names, next(scores_iter)))))
+
+            return results
+
+    async def _moderate_images_async(
+        self, images: List[ImageInput], timeout: Optional[float] = None
+    ) -> List[ModerationResult]:
+        """
+        Асинхронный метод модерации изображений одним вызовом модели (в пуле потоков, onnxruntime отпускает GIL).
+
+        :param images: список изображений в формате bytes.
+        :param timeout: не используется (модель вызывается локально).
+        :return: результат модерации по каждому изображению.
+        """
+
+        return await asyncio.get_running_loop().run_in_executor(None, self._moderate_images, images, timeout)
@@ -0,0 +1,224 @@
+import abc
+import threading
+import time
+from contextlib import ExitStack, contextmanager, nullcontext
+from dataclasses import dataclass, field
+from typing import Any, Callable, ContextManager, Dict, Iterator, List, Optional, Tuple
+
+# Метрики: название -> (тип, описание, метки).
+METRICS: Dict[str, Tuple[str, str, Tuple[str, ...]]] = {
+    "stage_seconds": ("histogram", "Duration of a moderation stage in seconds", ("stage", "provider")),
+    "bytes_fetched": ("counter", "Image bytes downloaded from the file system", ("provider",)),
+    "bytes_sent": ("counter", "Image bytes sent to the moderation service", ("provider",)),
+    "images_per_rpc": ("histogram", "Number of images in one moderation request", ("provider",)),
+    "rpc_retries": ("counter", "Retried moderation requests", ("provider", "code")),
+    "rpc_hedges": ("counter", "Duplicate moderation requests sent after the latency quantile", ("provider",)),
+    "cache_hits": ("counter", "Moderation results found in the result cache", ("provider",)),
+    "cache_misses": ("counter", "Moderation results not found in the result cache", ("provider",)),
+    "images": ("counter", "Moderated images by status", ("provider", "status")),
+    "images_rejected": ("counter", "Images rejected by screening before download", ("provider", "reason")),
+}
+
+
+class MetricsSink(abc.ABC):
+    """
+    Базовый класс получателя метрик модерации.
+    """
+
+    @abc.abstractmethod
+    def record(self, name: str, value: float, attributes: Dict[str, str]) -> None:
+        """
+        Метод записи значения метрики.
+
+        :param name: название метрики (см. METRICS).
+        :param value: значение.
+        :param attributes: метки.
+        """
+
+    @contextmanager
+    def span(self, stage: str, attributes: Dict[str, str]) -> Iterator[None]:
+        """
+        Метод замера длительности этапа (записывается в stage_seconds).
+
+        :param stage: название этапа.
+        :param attributes: метки.
+        """
+
+        started_at = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record("stage_seconds", time.perf_counter() - started_at, {**attributes, "stage": stage})
+
+
+@dataclass
+class MetricEvent:
+    """
+    Значение метрики для CallbackMetricsSink.
+    """
+
+    name: str
+    value: float
+    attributes: Dict[str, str] = field(default_factory=dict)
+
+
+class CallbackMetricsSink(MetricsSink):
+    """
+    Получатель метрик, передающий каждое значение в функцию.
+    """
+
+    def __init__(self, callback: Callable[[MetricEvent], None]) -> None:
+        self._callback = callback
+
+    def record(self, name: str, value: float, attributes: Dict[str, str]) -> None:
+        self._callback(MetricEvent(name=name, value=value, attributes=attributes))
+
+
+class PrometheusMetricsSink(MetricsSink):
+    """
+    Получатель метрик для prometheus_client (pip install datapipe-image-moderation[prometheus]).
+    """
+
+    def __init__(self, registry: Any = None, namespace: str = "image_moderation") -> None:
+        """
+        Метод инициализации класса PrometheusMetricsSink.
+
+        :param registry: CollectorRegistry (по умолчанию глобальный реестр prometheus_client).
+        :param namespace: префикс названий метрик.
+        """
+
+        import prometheus_client  # pylint: disable=import-outside-toplevel
+
+        kwargs = {"registry": registry} if registry is not None else {}
+        self._metrics: Dict[str, Any] = {}
+        for name, (kind, description, labels) in METRICS.items():
+            metric_class = prometheus_client.Histogram if kind == "histogram" else prometheus_client.Counter
+            self._metrics[name] = metric_class(name, description, labels, namespace=namespace, **kwargs)
+
+    def record(self, name: str, value: float, attributes: Dict[str, str]) -> None:
+        kind, _, labels = METRICS[name]
+        metric = self._metrics[name].labels(*[attributes.get(label, "") for label in labels])
+        if kind == "histogram":
+            metric.observe(value)
+        else:
+            metric.inc(value)
+
+
+class OpenTelemetryMetricsSink(MetricsSink):
+    """
+    Получатель метрик для OpenTelemetry: этапы - спаны, значения - инструменты Meter.
+    """
+
+    def __init__(self, tracer: Any = None, meter: Any = None) -> None:
+        """
+        Метод инициализации класса OpenTelemetryMetricsSink.
+
+        :param tracer: Tracer (по умолчанию из глобального TracerProvider).
+        :param meter: Meter (по умолчанию из глобального MeterProvider).
+        """
+
+        from opentelemetry import metrics, trace  # pylint: disable=import-outside-toplevel
+
+        self._tracer = tracer or trace.get_tracer("datapipe_image_moderation")
+        meter = meter or metrics.get_meter("datapipe_image_moderation")
+        self._instruments: Dict[str, Any] = {}
+        for name, (kind, description, _) in METRICS.items():
+            create = meter.create_histogram if kind == "histogram" else meter.create_counter
+            self._instruments[name] = create(f"image_moderation.{name}", description=description)
+
+    def record(self, name: str, value: float, attributes: Dict[str, str]) -> None:
+        kind, _, _ = METRICS[name]
+        instrument = self._instruments[name]
+        if kind == "histogram":
+            instrument.record(value, attributes=attributes)
+        else:
+            instrument.add(value, attributes=attributes)
+
+    @contextmanager
+    def span(self, stage: str, attributes: Dict[str, str]) -> Iterator[None]:
+        with self._tracer.start_as_current_span(f"image_moderation.{stage}", attributes=attributes):
+            with super().span(stage, attributes):
+                yield
+
+
+_sinks: List[MetricsSink] = []
+_sinks_lock = threading.Lock()
+_null_context = nullcontext()
+
+
+def add_metrics_sink(sink: MetricsSink) -> MetricsSink:
+    """
+    Метод подключения получателя метрик для всего процесса.
+
+    :param sink: получатель метрик.
+    :return: получатель метрик.
+    """
+
+    with _sinks_lock:
+        _sinks.append(sink)
+
+    return sink
+
+
+def remove_metrics_sink(sink: MetricsSink) -> None:
+    """
+    Метод отключения получателя метрик.
+
+    :param sink: получатель метрик.
+    """
+
+    with _sinks_lock:
+        if sink in _sinks:
+            _sinks.remove(sink)
+
+
+@contextmanager
+def _stage(stage_name: str, attributes: Dict[str, str]) -> Iterator[None]:
+    with ExitStack() as stack:
+        for sink in list(_sinks):
+            stack.enter_context(sink.span(stage_name, attributes))
+
+        yield
+
+
+def stage(stage_name: str, provider: Optional[str] = None) -> ContextManager[None]:
+    """
+    Метод замера этапа модерации. Без подключённых получателей возвращает общий пустой context manager.
+
+    :param stage_name: название этапа (fetch, rpc, parse, ...).
+    :param provider: название сервиса модерации (опционально).
+    :return: context manager.
+    """
+
+    if not _sinks:
+        return _null_context
+
+    return _stage(stage_name, {"provider": provider or ""})
+
+
+def record(name: str, value: float, provider: Optional[str] = None, **attributes: str) -> None:
+    """
+    Метод записи значения метрики во все подключённые получатели.
+
+    :param name: название метрики (см. METRICS).
+    :param value: значение.
+    :param provider: название сервиса модерации (опционально).
+    :param attributes: дополнительные метки.
+    """
+
+    if not _sinks:
+        return
+
+    attributes["provider"] = provider or ""
+    for sink in list(_sinks):
+        sink.record(name, value, attributes)
+
+
+def is_enabled() -> bool:
+    """
+    Метод проверки, подключён ли хотя бы один получатель метрик (для пропуска подсчёта значений).
+
+    :return: bool.
+    """
+
+    return bool(_sinks)
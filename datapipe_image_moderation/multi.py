@@ -0,0 +1,386 @@
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Dict, Iterator, List, Optional, Tuple, Union
+
+from datapipe_image_moderation import metrics
+from datapipe_image_moderation.base import DEFAULT_MAX_IMAGE_RETRIES, DEFAULT_MAX_PARALLEL_BATCHES, ImageModerationBase
+from datapipe_image_moderation.batching import DEFAULT_MAX_INFLIGHT_BYTES, plan_batches
+from datapipe_image_moderation.byte_cache import DiskByteCache
+from datapipe_image_moderation.cache import ModerationResultCache
+from datapipe_image_moderation.providers import get_likelihood_value
+from datapipe_image_moderation.rate_limit import RetryPolicy
+from datapipe_image_moderation.result import ImageStatus, ModerationResult
+from datapipe_image_moderation.utils import DEFAULT_FETCH_CONCURRENCY, fetch_images, get_image_sizes
+
+# Максимальное количество изображений, загружаемых за один раз для всех сервисов.
+DEFAULT_WINDOW_SIZE = 200
+
+
+def _needs_moderation(results: Dict[str, ModerationResult], image: str) -> bool:
+    return image not in results or results[image].retryable
+
+
+def _moderate_fetched(
+    clients: Dict[str, ImageModerationBase],
+    fetched_images: Dict[str, Union[bytes, Exception]],
+    results: Dict[str, Dict[str, ModerationResult]],
+    result_cache: Optional[ModerationResultCache] = None,
+    max_parallel_batches: int = DEFAULT_MAX_PARALLEL_BATCHES,
+    retry_policy: Optional[RetryPolicy] = None,
+) -> None:
+    """
+    Метод модерации загруженных изображений всеми сервисами одновременно.
+
+    Каждый сервис получает только изображения без результата или с повторяемой ошибкой, батчи
+    формируются по лимитам сервиса на количество и размер запроса.
+
+    :param clients: клиенты модерации по названию сервиса.
+    :param fetched_images: изображение в bytes или исключение загрузки по URL.
+    :param results: результаты модерации по сервису и URL (дополняются).
+    :param result_cache: кэш результатов модерации (опционально).
+    :param max_parallel_batches: максимальное количество одновременных запросов к каждому сервису.
+    :param retry_policy: политика повторов запросов к сервисам (опционально).
+    """
+
+    def moderate_provider(provider_name: str) -> Dict[str, ModerationResult]:
+        client = clients[provider_name]
+        provider_results: Dict[str, ModerationResult] = {}
+        images: List[str] = []
+        for image, fetched_image in fetched_images.items():
+            if not _needs_moderation(results[provider_name], image):
+                continue
+
+            if isinstance(fetched_image, Exception):
+                provider_results[image] = ModerationResult.from_fetch_error(fetched_image)
+            else:
+                images.append(image)
+
+        sizes = {image: len(fetched_images[image]) for image in images}  # type: ignore
+        batches = plan_batches(images, sizes, client.max_batch_size, client.max_request_bytes)
+
+        def moderate(batch: List[str]) -> List[ModerationResult]:
+            return client.moderate_images_results(
+                images=[fetched_images[image] for image in batch],  # type: ignore
+                result_cache=result_cache,
+                retry_policy=retry_policy,
+            )
+
+        if len(batches) <= 1 or max_parallel_batches <= 1:
+            batches_results = [moderate(batch) for batch in batches]
+        else:
+            with ThreadPoolExecutor(max_workers=min(max_parallel_batches, len(batches))) as executor:
+                batches_results = list(executor.map(moderate, batches))
+
+        for batch, batch_results in zip(batches, batches_results):
+            provider_results.update(zip(batch, batch_results))
+
+        return provider_results
+
+    with ThreadPoolExecutor(max_workers=len(clients)) as executor:
+        for provider_name, provider_results in zip(clients, executor.map(moderate_provider, clients)):
+            results[provider_name].update(provider_results)
+
+
+def _iter_fetched_windows(
+    images: List[str],
+    file_system_name: str,
+    file_system_creds_path: Optional[str],
+    fetch_concurrency: int,
+    fetch_timeout: Optional[float],
+    window_size: int,
+    window_bytes: Optional[int],
+    provider_label: str,
+    byte_cache: Optional[DiskByteCache] = None,
+) -> Iterator[Dict[str, Union[bytes, Exception]]]:
+    """
+    Метод загрузки изображений окнами: следующее окно загружается, пока обрабатывается текущее.
+
+    :param images: список изображений в виде URL.
+    :param file_system_name: файловая система, где находится изображение.
+    :param file_system_creds_path: путь к credentials для файловой системы (опционально).
+    :param fetch_concurrency: максимальное количество одновременных загрузок изображений.
+    :param fetch_timeout: таймаут загрузки одного изображения в секундах (опционально).
+    :param window_size: максимальное количество изображений в окне.
+    :param window_bytes: максимальный суммарный размер изображений окна (опционально).
+    :param provider_label: название сервисов для метрик.
+    :param byte_cache: кэш загруженных изображений на локальном диске (опционально).
+    :return: изображение в bytes или исключение загрузки по URL для каждого окна.
+    """
+
+    def fetch(window: List[str]) -> Dict[str, Union[bytes, Exception]]:
+        with metrics.stage("fetch", provider_label):
+            fetched_images = fetch_images(
+                image_url_list=window,
+                file_system_name=file_system_name,
+                file_system_creds_path=file_system_creds_path,
+                max_concurrency=fetch_concurrency,
+                timeout=fetch_timeout,
+                byte_cache=byte_cache,
+            )
+
+        if metrics.is_enabled():
+            fetched_bytes = sum(len(image) for image in fetched_images if isinstance(image, bytes))
+            metrics.record("bytes_fetched", fetched_bytes, provider=provider_label)
+
+        return dict(zip(window, fetched_images))
+
+    sizes = dict.fromkeys(images, 0)
+    if window_bytes is not None:
+        with metrics.stage("size_lookup", provider_label):
+            image_sizes = get_image_sizes(
+                image_url_list=images,
+                file_system_name=file_system_name,
+                file_system_creds_path=file_system_creds_path,
+                max_concurrency=fetch_concurrency,
+                timeout=fetch_timeout,
+                byte_cache=byte_cache,
+            )
+        sizes.update((image, size or 0) for image, size in zip(images, image_sizes))
+
+    windows = plan_batches(images, sizes, window_size, window_bytes)
+    with ThreadPoolExecutor(max_workers=1) as prefetch_executor:
+        next_window: Optional[Future] = prefetch_executor.submit(fetch, windows[0]) if windows else None
+        for i in range(len(windows)):
+            fetched_images = next_window.result()  # type: ignore
+            next_window = prefetch_executor.submit(fetch, windows[i + 1]) if i + 1 < len(windows) else None
+            yield fetched_images
+            del fetched_images
+
+
+def moderate_chunk_multi_results(
+    clients: Dict[str, ImageModerationBase],
+    images: List[str],
+    file_system_name: str,
+    file_system_creds_path: Optional[str] = None,
+    fetch_concurrency: int = DEFAULT_FETCH_CONCURRENCY,
+    fetch_timeout: Optional[float] = None,
+    result_cache: Optional[ModerationResultCache] = None,
+    max_parallel_batches: int = DEFAULT_MAX_PARALLEL_BATCHES,
+    retry_policy: Optional[RetryPolicy] = None,
+    max_image_retries: int = DEFAULT_MAX_IMAGE_RETRIES,
+    max_inflight_bytes: Optional[int] = DEFAULT_MAX_INFLIGHT_BYTES,
+    window_size: int = DEFAULT_WINDOW_SIZE,
+    byte_cache: Optional[DiskByteCache] = None,
+) -> Dict[str, List[ModerationResult]]:
+    """
+    Метод модерации изображений несколькими сервисами с однократной загрузкой каждого изображения.
+
+    Изображения загружаются окнами (не больше window_size изображений и половины max_inflight_bytes), пока
+    сервисы модерируют текущее окно, загружается следующее. Загруженные bytes отправляются во все сервисы
+    одновременно, поэтому время обработки chunk определяется самым медленным сервисом, а не суммой.
+    Изображения с повторяемыми ошибками загружаются и отправляются повторно только в сервисы с ошибкой.
+
+    :param clients: клиенты модерации по названию сервиса.
+    :param images: список изображений в виде URL.
+    :param file_system_name: файловая система, где находится изображение.
+    :param file_system_creds_path: путь к credentials для файловой системы (опционально).
+    :param fetch_concurrency: максимальное количество одновременных загрузок изображений.
+    :param fetch_timeout: таймаут загрузки одного изображения в секундах (опционально).
+    :param result_cache: кэш результатов модерации (опционально).
+    :param max_parallel_batches: максимальное количество одновременных запросов к каждому сервису.
+    :param retry_policy: политика повторов запросов к сервисам (опционально).
+    :param max_image_retries: количество повторных раундов для изображений с повторяемыми ошибками.
+    :param max_inflight_bytes: лимит суммарного размера одновременно загруженных изображений (опционально).
+    :param window_size: максимальное количество изображений в одной загрузке.
+    :param byte_cache: кэш загруженных изображений на локальном диске (опционально).
+    :return: результат модерации по каждому изображению по названию сервиса.
+    """
+
+    provider_label = "+".join(clients)
+    results: Dict[str, Dict[str, ModerationResult]] = {provider_name: {} for provider_name in clients}
+
+    # Одинаковые URL загружаем и модерируем один раз на весь chunk.
+    pending_images = list(dict.fromkeys(images))
+    for _ in range(max_image_retries + 1):
+        for fetched_images in _iter_fetched_windows(
+            pending_images,
+            file_system_name=file_system_name,
+            file_system_creds_path=file_system_creds_path,
+            fetch_concurrency=fetch_concurrency,
+            fetch_timeout=fetch_timeout,
+            window_size=window_size,
+            # В памяти одновременно находятся текущее и следующее окно.
+            window_bytes=max_inflight_bytes // 2 if max_inflight_bytes is not None else None,
+            provider_label=provider_label,
+            byte_cache=byte_cache,
+        ):
+            _moderate_fetched(
+                clients,
+                fetched_images,
+                results,
+                result_cache=result_cache,
+                max_parallel_batches=max_parallel_batches,
+                retry_policy=retry_policy,
+            )
+
+        pending_images = [
+            image
+            for image in pending_images
+            if any(results[provider_name][image].retryable for provider_name in clients)
+        ]
+        if len(pending_images) == 0:
+            break
+
+    chunk_results = {}
+    for provider_name, client in clients.items():
+        chunk_results[provider_name] = [results[provider_name][image] for image in images]
+        client._record_statuses(chunk_results[provider_name])  # pylint: disable=protected-access
+
+    return chunk_results
+
+
+def _get_score(value: Union[float, str]) -> float:
+    # Вероятности SafeSearch Google сравниваются по значению (UNKNOWN=0 ... VERY_LIKELY=5).
+    return float(get_likelihood_value(value)) if isinstance(value, str) else float(value)
+
+
+@dataclass(frozen=True)
+class EscalationPolicy:
+    """
+    Политика передачи изображений во второй уровень каскада.
+
+    Результат первого уровня неуверенный, если оценка хотя бы одной из категорий лежит в диапазоне
+    [min_score, max_score]. Для Google границы задаются названиями вероятностей SafeSearch (например, POSSIBLE).
+    """
+
+    categories: Tuple[str, ...] = ("adult",)  # Categories of first tier result to check.
+    min_score: Union[float, str] = 0.2  # Lower bound of uncertain score (inclusive).
+    max_score: Union[float, str] = 0.8  # Upper bound of uncertain score (inclusive).
+
+    def needs_escalation(self, result: ModerationResult) -> bool:
+        """
+        Метод проверки, нужно ли отправить изображение во второй уровень.
+
+        :param result: результат модерации первого уровня.
+        :return: True, если результат успешный и неуверенный.
+        """
+
+        if result.status != ImageStatus.OK:
+            return False
+
+        min_score, max_score = _get_score(self.min_score), _get_score(self.max_score)
+        return any(
+            min_score <= _get_score(result.details[category]) <= max_score  # type: ignore
+            for category in self.categories
+            if result.details.get(category) is not None  # type: ignore
+        )
+
+
+# Неуверенные результаты Yandex Cloud Vision: вероятность adult от 0.2 до 0.8.
+YANDEX_ESCALATION_POLICY = EscalationPolicy(categories=("adult",), min_score=0.2, max_score=0.8)
+
+# Неуверенные результаты Google Cloud Vision: adult или racy - POSSIBLE.
+GOOGLE_ESCALATION_POLICY = EscalationPolicy(categories=("adult", "racy"), min_score="POSSIBLE", max_score="POSSIBLE")
+
+
+def moderate_chunk_cascade_results(
+    first_tier: ImageModerationBase,
+    second_tier: ImageModerationBase,
+    images: List[str],
+    file_system_name: str,
+    escalation_policy: EscalationPolicy = YANDEX_ESCALATION_POLICY,
+    file_system_creds_path: Optional[str] = None,
+    fetch_concurrency: int = DEFAULT_FETCH_CONCURRENCY,
+    fetch_timeout: Optional[float] = None,
+    result_cache: Optional[ModerationResultCache] = None,
+    max_parallel_batches: int = DEFAULT_MAX_PARALLEL_BATCHES,
+    retry_policy: Optional[RetryPolicy] = None,
+    max_image_retries: int = DEFAULT_MAX_IMAGE_RETRIES,
+    max_inflight_bytes: Optional[int] = DEFAULT_MAX_INFLIGHT_BYTES,
+    window_size: int = DEFAULT_WINDOW_SIZE,
+    byte_cache: Optional[DiskByteCache] = None,
+) -> Tuple[List[ModerationResult], List[Optional[ModerationResult]]]:
+    """
+    Метод каскадной модерации: все изображения модерируются первым уровнем, во второй уровень отправляются только
+    изображения с неуверенным результатом первого.
+
+    Изображения загружаются один раз (окнами, как в moderate_chunk_multi_results). Неуверенные изображения
+    накапливаются между окнами и отправляются во второй уровень полными батчами (max_batch_size второго уровня
+    на каждый из max_parallel_batches запросов), в памяти одновременно не больше трети max_inflight_bytes
+    на текущее окно, следующее окно и накопленные изображения.
+
+    :param first_tier: клиент модерации первого уровня.
+    :param second_tier: клиент модерации второго уровня.
+    :param images: список изображений в виде URL.
+    :param file_system_name: файловая система, где находится изображение.
+    :param escalation_policy: политика передачи изображений во второй уровень.
+    :param file_system_creds_path: путь к credentials для файловой системы (опционально).
+    :param fetch_concurrency: максимальное количество одновременных загрузок изображений.
+    :param fetch_timeout: таймаут загрузки одного изображения в секундах (опционально).
+    :param result_cache: кэш результатов модерации (опционально).
+    :param max_parallel_batches: максимальное количество одновременных запросов к каждому уровню.
+    :param retry_policy: политика повторов запросов к сервисам (опционально).
+    :param max_image_retries: количество повторных раундов для изображений с повторяемыми ошибками.
+    :param max_inflight_bytes: лимит суммарного размера одновременно загруженных изображений (опционально).
+    :param window_size: максимальное количество изображений в одной загрузке.
+    :param byte_cache: кэш загруженных изображений на локальном диске (опционально).
+    :return: результаты первого уровня и результаты второго уровня (None для изображений без передачи).
+    """
+
+    tiers = {"first": first_tier, "second": second_tier}
+    provider_label = f"{first_tier.provider_name}>{second_tier.provider_name}"
+    results: Dict[str, Dict[str, ModerationResult]] = {tier: {} for tier in tiers}
+    window_bytes = max_inflight_bytes // 3 if max_inflight_bytes is not None else None
+    escalation_batch_size = second_tier.max_batch_size * max(max_parallel_batches, 1)
+
+    def needs_escalation(image: str) -> bool:
+        return image in results["first"] and escalation_policy.needs_escalation(results["first"][image])
+
+    def moderate(tier: str, fetched_images: Dict[str, Union[bytes, Exception]]) -> None:
+        _moderate_fetched(
+            {tier: tiers[tier]},
+            fetched_images,
+            results,
+            result_cache=result_cache,
+            max_parallel_batches=max_parallel_batches,
+            retry_policy=retry_policy,
+        )
+
+    # Одинаковые URL загружаем и модерируем один раз на весь chunk.
+    pending_images = list(dict.fromkeys(images))
+    for _ in range(max_image_retries + 1):
+        escalated_images: Dict[str, Union[bytes, Exception]] = {}
+        escalated_bytes = 0
+        for fetched_images in _iter_fetched_windows(
+            pending_images,
+            file_system_name=file_system_name,
+            file_system_creds_path=file_system_creds_path,
+            fetch_concurrency=fetch_concurrency,
+            fetch_timeout=fetch_timeout,
+            window_size=window_size,
+            window_bytes=window_bytes,
+            provider_label=provider_label,
+            byte_cache=byte_cache,
+        ):
+            moderate("first", fetched_images)
+
+            for image, fetched_image in fetched_images.items():
+                if needs_escalation(image) and _needs_moderation(results["second"], image):
+                    escalated_images[image] = fetched_image
+                    escalated_bytes += len(fetched_image)  # type: ignore
+
+            if len(escalated_images) >= escalation_batch_size or (
+                window_bytes is not None and escalated_bytes >= window_bytes
+            ):
+                moderate("second", escalated_images)
+                escalated_images, escalated_bytes = {}, 0
+
+        if len(escalated_images) > 0:
+            moderate("second", escalated_images)
+
+        pending_images = [
+            image
+            for image in pending_images
+            if results["first"][image].retryable or (needs_escalation(image) and results["second"][image].retryable)
+        ]
+        if len(pending_images) == 0:
+            break
+
+    first_results = [results["first"][image] for image in images]
+    second_results = [results["second"].get(image) for image in images]
+    first_tier._record_statuses(first_results)  # pylint: disable=protected-access
+    second_tier._record_statuses(  # pylint: disable=protected-access
+        [result for result in second_results if result is not None]
+    )
+
+    return first_results, second_results
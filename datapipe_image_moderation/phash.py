@@ -0,0 +1,419 @@
+import io
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Set, Tuple, Union
+
+import numpy as np
+import pandas as pd
+import sqlalchemy as sa
+from datapipe.store.database import DBConn, TableStoreDB
+
+from datapipe_image_moderation.cache import ModerationResultCache
+
+try:
+    from PIL import Image
+except ImportError:  # pragma: no cover
+    Image = None  # type: ignore
+
+# Сторона матрицы перцептивного хэша: 8x8 = 64 бита.
+HASH_SIZE = 8
+
+# Количество недавно вычисленных хэшей, которые хранятся до сохранения результатов модерации.
+RECENT_PHASHES_SIZE = 10_000
+
+# Строки, добавленные в последние секунды перед предыдущей загрузкой, читаются повторно: created_at - время
+# записывающего процесса до коммита, и строка с расхождением часов или долгой транзакцией может появиться позже.
+REFRESH_OVERLAP_SECONDS = 600.0
+
+
+def _bits_to_int(bits: np.ndarray) -> int:
+    return int.from_bytes(np.packbits(bits.flatten()).tobytes(), "big")
+
+
+def _get_gray_pixels(image: bytes, width: int, height: int) -> np.ndarray:
+    with Image.open(io.BytesIO(image)) as pil_image:
+        # Для JPEG декодируем сразу в уменьшенном масштабе (DCT scaling).
+        pil_image.draft("L", (width, height))
+        return np.asarray(pil_image.convert("L").resize((width, height), Image.LANCZOS), dtype=np.float64)
+
+
+def get_dhash(image: bytes) -> int:
+    """
+    Метод получения разностного хэша изображения (dHash): знаки разностей соседних пикселей по строкам.
+
+    :param image: изображение в bytes.
+    :return: 64-битный хэш.
+    """
+
+    pixels = _get_gray_pixels(image, HASH_SIZE + 1, HASH_SIZE)
+    return _bits_to_int(pixels[:, 1:] > pixels[:, :-1])
+
+
+def _get_dct_matrix(size: int) -> np.ndarray:
+    n = np.arange(size)
+    return 2 * np.cos(np.pi * (2 * n[None, :] + 1) * n[:, None] / (2 * size))
+
+
+# Матрица DCT-II для pHash по изображению 32x32.
+_DCT_MATRIX = _get_dct_matrix(HASH_SIZE * 4)
+
+
+def get_phash(image: bytes) -> int:
+    """
+    Метод получения перцептивного хэша изображения (pHash): знаки низкочастотных коэффициентов DCT
+    относительно медианы.
+
+    :param image: изображение в bytes.
+    :return: 64-битный хэш.
+    """
+
+    pixels = _get_gray_pixels(image, HASH_SIZE * 4, HASH_SIZE * 4)
+    coefficients = (_DCT_MATRIX @ pixels @ _DCT_MATRIX.T)[:HASH_SIZE, :HASH_SIZE]
+    return _bits_to_int(coefficients > np.median(coefficients))
+
+
+HASH_METHODS = {"phash": get_phash, "dhash": get_dhash}
+
+
+def get_hamming_distance(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
+
+
+class BKTree:
+    """
+    BK-дерево для поиска хэшей в пределах расстояния Хэмминга.
+
+    Узел - [хэш, ключи с этим хэшем, дочерние узлы по расстоянию до хэша узла].
+    """
+
+    def __init__(self) -> None:
+        self._root: Optional[List[Any]] = None
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def add(self, value: int, key: str) -> None:
+        """
+        Метод добавления хэша.
+
+        :param value: хэш.
+        :param key: ключ, возвращаемый при поиске.
+        """
+
+        self._size += 1
+        if self._root is None:
+            self._root = [value, [key], {}]
+            return
+
+        node = self._root
+        while True:
+            distance = get_hamming_distance(value, node[0])
+            if distance == 0:
+                node[1].append(key)
+                return
+
+            child = node[2].get(distance)
+            if child is None:
+                node[2][distance] = [value, [key], {}]
+                return
+
+            node = child
+
+    def search(self, value: int, max_distance: int) -> List[Tuple[int, str]]:
+        """
+        Метод поиска хэшей в пределах расстояния.
+
+        :param value: хэш.
+        :param max_distance: максимальное расстояние Хэмминга.
+        :return: список (расстояние, ключ) по возрастанию расстояния.
+        """
+
+        found: List[Tuple[int, str]] = []
+        nodes = [self._root] if self._root is not None else []
+        while nodes:
+            node = nodes.pop()
+            distance = get_hamming_distance(value, node[0])
+            if distance <= max_distance:
+                found.extend((distance, key) for key in node[1])
+
+            # По неравенству треугольника подходящие хэши могут быть только в этих поддеревьях.
+            for child_distance, child in node[2].items():
+                if distance - max_distance <= child_distance <= distance + max_distance:
+                    nodes.append(child)
+
+        return sorted(found)
+
+
+def _to_signed(value: int) -> int:
+    # BIGINT в БД знаковый.
+    return value - (1 << 64) if value >= 1 << 63 else value
+
+
+def _to_unsigned(value: int) -> int:
+    return value & ((1 << 64) - 1)
+
+
+class PerceptualHashCache(ModerationResultCache):
+    """
+    Кэш результатов модерации с поиском похожих изображений по перцептивному хэшу.
+
+    Изображения, отличающиеся размером или сжатием от уже промодерированного (расстояние Хэмминга хэшей
+    не больше max_distance), получают его результат без запроса к сервису, и он сохраняется под их content-hash.
+    Результаты и хэши хранятся в таблице БД, поиск - по BK-дереву в памяти процесса, которое дополняется новыми
+    строками таблицы не чаще раза в refresh_interval секунд. Требует Pillow
+    (pip install datapipe-image-moderation[preprocessing]).
+    """
+
+    def __init__(
+        self,
+        dbconn: Union[DBConn, str],
+        table_name: str = "image_moderation_phash",
+        max_distance: int = 6,
+        hash_method: str = "phash",
+        refresh_interval: float = 60.0,
+        ttl: Optional[float] = None,
+        create_table: bool = True,
+    ) -> None:
+        """
+        Метод инициализации класса PerceptualHashCache.
+
+        :param dbconn: коннектор к БД.
+        :param table_name: название таблицы кэша.
+        :param max_distance: максимальное расстояние Хэмминга между 64-битными хэшами похожих изображений.
+        :param hash_method: перцептивный хэш (phash или dhash).
+        :param refresh_interval: период загрузки строк, добавленных другими процессами, в секундах.
+        :param ttl: время жизни результата в секундах (опционально).
+        :param create_table: создавать ли таблицу кэша.
+        """
+
+        if Image is None:
+            raise ImportError(
+                "Для PerceptualHashCache нужен Pillow: pip install datapipe-image-moderation[preprocessing]"
+            )
+
+        if hash_method not in HASH_METHODS:
+            raise ValueError(f"Неизвестный перцептивный хэш: {hash_method}!")
+
+        super().__init__()
+        self.max_distance = max_distance
+        self.hash_method = hash_method
+        self.refresh_interval = refresh_interval
+        self.near_hits = 0
+        self._ttl = ttl
+        self._table_store = TableStoreDB(
+            dbconn=dbconn,
+            name=table_name,
+            data_sql_schema=[
+                sa.Column("provider", sa.String, primary_key=True),
+                sa.Column("image_hash", sa.String, primary_key=True),
+                sa.Column("phash", sa.BigInteger),
+                sa.Column("details", sa.JSON),
+                sa.Column("created_at", sa.Float, index=True),
+            ],
+            create_table=create_table,
+        )
+        self._init_index()
+
+    def _init_index(self) -> None:
+        self._trees: Dict[str, BKTree] = {}
+        self._indexed_hashes: Dict[str, Set[str]] = {}
+        self._loaded_at: Dict[str, float] = {}
+        self._refreshed_at: Dict[str, float] = {}
+        self._recent_phashes: "OrderedDict[str, int]" = OrderedDict()
+        self._index_lock = threading.Lock()
+
+    def __getstate__(self) -> Dict[str, Any]:
+        # BK-дерево строится заново в каждом процессе.
+        state = super().__getstate__()
+        state.update(
+            near_hits=0,
+            _trees=None,
+            _indexed_hashes=None,
+            _loaded_at=None,
+            _refreshed_at=None,
+            _recent_phashes=None,
+            _index_lock=None,
+        )
+        return state
+
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        super().__setstate__(state)
+        self._init_index()
+
+    def _add_to_index(self, provider: str, image_hash: str, phash: int) -> None:
+        if image_hash not in self._indexed_hashes.setdefault(provider, set()):
+            self._indexed_hashes[provider].add(image_hash)
+            self._trees.setdefault(provider, BKTree()).add(phash, image_hash)
+
+    def _refresh_index(self, provider: str) -> None:
+        """
+        Метод загрузки в BK-дерево хэшей, добавленных в таблицу после предыдущей загрузки.
+
+        Запрос к БД выполняется без блокировки индекса: поиск в это время идёт по текущему дереву.
+
+        :param provider: название сервиса модерации.
+        """
+
+        now = time.time()
+        with self._index_lock:
+            refreshed_at = self._refreshed_at.get(provider)
+            if refreshed_at is not None and now - refreshed_at < self.refresh_interval:
+                return
+
+            # Загрузку выполняет один поток, остальные не ждут её.
+            self._refreshed_at[provider] = now
+            loaded_at = self._loaded_at.get(provider)
+
+        data_table = self._table_store.data_table
+        query = sa.select(data_table.c.image_hash, data_table.c.phash, data_table.c.created_at).where(
+            data_table.c.provider == provider, data_table.c.phash.isnot(None)
+        )
+        if loaded_at is not None:
+            query = query.where(data_table.c.created_at >= loaded_at - REFRESH_OVERLAP_SECONDS)
+        elif self._ttl is not None:
+            query = query.where(data_table.c.created_at >= now - self._ttl)
+
+        try:
+            with self._table_store.dbconn.con.begin() as con:
+                rows = con.execute(query).fetchall()
+        except Exception:
+            with self._index_lock:
+                if refreshed_at is None:
+                    self._refreshed_at.pop(provider, None)
+                else:
+                    self._refreshed_at[provider] = refreshed_at
+            raise
+
+        with self._index_lock:
+            for image_hash, phash, created_at in rows:
+                self._add_to_index(provider, image_hash, _to_unsigned(phash))
+                self._loaded_at[provider] = max(self._loaded_at.get(provider, created_at), created_at)
+
+    def _get_phashes(self, images: Dict[str, bytes]) -> Dict[str, int]:
+        get_hash = HASH_METHODS[self.hash_method]
+
+        phashes = {}
+        for image_hash, image in images.items():
+            # Хэши промахов кэша понадобятся при сохранении результатов - не декодируем изображения повторно.
+            phash = self._recent_phashes.get(image_hash)
+            if phash is None:
+                try:
+                    phash = get_hash(image)
+                except Exception:  # pylint: disable=broad-except
+                    # Изображения, которые не удалось декодировать, ищутся только по content-hash.
+                    continue
+
+            phashes[image_hash] = phash
+
+        with self._index_lock:
+            self._recent_phashes.update(phashes)
+            while len(self._recent_phashes) > RECENT_PHASHES_SIZE:
+                self._recent_phashes.popitem(last=False)
+
+        return phashes
+
+    def _read_rows(self, provider: str, image_hashes: List[str]) -> pd.DataFrame:
+        rows = self._table_store.read_rows(
+            pd.DataFrame({"provider": [provider] * len(image_hashes), "image_hash": image_hashes})
+        )
+        if self._ttl is not None:
+            rows = rows[rows["created_at"] >= time.time() - self._ttl]
+
+        return rows
+
+    def _get_many(self, provider: str, image_hashes: List[str]) -> Dict[str, Dict]:
+        if len(image_hashes) == 0:
+            return {}
+
+        rows = self._read_rows(provider, image_hashes)
+        return dict(zip(rows["image_hash"], rows["details"]))
+
+    def get_many_images(self, provider: str, images: Dict[str, bytes]) -> Dict[str, Dict]:
+        found = self._get_many(provider, list(images))
+
+        phashes = self._get_phashes(
+            {image_hash: image for image_hash, image in images.items() if image_hash not in found}
+        )
+        if len(phashes) > 0:
+            self._refresh_index(provider)
+            with self._index_lock:
+                tree = self._trees.get(provider, BKTree())
+                candidates = {
+                    image_hash: [key for _, key in tree.search(phash, self.max_distance)]
+                    for image_hash, phash in phashes.items()
+                }
+
+            candidate_rows = self._read_rows(provider, sorted({key for keys in candidates.values() for key in keys}))
+            candidate_results = dict(
+                zip(candidate_rows["image_hash"], zip(candidate_rows["details"], candidate_rows["created_at"]))
+            )
+            near_found: Dict[str, Dict] = {}
+            near_created_at: Dict[str, float] = {}
+            for image_hash, keys in candidates.items():
+                # Берём результат ближайшего изображения.
+                for key in keys:
+                    if key in candidate_results:
+                        near_found[image_hash], near_created_at[image_hash] = candidate_results[key]
+                        break
+
+            if len(near_found) > 0:
+                # Повтор того же изображения найдётся по content-hash без декодирования и поиска, срок жизни
+                # результата отсчитывается от исходной записи.
+                self._set_many(provider, near_found, phashes, near_created_at)
+                found.update(near_found)
+
+            with self._stats_lock:
+                self.near_hits += len(near_found)
+
+        self._record(hits=len(found), misses=len(images) - len(found))
+        return found
+
+    def set_many(self, provider: str, results: Dict[str, Dict]) -> None:
+        self._set_many(provider, results, {})
+
+    def set_many_images(self, provider: str, results: Dict[str, Dict], images: Dict[str, bytes]) -> None:
+        self._set_many(provider, results, self._get_phashes(images))
+
+    def _set_many(
+        self,
+        provider: str,
+        results: Dict[str, Dict],
+        phashes: Dict[str, int],
+        created_at: Optional[Dict[str, float]] = None,
+    ) -> None:
+        if len(results) == 0:
+            return
+
+        image_hashes = list(results.keys())
+        self._table_store.update_rows(
+            pd.DataFrame(
+                {
+                    "provider": provider,
+                    "image_hash": image_hashes,
+                    "phash": pd.Series(
+                        [_to_signed(phashes[h]) if h in phashes else None for h in image_hashes], dtype=object
+                    ),
+                    "details": list(results.values()),
+                    "created_at": [created_at[h] for h in image_hashes] if created_at is not None else time.time(),
+                }
+            )
+        )
+
+        with self._index_lock:
+            for image_hash in image_hashes:
+                if image_hash in phashes:
+                    self._add_to_index(provider, image_hash, phashes[image_hash])
+
+    def evict_expired(self) -> None:
+        """
+        Метод удаления просроченных результатов из таблицы кэша.
+        """
+
+        if self._ttl is None:
+            return
+
+        data_table = self._table_store.data_table
+        with self._table_store.dbconn.con.begin() as con:
+            con.execute(sa.delete(data_table).where(data_table.c.created_at < time.time() - self._ttl))
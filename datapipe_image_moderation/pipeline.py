@@ -1,14 +1,286 @@
-from dataclasses import dataclass
-from typing import List, Optional, Union
+from dataclasses import dataclass, field
+from typing import Any, Callable, ClassVar, Dict, Iterable, List, Optional, Tuple, Union
 
 import pandas as pd
 import sqlalchemy as sa
 from datapipe.compute import Catalog, ComputeInput, ComputeStep, DataStore, ExecutorConfig, Labels, PipelineStep, Table
+from datapipe.executor import Executor, SingleThreadExecutor
+from datapipe.run_config import RunConfig
 from datapipe.step.batch_transform import BatchTransformStep
 from datapipe.store.database import DBConn, TableStoreDB
+from datapipe.types import ChangeList, IndexDF
 
-from datapipe_image_moderation.google_vision import ImageModerationGoogle
-from datapipe_image_moderation.yandex_vision import ImageModerationYandex
+from datapipe_image_moderation import metrics
+from datapipe_image_moderation.base import (
+    DEFAULT_MAX_IMAGE_RETRIES,
+    DEFAULT_MAX_PARALLEL_BATCHES,
+    DEFAULT_RETRY_POLICY,
+    ImageModerationBase,
+)
+from datapipe_image_moderation.batching import DEFAULT_MAX_INFLIGHT_BYTES
+from datapipe_image_moderation.byte_cache import DiskByteCache
+from datapipe_image_moderation.cache import ModerationResultCache
+from datapipe_image_moderation.multi import (
+    DEFAULT_WINDOW_SIZE,
+    GOOGLE_ESCALATION_POLICY,
+    YANDEX_ESCALATION_POLICY,
+    EscalationPolicy,
+    moderate_chunk_cascade_results,
+    moderate_chunk_multi_results,
+)
+from datapipe_image_moderation.preprocess import ImagePreprocessor
+from datapipe_image_moderation.providers import (
+    DEFAULT_CLASS_NAMES,
+    MAX_BATCH_SIZES,
+    MODERATION_CLASSES,
+    SAFE_SEARCH_CATEGORIES,
+    get_likelihood_value,
+    get_provider_class,
+)
+from datapipe_image_moderation.rate_limit import RetryPolicy
+from datapipe_image_moderation.result import ModerationResult, get_details
+from datapipe_image_moderation.scheduling import PriorityScheduling
+from datapipe_image_moderation.screening import ImageScreening
+from datapipe_image_moderation.utils import DEFAULT_FETCH_CONCURRENCY
+from datapipe_image_moderation.worker import WorkerTransform, init_worker
+
+# Количество строк в одной транзакции datapipe по умолчанию, если задан status_field.
+DEFAULT_CHUNK_SIZE = 500
+
+# Типизированная колонка результата: тип SQL и функция получения значения колонки из результата модерации.
+TypedColumn = Tuple[Any, Callable[[Any], Any]]
+
+# Google: вероятность SafeSearch по категории (UNKNOWN=0 ... VERY_LIKELY=5).
+GOOGLE_TYPED_COLUMNS: Dict[str, TypedColumn] = {
+    category: (sa.SmallInteger, get_likelihood_value) for category in SAFE_SEARCH_CATEGORIES
+}
+
+# Yandex: вероятность класса модели moderation.
+YANDEX_TYPED_COLUMNS: Dict[str, TypedColumn] = {name: (sa.REAL, float) for name in MODERATION_CLASSES}
+
+
+class ModerationBatchTransformStep(BatchTransformStep):
+    """
+    BatchTransformStep с замером записи результата в datapipe (этап write) и порядком обработки по приоритету.
+    """
+
+    def __init__(
+        self, *args: Any, provider_name: str, scheduling: Optional[PriorityScheduling] = None, **kwargs: Any
+    ) -> None:
+        super().__init__(*args, **kwargs)
+        self.provider_name = provider_name
+        self.scheduling = scheduling
+        if scheduling is not None:
+            scheduling.validate(self, kwargs["ds"] if "ds" in kwargs else args[0])
+
+    def get_full_process_ids(
+        self,
+        ds: DataStore,
+        chunk_size: Optional[int] = None,
+        run_config: Optional[RunConfig] = None,
+    ) -> Tuple[int, Iterable[IndexDF]]:
+        if self.scheduling is None:
+            return super().get_full_process_ids(ds=ds, chunk_size=chunk_size, run_config=run_config)
+
+        return self.scheduling.get_process_ids(
+            step=self,
+            ds=ds,
+            chunk_size=chunk_size or self.chunk_size,
+            run_config=self._apply_filters_to_run_config(run_config),
+        )
+
+    def store_batch_result(self, *args: Any, **kwargs: Any) -> ChangeList:
+        with metrics.stage("write", self.provider_name):
+            return super().store_batch_result(*args, **kwargs)
+
+    def _init_worker(self, executor: Optional[Executor] = None) -> None:
+        # В текущем процессе функция преобразования не десериализуется, поэтому инициализируем её перед запуском.
+        if isinstance(self.func, WorkerTransform) and (executor is None or isinstance(executor, SingleThreadExecutor)):
+            self.func.init_worker()
+
+    def run_full(
+        self,
+        ds: DataStore,
+        run_config: Optional[RunConfig] = None,
+        executor: Optional[Executor] = None,
+    ) -> None:
+        self._init_worker(executor)
+        super().run_full(ds=ds, run_config=run_config, executor=executor)
+
+    def run_changelist(
+        self,
+        ds: DataStore,
+        change_list: ChangeList,
+        run_config: Optional[RunConfig] = None,
+        executor: Optional[Executor] = None,
+    ) -> ChangeList:
+        self._init_worker(executor)
+        return super().run_changelist(ds=ds, change_list=change_list, run_config=run_config, executor=executor)
+
+    def run_idx(
+        self,
+        ds: DataStore,
+        idx: IndexDF,
+        run_config: Optional[RunConfig] = None,
+        executor: Optional[Executor] = None,
+    ) -> ChangeList:
+        self._init_worker()
+        return super().run_idx(ds=ds, idx=idx, run_config=run_config, executor=executor)
+
+
+def _get_chunk_size(chunk_size: Optional[int], status_field: Optional[str], max_batch_size: int) -> int:
+    """
+    Метод получения количества строк в одной транзакции datapipe.
+
+    Без status_field ошибка одного изображения прерывает весь chunk и datapipe повторяет его целиком,
+    поэтому по умолчанию chunk - один батч сервиса, а большой chunk используется только со status_field.
+
+    :param chunk_size: количество строк, заданное в шаге (опционально).
+    :param status_field: название поля для статуса модерации (опционально).
+    :param max_batch_size: количество изображений в одном запросе к сервису.
+    :return: количество строк.
+    """
+
+    if chunk_size is not None:
+        return chunk_size
+
+    return DEFAULT_CHUNK_SIZE if status_field is not None else max_batch_size
+
+
+def _get_provider_batch_size(provider_names: Iterable[str]) -> int:
+    # Для встроенных сервисов лимит известен без импорта SDK, для зарегистрированных берётся у класса клиента.
+    return min(
+        MAX_BATCH_SIZES.get(name) or getattr(get_provider_class(name), "max_batch_size", DEFAULT_CHUNK_SIZE)
+        for name in provider_names
+    )
+
+
+def _get_output_schema(
+    details_field: str,
+    status_field: Optional[str],
+    typed_columns: Optional[Dict[str, TypedColumn]] = None,
+    indexed_columns: Optional[List[str]] = None,
+) -> List[sa.Column]:
+    """
+    Метод получения колонок результата модерации в выходной таблице.
+
+    :param details_field: название поля для результата модерации (JSON).
+    :param status_field: название поля для статуса модерации (опционально).
+    :param typed_columns: типизированные колонки вместо JSON-поля (опционально).
+    :param indexed_columns: типизированные колонки, по которым нужен индекс (опционально).
+    :return: список колонок.
+    """
+
+    if typed_columns is None:
+        columns = [sa.Column(details_field, sa.JSON)]
+    else:
+        unknown_columns = set(indexed_columns or []) - set(typed_columns)
+        if len(unknown_columns) > 0:
+            raise ValueError(f"Неизвестные колонки для индекса: {sorted(unknown_columns)}!")
+
+        columns = [
+            sa.Column(name, column_type, index=name in (indexed_columns or []))
+            for name, (column_type, _) in typed_columns.items()
+        ]
+
+    if status_field is not None:
+        columns.append(sa.Column(status_field, sa.String))
+
+    return columns
+
+
+def _set_results(
+    output_df: pd.DataFrame,
+    results: List[ModerationResult],
+    details_field: str,
+    status_field: Optional[str],
+    typed_columns: Optional[Dict[str, TypedColumn]] = None,
+) -> pd.DataFrame:
+    """
+    Метод записи результатов модерации в выходной DataFrame.
+
+    Без status_field ошибка любого изображения прерывает обработку chunk (ImageModerationError),
+    со status_field строки с ошибками записываются с пустым результатом и статусом ошибки.
+
+    :param output_df: выходной DataFrame.
+    :param results: результат модерации по каждой строке.
+    :param details_field: название поля для результата модерации.
+    :param status_field: название поля для статуса модерации (опционально).
+    :param typed_columns: типизированные колонки вместо JSON-поля (опционально).
+    :return: выходной DataFrame.
+    """
+
+    if status_field is None:
+        # Проверяем, что все изображения обработаны (иначе ImageModerationError).
+        get_details(results)
+    else:
+        output_df[status_field] = [result.status.value for result in results]
+
+    if typed_columns is None:
+        output_df[details_field] = [result.details for result in results]
+        return output_df
+
+    # Собираем значения сразу по колонкам, без промежуточного DataFrame из словарей.
+    columns: Dict[str, List[Any]] = {name: [] for name in typed_columns}
+    for result in results:
+        for name, (_, get_value) in typed_columns.items():
+            columns[name].append(get_value(result.details[name]) if result.ok else None)  # type: ignore
+
+    for name, values in columns.items():
+        # Пустые значения храним как None (NULL), а не NaN.
+        dtype = object if any(value is None for value in values) else None
+        output_df[name] = pd.Series(values, index=output_df.index, dtype=dtype)
+
+    return output_df
+
+
+@dataclass
+class ImageClassificationTransform(WorkerTransform):
+    """
+    Функция преобразования шага модерации.
+
+    Объект сериализуется (pickle) для многопроцессных и распределённых executor: передаются только параметры,
+    а клиент модерации, файловая система и ограничитель запросов создаются в процессе-обработчике (init_worker).
+    """
+
+    provider_name: str  # google, yandex or local.
+    client_params: Dict[str, Any]  # Parameters of the process-wide client (credentials path or OAuth token, folder).
+    primary_keys: List[str]  # Primary keys of Input Table copied to Output Table.
+    image_field: str  # Name of Field with Image URL or Image Bytes.
+    file_system_name: str  # File system for Fsspec.
+    file_system_creds_path: Optional[str]  # File System Credentials File Path (Optional).
+    moderation_params: Dict[str, Any]  # Keyword arguments of moderate_chunk_results.
+    details_field: str  # Name of Field for write classification result.
+    status_field: Optional[str] = None  # Name of Field for per-image status (Optional).
+    typed_columns: Optional[Dict[str, TypedColumn]] = None  # Typed output columns instead of details (Optional).
+    requests_per_second: Optional[float] = None  # Provider requests/sec limit of the worker process (Optional).
+    images_per_second: Optional[float] = None  # Provider images/sec limit of the worker process (Optional).
+
+    def _create_clients(self) -> Dict[str, ImageModerationBase]:
+        return {
+            self.provider_name: init_worker(
+                self.provider_name,
+                self.client_params,
+                file_system_name=self.file_system_name,
+                file_system_creds_path=self.file_system_creds_path,
+                requests_per_second=self.requests_per_second,
+                images_per_second=self.images_per_second,
+            )
+        }
+
+    def __call__(self, input_df: pd.DataFrame) -> pd.DataFrame:
+        image_moderation_service = self._get_clients()[self.provider_name]
+
+        output_df = input_df[self.primary_keys].copy()
+        with metrics.stage("transform", self.provider_name):
+            results = image_moderation_service.moderate_chunk_results(
+                images=input_df[self.image_field].tolist(),
+                file_system_name=self.file_system_name,
+                file_system_creds_path=self.file_system_creds_path,
+                **self.moderation_params,
+            )
+
+        return _set_results(output_df, results, self.details_field, self.status_field, self.typed_columns)
 
 
 @dataclass
@@ -17,6 +289,8 @@ class YandexImageClassificationStep(PipelineStep):
     Шаг пайплайна для классификации изображений через Yandex Cloud Vision gRPC.
     """
 
+    typed_columns: ClassVar[Dict[str, TypedColumn]] = YANDEX_TYPED_COLUMNS
+
     input: str  # Input Table name.
     output: str  # Output Table name.
     dbconn: Union[DBConn, str]  # Database Connection.
@@ -26,9 +300,28 @@ class YandexImageClassificationStep(PipelineStep):
 
     file_system_name: str  # File system for Fsspec.
     file_system_creds_path: Optional[str] = None  # File System Credentials File Path (Optional).
+    fetch_concurrency: int = DEFAULT_FETCH_CONCURRENCY  # Max number of images downloaded in parallel.
+    fetch_timeout: Optional[float] = None  # Timeout for downloading one image in seconds (Optional).
+    result_cache: Optional[ModerationResultCache] = None  # Cache of results by image content hash (Optional).
+    byte_cache: Optional[DiskByteCache] = None  # Local disk cache of downloaded images (Optional).
+    preprocessor: Optional[ImagePreprocessor] = None  # Downscale and re-encode images before upload (Optional).
 
     image_field: str = "image_url"  # Name of Field with Image URL or Image Bytes.
+    chunk_size: Optional[int] = None  # Rows per datapipe transaction (500 with status_field, else one batch).
+    max_parallel_batches: int = DEFAULT_MAX_PARALLEL_BATCHES  # Max number of provider requests in flight per chunk.
+    max_request_bytes: Optional[int] = None  # Byte budget of one provider request (Optional, provider limit).
+    max_inflight_bytes: Optional[int] = DEFAULT_MAX_INFLIGHT_BYTES  # Cap on image bytes held in memory (Optional).
+    size_lookup: bool = False  # Get image sizes via fsspec info() before download to pack requests by size.
+    screening: Optional[ImageScreening] = None  # Size and format check before download (Optional).
+    scheduling: Optional[PriorityScheduling] = None  # Process changed rows by priority, e.g. uploads first (Optional).
+    requests_per_second: Optional[float] = None  # Provider requests/sec limit shared by the process (Optional).
+    images_per_second: Optional[float] = None  # Provider images/sec limit shared by the process (Optional).
+    retry_policy: RetryPolicy = DEFAULT_RETRY_POLICY  # Retries, backoff and per-RPC deadline for provider requests.
+    max_image_retries: int = DEFAULT_MAX_IMAGE_RETRIES  # Resubmit rounds for images with retryable errors per chunk.
     details_field: str = "details"  # Name of Field for write classification result.
+    status_field: Optional[str] = None  # Name of Field for per-image status; failed images don't fail the chunk.
+    typed_output: bool = False  # Write one typed column per category instead of the JSON details column.
+    indexed_columns: List[str] = field(default_factory=list)  # Typed output columns to index.
     step_name: str = "image_classification_yandex"  # Name of Step.
 
     create_table: bool = True
@@ -43,34 +336,56 @@ class YandexImageClassificationStep(PipelineStep):
             TableStoreDB(
                 dbconn=self.dbconn,
                 name=self.output,
-                data_sql_schema=input_dt.primary_schema + [sa.Column("details", sa.JSON)],
+                data_sql_schema=input_dt.primary_schema
+                + _get_output_schema(
+                    self.details_field,
+                    self.status_field,
+                    self.typed_columns if self.typed_output else None,
+                    self.indexed_columns,
+                ),
                 create_table=self.create_table,
             ),
         )
         catalog.add_datatable(self.output, Table(output_dt.table_store))
 
-        def image_classification_yandex(input_df: pd.DataFrame) -> pd.DataFrame:
-            image_moderation_yandex_service = ImageModerationYandex(
-                oauth_token=self.yandex_oauth_token,
-                folder_id=self.folder_id,
-            )
-
-            output_df = input_df[input_dt.primary_keys].copy()
-            output_df[self.details_field] = image_moderation_yandex_service.moderate_batch(
-                images=input_df[self.image_field].tolist(),
-                file_system_name=self.file_system_name,
-                file_system_creds_path=self.file_system_creds_path,
-            )
-            return output_df
+        image_classification_yandex = ImageClassificationTransform(
+            provider_name="yandex",
+            client_params={"oauth_token": self.yandex_oauth_token, "folder_id": self.folder_id},
+            primary_keys=input_dt.primary_keys,
+            image_field=self.image_field,
+            file_system_name=self.file_system_name,
+            file_system_creds_path=self.file_system_creds_path,
+            moderation_params=dict(
+                fetch_concurrency=self.fetch_concurrency,
+                fetch_timeout=self.fetch_timeout,
+                result_cache=self.result_cache,
+                byte_cache=self.byte_cache,
+                max_parallel_batches=self.max_parallel_batches,
+                retry_policy=self.retry_policy,
+                preprocessor=self.preprocessor,
+                max_image_retries=self.max_image_retries,
+                max_request_bytes=self.max_request_bytes,
+                max_inflight_bytes=self.max_inflight_bytes,
+                size_lookup=self.size_lookup,
+                screening=self.screening,
+            ),
+            details_field=self.details_field,
+            status_field=self.status_field,
+            typed_columns=self.typed_columns if self.typed_output else None,
+            requests_per_second=self.requests_per_second,
+            images_per_second=self.images_per_second,
+        )
 
         return [
-            BatchTransformStep(
+            ModerationBatchTransformStep(
                 ds=ds,
                 name=self.step_name,
                 input_dts=[input_dt],
                 output_dts=[output_dt],
                 func=image_classification_yandex,
-                chunk_size=5,
+                provider_name="yandex",
+                chunk_size=_get_chunk_size(self.chunk_size, self.status_field, MAX_BATCH_SIZES["yandex"]),
+                scheduling=self.scheduling,
                 labels=self.labels,
                 executor_config=self.executor_config,
             )
@@ -83,16 +398,38 @@ class GoogleImageClassificationStep(PipelineStep):
     Шаг пайплайна для классификации изображений через Google Cloud Vision gRPC.
     """
 
+    typed_columns: ClassVar[Dict[str, TypedColumn]] = GOOGLE_TYPED_COLUMNS
+
     input: str  # Input Table name.
     output: str  # Output Table name.
     dbconn: Union[DBConn, str]  # Database Connection.
 
     file_system_name: str  # File system for Fsspec.
     file_system_creds_path: Optional[str] = None  # File System Credentials File Path (Optional).
+    fetch_concurrency: int = DEFAULT_FETCH_CONCURRENCY  # Max number of images downloaded in parallel.
+    fetch_timeout: Optional[float] = None  # Timeout for downloading one image in seconds (Optional).
+    result_cache: Optional[ModerationResultCache] = None  # Cache of results by image content hash (Optional).
+    byte_cache: Optional[DiskByteCache] = None  # Local disk cache of downloaded images (Optional).
+    preprocessor: Optional[ImagePreprocessor] = None  # Downscale and re-encode images before upload (Optional).
+    use_gcs_uri: bool = False  # Send gs:// images to Google Vision by URI instead of downloading them.
 
     credentials_path: Optional[str] = None  # Credentials File Path for Google Vision API (Optional).
     image_field: str = "image_url"  # Name of Field with Image URL or Image Bytes.
+    chunk_size: Optional[int] = None  # Rows per datapipe transaction (500 with status_field, else one batch).
+    max_parallel_batches: int = DEFAULT_MAX_PARALLEL_BATCHES  # Max number of provider requests in flight per chunk.
+    max_request_bytes: Optional[int] = None  # Byte budget of one provider request (Optional, provider limit).
+    max_inflight_bytes: Optional[int] = DEFAULT_MAX_INFLIGHT_BYTES  # Cap on image bytes held in memory (Optional).
+    size_lookup: bool = False  # Get image sizes via fsspec info() before download to pack requests by size.
+    screening: Optional[ImageScreening] = None  # Size and format check before download (Optional).
+    scheduling: Optional[PriorityScheduling] = None  # Process changed rows by priority, e.g. uploads first (Optional).
+    requests_per_second: Optional[float] = None  # Provider requests/sec limit shared by the process (Optional).
+    images_per_second: Optional[float] = None  # Provider images/sec limit shared by the process (Optional).
+    retry_policy: RetryPolicy = DEFAULT_RETRY_POLICY  # Retries, backoff and per-RPC deadline for provider requests.
+    max_image_retries: int = DEFAULT_MAX_IMAGE_RETRIES  # Resubmit rounds for images with retryable errors per chunk.
     details_field: str = "details"  # Name of Field for write classification result.
+    status_field: Optional[str] = None  # Name of Field for per-image status; failed images don't fail the chunk.
+    typed_output: bool = False  # Write one typed column per category instead of the JSON details column.
+    indexed_columns: List[str] = field(default_factory=list)  # Typed output columns to index.
     step_name: str = "image_classification_google"  # Name of Step.
 
     create_table: bool = True
@@ -107,31 +444,531 @@ class GoogleImageClassificationStep(PipelineStep):
             TableStoreDB(
                 dbconn=self.dbconn,
                 name=self.output,
-                data_sql_schema=input_dt.primary_schema + [sa.Column("details", sa.JSON)],
+                data_sql_schema=input_dt.primary_schema
+                + _get_output_schema(
+                    self.details_field,
+                    self.status_field,
+                    self.typed_columns if self.typed_output else None,
+                    self.indexed_columns,
+                ),
+                create_table=self.create_table,
+            ),
+        )
+        catalog.add_datatable(self.output, Table(output_dt.table_store))
+
+        image_classification_google = ImageClassificationTransform(
+            provider_name="google",
+            client_params={"google_credentials_path": self.credentials_path},
+            primary_keys=input_dt.primary_keys,
+            image_field=self.image_field,
+            file_system_name=self.file_system_name,
+            file_system_creds_path=self.file_system_creds_path,
+            moderation_params=dict(
+                fetch_concurrency=self.fetch_concurrency,
+                fetch_timeout=self.fetch_timeout,
+                result_cache=self.result_cache,
+                byte_cache=self.byte_cache,
+                use_gcs_uri=self.use_gcs_uri,
+                max_parallel_batches=self.max_parallel_batches,
+                retry_policy=self.retry_policy,
+                preprocessor=self.preprocessor,
+                max_image_retries=self.max_image_retries,
+                max_request_bytes=self.max_request_bytes,
+                max_inflight_bytes=self.max_inflight_bytes,
+                size_lookup=self.size_lookup,
+                screening=self.screening,
+            ),
+            details_field=self.details_field,
+            status_field=self.status_field,
+            typed_columns=self.typed_columns if self.typed_output else None,
+            requests_per_second=self.requests_per_second,
+            images_per_second=self.images_per_second,
+        )
+
+        return [
+            ModerationBatchTransformStep(
+                ds=ds,
+                name=self.step_name,
+                input_dts=[ComputeInput(dt=input_dt)],
+                output_dts=[output_dt],
+                func=image_classification_google,
+                provider_name="google",
+                chunk_size=_get_chunk_size(self.chunk_size, self.status_field, MAX_BATCH_SIZES["google"]),
+                scheduling=self.scheduling,
+                labels=self.labels,
+                executor_config=self.executor_config,
+            )
+        ]
+
+
+@dataclass
+class LocalImageClassificationStep(PipelineStep):
+    """
+    Шаг пайплайна для классификации изображений локальной ONNX-моделью на CPU.
+    """
+
+    input: str  # Input Table name.
+    output: str  # Output Table name.
+    dbconn: Union[DBConn, str]  # Database Connection.
+
+    file_system_name: str  # File system for Fsspec.
+    model_path: str  # Path to ONNX model file.
+    class_names: Tuple[str, ...] = DEFAULT_CLASS_NAMES  # Names of model output classes.
+    input_size: int = 224  # Side of model input image in pixels.
+    layout: str = "NHWC"  # Axes of model input (NHWC or NCHW).
+    mean: Tuple[float, float, float] = (0.0, 0.0, 0.0)  # Per-channel RGB mean subtracted from 0-255 pixels.
+    std: Tuple[float, float, float] = (255.0, 255.0, 255.0)  # Per-channel RGB std pixels are divided by.
+    softmax: bool = False  # Apply softmax to model output (for models returning logits).
+    num_threads: Optional[int] = None  # Number of onnxruntime threads (Optional, number of CPUs by default).
+    batch_size: int = 32  # Number of images in one model call.
+
+    file_system_creds_path: Optional[str] = None  # File System Credentials File Path (Optional).
+    fetch_concurrency: int = DEFAULT_FETCH_CONCURRENCY  # Max number of images downloaded in parallel.
+    fetch_timeout: Optional[float] = None  # Timeout for downloading one image in seconds (Optional).
+    result_cache: Optional[ModerationResultCache] = None  # Cache of results by image content hash (Optional).
+    byte_cache: Optional[DiskByteCache] = None  # Local disk cache of downloaded images (Optional).
+    image_field: str = "image_url"  # Name of Field with Image URL or Image Bytes.
+    chunk_size: Optional[int] = None  # Rows per datapipe transaction (500 with status_field, else one batch).
+    max_parallel_batches: int = 1  # Max number of model calls in flight per chunk.
+    max_inflight_bytes: Optional[int] = DEFAULT_MAX_INFLIGHT_BYTES  # Cap on image bytes held in memory (Optional).
+    screening: Optional[ImageScreening] = None  # Size and format check before download (Optional).
+    scheduling: Optional[PriorityScheduling] = None  # Process changed rows by priority, e.g. uploads first (Optional).
+    max_image_retries: int = DEFAULT_MAX_IMAGE_RETRIES  # Resubmit rounds for images with retryable errors per chunk.
+    details_field: str = "details"  # Name of Field for write classification result.
+    status_field: Optional[str] = None  # Name of Field for per-image status; failed images don't fail the chunk.
+    typed_output: bool = False  # Write one REAL column per class instead of the JSON details column.
+    indexed_columns: List[str] = field(default_factory=list)  # Typed output columns to index.
+    step_name: str = "image_classification_local"  # Name of Step.
+
+    create_table: bool = True
+    executor_config: Optional[ExecutorConfig] = None
+    labels: Optional[Labels] = None
+
+    @property
+    def typed_columns(self) -> Dict[str, TypedColumn]:
+        return {class_name: (sa.REAL, float) for class_name in self.class_names}
+
+    def build_compute(self, ds: DataStore, catalog: Catalog) -> List[ComputeStep]:
+        input_dt = catalog.get_datatable(ds, self.input)
+
+        output_dt = ds.get_or_create_table(
+            self.output,
+            TableStoreDB(
+                dbconn=self.dbconn,
+                name=self.output,
+                data_sql_schema=input_dt.primary_schema
+                + _get_output_schema(
+                    self.details_field,
+                    self.status_field,
+                    self.typed_columns if self.typed_output else None,
+                    self.indexed_columns,
+                ),
                 create_table=self.create_table,
             ),
         )
         catalog.add_datatable(self.output, Table(output_dt.table_store))
 
-        def image_classification_google(input_df: pd.DataFrame) -> pd.DataFrame:
-            image_moderation_google_service = ImageModerationGoogle(google_credentials_path=self.credentials_path)
+        image_classification_local = ImageClassificationTransform(
+            provider_name="local",
+            client_params=dict(
+                model_path=self.model_path,
+                class_names=tuple(self.class_names),
+                input_size=self.input_size,
+                layout=self.layout,
+                mean=tuple(self.mean),
+                std=tuple(self.std),
+                softmax=self.softmax,
+                num_threads=self.num_threads,
+                batch_size=self.batch_size,
+            ),
+            primary_keys=input_dt.primary_keys,
+            image_field=self.image_field,
+            file_system_name=self.file_system_name,
+            file_system_creds_path=self.file_system_creds_path,
+            moderation_params=dict(
+                fetch_concurrency=self.fetch_concurrency,
+                fetch_timeout=self.fetch_timeout,
+                result_cache=self.result_cache,
+                byte_cache=self.byte_cache,
+                max_parallel_batches=self.max_parallel_batches,
+                max_image_retries=self.max_image_retries,
+                max_inflight_bytes=self.max_inflight_bytes,
+                screening=self.screening,
+            ),
+            details_field=self.details_field,
+            status_field=self.status_field,
+            typed_columns=self.typed_columns if self.typed_output else None,
+        )
+
+        return [
+            ModerationBatchTransformStep(
+                ds=ds,
+                name=self.step_name,
+                input_dts=[ComputeInput(dt=input_dt)],
+                output_dts=[output_dt],
+                func=image_classification_local,
+                provider_name="local",
+                chunk_size=_get_chunk_size(self.chunk_size, self.status_field, self.batch_size),
+                scheduling=self.scheduling,
+                labels=self.labels,
+                executor_config=self.executor_config,
+            )
+        ]
+
+
+@dataclass
+class MultiProviderClassificationTransform(WorkerTransform):
+    """
+    Функция преобразования шага модерации несколькими сервисами (сериализуемая, см. ImageClassificationTransform).
+    """
+
+    client_params: Dict[str, Dict[str, Any]]  # Client parameters by provider name.
+    primary_keys: List[str]  # Primary keys of Input Table copied to Output Tables.
+    image_field: str  # Name of Field with Image URL.
+    file_system_name: str  # File system for Fsspec.
+    file_system_creds_path: Optional[str]  # File System Credentials File Path (Optional).
+    moderation_params: Dict[str, Any]  # Keyword arguments of moderate_chunk_multi_results.
+    details_field: str  # Name of Field for write classification result.
+    status_field: Optional[str] = None  # Name of Field for per-image status (Optional).
+    separate_outputs: bool = False  # One Output Table per provider instead of prefixed columns in one table.
+
+    def _create_clients(self) -> Dict[str, ImageModerationBase]:
+        return {
+            provider_name: init_worker(
+                provider_name,
+                client_params,
+                file_system_name=self.file_system_name,
+                file_system_creds_path=self.file_system_creds_path,
+            )
+            for provider_name, client_params in self.client_params.items()
+        }
+
+    def __call__(self, input_df: pd.DataFrame) -> Union[pd.DataFrame, Tuple[pd.DataFrame, ...]]:
+        image_moderation_services = self._get_clients()
 
-            output_df = input_df[input_dt.primary_keys].copy()
-            output_df[self.details_field] = image_moderation_google_service.moderate_batch(
+        with metrics.stage("transform", "+".join(image_moderation_services)):
+            results = moderate_chunk_multi_results(
+                image_moderation_services,
                 images=input_df[self.image_field].tolist(),
                 file_system_name=self.file_system_name,
                 file_system_creds_path=self.file_system_creds_path,
+                **self.moderation_params,
             )
-            return output_df
+
+        if self.separate_outputs:
+            return tuple(
+                _set_results(
+                    input_df[self.primary_keys].copy(), provider_results, self.details_field, self.status_field
+                )
+                for provider_results in results.values()
+            )
+
+        output_df = input_df[self.primary_keys].copy()
+        for provider_name, provider_results in results.items():
+            output_df = _set_results(
+                output_df,
+                provider_results,
+                f"{provider_name}_{self.details_field}",
+                f"{provider_name}_{self.status_field}" if self.status_field is not None else None,
+            )
+
+        return output_df
+
+
+@dataclass
+class MultiProviderImageClassificationStep(PipelineStep):
+    """
+    Шаг пайплайна для классификации изображений несколькими сервисами с однократной загрузкой изображений.
+
+    Результаты пишутся в одну таблицу (колонки <сервис>_<details_field>, <сервис>_<status_field>)
+    или в отдельную таблицу на каждый сервис, если output - словарь сервис -> таблица.
+    """
+
+    input: str  # Input Table name.
+    output: Union[str, Dict[str, str]]  # Output Table name or Output Table name by provider.
+    dbconn: Union[DBConn, str]  # Database Connection.
+
+    file_system_name: str  # File system for Fsspec.
+    providers: Dict[str, Dict[str, Any]]  # Client parameters by provider, e.g. {"google": {}, "yandex": {...}}.
+    file_system_creds_path: Optional[str] = None  # File System Credentials File Path (Optional).
+    fetch_concurrency: int = DEFAULT_FETCH_CONCURRENCY  # Max number of images downloaded in parallel.
+    fetch_timeout: Optional[float] = None  # Timeout for downloading one image in seconds (Optional).
+    result_cache: Optional[ModerationResultCache] = None  # Cache of results by image content hash (Optional).
+    byte_cache: Optional[DiskByteCache] = None  # Local disk cache of downloaded images (Optional).
+    image_field: str = "image_url"  # Name of Field with Image URL.
+    chunk_size: Optional[int] = None  # Rows per datapipe transaction (500 with status_field, else one batch).
+    window_size: int = DEFAULT_WINDOW_SIZE  # Max number of images downloaded at once for all providers.
+    max_parallel_batches: int = DEFAULT_MAX_PARALLEL_BATCHES  # Max number of requests in flight per provider.
+    max_inflight_bytes: Optional[int] = DEFAULT_MAX_INFLIGHT_BYTES  # Cap on image bytes held in memory (Optional).
+    scheduling: Optional[PriorityScheduling] = None  # Process changed rows by priority, e.g. uploads first (Optional).
+    retry_policy: RetryPolicy = DEFAULT_RETRY_POLICY  # Retries, backoff and per-RPC deadline for provider requests.
+    max_image_retries: int = DEFAULT_MAX_IMAGE_RETRIES  # Resubmit rounds for images with retryable errors per chunk.
+    details_field: str = "details"  # Name of Field for write classification result.
+    status_field: Optional[str] = None  # Name of Field for per-image status; failed images don't fail the chunk.
+    step_name: str = "image_classification_multi"  # Name of Step.
+
+    create_table: bool = True
+    executor_config: Optional[ExecutorConfig] = None
+    labels: Optional[Labels] = None
+
+    def build_compute(self, ds: DataStore, catalog: Catalog) -> List[ComputeStep]:
+        input_dt = catalog.get_datatable(ds, self.input)
+
+        if isinstance(self.output, dict):
+            unknown_providers = set(self.output) ^ set(self.providers)
+            if len(unknown_providers) > 0:
+                raise ValueError(f"Таблицы результатов не соответствуют сервисам: {sorted(unknown_providers)}!")
+
+            output_schemas = {
+                self.output[provider_name]: _get_output_schema(self.details_field, self.status_field)
+                for provider_name in self.providers
+            }
+        else:
+            output_schemas = {
+                self.output: [
+                    column
+                    for provider_name in self.providers
+                    for column in _get_output_schema(
+                        f"{provider_name}_{self.details_field}",
+                        f"{provider_name}_{self.status_field}" if self.status_field is not None else None,
+                    )
+                ]
+            }
+
+        output_dts = []
+        for output, output_schema in output_schemas.items():
+            output_dt = ds.get_or_create_table(
+                output,
+                TableStoreDB(
+                    dbconn=self.dbconn,
+                    name=output,
+                    data_sql_schema=input_dt.primary_schema + output_schema,
+                    create_table=self.create_table,
+                ),
+            )
+            catalog.add_datatable(output, Table(output_dt.table_store))
+            output_dts.append(output_dt)
+
+        image_classification_multi = MultiProviderClassificationTransform(
+            client_params=dict(self.providers),
+            primary_keys=input_dt.primary_keys,
+            image_field=self.image_field,
+            file_system_name=self.file_system_name,
+            file_system_creds_path=self.file_system_creds_path,
+            moderation_params=dict(
+                fetch_concurrency=self.fetch_concurrency,
+                fetch_timeout=self.fetch_timeout,
+                result_cache=self.result_cache,
+                byte_cache=self.byte_cache,
+                max_parallel_batches=self.max_parallel_batches,
+                retry_policy=self.retry_policy,
+                max_image_retries=self.max_image_retries,
+                max_inflight_bytes=self.max_inflight_bytes,
+                window_size=self.window_size,
+            ),
+            details_field=self.details_field,
+            status_field=self.status_field,
+            separate_outputs=isinstance(self.output, dict),
+        )
 
         return [
-            BatchTransformStep(
+            ModerationBatchTransformStep(
+                ds=ds,
+                name=self.step_name,
+                input_dts=[ComputeInput(dt=input_dt)],
+                output_dts=output_dts,
+                func=image_classification_multi,
+                provider_name="+".join(self.providers),
+                chunk_size=_get_chunk_size(
+                    self.chunk_size, self.status_field, _get_provider_batch_size(self.providers)
+                ),
+                scheduling=self.scheduling,
+                labels=self.labels,
+                executor_config=self.executor_config,
+            )
+        ]
+
+
+@dataclass
+class CascadeClassificationTransform(WorkerTransform):
+    """
+    Функция преобразования шага каскадной модерации (сериализуемая, см. ImageClassificationTransform).
+    """
+
+    first_tier: str  # Name of first tier provider.
+    first_tier_params: Dict[str, Any]  # Client parameters of first tier provider.
+    second_tier: str  # Name of second tier provider.
+    second_tier_params: Dict[str, Any]  # Client parameters of second tier provider.
+    primary_keys: List[str]  # Primary keys of Input Table copied to Output Table.
+    image_field: str  # Name of Field with Image URL.
+    file_system_name: str  # File system for Fsspec.
+    file_system_creds_path: Optional[str]  # File System Credentials File Path (Optional).
+    moderation_params: Dict[str, Any]  # Keyword arguments of moderate_chunk_cascade_results.
+    details_field: str  # Name of Field for write classification result.
+    status_field: Optional[str] = None  # Name of Field for per-image status (Optional).
+    tier_field: Optional[str] = None  # Name of Field for provider of final result (Optional).
+    escalation_status_field: Optional[str] = None  # Name of Field for status of second tier result (Optional).
+
+    def _create_clients(self) -> Dict[str, ImageModerationBase]:
+        # Клиенты по уровню: оба уровня могут использовать один сервис с разными параметрами.
+        return {
+            tier: init_worker(
+                provider_name,
+                client_params,
+                file_system_name=self.file_system_name,
+                file_system_creds_path=self.file_system_creds_path,
+            )
+            for tier, provider_name, client_params in (
+                ("first_tier", self.first_tier, self.first_tier_params),
+                ("second_tier", self.second_tier, self.second_tier_params),
+            )
+        }
+
+    def __call__(self, input_df: pd.DataFrame) -> pd.DataFrame:
+        clients = self._get_clients()
+        first_tier, second_tier = clients["first_tier"], clients["second_tier"]
+
+        with metrics.stage("transform", f"{self.first_tier}>{self.second_tier}"):
+            first_results, second_results = moderate_chunk_cascade_results(
+                first_tier,
+                second_tier,
+                images=input_df[self.image_field].tolist(),
+                file_system_name=self.file_system_name,
+                file_system_creds_path=self.file_system_creds_path,
+                **self.moderation_params,
+            )
+
+        # Ошибка второго уровня не заменяет результат первого: записывается результат первого уровня,
+        # а статус второго - в escalation_status_field.
+        use_second_tier = [second_result is not None and second_result.ok for second_result in second_results]
+
+        output_df = input_df[self.primary_keys].copy()
+        if self.tier_field is not None:
+            output_df[self.tier_field] = [self.second_tier if use else self.first_tier for use in use_second_tier]
+
+        if self.escalation_status_field is not None:
+            output_df[self.escalation_status_field] = [
+                second_result.status.value if second_result is not None else None for second_result in second_results
+            ]
+
+        return _set_results(
+            output_df,
+            [
+                second_result if use else first_result
+                for first_result, second_result, use in zip(first_results, second_results, use_second_tier)
+            ],
+            self.details_field,
+            self.status_field,
+        )
+
+
+@dataclass
+class CascadeImageClassificationStep(PipelineStep):
+    """
+    Шаг пайплайна для каскадной классификации изображений: все изображения модерируются первым уровнем,
+    во второй уровень отправляются только изображения с неуверенным результатом первого (escalation_policy).
+
+    В details_field записывается результат второго уровня для переданных изображений и первого - для остальных
+    и для изображений, которые второй уровень не обработал, в tier_field - сервис, чей результат записан,
+    в escalation_status_field - статус результата второго уровня (пусто для изображений без передачи).
+    """
+
+    input: str  # Input Table name.
+    output: str  # Output Table name.
+    dbconn: Union[DBConn, str]  # Database Connection.
+
+    file_system_name: str  # File system for Fsspec.
+    first_tier: str = "yandex"  # Name of first tier provider.
+    second_tier: str = "google"  # Name of second tier provider.
+    first_tier_params: Dict[str, Any] = field(default_factory=dict)  # Client parameters of first tier provider.
+    second_tier_params: Dict[str, Any] = field(default_factory=dict)  # Client parameters of second tier provider.
+    escalation_policy: Optional[EscalationPolicy] = None  # Uncertain first tier results (default by first tier).
+    file_system_creds_path: Optional[str] = None  # File System Credentials File Path (Optional).
+    fetch_concurrency: int = DEFAULT_FETCH_CONCURRENCY  # Max number of images downloaded in parallel.
+    fetch_timeout: Optional[float] = None  # Timeout for downloading one image in seconds (Optional).
+    result_cache: Optional[ModerationResultCache] = None  # Cache of results by image content hash (Optional).
+    byte_cache: Optional[DiskByteCache] = None  # Local disk cache of downloaded images (Optional).
+    image_field: str = "image_url"  # Name of Field with Image URL.
+    chunk_size: Optional[int] = None  # Rows per datapipe transaction (500 with status_field, else one batch).
+    window_size: int = DEFAULT_WINDOW_SIZE  # Max number of images downloaded at once.
+    max_parallel_batches: int = DEFAULT_MAX_PARALLEL_BATCHES  # Max number of requests in flight per tier.
+    max_inflight_bytes: Optional[int] = DEFAULT_MAX_INFLIGHT_BYTES  # Cap on image bytes held in memory (Optional).
+    scheduling: Optional[PriorityScheduling] = None  # Process changed rows by priority, e.g. uploads first (Optional).
+    retry_policy: RetryPolicy = DEFAULT_RETRY_POLICY  # Retries, backoff and per-RPC deadline for provider requests.
+    max_image_retries: int = DEFAULT_MAX_IMAGE_RETRIES  # Resubmit rounds for images with retryable errors per chunk.
+    details_field: str = "details"  # Name of Field for write classification result.
+    status_field: Optional[str] = None  # Name of Field for per-image status; failed images don't fail the chunk.
+    tier_field: Optional[str] = "tier"  # Name of Field for provider of final result (Optional).
+    escalation_status_field: Optional[str] = "escalation_status"  # Status of second tier result (Optional).
+    step_name: str = "image_classification_cascade"  # Name of Step.
+
+    create_table: bool = True
+    executor_config: Optional[ExecutorConfig] = None
+    labels: Optional[Labels] = None
+
+    def build_compute(self, ds: DataStore, catalog: Catalog) -> List[ComputeStep]:
+        input_dt = catalog.get_datatable(ds, self.input)
+        output_schema = _get_output_schema(self.details_field, self.status_field)
+        if self.tier_field is not None:
+            output_schema.append(sa.Column(self.tier_field, sa.String))
+
+        if self.escalation_status_field is not None:
+            output_schema.append(sa.Column(self.escalation_status_field, sa.String))
+
+        output_dt = ds.get_or_create_table(
+            self.output,
+            TableStoreDB(
+                dbconn=self.dbconn,
+                name=self.output,
+                data_sql_schema=input_dt.primary_schema + output_schema,
+                create_table=self.create_table,
+            ),
+        )
+        catalog.add_datatable(self.output, Table(output_dt.table_store))
+
+        escalation_policy = self.escalation_policy
+        if escalation_policy is None:
+            escalation_policy = GOOGLE_ESCALATION_POLICY if self.first_tier == "google" else YANDEX_ESCALATION_POLICY
+
+        image_classification_cascade = CascadeClassificationTransform(
+            first_tier=self.first_tier,
+            first_tier_params=dict(self.first_tier_params),
+            second_tier=self.second_tier,
+            second_tier_params=dict(self.second_tier_params),
+            primary_keys=input_dt.primary_keys,
+            image_field=self.image_field,
+            file_system_name=self.file_system_name,
+            file_system_creds_path=self.file_system_creds_path,
+            moderation_params=dict(
+                escalation_policy=escalation_policy,
+                fetch_concurrency=self.fetch_concurrency,
+                fetch_timeout=self.fetch_timeout,
+                result_cache=self.result_cache,
+                byte_cache=self.byte_cache,
+                max_parallel_batches=self.max_parallel_batches,
+                retry_policy=self.retry_policy,
+                max_image_retries=self.max_image_retries,
+                max_inflight_bytes=self.max_inflight_bytes,
+                window_size=self.window_size,
+            ),
+            details_field=self.details_field,
+            status_field=self.status_field,
+            tier_field=self.tier_field,
+            escalation_status_field=self.escalation_status_field,
+        )
+
+        return [
+            ModerationBatchTransformStep(
                 ds=ds,
                 name=self.step_name,
                 input_dts=[ComputeInput(dt=input_dt)],
                 output_dts=[output_dt],
-                func=image_classification_google,
-                chunk_size=15,
+                func=image_classification_cascade,
+                provider_name=f"{self.first_tier}>{self.second_tier}",
+                chunk_size=_get_chunk_size(
+                    self.chunk_size, self.status_field, _get_provider_batch_size([self.first_tier])
+                ),
+                scheduling=self.scheduling,
                 labels=self.labels,
                 executor_config=self.executor_config,
             )
@@ -0,0 +1,195 @@
+import asyncio
+import io
+import multiprocessing
+import threading
+from concurrent.futures import Executor, ProcessPoolExecutor
+from functools import partial
+from typing import Any, Callable, Dict, List, Optional
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # pragma: no cover
+    Image = None  # type: ignore
+    ImageOps = None  # type: ignore
+
+
+def downscale_image(image: bytes, max_side: int, image_format: str = "JPEG", quality: int = 85) -> bytes:
+    """
+    Метод уменьшения изображения до максимальной стороны и перекодирования в JPEG/WebP.
+
+    Если изображение не удалось декодировать или результат получился не меньше оригинала,
+    возвращается исходное изображение.
+
+    :param image: изображение в bytes.
+    :param max_side: максимальная сторона изображения в пикселях.
+    :param image_format: формат результата (JPEG или WEBP).
+    :param quality: качество сжатия.
+    :return: изображение в bytes.
+    """
+
+    try:
+        with Image.open(io.BytesIO(image)) as pil_image:
+            # Для JPEG декодируем сразу в уменьшенном масштабе (DCT scaling).
+            pil_image.draft("RGB", (max_side, max_side))
+            pil_image = ImageOps.exif_transpose(pil_image)
+            pil_image.thumbnail((max_side, max_side))
+
+            if image_format.upper() == "JPEG" and pil_image.mode != "RGB":
+                pil_image = pil_image.convert("RGB")
+            elif pil_image.mode not in ("RGB", "RGBA"):
+                pil_image = pil_image.convert("RGBA")
+
+            output = io.BytesIO()
+            pil_image.save(output, format=image_format, quality=quality)
+    except Exception:  # pylint: disable=broad-except
+        return image
+
+    processed_image = output.getvalue()
+    return processed_image if len(processed_image) < len(image) else image
+
+
+class ImagePreprocessor:
+    """
+    Уменьшение и перекодирование изображений перед отправкой в сервис модерации.
+
+    Декодирование выполняется в пуле процессов, чтобы не держать GIL потоков загрузки и запросов.
+    Требует Pillow (pip install datapipe-image-moderation[preprocessing]).
+    """
+
+    def __init__(
+        self,
+        max_side: int = 1024,
+        image_format: str = "JPEG",
+        quality: int = 85,
+        min_bytes: int = 100 * 1024,
+        max_workers: Optional[int] = None,
+    ) -> None:
+        """
+        Метод инициализации класса ImagePreprocessor.
+
+        :param max_side: максимальная сторона изображения в пикселях.
+        :param image_format: формат результата (JPEG или WEBP).
+        :param quality: качество сжатия.
+        :param min_bytes: изображения меньше этого размера отправляются без изменений.
+        :param max_workers: количество процессов (по умолчанию - количество CPU, 0 - в текущем процессе).
+        """
+
+        if Image is None:
+            raise ImportError(
+                "Для ImagePreprocessor нужен Pillow: pip install datapipe-image-moderation[preprocessing]"
+            )
+
+        self.max_side = max_side
+        self.image_format = image_format
+        self.quality = quality
+        self.min_bytes = min_bytes
+        self.max_workers = max_workers
+
+        self.bytes_before = 0
+        self.bytes_after = 0
+        self._stats_lock = threading.Lock()
+        self._executor: Optional[Executor] = None
+        self._executor_lock = threading.Lock()
+
+    def __getstate__(self) -> Dict[str, Any]:
+        # Пул процессов и блокировки не передаются в другие процессы.
+        state = self.__dict__.copy()
+        state.update(bytes_before=0, bytes_after=0, _stats_lock=None, _executor=None, _executor_lock=None)
+        return state
+
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        self.__dict__.update(state)
+        self._stats_lock = threading.Lock()
+        self._executor_lock = threading.Lock()
+
+    @property
+    def compression_ratio(self) -> float:
+        return self.bytes_after / self.bytes_before if self.bytes_before > 0 else 1.0
+
+    def _get_executor(self) -> Executor:
+        if self._executor is None:
+            with self._executor_lock:
+                if self._executor is None:
+                    # Пул создаётся из потоков батчей в процессе с gRPC-каналами и фоновыми потоками,
+                    # fork в таком процессе может зависнуть, поэтому процессы запускаются через spawn.
+                    self._executor = ProcessPoolExecutor(
+                        max_workers=self.max_workers, mp_context=multiprocessing.get_context("spawn")
+                    )
+
+        return self._executor
+
+    def _record(self, images: List[bytes], processed_images: List[bytes]) -> None:
+        with self._stats_lock:
+            self.bytes_before += sum(len(image) for image in images)
+            self.bytes_after += sum(len(image) for image in processed_images)
+
+    def _get_indexes(self, images: List[Any]) -> List[int]:
+        # URI и небольшие изображения не обрабатываем.
+        return [i for i, image in enumerate(images) if isinstance(image, bytes) and len(image) >= self.min_bytes]
+
+    def _get_process_image(self) -> Callable[[bytes], bytes]:
+        return partial(downscale_image, max_side=self.max_side, image_format=self.image_format, quality=self.quality)
+
+    def _replace_images(self, images: List[Any], indexes: List[int], processed_images: List[bytes]) -> List[Any]:
+        self._record([images[i] for i in indexes], processed_images)
+
+        images = list(images)
+        for i, processed_image in zip(indexes, processed_images):
+            images[i] = processed_image
+
+        return images
+
+    def process(self, images: List[Any]) -> List[Any]:
+        """
+        Метод обработки изображений.
+
+        :param images: список изображений в формате bytes или URI (URI не изменяются).
+        :return: список изображений в исходном порядке.
+        """
+
+        indexes = self._get_indexes(images)
+        if len(indexes) == 0:
+            return images
+
+        process_image = self._get_process_image()
+        source_images = [images[i] for i in indexes]
+        if self.max_workers == 0:
+            processed_images = [process_image(image) for image in source_images]
+        else:
+            processed_images = list(self._get_executor().map(process_image, source_images))
+
+        return self._replace_images(images, indexes, processed_images)
+
+    async def process_async(self, images: List[Any]) -> List[Any]:
+        """
+        Асинхронный метод обработки изображений.
+
+        :param images: список изображений в формате bytes или URI (URI не изменяются).
+        :return: список изображений в исходном порядке.
+        """
+
+        if self.max_workers == 0:
+            return self.process(images)
+
+        indexes = self._get_indexes(images)
+        if len(indexes) == 0:
+            return images
+
+        process_image = self._get_process_image()
+        loop = asyncio.get_running_loop()
+        executor = self._get_executor()
+        processed_images = await asyncio.gather(
+            *[loop.run_in_executor(executor, process_image, images[i]) for i in indexes]
+        )
+
+        return self._replace_images(images, indexes, list(processed_images))
+
+    def close(self) -> None:
+        """
+        Метод остановки пула процессов.
+        """
+
+        with self._executor_lock:
+            if self._executor is not None:
+                self._executor.shutdown()
+                self._executor = None
@@ -0,0 +1,79 @@
+import importlib
+import threading
+from typing import TYPE_CHECKING, Dict, Type
+
+if TYPE_CHECKING:  # pragma: no cover
+    from datapipe_image_moderation.base import ImageModerationBase
+
+# Категории SafeSearch Google Cloud Vision в результате модерации.
+SAFE_SEARCH_CATEGORIES = ("adult", "spoof", "medical", "violence", "racy")
+
+# Значения google.cloud.vision.Likelihood по порядку (UNKNOWN=0 ... VERY_LIKELY=5).
+LIKELIHOOD_NAMES = ("UNKNOWN", "VERY_UNLIKELY", "UNLIKELY", "POSSIBLE", "LIKELY", "VERY_LIKELY")
+
+# Классы модели moderation Yandex Cloud Vision в результате модерации.
+MODERATION_CLASSES = ("adult", "gruesome", "text", "watermarks")
+
+# Классы локального NSFW-классификатора по умолчанию (GantMan nsfw_model: MobileNetV2, 224x224, NHWC, RGB / 255).
+DEFAULT_CLASS_NAMES = ("drawings", "hentai", "neutral", "porn", "sexy")
+
+# Классы клиентов модерации: сервис -> "модуль:класс".
+# Модуль клиента и SDK сервиса импортируются при первом обращении к сервису, а не при импорте шагов пайплайна.
+PROVIDERS: Dict[str, str] = {
+    "google": "datapipe_image_moderation.google_vision:ImageModerationGoogle",
+    "yandex": "datapipe_image_moderation.yandex_vision:ImageModerationYandex",
+    "local": "datapipe_image_moderation.local_model:ImageModerationLocal",
+}
+
+# Лимит количества изображений в одном запросе сервиса (без импорта модуля клиента).
+MAX_BATCH_SIZES: Dict[str, int] = {"google": 15, "yandex": 5}
+
+_provider_classes: Dict[str, Type["ImageModerationBase"]] = {}
+_provider_classes_lock = threading.Lock()
+
+
+def get_likelihood_value(likelihood_name: str) -> int:
+    """
+    Метод получения числового значения вероятности SafeSearch (UNKNOWN=0 ... VERY_LIKELY=5).
+
+    :param likelihood_name: название вероятности (например, LIKELY).
+    :return: числовое значение.
+    """
+
+    return LIKELIHOOD_NAMES.index(likelihood_name)
+
+
+def register_provider(provider_name: str, client_class_path: str) -> None:
+    """
+    Метод регистрации сервиса модерации.
+
+    :param provider_name: название сервиса модерации.
+    :param client_class_path: класс клиента в формате "модуль:класс".
+    """
+
+    with _provider_classes_lock:
+        PROVIDERS[provider_name] = client_class_path
+        _provider_classes.pop(provider_name, None)
+
+
+def get_provider_class(provider_name: str) -> Type["ImageModerationBase"]:
+    """
+    Метод получения класса клиента сервиса модерации (с импортом модуля клиента при первом обращении).
+
+    :param provider_name: название сервиса модерации.
+    :return: класс клиента модерации.
+    """
+
+    provider_class = _provider_classes.get(provider_name)
+    if provider_class is not None:
+        return provider_class
+
+    if provider_name not in PROVIDERS:
+        raise ValueError(f"Неизвестный сервис модерации: {provider_name}!")
+
+    with _provider_classes_lock:
+        if provider_name not in _provider_classes:
+            module_name, class_name = PROVIDERS[provider_name].split(":")
+            _provider_classes[provider_name] = getattr(importlib.import_module(module_name), class_name)
+
+        return _provider_classes[provider_name]
@@ -0,0 +1,651 @@
+import asyncio
+import random
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Deque, Dict, Generic, List, Optional, TypeVar
+
+import grpc
+
+from datapipe_image_moderation import metrics
+
+T = TypeVar("T")
+
+# Коды ошибок, при которых запрос к сервису можно повторить.
+RETRYABLE_STATUS_CODES = (
+    grpc.StatusCode.RESOURCE_EXHAUSTED,
+    grpc.StatusCode.UNAVAILABLE,
+    grpc.StatusCode.DEADLINE_EXCEEDED,
+)
+
+
+def get_status_code(exception: BaseException) -> Optional[grpc.StatusCode]:
+    """
+    Метод для получения gRPC-кода ошибки из исключения grpc или google.api_core.
+
+    :param exception: исключение.
+    :return: gRPC-код ошибки или None.
+    """
+
+    if isinstance(exception, (asyncio.TimeoutError, TimeoutError)):
+        return grpc.StatusCode.DEADLINE_EXCEEDED
+
+    # google.api_core.exceptions.GoogleAPICallError.
+    grpc_status_code = getattr(exception, "grpc_status_code", None)
+    if isinstance(grpc_status_code, grpc.StatusCode):
+        return grpc_status_code
+
+    # grpc.RpcError и grpc.aio.AioRpcError.
+    code = getattr(exception, "code", None)
+    if callable(code):
+        status_code = code()
+        if isinstance(status_code, grpc.StatusCode):
+            return status_code
+
+    return None
+
+
+@dataclass
+class RateLimiterState:
+    """
+    Текущее состояние ограничителя запросов.
+    """
+
+    rate_factor: float  # Доля от настроенных лимитов, которая используется сейчас (AIMD).
+    requests_per_second: Optional[float]  # Текущий лимит запросов в секунду.
+    images_per_second: Optional[float]  # Текущий лимит изображений в секунду.
+    throttled: int  # Количество ошибок квоты с момента создания.
+
+
+class RateLimiter:
+    """
+    Token bucket ограничитель запросов к сервису с адаптивным (AIMD) снижением скорости при ошибках квоты.
+
+    Один экземпляр используется всеми потоками и корутинами процесса.
+    """
+
+    def __init__(
+        self,
+        requests_per_second: Optional[float] = None,
+        images_per_second: Optional[float] = None,
+        min_rate_factor: float = 0.05,
+        increase_step: float = 0.02,
+        decrease_factor: float = 0.5,
+        name: Optional[str] = None,
+    ) -> None:
+        """
+        Метод инициализации класса RateLimiter.
+
+        :param requests_per_second: лимит запросов в секунду (опционально).
+        :param images_per_second: лимит изображений в секунду (опционально).
+        :param min_rate_factor: минимальная доля от лимитов при снижении скорости.
+        :param increase_step: аддитивное увеличение доли после успешного запроса.
+        :param decrease_factor: мультипликативное снижение доли при ошибке квоты.
+        :param name: название сервиса модерации (для метрик, опционально).
+        """
+
+        self.name = name
+        self._lock = threading.Lock()
+        self._min_rate_factor = min_rate_factor
+        self._increase_step = increase_step
+        self._decrease_factor = decrease_factor
+
+        self._rate_factor = 1.0
+        self._throttled = 0
+        self.configure(requests_per_second=requests_per_second, images_per_second=images_per_second)
+
+    def configure(self, requests_per_second: Optional[float] = None, images_per_second: Optional[float] = None) -> None:
+        """
+        Метод изменения лимитов.
+
+        :param requests_per_second: лимит запросов в секунду (опционально).
+        :param images_per_second: лимит изображений в секунду (опционально).
+        """
+
+        with self._lock:
+            self._requests_per_second = requests_per_second
+            self._images_per_second = images_per_second
+            # Баланс токенов (может быть отрицательным - это зарезервированное ожидание).
+            self._request_tokens = max(requests_per_second or 0.0, 1.0)
+            self._image_tokens = images_per_second or 0.0
+            self._updated_at = time.monotonic()
+
+    @property
+    def state(self) -> RateLimiterState:
+        with self._lock:
+            return RateLimiterState(
+                rate_factor=self._rate_factor,
+                requests_per_second=self._scaled(self._requests_per_second),
+                images_per_second=self._scaled(self._images_per_second),
+                throttled=self._throttled,
+            )
+
+    def _scaled(self, rate: Optional[float]) -> Optional[float]:
+        return rate * self._rate_factor if rate is not None else None
+
+    def _reserve(self, images_count: int) -> float:
+        """
+        Метод резервирования токенов под запрос.
+
+        :param images_count: количество изображений в запросе.
+        :return: время ожидания в секундах до отправки запроса.
+        """
+
+        with self._lock:
+            now = time.monotonic()
+            elapsed = now - self._updated_at
+            self._updated_at = now
+
+            delay = 0.0
+            request_rate = self._scaled(self._requests_per_second)
+            if request_rate is not None:
+                request_capacity = max(request_rate, 1.0)
+                self._request_tokens = min(self._request_tokens + elapsed * request_rate, request_capacity) - 1
+                delay = max(delay, -self._request_tokens / request_rate)
+
+            image_rate = self._scaled(self._images_per_second)
+            if image_rate is not None:
+                image_capacity = max(image_rate, float(images_count))
+                self._image_tokens = min(self._image_tokens + elapsed * image_rate, image_capacity) - images_count
+                delay = max(delay, -self._image_tokens / image_rate)
+
+            return delay
+
+    def acquire(self, images_count: int = 1) -> None:
+        """
+        Метод ожидания разрешения на запрос.
+
+        :param images_count: количество изображений в запросе.
+        """
+
+        delay = self._reserve(images_count)
+        if delay > 0:
+            time.sleep(delay)
+
+    async def acquire_async(self, images_count: int = 1) -> None:
+        """
+        Асинхронный метод ожидания разрешения на запрос.
+
+        :param images_count: количество изображений в запросе.
+        """
+
+        delay = self._reserve(images_count)
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    def on_success(self) -> None:
+        """
+        Метод учёта успешного запроса (аддитивное увеличение скорости).
+        """
+
+        with self._lock:
+            self._rate_factor = min(1.0, self._rate_factor + self._increase_step)
+
+    def on_throttle(self) -> None:
+        """
+        Метод учёта ошибки квоты (мультипликативное снижение скорости).
+        """
+
+        with self._lock:
+            self._rate_factor = max(self._min_rate_factor, self._rate_factor * self._decrease_factor)
+            self._throttled += 1
+
+
+@dataclass(frozen=True)
+class HedgingPolicy:
+    """
+    Политика дублирования (hedging) медленных запросов к сервису.
+
+    Если запрос не вернулся за quantile-квантиль задержки сервиса (оценивается по последним запросам процесса),
+    отправляется дубликат и используется первый ответ. Доля дубликатов ограничена budget.
+    """
+
+    quantile: float = 0.95  # Квантиль задержки запроса, после которого отправляется дубликат.
+    budget: float = 0.05  # Максимальная доля дубликатов от количества запросов.
+    min_samples: int = 20  # Минимальное количество измерений задержки до включения дублирования.
+    min_delay: float = 0.05  # Минимальная задержка перед отправкой дубликата в секундах.
+
+
+class LatencyTracker:
+    """
+    Оценка квантилей задержки запросов к сервису по последним измерениям и учёт бюджета дубликатов.
+
+    Один экземпляр используется всеми потоками и корутинами процесса.
+    """
+
+    def __init__(self, window_size: int = 1000, update_interval: int = 10) -> None:
+        """
+        Метод инициализации класса LatencyTracker.
+
+        :param window_size: количество последних измерений задержки.
+        :param update_interval: количество измерений между пересчётами квантилей.
+        """
+
+        self._lock = threading.Lock()
+        self._latencies: Deque[float] = deque(maxlen=window_size)
+        self._update_interval = update_interval
+        self._added = 0
+        self._sorted_latencies: List[float] = []
+        self.requests = 0
+        self.hedges = 0
+
+    def add(self, latency: float) -> None:
+        """
+        Метод добавления задержки успешного запроса.
+
+        :param latency: задержка в секундах.
+        """
+
+        with self._lock:
+            self._latencies.append(latency)
+            self._added += 1
+            if self._added % self._update_interval == 0 or len(self._latencies) <= self._update_interval:
+                self._sorted_latencies = sorted(self._latencies)
+
+    def get_quantile(self, quantile: float) -> Optional[float]:
+        """
+        Метод получения квантиля задержки.
+
+        :param quantile: квантиль от 0 до 1.
+        :return: задержка в секундах или None, если измерений нет.
+        """
+
+        sorted_latencies = self._sorted_latencies
+        if not sorted_latencies:
+            return None
+
+        return sorted_latencies[min(int(quantile * len(sorted_latencies)), len(sorted_latencies) - 1)]
+
+    def get_hedge_delay(self, hedging: HedgingPolicy) -> Optional[float]:
+        """
+        Метод учёта нового запроса и получения задержки перед отправкой дубликата.
+
+        :param hedging: политика дублирования.
+        :return: задержка в секундах или None, если измерений пока недостаточно.
+        """
+
+        with self._lock:
+            self.requests += 1
+            if len(self._latencies) < hedging.min_samples:
+                return None
+
+        return max(self.get_quantile(hedging.quantile), hedging.min_delay)  # type: ignore
+
+    def try_acquire_hedge(self, hedging: HedgingPolicy) -> bool:
+        """
+        Метод резервирования дубликата в пределах бюджета.
+
+        :param hedging: политика дублирования.
+        :return: можно ли отправить дубликат.
+        """
+
+        with self._lock:
+            if self.hedges + 1 > hedging.budget * self.requests:
+                return False
+
+            self.hedges += 1
+            return True
+
+
+@dataclass(frozen=True)
+class RetryPolicy:
+    """
+    Политика повторов и дедлайнов запросов к сервису.
+    """
+
+    max_retries: int = 3  # Количество повторов после первой попытки.
+    rpc_timeout: Optional[float] = 60.0  # Дедлайн одного запроса в секундах.
+    initial_backoff: float = 0.5  # Пауза перед первым повтором в секундах.
+    max_backoff: float = 30.0  # Максимальная пауза между повторами в секундах.
+    backoff_multiplier: float = 2.0
+    hedging: Optional[HedgingPolicy] = None  # Дублирование запросов, не завершившихся за квантиль задержки сервиса.
+
+    def get_backoff(self, attempt: int) -> float:
+        """
+        Метод получения паузы перед повтором (экспоненциальная, с full jitter).
+
+        :param attempt: номер повтора, начиная с 0.
+        :return: пауза в секундах.
+        """
+
+        return random.uniform(0, min(self.max_backoff, self.initial_backoff * self.backoff_multiplier**attempt))
+
+
+def _on_error(exception: BaseException, rate_limiter: RateLimiter, retry_policy: RetryPolicy, attempt: int) -> bool:
+    status_code = get_status_code(exception)
+    if status_code == grpc.StatusCode.RESOURCE_EXHAUSTED:
+        rate_limiter.on_throttle()
+
+    retry = status_code in RETRYABLE_STATUS_CODES and attempt < retry_policy.max_retries
+    if retry:
+        metrics.record("rpc_retries", 1, provider=rate_limiter.name, code=status_code.name)  # type: ignore
+
+    return retry
+
+
+class RpcCall(Generic[T]):
+    """
+    Отправленный запрос к сервису, который можно отменить (обёртка над grpc.Future).
+    """
+
+    def __init__(self, future: "grpc.Future", parse: Callable[[Any], T]) -> None:
+        """
+        Метод инициализации класса RpcCall.
+
+        :param future: запрос, отправленный методом future gRPC-клиента.
+        :param parse: функция разбора ответа сервиса.
+        """
+
+        self._future = future
+        self._parse = parse
+        self.started_at = time.perf_counter()
+
+    def add_done_callback(self, callback: Callable[[], None]) -> None:
+        """
+        Метод добавления функции, которая вызывается после завершения запроса (сразу, если он уже завершён).
+
+        :param callback: функция без аргументов.
+        """
+
+        self._future.add_done_callback(lambda _: callback())
+
+    def done(self) -> bool:
+        """
+        Метод проверки завершения запроса.
+
+        :return: True, если запрос завершён.
+        """
+
+        return self._future.done()
+
+    def cancel(self) -> bool:
+        """
+        Метод отмены запроса (освобождает соединение и ресурсы сервиса).
+
+        :return: True, если запрос отменён.
+        """
+
+        return self._future.cancel()
+
+    def result(self) -> T:
+        """
+        Метод получения результата завершённого запроса.
+
+        :return: разобранный ответ сервиса.
+        """
+
+        return self._parse(self._future.result())
+
+
+def _get_first_result(calls: "List[RpcCall[T]]", done_event: threading.Event, latency_tracker: "LatencyTracker") -> T:
+    pending = list(calls)
+    exceptions = []
+    while True:
+        done_event.wait()
+        done_event.clear()
+        for call in [call for call in pending if call.done()]:
+            pending.remove(call)
+            try:
+                result = call.result()
+            except Exception as exception:  # pylint: disable=broad-except
+                exceptions.append(exception)
+                continue
+
+            latency_tracker.add(time.perf_counter() - call.started_at)
+            return result
+
+        if not pending:
+            raise exceptions[0]
+
+
+def call_hedged(
+    func: Callable[[Optional[float]], T],
+    start_func: Callable[[Optional[float]], Optional[RpcCall[T]]],
+    timeout: Optional[float],
+    images_count: int,
+    rate_limiter: RateLimiter,
+    hedging: HedgingPolicy,
+) -> T:
+    """
+    Метод вызова запроса к сервису с отправкой дубликата, если ответа нет дольше квантиля задержки.
+
+    Задержка отсчитывается от отправки запроса. Используется первый успешный ответ, опоздавший запрос отменяется.
+    Если сервис не умеет отправлять запрос без ожидания ответа (start_func вернул None), запрос выполняется
+    без дублирования.
+
+    :param func: запрос к сервису, принимает дедлайн в секундах.
+    :param start_func: отправка запроса без ожидания ответа, принимает дедлайн в секундах.
+    :param timeout: дедлайн одного запроса в секундах.
+    :param images_count: количество изображений в запросе.
+    :param rate_limiter: ограничитель запросов (дубликат тоже расходует лимит).
+    :param hedging: политика дублирования.
+    :return: результат запроса.
+    """
+
+    latency_tracker = get_latency_tracker(rate_limiter.name)  # type: ignore
+    hedge_delay = latency_tracker.get_hedge_delay(hedging)
+    primary = start_func(timeout) if hedge_delay is not None else None
+    if primary is None:
+        started_at = time.perf_counter()
+        result = func(timeout)
+        latency_tracker.add(time.perf_counter() - started_at)
+        return result
+
+    calls = [primary]
+    done_event = threading.Event()
+    try:
+        primary.add_done_callback(done_event.set)
+        done_event.wait(max(hedge_delay - (time.perf_counter() - primary.started_at), 0))  # type: ignore
+        if not primary.done() and latency_tracker.try_acquire_hedge(hedging):
+            rate_limiter.acquire(images_count)
+            metrics.record("rpc_hedges", 1, provider=rate_limiter.name)
+            hedge = start_func(timeout)
+            if hedge is not None:
+                calls.append(hedge)
+                hedge.add_done_callback(done_event.set)
+
+        return _get_first_result(calls, done_event, latency_tracker)
+    finally:
+        # Отмена завершённого запроса ничего не делает.
+        for call in calls:
+            call.cancel()
+
+
+async def call_hedged_async(
+    func: Callable[[Optional[float]], Awaitable[T]],
+    timeout: Optional[float],
+    images_count: int,
+    rate_limiter: RateLimiter,
+    hedging: HedgingPolicy,
+) -> T:
+    """
+    Асинхронный метод вызова запроса к сервису с отправкой дубликата, если ответа нет дольше квантиля задержки.
+
+    Используется первый успешный ответ, опоздавший запрос отменяется.
+
+    :param func: запрос к сервису, принимает дедлайн в секундах.
+    :param timeout: дедлайн одного запроса в секундах.
+    :param images_count: количество изображений в запросе.
+    :param rate_limiter: ограничитель запросов (дубликат тоже расходует лимит).
+    :param hedging: политика дублирования.
+    :return: результат запроса.
+    """
+
+    latency_tracker = get_latency_tracker(rate_limiter.name)  # type: ignore
+
+    async def timed_func() -> T:
+        started_at = time.perf_counter()
+        result = await func(timeout)
+        latency_tracker.add(time.perf_counter() - started_at)
+        return result
+
+    hedge_delay = latency_tracker.get_hedge_delay(hedging)
+    if hedge_delay is None:
+        return await timed_func()
+
+    pending = {asyncio.ensure_future(timed_func())}
+    exceptions = []
+    try:
+        done, _ = await asyncio.wait(pending, timeout=hedge_delay)
+        if not done and latency_tracker.try_acquire_hedge(hedging):
+            await rate_limiter.acquire_async(images_count)
+            metrics.record("rpc_hedges", 1, provider=rate_limiter.name)
+            pending.add(asyncio.ensure_future(timed_func()))
+
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    return task.result()
+                exceptions.append(task.exception())
+    finally:
+        # Задачи отменяются при любом выходе, в том числе при отмене вызывающей корутины.
+        for task in pending:
+            task.cancel()
+
+    raise exceptions[0]  # type: ignore
+
+
+def call_with_retries(
+    func: Callable[[Optional[float]], T],
+    images_count: int,
+    rate_limiter: RateLimiter,
+    retry_policy: RetryPolicy,
+    start_func: Optional[Callable[[Optional[float]], Optional[RpcCall[T]]]] = None,
+) -> T:
+    """
+    Метод вызова запроса к сервису с ограничением скорости, дедлайном и повторами.
+
+    :param func: запрос к сервису, принимает дедлайн в секундах.
+    :param images_count: количество изображений в запросе.
+    :param rate_limiter: ограничитель запросов.
+    :param retry_policy: политика повторов.
+    :param start_func: отправка запроса без ожидания ответа для дублирования запросов (опционально).
+    :return: результат запроса.
+    """
+
+    attempt = 0
+    while True:
+        rate_limiter.acquire(images_count)
+        try:
+            if retry_policy.hedging is not None and start_func is not None:
+                result = call_hedged(
+                    func, start_func, retry_policy.rpc_timeout, images_count, rate_limiter, retry_policy.hedging
+                )
+            else:
+                result = func(retry_policy.rpc_timeout)
+        except Exception as exception:  # pylint: disable=broad-except
+            if not _on_error(exception, rate_limiter, retry_policy, attempt):
+                raise
+
+            time.sleep(retry_policy.get_backoff(attempt))
+            attempt += 1
+        else:
+            rate_limiter.on_success()
+            return result
+
+
+async def call_with_retries_async(
+    func: Callable[[Optional[float]], Awaitable[T]],
+    images_count: int,
+    rate_limiter: RateLimiter,
+    retry_policy: RetryPolicy,
+) -> T:
+    """
+    Асинхронный метод вызова запроса к сервису с ограничением скорости, дедлайном и повторами.
+
+    :param func: запрос к сервису, принимает дедлайн в секундах.
+    :param images_count: количество изображений в запросе.
+    :param rate_limiter: ограничитель запросов.
+    :param retry_policy: политика повторов.
+    :return: результат запроса.
+    """
+
+    attempt = 0
+    while True:
+        await rate_limiter.acquire_async(images_count)
+        try:
+            if retry_policy.hedging is not None:
+                result = await call_hedged_async(
+                    func, retry_policy.rpc_timeout, images_count, rate_limiter, retry_policy.hedging
+                )
+            else:
+                result = await func(retry_policy.rpc_timeout)
+        except Exception as exception:  # pylint: disable=broad-except
+            if not _on_error(exception, rate_limiter, retry_policy, attempt):
+                raise
+
+            await asyncio.sleep(retry_policy.get_backoff(attempt))
+            attempt += 1
+        else:
+            rate_limiter.on_success()
+            return result
+
+
+_rate_limiters: Dict[str, RateLimiter] = {}
+_rate_limiters_lock = threading.Lock()
+_latency_trackers: Dict[str, LatencyTracker] = {}
+
+
+def get_rate_limiter(provider_name: str) -> RateLimiter:
+    """
+    Метод получения общего для процесса ограничителя запросов к сервису (по умолчанию без лимитов).
+
+    :param provider_name: название сервиса модерации.
+    :return: RateLimiter.
+    """
+
+    rate_limiter = _rate_limiters.get(provider_name)
+    if rate_limiter is not None:
+        return rate_limiter
+
+    with _rate_limiters_lock:
+        return _rate_limiters.setdefault(provider_name, RateLimiter(name=provider_name))
+
+
+def get_latency_tracker(provider_name: str) -> LatencyTracker:
+    """
+    Метод получения общей для процесса оценки задержки запросов к сервису.
+
+    :param provider_name: название сервиса модерации.
+    :return: LatencyTracker.
+    """
+
+    latency_tracker = _latency_trackers.get(provider_name)
+    if latency_tracker is not None:
+        return latency_tracker
+
+    with _rate_limiters_lock:
+        return _latency_trackers.setdefault(provider_name, LatencyTracker())
+
+
+def configure_rate_limiter(
+    provider_name: str,
+    requests_per_second: Optional[float] = None,
+    images_per_second: Optional[float] = None,
+) -> RateLimiter:
+    """
+    Метод настройки лимитов общего для процесса ограничителя запросов к сервису.
+
+    :param provider_name: название сервиса модерации.
+    :param requests_per_second: лимит запросов в секунду (опционально).
+    :param images_per_second: лимит изображений в секунду (опционально).
+    :return: RateLimiter.
+    """
+
+    rate_limiter = get_rate_limiter(provider_name)
+    rate_limiter.configure(requests_per_second=requests_per_second, images_per_second=images_per_second)
+    return rate_limiter
+
+
+def reset_rate_limiters() -> None:
+    """
+    Метод сброса ограничителей запросов и оценок задержки без ожидания блокировки (в дочернем процессе после fork).
+    """
+
+    global _rate_limiters_lock  # pylint: disable=global-statement
+
+    _rate_limiters_lock = threading.Lock()
+    _rate_limiters.clear()
+    _latency_trackers.clear()
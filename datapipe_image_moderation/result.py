@@ -0,0 +1,128 @@
+from dataclasses import dataclass
+from enum import Enum
+from typing import Dict, List, Optional
+
+import grpc
+
+from datapipe_image_moderation.rate_limit import RETRYABLE_STATUS_CODES, get_status_code
+
+# Числовые gRPC-коды ошибок отдельных изображений (google.rpc.Status), которые можно повторить.
+RETRYABLE_STATUS_CODE_VALUES = {status_code.value[0] for status_code in RETRYABLE_STATUS_CODES} | {
+    grpc.StatusCode.INTERNAL.value[0]
+}
+
+
+class ImageStatus(str, Enum):
+    """
+    Статус модерации изображения.
+    """
+
+    OK = "ok"
+    FETCH_ERROR = "fetch_error"  # Не удалось загрузить изображение из файловой системы.
+    API_ERROR = "api_error"  # Сервис вернул ошибку для изображения или для всего запроса.
+    REJECTED = "rejected"  # Изображение отклонено проверкой до загрузки (размер, формат).
+
+
+@dataclass
+class ModerationResult:
+    """
+    Результат модерации одного изображения.
+    """
+
+    status: ImageStatus
+    details: Optional[Dict] = None  # Результат модерации (только для ImageStatus.OK).
+    error: Optional[str] = None  # Описание ошибки.
+    retryable: bool = False  # Можно ли повторить модерацию изображения.
+
+    @property
+    def ok(self) -> bool:
+        return self.status == ImageStatus.OK
+
+    @classmethod
+    def from_details(cls, details: Dict) -> "ModerationResult":
+        return cls(status=ImageStatus.OK, details=details)
+
+    @classmethod
+    def from_fetch_error(cls, exception: BaseException) -> "ModerationResult":
+        """
+        Метод формирования результата для изображения, которое не удалось загрузить.
+
+        Отсутствующие файлы и ошибки доступа не повторяются, остальные ошибки (таймауты, сеть) - повторяются.
+
+        :param exception: исключение при загрузке.
+        :return: ModerationResult.
+        """
+
+        return cls(
+            status=ImageStatus.FETCH_ERROR,
+            error=f"{type(exception).__name__}: {exception}",
+            retryable=not isinstance(exception, (FileNotFoundError, PermissionError, IsADirectoryError)),
+        )
+
+    @classmethod
+    def from_rejection(cls, reason: str) -> "ModerationResult":
+        """
+        Метод формирования результата для изображения, отклонённого проверкой до загрузки.
+
+        :param reason: причина отклонения.
+        :return: ModerationResult.
+        """
+
+        return cls(status=ImageStatus.REJECTED, error=reason)
+
+    @classmethod
+    def from_api_error(cls, code: int, message: str) -> "ModerationResult":
+        """
+        Метод формирования результата для изображения, по которому сервис вернул ошибку.
+
+        :param code: числовой gRPC-код ошибки.
+        :param message: сообщение об ошибке.
+        :return: ModerationResult.
+        """
+
+        return cls(
+            status=ImageStatus.API_ERROR,
+            error=f"{code}: {message}",
+            retryable=code in RETRYABLE_STATUS_CODE_VALUES,
+        )
+
+    @classmethod
+    def from_api_exception(cls, exception: BaseException) -> "ModerationResult":
+        """
+        Метод формирования результата для изображения из запроса, завершившегося ошибкой.
+
+        :param exception: исключение запроса.
+        :return: ModerationResult.
+        """
+
+        status_code = get_status_code(exception)
+        return cls(
+            status=ImageStatus.API_ERROR,
+            error=f"{type(exception).__name__}: {exception}",
+            retryable=status_code in RETRYABLE_STATUS_CODES,
+        )
+
+
+class ImageModerationError(Exception):
+    """
+    Ошибка модерации одного или нескольких изображений.
+    """
+
+    def __init__(self, results: List[ModerationResult]) -> None:
+        self.results = results
+        failed = [result for result in results if not result.ok]
+        super().__init__(f"Не удалось промодерировать {len(failed)} из {len(results)} изображений: {failed[0].error}")
+
+
+def get_details(results: List[ModerationResult]) -> List[Dict]:
+    """
+    Метод получения результатов модерации, если все изображения обработаны успешно.
+
+    :param results: результаты модерации изображений.
+    :return: результат модерации.
+    """
+
+    if not all(result.ok for result in results):
+        raise ImageModerationError(results)
+
+    return [result.details for result in results]  # type: ignore
@@ -0,0 +1,223 @@
+import math
+import time
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Any, Dict, Iterator, List, Literal, Optional, Tuple, Union, cast
+
+import pandas as pd
+import sqlalchemy as sa
+from datapipe.compute import DataStore
+from datapipe.meta.sql_meta import build_changed_idx_sql
+from datapipe.run_config import RunConfig
+from datapipe.store.database import TableStoreDB
+from datapipe.types import IndexDF
+from sqlalchemy.sql import visitors
+from sqlalchemy.sql.expression import ColumnClause, ColumnElement
+
+if TYPE_CHECKING:
+    from datapipe.step.batch_transform import BaseBatchTransformStep
+
+_PRIORITY_COLUMN = "_moderation_priority"
+
+
+@dataclass(frozen=True, eq=False)
+class PriorityScheduling:
+    """
+    Порядок обработки изменённых строк шага модерации по приоритету.
+
+    priority - название колонки входной таблицы или выражение SQLAlchemy над её колонками (sa.column("source")),
+    order - направление: при "desc" строки с большим значением обрабатываются раньше. Если задан
+    high_priority_threshold, строки с приоритетом не хуже порога (например, новые загрузки) запрашиваются заново
+    перед каждым chunk и отправляются первыми, а остальные строки (бэкфилл) обрабатываются на оставшейся пропускной
+    способности: доля reserved_capacity каждого chunk не занимается бэкфиллом.
+    Входная таблица должна храниться в той же базе, что и метаданные datapipe (TableStoreDB).
+    """
+
+    priority: Union[str, ColumnElement]  # Column name or SQLAlchemy expression over columns of the input table.
+    order: Literal["asc", "desc"] = "desc"  # With "desc" rows with larger priority are processed first.
+    high_priority_threshold: Optional[float] = None  # Rows with priority at or above threshold are polled every chunk.
+    reserved_capacity: float = 0.0  # Share of every chunk kept free of backfill rows for high priority rows.
+
+    def __post_init__(self) -> None:
+        if self.order not in ("asc", "desc"):
+            raise ValueError(f"Неизвестное направление приоритета: {self.order}!")
+
+        if not 0 <= self.reserved_capacity < 1:
+            raise ValueError("reserved_capacity должен быть в диапазоне [0, 1)!")
+
+        if self.reserved_capacity > 0 and self.high_priority_threshold is None:
+            raise ValueError("Для reserved_capacity нужен high_priority_threshold!")
+
+    def _get_data_table(self, step: "BaseBatchTransformStep", ds: DataStore) -> sa.Table:
+        input_dt = step.input_dts[0].dt
+        table_store = input_dt.table_store
+        if not isinstance(table_store, TableStoreDB) or table_store.dbconn.connstr != ds.meta_dbconn.connstr:
+            raise ValueError(
+                f"Приоритет обработки поддерживается только для таблицы в базе метаданных datapipe: {input_dt.name}!"
+            )
+
+        return table_store.data_table
+
+    def _get_priority(self, data_table: sa.Table) -> ColumnElement:
+        def bind_column(element: Any) -> Optional[ColumnElement]:
+            # Колонки без таблицы (sa.column("source")) привязываются к входной таблице.
+            if not isinstance(element, ColumnClause) or element.table is not None:
+                return None
+
+            if element.name not in data_table.c:
+                raise ValueError(f"Колонки приоритета {element.name} нет во входной таблице {data_table.name}!")
+
+            return data_table.c[element.name]
+
+        if isinstance(self.priority, str):
+            return cast(ColumnElement, bind_column(sa.column(self.priority)))
+
+        return visitors.replacement_traverse(self.priority, {}, bind_column)
+
+    def validate(self, step: "BaseBatchTransformStep", ds: DataStore) -> None:
+        """
+        Метод проверки входной таблицы шага и колонок приоритета при создании шага.
+
+        :param step: шаг datapipe с одной входной таблицей.
+        :param ds: DataStore.
+        """
+
+        self._get_priority(self._get_data_table(step, ds))
+
+    def _is_before(self, left: Any, right: Any) -> Any:
+        return left > right if self.order == "desc" else left < right
+
+    def _build_sql(
+        self, step: "BaseBatchTransformStep", ds: DataStore, run_config: Optional[RunConfig]
+    ) -> Tuple[Any, Any]:
+        keys = step.transform_keys
+        _, changed_sql = build_changed_idx_sql(
+            ds=ds,
+            meta_table=step.meta_table,
+            input_dts=step.input_dts,
+            transform_keys=keys,
+            run_config=run_config,
+        )
+        changed = changed_sql.subquery("changed")
+
+        data_table = self._get_data_table(step, ds)
+        priority = (
+            sa.select(*[data_table.c[key] for key in keys], self._get_priority(data_table).label(_PRIORITY_COLUMN))
+            .select_from(data_table)
+            .subquery("priority")
+        )
+        priority_column = priority.c[_PRIORITY_COLUMN]
+        order_by = priority_column.desc() if self.order == "desc" else priority_column.asc()
+
+        return (
+            sa.select(*[changed.c[key] for key in keys], priority_column)
+            .select_from(changed)
+            .outerjoin(priority, onclause=sa.and_(*[changed.c[key] == priority.c[key] for key in keys]))
+            .order_by(order_by.nullslast(), *[changed.c[key] for key in keys])
+        ), priority_column
+
+    def _after(self, key_columns: List[Any], priority: Any, last_row: Dict[str, Any]) -> Any:
+        """
+        Метод условия keyset-пагинации: строки после last_row в порядке (приоритет, ключи).
+
+        :param key_columns: колонки ключей запроса.
+        :param priority: колонка приоритета запроса.
+        :param last_row: последняя прочитанная строка.
+        :return: SQL-условие.
+        """
+
+        last_priority = last_row[_PRIORITY_COLUMN]
+        after_keys = (
+            key_columns[0] > last_row[key_columns[0].name]
+            if len(key_columns) == 1
+            else sa.tuple_(*key_columns) > sa.tuple_(*[last_row[column.name] for column in key_columns])
+        )
+        if pd.isna(last_priority):
+            return sa.and_(priority.is_(None), after_keys)
+
+        return sa.or_(
+            self._is_before(last_priority, priority),
+            sa.and_(priority == last_priority, after_keys),
+            priority.is_(None),
+        )
+
+    def get_process_ids(
+        self,
+        step: "BaseBatchTransformStep",
+        ds: DataStore,
+        chunk_size: int,
+        run_config: Optional[RunConfig] = None,
+    ) -> Tuple[int, Iterator[IndexDF]]:
+        """
+        Метод получения изменённых строк шага по chunk в порядке приоритета.
+
+        Каждый chunk читается отдельным коротким запросом: бэкфилл - с keyset-пагинацией по (приоритет, ключи),
+        строки высокого приоритета - без строк, уже обработанных в этом запуске (по метаданным шага).
+
+        :param step: шаг datapipe с одной входной таблицей.
+        :param ds: DataStore.
+        :param chunk_size: количество строк в chunk.
+        :param run_config: RunConfig с фильтрами (опционально).
+        :return: оценка количества chunk и итератор индексов.
+        """
+
+        keys = step.transform_keys
+        idx_count = step.get_changed_idx_count(ds=ds, run_config=run_config)
+        sql, priority = self._build_sql(step, ds, run_config)
+        key_columns = [column for column in sql.selected_columns if column.name in keys]
+        extra_filters = {k: v for k, v in run_config.filters.items() if k not in keys} if run_config else {}
+
+        def read(query: Any) -> pd.DataFrame:
+            with ds.meta_dbconn.con.begin() as con:
+                return pd.read_sql_query(query, con=con)
+
+        def to_idx(df: pd.DataFrame) -> IndexDF:
+            return cast(IndexDF, df[keys].assign(**extra_filters))
+
+        if self.high_priority_threshold is None:
+            backfill_sql, backfill_chunk_size = sql, chunk_size
+        else:
+            backfill_sql = sql.where(
+                sa.or_(self._is_before(self.high_priority_threshold, priority), priority.is_(None))
+            )
+            backfill_chunk_size = max(int(chunk_size * (1 - self.reserved_capacity)), 1)
+
+            # Строки, обработанные в этом запуске (в том числе с ошибкой), повторно не отправляются.
+            run_started_at = time.time()
+            meta_table = step.meta_table.sql_table
+            high_priority_sql = (
+                sql.outerjoin(
+                    meta_table, onclause=sa.and_(*[column == meta_table.c[column.name] for column in key_columns])
+                )
+                .where(sa.not_(self._is_before(self.high_priority_threshold, priority)))
+                .where(sa.or_(meta_table.c.process_ts.is_(None), meta_table.c.process_ts < run_started_at))
+            )
+
+        def read_chunks() -> Iterator[IndexDF]:
+            last_row: Optional[Dict[str, Any]] = None
+            backfill_done = False
+            while True:
+                chunk_dfs = []
+                if self.high_priority_threshold is not None:
+                    chunk_dfs.append(read(high_priority_sql.limit(chunk_size)))
+
+                # Бэкфилл занимает место, оставшееся от строк высокого приоритета, но не больше backfill_chunk_size.
+                backfill_rows = min(chunk_size - sum(len(df) for df in chunk_dfs), backfill_chunk_size)
+                if backfill_rows > 0 and not backfill_done:
+                    query = (
+                        backfill_sql
+                        if last_row is None
+                        else backfill_sql.where(self._after(key_columns, priority, last_row))
+                    )
+                    backfill_df = read(query.limit(backfill_rows))
+                    backfill_done = len(backfill_df) < backfill_rows
+                    if len(backfill_df) > 0:
+                        last_row = backfill_df.tail(1).to_dict("records")[0]
+                        chunk_dfs.append(backfill_df)
+
+                chunk_dfs = [df for df in chunk_dfs if len(df) > 0]
+                if not chunk_dfs:
+                    return
+
+                yield to_idx(pd.concat(chunk_dfs, ignore_index=True))
+
+        return math.ceil(idx_count / backfill_chunk_size), read_chunks()
@@ -0,0 +1,294 @@
+import asyncio
+from typing import FrozenSet, Iterable, List, Optional, Tuple
+
+from fsspec import AbstractFileSystem
+
+from datapipe_image_moderation.byte_cache import DiskByteCache
+from datapipe_image_moderation.utils import (
+    DEFAULT_FETCH_CONCURRENCY,
+    call_file_system_async,
+    get_file_system,
+    map_with_timeout,
+)
+
+# Количество первых байт файла, по которым определяется формат.
+HEADER_BYTES = 32
+
+# Сигнатуры форматов: (смещение, magic bytes, формат).
+_SIGNATURES: Tuple[Tuple[int, bytes, str], ...] = (
+    (0, b"\xff\xd8\xff", "jpeg"),
+    (0, b"\x89PNG\r\n\x1a\n", "png"),
+    (0, b"GIF87a", "gif"),
+    (0, b"GIF89a", "gif"),
+    (0, b"BM", "bmp"),
+    (0, b"\x00\x00\x01\x00", "ico"),
+    (0, b"II*\x00", "tiff"),
+    (0, b"MM\x00*", "tiff"),
+    (0, b"%PDF", "pdf"),
+    (0, b"\x1a\x45\xdf\xa3", "webm"),
+)
+
+# Бренды контейнера ISO BMFF (байты 8-12) форматов изображений, остальные бренды - видео.
+_ISO_IMAGE_BRANDS = {b"heic": "heic", b"heix": "heic", b"mif1": "heic", b"msf1": "heic", b"avif": "avif"}
+
+
+def sniff_image_format(header: bytes) -> Optional[str]:
+    """
+    Метод определения формата файла по первым байтам.
+
+    :param header: первые байты файла (не меньше HEADER_BYTES для всех форматов).
+    :return: формат (jpeg, png, gif, bmp, webp, ico, tiff, pdf, heic, avif, svg, mp4, webm, avi)
+        или None, если формат неизвестен.
+    """
+
+    for offset, signature, image_format in _SIGNATURES:
+        if header[offset : offset + len(signature)] == signature:
+            return image_format
+
+    if header[:4] == b"RIFF":
+        return {b"WEBP": "webp", b"AVI ": "avi"}.get(header[8:12])
+
+    if header[4:8] == b"ftyp":
+        return _ISO_IMAGE_BRANDS.get(header[8:12], "mp4")
+
+    text = header.lstrip(b"\xef\xbb\xbf \t\r\n").lower()
+    if text.startswith(b"<svg") or text.startswith(b"<?xml"):
+        return "svg"
+
+    return None
+
+
+class ImageScreening:
+    """
+    Проверка изображений до загрузки: размер по info файловой системы, формат по первым байтам (range-чтение).
+
+    Пустые файлы, файлы больше лимита и файлы неподдерживаемых форматов (SVG, видео, повреждённые загрузки)
+    получают статус rejected с причиной и не загружаются, не занимают память и место в батче сервиса.
+    Лимиты по умолчанию берутся у клиента модерации (max_image_bytes, supported_formats).
+    """
+
+    def __init__(
+        self,
+        max_image_bytes: Optional[int] = None,
+        allowed_formats: Optional[Iterable[str]] = None,
+        use_provider_limits: bool = True,
+        header_bytes: int = HEADER_BYTES,
+    ) -> None:
+        """
+        Метод инициализации класса ImageScreening.
+
+        :param max_image_bytes: максимальный размер изображения в байтах (опционально).
+        :param allowed_formats: допустимые форматы, см. sniff_image_format (опционально).
+        :param use_provider_limits: использовать лимиты клиента модерации, если лимиты не заданы.
+        :param header_bytes: количество первых байт файла для определения формата.
+        """
+
+        self.max_image_bytes = max_image_bytes
+        self.allowed_formats = frozenset(allowed_formats) if allowed_formats is not None else None
+        self.use_provider_limits = use_provider_limits
+        self.header_bytes = header_bytes
+
+    def get_limits(
+        self, provider_max_image_bytes: Optional[int], provider_formats: Optional[FrozenSet[str]]
+    ) -> Tuple[Optional[int], Optional[FrozenSet[str]]]:
+        """
+        Метод получения лимитов проверки с учётом лимитов клиента модерации.
+
+        :param provider_max_image_bytes: максимальный размер изображения в сервисе (опционально).
+        :param provider_formats: форматы, которые принимает сервис (опционально).
+        :return: максимальный размер изображения и допустимые форматы.
+        """
+
+        if not self.use_provider_limits:
+            return self.max_image_bytes, self.allowed_formats
+
+        return (
+            self.max_image_bytes if self.max_image_bytes is not None else provider_max_image_bytes,
+            self.allowed_formats if self.allowed_formats is not None else provider_formats,
+        )
+
+    @staticmethod
+    def get_rejection(
+        size: Optional[int],
+        header: Optional[bytes],
+        max_image_bytes: Optional[int] = None,
+        allowed_formats: Optional[FrozenSet[str]] = None,
+    ) -> Optional[str]:
+        """
+        Метод получения причины отклонения изображения.
+
+        Если размер или первые байты получить не удалось, проверка не выполняется (ошибка будет получена при загрузке).
+
+        :param size: размер файла в байтах (опционально).
+        :param header: первые байты файла (опционально).
+        :param max_image_bytes: максимальный размер изображения в байтах (опционально).
+        :param allowed_formats: допустимые форматы (опционально).
+        :return: причина отклонения в формате "<код>: <описание>" или None.
+        """
+
+        if size == 0 or header == b"":
+            return "empty: file is empty"
+
+        if size is not None and max_image_bytes is not None and size > max_image_bytes:
+            return f"too_large: {size} > {max_image_bytes} bytes"
+
+        if header is not None and allowed_formats is not None:
+            image_format = sniff_image_format(header)
+            if image_format is None:
+                return "unknown_format: no image signature in the first bytes"
+
+            if image_format not in allowed_formats:
+                return f"unsupported_format: {image_format}"
+
+        return None
+
+    @staticmethod
+    def _needs_header(
+        size: Optional[int], max_image_bytes: Optional[int], allowed_formats: Optional[FrozenSet[str]]
+    ) -> bool:
+        # Для пустых и отклонённых по размеру файлов первые байты не читаем.
+        return allowed_formats is not None and size != 0 and (max_image_bytes is None or (size or 0) <= max_image_bytes)
+
+    def _screen_cached_image(
+        self,
+        byte_cache: Optional[DiskByteCache],
+        file_system_name: str,
+        image_url: str,
+        max_image_bytes: Optional[int],
+        allowed_formats: Optional[FrozenSet[str]],
+    ) -> Optional[Tuple[Optional[int], Optional[str]]]:
+        # Размер и первые байты изображения из кэша на диске, без запросов к файловой системе.
+        if byte_cache is None:
+            return None
+
+        key = byte_cache.get_key(file_system_name, image_url)
+        size = byte_cache.get_size(key)
+        if size is None:
+            return None
+
+        header = None
+        if self._needs_header(size, max_image_bytes, allowed_formats):
+            header = byte_cache.get_header(key, self.header_bytes)
+            if header is None:
+                return None
+
+        return size, self.get_rejection(size, header, max_image_bytes, allowed_formats)
+
+    def _screen_image(
+        self,
+        file_system: AbstractFileSystem,
+        image_url: str,
+        max_image_bytes: Optional[int],
+        allowed_formats: Optional[FrozenSet[str]],
+    ) -> Tuple[Optional[int], Optional[str]]:
+        try:
+            size = file_system.info(image_url).get("size")
+        except Exception:  # pylint: disable=broad-except
+            return None, None
+
+        header = None
+        if self._needs_header(size, max_image_bytes, allowed_formats):
+            try:
+                header = file_system.cat_file(image_url, 0, self.header_bytes)
+            except Exception:  # pylint: disable=broad-except
+                pass
+
+        return size, self.get_rejection(size, header, max_image_bytes, allowed_formats)
+
+    def screen(
+        self,
+        image_url_list: List[str],
+        file_system_name: str,
+        file_system_creds_path: Optional[str] = None,
+        max_concurrency: int = DEFAULT_FETCH_CONCURRENCY,
+        timeout: Optional[float] = None,
+        provider_max_image_bytes: Optional[int] = None,
+        provider_formats: Optional[FrozenSet[str]] = None,
+        byte_cache: Optional[DiskByteCache] = None,
+    ) -> List[Tuple[Optional[int], Optional[str]]]:
+        """
+        Метод параллельной проверки изображений до загрузки.
+
+        :param image_url_list: Список ссылок на изображения.
+        :param file_system_name: файловая система, где находится изображение.
+        :param file_system_creds_path: путь к credentials для файловой системы (опционально).
+        :param max_concurrency: максимальное количество одновременных запросов.
+        :param timeout: таймаут проверки одного изображения в секундах (опционально).
+        :param provider_max_image_bytes: максимальный размер изображения в сервисе (опционально).
+        :param provider_formats: форматы, которые принимает сервис (опционально).
+        :param byte_cache: кэш загруженных изображений на локальном диске (опционально).
+        :return: размер (или None) и причина отклонения (или None) по каждому изображению в исходном порядке.
+        """
+
+        file_system = get_file_system(file_system_name, file_system_creds_path)
+        max_image_bytes, allowed_formats = self.get_limits(provider_max_image_bytes, provider_formats)
+
+        def screen_image(image_url: str) -> Tuple[Optional[int], Optional[str]]:
+            cached = self._screen_cached_image(
+                byte_cache, file_system_name, image_url, max_image_bytes, allowed_formats
+            )
+            if cached is not None:
+                return cached
+
+            return self._screen_image(file_system, image_url, max_image_bytes, allowed_formats)
+
+        return map_with_timeout(screen_image, image_url_list, max_concurrency, timeout, lambda: (None, None))
+
+    async def screen_async(
+        self,
+        image_url_list: List[str],
+        file_system_name: str,
+        file_system_creds_path: Optional[str] = None,
+        max_concurrency: int = DEFAULT_FETCH_CONCURRENCY,
+        timeout: Optional[float] = None,
+        provider_max_image_bytes: Optional[int] = None,
+        provider_formats: Optional[FrozenSet[str]] = None,
+        byte_cache: Optional[DiskByteCache] = None,
+    ) -> List[Tuple[Optional[int], Optional[str]]]:
+        """
+        Асинхронный метод параллельной проверки изображений до загрузки.
+
+        :param image_url_list: Список ссылок на изображения.
+        :param file_system_name: файловая система, где находится изображение.
+        :param file_system_creds_path: путь к credentials для файловой системы (опционально).
+        :param max_concurrency: максимальное количество одновременных запросов.
+        :param timeout: таймаут проверки одного изображения в секундах (опционально).
+        :param provider_max_image_bytes: максимальный размер изображения в сервисе (опционально).
+        :param provider_formats: форматы, которые принимает сервис (опционально).
+        :param byte_cache: кэш загруженных изображений на локальном диске (опционально).
+        :return: размер (или None) и причина отклонения (или None) по каждому изображению в исходном порядке.
+        """
+
+        file_system = get_file_system(file_system_name, file_system_creds_path)
+        max_image_bytes, allowed_formats = self.get_limits(provider_max_image_bytes, provider_formats)
+        semaphore = asyncio.Semaphore(max(max_concurrency, 1))
+
+        async def screen_image(image_url: str) -> Tuple[Optional[int], Optional[str]]:
+            cached = self._screen_cached_image(
+                byte_cache, file_system_name, image_url, max_image_bytes, allowed_formats
+            )
+            if cached is not None:
+                return cached
+
+            async with semaphore:
+                try:
+                    info = await asyncio.wait_for(
+                        call_file_system_async(file_system, "info", image_url), timeout=timeout
+                    )
+                    size = info.get("size")
+                except Exception:  # pylint: disable=broad-except
+                    return None, None
+
+                header = None
+                if self._needs_header(size, max_image_bytes, allowed_formats):
+                    try:
+                        header = await asyncio.wait_for(
+                            call_file_system_async(file_system, "cat_file", image_url, 0, self.header_bytes),
+                            timeout=timeout,
+                        )
+                    except Exception:  # pylint: disable=broad-except
+                        pass
+
+                return size, self.get_rejection(size, header, max_image_bytes, allowed_formats)
+
+        return list(await asyncio.gather(*[screen_image(image_url) for image_url in image_url_list]))
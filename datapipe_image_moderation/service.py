@@ -0,0 +1,332 @@
+import asyncio
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Set, Tuple
+
+from datapipe_image_moderation.base import DEFAULT_MAX_PARALLEL_BATCHES, ImageModerationBase
+from datapipe_image_moderation.byte_cache import DiskByteCache
+from datapipe_image_moderation.cache import ModerationResultCache
+from datapipe_image_moderation.clients import get_image_moderation
+from datapipe_image_moderation.preprocess import ImagePreprocessor
+from datapipe_image_moderation.rate_limit import RetryPolicy
+from datapipe_image_moderation.result import ModerationResult
+from datapipe_image_moderation.utils import fetch_images_async
+
+try:
+    from aiohttp import web
+except ImportError:  # pragma: no cover
+    web = None  # type: ignore
+
+# Максимальное время ожидания заполнения батча в секундах по умолчанию.
+DEFAULT_MAX_WAIT = 0.05
+
+# Запрос в очереди: изображение, время постановки в очередь, future результата.
+_PendingRequest = Tuple[bytes, float, "asyncio.Future[ModerationResult]"]
+
+
+class MicroBatcher:
+    """
+    Объединение одиночных запросов модерации в батчи сервиса (15 для Google, 5 для Yandex).
+
+    Батч отправляется, когда он заполнен или самый старый запрос ждёт max_wait секунд. Пока выполняются
+    max_parallel_batches запросов к сервису, новые запросы копятся в очереди и уходят полными батчами.
+    Каждый вызывающий получает свой ModerationResult.
+    """
+
+    def __init__(
+        self,
+        client: ImageModerationBase,
+        max_wait: float = DEFAULT_MAX_WAIT,
+        max_batch_size: Optional[int] = None,
+        max_parallel_batches: int = DEFAULT_MAX_PARALLEL_BATCHES,
+        file_system_name: str = "gcs",
+        file_system_creds_path: Optional[str] = None,
+        fetch_timeout: Optional[float] = None,
+        byte_cache: Optional[DiskByteCache] = None,
+        result_cache: Optional[ModerationResultCache] = None,
+        retry_policy: Optional[RetryPolicy] = None,
+        preprocessor: Optional[ImagePreprocessor] = None,
+    ) -> None:
+        """
+        Метод инициализации класса MicroBatcher.
+
+        :param client: клиент модерации.
+        :param max_wait: максимальное время ожидания заполнения батча в секундах.
+        :param max_batch_size: размер батча (опционально, по умолчанию лимит сервиса).
+        :param max_parallel_batches: максимальное количество одновременных запросов к сервису.
+        :param file_system_name: файловая система для запросов по URL.
+        :param file_system_creds_path: путь к credentials для файловой системы (опционально).
+        :param fetch_timeout: таймаут загрузки одного изображения в секундах (опционально).
+        :param byte_cache: кэш загруженных изображений на локальном диске (опционально).
+        :param result_cache: кэш результатов модерации (опционально).
+        :param retry_policy: политика повторов запросов к сервису (опционально).
+        :param preprocessor: уменьшение и перекодирование изображений перед отправкой (опционально).
+        """
+
+        self.client = client
+        self.max_wait = max_wait
+        self.max_batch_size = min(max_batch_size or client.max_batch_size, client.max_batch_size)
+        self.max_parallel_batches = max(max_parallel_batches, 1)
+        self.file_system_name = file_system_name
+        self.file_system_creds_path = file_system_creds_path
+        self.fetch_timeout = fetch_timeout
+        self.byte_cache = byte_cache
+        self.result_cache = result_cache
+        self.retry_policy = retry_policy
+        self.preprocessor = preprocessor
+
+        self.requests = 0
+        self.batches = 0
+        self._pending: Deque[_PendingRequest] = deque()
+        self._not_empty: Optional[asyncio.Event] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._collector: Optional["asyncio.Task[None]"] = None
+        self._batch_tasks: Set["asyncio.Task[None]"] = set()
+        self._stopping = False
+
+    @property
+    def mean_batch_size(self) -> float:
+        return self.requests / self.batches if self.batches > 0 else 0.0
+
+    async def start(self) -> None:
+        """
+        Метод запуска сборки батчей на текущем event loop.
+        """
+
+        if self._collector is not None:
+            return
+
+        self._stopping = False
+        self._not_empty = asyncio.Event()
+        self._semaphore = asyncio.Semaphore(self.max_parallel_batches)
+        self._collector = asyncio.create_task(self._collect())
+
+    async def stop(self) -> None:
+        """
+        Метод остановки: запросы из очереди отправляются без ожидания, выполняющиеся батчи завершаются.
+        """
+
+        if self._collector is None:
+            return
+
+        self._stopping = True
+        self._not_empty.set()  # type: ignore
+        await self._collector
+        if self._batch_tasks:
+            await asyncio.gather(*self._batch_tasks, return_exceptions=True)
+        self._collector = None
+
+    async def __aenter__(self) -> "MicroBatcher":
+        await self.start()
+        return self
+
+    async def __aexit__(self, *args: Any) -> None:
+        await self.stop()
+
+    async def moderate_image(self, image: bytes) -> ModerationResult:
+        """
+        Метод модерации одного изображения в составе батча.
+
+        :param image: изображение в bytes.
+        :return: результат модерации изображения.
+        """
+
+        if self._collector is None or self._stopping:
+            raise RuntimeError("MicroBatcher не запущен!")
+
+        loop = asyncio.get_running_loop()
+        future: "asyncio.Future[ModerationResult]" = loop.create_future()
+        self._pending.append((image, loop.time(), future))
+        self._not_empty.set()  # type: ignore
+        return await future
+
+    async def moderate(self, image_url: str) -> ModerationResult:
+        """
+        Метод модерации одного изображения по URL в составе батча (изображение загружается до постановки в очередь).
+
+        :param image_url: ссылка на изображение.
+        :return: результат модерации изображения.
+        """
+
+        fetched_image = (
+            await fetch_images_async(
+                [image_url],
+                file_system_name=self.file_system_name,
+                file_system_creds_path=self.file_system_creds_path,
+                timeout=self.fetch_timeout,
+                byte_cache=self.byte_cache,
+            )
+        )[0]
+        if isinstance(fetched_image, Exception):
+            result = ModerationResult.from_fetch_error(fetched_image)
+            self.client._record_statuses([result])  # pylint: disable=protected-access
+            return result
+
+        return await self.moderate_image(fetched_image)
+
+    def _take_batch(self) -> List[_PendingRequest]:
+        batch: List[_PendingRequest] = []
+        batch_bytes = 0
+        while self._pending and len(batch) < self.max_batch_size:
+            if self._pending[0][2].cancelled():
+                # Вызывающий перестал ждать результат (например, закрыл HTTP-соединение).
+                self._pending.popleft()
+                continue
+
+            image_bytes = len(self._pending[0][0])
+            max_request_bytes = self.client.max_request_bytes
+            if batch and max_request_bytes is not None and batch_bytes + image_bytes > max_request_bytes:
+                break
+
+            batch.append(self._pending.popleft())
+            batch_bytes += image_bytes
+
+        return batch
+
+    async def _collect(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            if not self._pending:
+                if self._stopping:
+                    return
+
+                self._not_empty.clear()  # type: ignore
+                await self._not_empty.wait()  # type: ignore
+                continue
+
+            # Ждём заполнения батча, но не дольше max_wait с момента постановки самого старого запроса.
+            deadline = self._pending[0][1] + self.max_wait
+            while len(self._pending) < self.max_batch_size and not self._stopping:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+
+                self._not_empty.clear()  # type: ignore
+                try:
+                    await asyncio.wait_for(self._not_empty.wait(), timeout)  # type: ignore
+                except asyncio.TimeoutError:
+                    break
+
+            await self._semaphore.acquire()  # type: ignore
+            batch = self._take_batch()
+            if not batch:
+                self._semaphore.release()  # type: ignore
+                continue
+
+            batch_task = asyncio.create_task(self._moderate_batch(batch))
+            self._batch_tasks.add(batch_task)
+            batch_task.add_done_callback(self._batch_tasks.discard)
+
+    async def _moderate_batch(self, batch: List[_PendingRequest]) -> None:
+        try:
+            self.requests += len(batch)
+            self.batches += 1
+            results = await self.client.moderate_images_results_async(
+                images=[image for image, _, _ in batch],
+                result_cache=self.result_cache,
+                retry_policy=self.retry_policy,
+                preprocessor=self.preprocessor,
+            )
+            self.client._record_statuses(results)  # pylint: disable=protected-access
+            for (_, _, future), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
+        except Exception as exception:  # pylint: disable=broad-except
+            for _, _, future in batch:
+                if not future.done():
+                    future.set_exception(exception)
+        finally:
+            self._semaphore.release()  # type: ignore
+
+
+def _result_to_json(result: ModerationResult) -> Dict[str, Any]:
+    return {
+        "status": result.status.value,
+        "details": result.details,
+        "error": result.error,
+        "retryable": result.retryable,
+    }
+
+
+def create_app(batchers: Dict[str, MicroBatcher]) -> "web.Application":
+    """
+    Метод создания HTTP-приложения aiohttp с модерацией одиночных изображений.
+
+    POST /moderate/{сервис} принимает JSON {"image_url": "..."} или изображение в теле запроса и возвращает
+    JSON {"status", "details", "error", "retryable"}. GET /health - проверка доступности.
+    Требует aiohttp (pip install datapipe-image-moderation[service]).
+
+    :param batchers: MicroBatcher по названию сервиса.
+    :return: web.Application.
+    """
+
+    if web is None:
+        raise ImportError("Для сервиса модерации нужен aiohttp: pip install datapipe-image-moderation[service]")
+
+    async def moderate(request: "web.Request") -> "web.Response":
+        batcher = batchers.get(request.match_info["provider"])
+        if batcher is None:
+            raise web.HTTPNotFound(text=f"Неизвестный сервис модерации: {request.match_info['provider']}")
+
+        if request.content_type == "application/json":
+            try:
+                image_url = (await request.json())["image_url"]
+            except (ValueError, KeyError, TypeError) as exception:
+                raise web.HTTPBadRequest(text='Ожидается JSON {"image_url": "..."}') from exception
+
+            result = await batcher.moderate(image_url)
+        else:
+            image = await request.read()
+            if len(image) == 0:
+                raise web.HTTPBadRequest(text="Пустое тело запроса")
+
+            result = await batcher.moderate_image(image)
+
+        return web.json_response(_result_to_json(result))
+
+    async def health(_: "web.Request") -> "web.Response":
+        return web.json_response(
+            {provider_name: batcher.mean_batch_size for provider_name, batcher in batchers.items()}
+        )
+
+    async def start_batchers(_: "web.Application") -> None:
+        for batcher in batchers.values():
+            await batcher.start()
+
+    async def stop_batchers(_: "web.Application") -> None:
+        for batcher in batchers.values():
+            await batcher.stop()
+
+    app = web.Application(client_max_size=64 * 1024 * 1024)
+    app.add_routes([web.post("/moderate/{provider}", moderate), web.get("/health", health)])
+    app.on_startup.append(start_batchers)
+    app.on_cleanup.append(stop_batchers)
+    return app
+
+
+def run_service(
+    providers: Dict[str, Dict[str, Any]],
+    file_system_name: str = "gcs",
+    host: str = "127.0.0.1",
+    port: int = 8080,
+    **batcher_params: Any,
+) -> None:
+    """
+    Метод запуска HTTP-сервиса модерации одиночных изображений (блокирующий).
+
+    :param providers: параметры клиента по названию сервиса, например {"google": {}, "yandex": {...}}.
+    :param file_system_name: файловая система для запросов по URL.
+    :param host: адрес сервиса.
+    :param port: порт сервиса.
+    :param batcher_params: параметры MicroBatcher (max_wait, max_parallel_batches, result_cache и т.д.).
+    """
+
+    if web is None:
+        raise ImportError("Для сервиса модерации нужен aiohttp: pip install datapipe-image-moderation[service]")
+
+    batchers = {
+        provider_name: MicroBatcher(
+            get_image_moderation(provider_name, **client_params), file_system_name=file_system_name, **batcher_params
+        )
+        for provider_name, client_params in providers.items()
+    }
+    web.run_app(create_app(batchers), host=host, port=port)
@@ -1,32 +1,467 @@
-from typing import List, Optional
+import asyncio
+import functools
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set, Tuple, TypeVar, Union
 
 import fsspec
+from fsspec import AbstractFileSystem
+from fsspec.asyn import AsyncFileSystem
+
+from datapipe_image_moderation.byte_cache import DiskByteCache
+
+T = TypeVar("T")
+
+# Количество одновременно загружаемых изображений по умолчанию.
+DEFAULT_FETCH_CONCURRENCY = 16
+
+# Максимальное количество одновременных блокирующих запросов процесса к файловым системам.
+FILE_SYSTEM_MAX_WORKERS = 64
+
+# Максимальное количество зависших запросов, после таймаута которых поток пула отдаётся следующему запросу.
+FILE_SYSTEM_MAX_ABANDONED = 64
+
+_file_systems: Dict[Tuple[str, Optional[str]], AbstractFileSystem] = {}
+_file_systems_lock = threading.Lock()
+_file_system_executor: Optional[ThreadPoolExecutor] = None
+_file_system_slots: Optional[threading.Semaphore] = None
+_abandoned_futures: Set["Future[Any]"] = set()
+
+
+def get_file_system(file_system_name: str, file_system_creds_path: Optional[str] = None) -> AbstractFileSystem:
+    """
+    Метод для получения закэшированного экземпляра файловой системы.
+
+    :param file_system_name: файловая система, где находится изображение.
+    :param file_system_creds_path: путь к credentials для файловой системы (опционально).
+    :return: экземпляр файловой системы Fsspec.
+    """
+
+    key = (file_system_name, file_system_creds_path)
+    file_system = _file_systems.get(key)
+    if file_system is not None:
+        return file_system
+
+    with _file_systems_lock:
+        if key not in _file_systems:
+            if file_system_creds_path is not None:
+                _file_systems[key] = fsspec.filesystem(file_system_name, token=file_system_creds_path)
+            else:
+                _file_systems[key] = fsspec.filesystem(file_system_name)
+
+        return _file_systems[key]
+
+
+def reset_file_systems() -> None:
+    """
+    Метод сброса кэша экземпляров файловых систем без ожидания блокировки (в дочернем процессе после fork).
+    """
+
+    global _file_systems_lock, _file_system_executor, _file_system_slots  # pylint: disable=global-statement
+
+    _file_systems_lock = threading.Lock()
+    _file_systems.clear()
+    # Потоки родительского процесса не копируются при fork.
+    _file_system_executor = None
+    _file_system_slots = None
+    _abandoned_futures.clear()
+
+
+def _get_file_system_executor() -> Tuple[ThreadPoolExecutor, threading.Semaphore]:
+    global _file_system_executor, _file_system_slots  # pylint: disable=global-statement
+
+    if _file_system_executor is None or _file_system_slots is None:
+        with _file_systems_lock:
+            if _file_system_executor is None or _file_system_slots is None:
+                # Потоки сверх FILE_SYSTEM_MAX_WORKERS заняты только зависшими запросами, отпущенными по таймауту.
+                _file_system_executor = ThreadPoolExecutor(
+                    max_workers=FILE_SYSTEM_MAX_WORKERS + FILE_SYSTEM_MAX_ABANDONED, thread_name_prefix="file_system"
+                )
+                _file_system_slots = threading.Semaphore(FILE_SYSTEM_MAX_WORKERS)
+
+    return _file_system_executor, _file_system_slots
+
+
+def _release_file_system_slot(slots: threading.Semaphore, future: "Future[Any]") -> None:
+    with _file_systems_lock:
+        if future in _abandoned_futures:
+            # Место освобождено при таймауте запроса.
+            _abandoned_futures.remove(future)
+            return
+
+    slots.release()
+
+
+def _abandon_file_system_call(slots: threading.Semaphore, future: "Future[Any]") -> None:
+    with _file_systems_lock:
+        # Если зависших запросов слишком много, место освобождается только после завершения запроса.
+        if future.done() or len(_abandoned_futures) >= FILE_SYSTEM_MAX_ABANDONED:
+            return
+
+        _abandoned_futures.add(future)
+
+    slots.release()
+
+
+def map_with_timeout(
+    func: Callable[[str], T],
+    image_url_list: List[str],
+    max_concurrency: int,
+    timeout: Optional[float],
+    on_timeout: Callable[[], T],
+) -> List[T]:
+    """
+    Метод параллельного вызова func для каждого изображения с таймаутом, который отсчитывается от начала вызова
+    в потоке пула.
+
+    Зависший вызов нельзя прервать: после таймаута он продолжает занимать поток, но его место в лимите
+    FILE_SYSTEM_MAX_WORKERS отдаётся следующим запросам (не более FILE_SYSTEM_MAX_ABANDONED зависших запросов
+    на процесс).
+
+    :param func: запрос к файловой системе для одного изображения.
+    :param image_url_list: Список ссылок на изображения.
+    :param max_concurrency: максимальное количество одновременных запросов.
+    :param timeout: таймаут запроса для одного изображения в секундах (опционально).
+    :param on_timeout: результат для изображения, запрос которого не завершился за timeout.
+    :return: результаты в исходном порядке.
+    """
+
+    if timeout is None and (len(image_url_list) <= 1 or max_concurrency <= 1):
+        return [func(image_url) for image_url in image_url_list]
+
+    executor, slots = _get_file_system_executor()
+    results: List[Any] = [None] * len(image_url_list)
+    started_at: Dict[int, float] = {}
+    running: Dict["Future[T]", int] = {}
+
+    def call(index: int) -> T:
+        started_at[index] = time.monotonic()
+        return func(image_url_list[index])
+
+    next_index = 0
+    while next_index < len(image_url_list) or running:
+        while next_index < len(image_url_list) and len(running) < max(max_concurrency, 1):
+            # Без своих запросов в работе ждём свободного места, иначе обрабатываем их завершение и таймауты.
+            if not slots.acquire(blocking=not running):
+                break
+
+            future = executor.submit(call, next_index)
+            future.add_done_callback(functools.partial(_release_file_system_slot, slots))
+            running[future] = next_index
+            next_index += 1
+
+        wait_timeout = None
+        if timeout is not None:
+            # Запрос, ещё не начавшийся в потоке пула, проверяется заново не позже чем через timeout.
+            nearest_deadline = min(
+                (started_at[index] + timeout for index in running.values() if index in started_at),
+                default=time.monotonic() + timeout,
+            )
+            wait_timeout = max(nearest_deadline - time.monotonic(), 0)
+
+        done, _ = wait(running, timeout=wait_timeout, return_when=FIRST_COMPLETED)
+        for future in done:
+            results[running.pop(future)] = future.result()
+
+        if timeout is not None:
+            now = time.monotonic()
+            for future, index in list(running.items()):
+                if index in started_at and started_at[index] + timeout <= now and not future.done():
+                    del running[future]
+                    results[index] = on_timeout()
+                    _abandon_file_system_call(slots, future)
+
+    return results
+
+
+def _set_cached_image(byte_cache: DiskByteCache, key: str, image: bytes) -> None:
+    try:
+        byte_cache.set(key, image)
+    except OSError:
+        # Ошибка записи в кэш (например, диск заполнен) не должна прерывать загрузку.
+        pass
+
+
+def fetch_images(
+    image_url_list: List[str],
+    file_system_name: str,
+    file_system_creds_path: Optional[str] = None,
+    max_concurrency: int = DEFAULT_FETCH_CONCURRENCY,
+    timeout: Optional[float] = None,
+    byte_cache: Optional[DiskByteCache] = None,
+) -> List[Union[bytes, Exception]]:
+    """
+    Метод для параллельной загрузки изображений с ошибкой по каждому изображению отдельно.
+
+    :param image_url_list: Список ссылок на изображения.
+    :param file_system_name: файловая система, где находится изображение.
+    :param file_system_creds_path: путь к credentials для файловой системы (опционально).
+    :param max_concurrency: максимальное количество одновременных загрузок.
+    :param timeout: таймаут загрузки одного изображения в секундах (опционально).
+    :param byte_cache: кэш загруженных изображений на локальном диске (опционально).
+    :return: изображение в bytes или исключение загрузки, в исходном порядке.
+    """
+
+    file_system = get_file_system(file_system_name, file_system_creds_path)
+
+    def fetch(image_url: str) -> Union[bytes, Exception]:
+        try:
+            if byte_cache is None:
+                return file_system.cat_file(image_url)
+
+            key = byte_cache.get_key(file_system_name, image_url)
+            image = byte_cache.get(key)
+            if image is None:
+                image = file_system.cat_file(image_url)
+                _set_cached_image(byte_cache, key, image)
+
+            return image
+        except Exception as exception:  # pylint: disable=broad-except
+            return exception
+
+    return map_with_timeout(
+        fetch,
+        image_url_list,
+        max_concurrency,
+        timeout,
+        lambda: TimeoutError(f"Image download timed out after {timeout} s"),
+    )
+
+
+async def fetch_images_async(
+    image_url_list: List[str],
+    file_system_name: str,
+    file_system_creds_path: Optional[str] = None,
+    max_concurrency: int = DEFAULT_FETCH_CONCURRENCY,
+    timeout: Optional[float] = None,
+    byte_cache: Optional[DiskByteCache] = None,
+) -> List[Union[bytes, Exception]]:
+    """
+    Асинхронный метод для параллельной загрузки изображений с ошибкой по каждому изображению отдельно.
+
+    Для асинхронных файловых систем (gcsfs, s3fs, http) чтение выполняется корутинами на IO-loop Fsspec
+    без отдельного потока на изображение, для остальных - в пуле потоков.
+
+    :param image_url_list: Список ссылок на изображения.
+    :param file_system_name: файловая система, где находится изображение.
+    :param file_system_creds_path: путь к credentials для файловой системы (опционально).
+    :param max_concurrency: максимальное количество одновременных загрузок.
+    :param timeout: таймаут загрузки одного изображения в секундах (опционально).
+    :param byte_cache: кэш загруженных изображений на локальном диске (опционально).
+    :return: изображение в bytes или исключение загрузки, в исходном порядке.
+    """
+
+    file_system = get_file_system(file_system_name, file_system_creds_path)
+    semaphore = asyncio.Semaphore(max(max_concurrency, 1))
+
+    async def fetch(image_url: str) -> bytes:
+        async with semaphore:
+            if byte_cache is None:
+                return await asyncio.wait_for(
+                    call_file_system_async(file_system, "cat_file", image_url), timeout=timeout
+                )
+
+            key = byte_cache.get_key(file_system_name, image_url)
+            image = await asyncio.to_thread(byte_cache.get, key)
+            if image is None:
+                image = await asyncio.wait_for(
+                    call_file_system_async(file_system, "cat_file", image_url), timeout=timeout
+                )
+                await asyncio.to_thread(_set_cached_image, byte_cache, key, image)
+
+            return image
+
+    return list(await asyncio.gather(*[fetch(image_url) for image_url in image_url_list], return_exceptions=True))
+
+
+def call_file_system_async(file_system: AbstractFileSystem, method_name: str, *args: Any) -> Awaitable:
+    """
+    Метод асинхронного вызова метода файловой системы Fsspec.
+
+    Для асинхронных файловых систем (gcsfs, s3fs, http) вызов выполняется корутиной на IO-loop Fsspec
+    без отдельного потока, для остальных - в пуле потоков.
+
+    :param file_system: экземпляр файловой системы Fsspec.
+    :param method_name: название метода (cat_file, info).
+    :param args: аргументы метода.
+    :return: awaitable с результатом метода.
+    """
+
+    if isinstance(file_system, AsyncFileSystem):
+        return asyncio.wrap_future(
+            asyncio.run_coroutine_threadsafe(getattr(file_system, f"_{method_name}")(*args), file_system.loop)
+        )
+
+    return asyncio.to_thread(getattr(file_system, method_name), *args)
+
+
+def get_image_sizes(
+    image_url_list: List[str],
+    file_system_name: str,
+    file_system_creds_path: Optional[str] = None,
+    max_concurrency: int = DEFAULT_FETCH_CONCURRENCY,
+    timeout: Optional[float] = None,
+    byte_cache: Optional[DiskByteCache] = None,
+) -> List[Optional[int]]:
+    """
+    Метод для получения размеров изображений в байтах без загрузки (Fsspec info).
+
+    :param image_url_list: Список ссылок на изображения.
+    :param file_system_name: файловая система, где находится изображение.
+    :param file_system_creds_path: путь к credentials для файловой системы (опционально).
+    :param max_concurrency: максимальное количество одновременных запросов.
+    :param timeout: таймаут запроса для одного изображения в секундах (опционально).
+    :param byte_cache: кэш загруженных изображений на локальном диске, размер из него берётся без запроса (опционально).
+    :return: размер изображения или None, если размер получить не удалось, в исходном порядке.
+    """
+
+    file_system = get_file_system(file_system_name, file_system_creds_path)
+
+    def get_size(image_url: str) -> Optional[int]:
+        if byte_cache is not None:
+            size = byte_cache.get_size(byte_cache.get_key(file_system_name, image_url))
+            if size is not None:
+                return size
+
+        try:
+            return file_system.info(image_url).get("size")
+        except Exception:  # pylint: disable=broad-except
+            return None
+
+    return map_with_timeout(get_size, image_url_list, max_concurrency, timeout, lambda: None)
+
+
+async def get_image_sizes_async(
+    image_url_list: List[str],
+    file_system_name: str,
+    file_system_creds_path: Optional[str] = None,
+    max_concurrency: int = DEFAULT_FETCH_CONCURRENCY,
+    timeout: Optional[float] = None,
+    byte_cache: Optional[DiskByteCache] = None,
+) -> List[Optional[int]]:
+    """
+    Асинхронный метод для получения размеров изображений в байтах без загрузки (Fsspec info).
+
+    :param image_url_list: Список ссылок на изображения.
+    :param file_system_name: файловая система, где находится изображение.
+    :param file_system_creds_path: путь к credentials для файловой системы (опционально).
+    :param max_concurrency: максимальное количество одновременных запросов.
+    :param timeout: таймаут запроса для одного изображения в секундах (опционально).
+    :param byte_cache: кэш загруженных изображений на локальном диске, размер из него берётся без запроса (опционально).
+    :return: размер изображения или None, если размер получить не удалось, в исходном порядке.
+    """
+
+    file_system = get_file_system(file_system_name, file_system_creds_path)
+    semaphore = asyncio.Semaphore(max(max_concurrency, 1))
+
+    async def get_size(image_url: str) -> Optional[int]:
+        if byte_cache is not None:
+            size = byte_cache.get_size(byte_cache.get_key(file_system_name, image_url))
+            if size is not None:
+                return size
+
+        async with semaphore:
+            try:
+                info = await asyncio.wait_for(call_file_system_async(file_system, "info", image_url), timeout=timeout)
+            except Exception:  # pylint: disable=broad-except
+                return None
+
+            return info.get("size")
+
+    return list(await asyncio.gather(*[get_size(image_url) for image_url in image_url_list]))
+
+
+def _raise_fetch_errors(image_bytes_list: List[Union[bytes, Exception]]) -> List[bytes]:
+    for image_bytes in image_bytes_list:
+        if isinstance(image_bytes, Exception):
+            raise image_bytes
+
+    return image_bytes_list  # type: ignore
 
 
 def get_bytes_images(
     image_url_list: List[str],
     file_system_name: str,
     file_system_creds_path: Optional[str] = None,
+    max_concurrency: int = DEFAULT_FETCH_CONCURRENCY,
+    timeout: Optional[float] = None,
+    byte_cache: Optional[DiskByteCache] = None,
 ) -> List[bytes]:
     """
     Метод для получения изображения из URL в bytes.
 
+    Изображения загружаются параллельно, результат возвращается в исходном порядке.
+
     :param image_url_list: Список ссылок на изображения.
     :param file_system_name: файловая система, где находится изображение.
     :param file_system_creds_path: путь к credentials для файловой системы (опционально).
+    :param max_concurrency: максимальное количество одновременных загрузок.
+    :param timeout: таймаут загрузки одного изображения в секундах (опционально).
+    :param byte_cache: кэш загруженных изображений на локальном диске (опционально).
     :return: изображение в bytes.
     """
 
-    if file_system_creds_path is not None:
-        file_system = fsspec.filesystem(file_system_name, token=file_system_creds_path)
-    else:
-        file_system = fsspec.filesystem(file_system_name)
+    return _raise_fetch_errors(
+        fetch_images(
+            image_url_list,
+            file_system_name,
+            file_system_creds_path,
+            max_concurrency,
+            timeout,
+            byte_cache,
+        )
+    )
+
+
+async def get_bytes_images_async(
+    image_url_list: List[str],
+    file_system_name: str,
+    file_system_creds_path: Optional[str] = None,
+    max_concurrency: int = DEFAULT_FETCH_CONCURRENCY,
+    timeout: Optional[float] = None,
+    byte_cache: Optional[DiskByteCache] = None,
+) -> List[bytes]:
+    """
+    Асинхронный метод для получения изображения из URL в bytes.
+
+    :param image_url_list: Список ссылок на изображения.
+    :param file_system_name: файловая система, где находится изображение.
+    :param file_system_creds_path: путь к credentials для файловой системы (опционально).
+    :param max_concurrency: максимальное количество одновременных загрузок.
+    :param timeout: таймаут загрузки одного изображения в секундах (опционально).
+    :param byte_cache: кэш загруженных изображений на локальном диске (опционально).
+    :return: изображение в bytes.
+    """
+
+    return _raise_fetch_errors(
+        await fetch_images_async(
+            image_url_list,
+            file_system_name,
+            file_system_creds_path,
+            max_concurrency,
+            timeout,
+            byte_cache,
+        )
+    )
+
+
+def get_gcs_uri(image_url: str, file_system_name: str) -> Optional[str]:
+    """
+    Метод для получения gs:// URI изображения, если оно находится в Google Cloud Storage.
+
+    :param image_url: ссылка на изображение.
+    :param file_system_name: файловая система, где находится изображение.
+    :return: gs:// URI или None, если изображение не в GCS.
+    """
+
+    if image_url.startswith("gs://"):
+        return image_url
 
-    image_bytes_list: List[bytes] = []
+    if image_url.startswith("gcs://"):
+        return "gs://" + image_url[len("gcs://") :]
 
-    for image_url in image_url_list:
-        with file_system.open(image_url, "rb") as image_file:
-            image_bytes = image_file.read()
-            image_bytes_list.append(image_bytes)
+    if file_system_name in ("gs", "gcs") and "://" not in image_url:
+        return "gs://" + image_url.lstrip("/")
 
-    return image_bytes_list
+    return None
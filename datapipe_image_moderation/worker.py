@@ -0,0 +1,113 @@
+import abc
+import os
+import threading
+from typing import Any, Dict, Optional, Tuple
+
+from datapipe_image_moderation.base import ImageModerationBase
+from datapipe_image_moderation.clients import client_registry, get_image_moderation
+from datapipe_image_moderation.rate_limit import configure_rate_limiter, reset_rate_limiters
+from datapipe_image_moderation.utils import get_file_system, reset_file_systems
+
+_worker_lock = threading.Lock()
+# Лимиты ограничителей запросов, уже применённые в процессе: сервис -> (запросов/с, изображений/с).
+_rate_limits: Dict[str, Tuple[Optional[float], Optional[float]]] = {}
+
+
+def init_worker(
+    provider_name: str,
+    client_params: Dict[str, Any],
+    file_system_name: str,
+    file_system_creds_path: Optional[str] = None,
+    requests_per_second: Optional[float] = None,
+    images_per_second: Optional[float] = None,
+) -> ImageModerationBase:
+    """
+    Метод инициализации процесса-обработчика шага модерации (вызывается из WorkerTransform.init_worker).
+
+    Клиент модерации и файловая система создаются один раз на процесс (credentials читаются в самом процессе),
+    лимиты ограничителя запросов применяются при первом вызове и при их изменении. Повторные вызовы дешёвые.
+
+    :param provider_name: название сервиса модерации (google, yandex или local).
+    :param client_params: параметры клиента (google_credentials_path, oauth_token и folder_id или model_path).
+    :param file_system_name: файловая система, где находятся изображения.
+    :param file_system_creds_path: путь к credentials для файловой системы (опционально).
+    :param requests_per_second: лимит запросов в секунду на процесс (опционально).
+    :param images_per_second: лимит изображений в секунду на процесс (опционально).
+    :return: клиент модерации.
+    """
+
+    client = get_image_moderation(provider_name, **client_params)
+    get_file_system(file_system_name, file_system_creds_path)
+
+    if requests_per_second is not None or images_per_second is not None:
+        rate_limits = (requests_per_second, images_per_second)
+        if _rate_limits.get(provider_name) != rate_limits:
+            with _worker_lock:
+                if _rate_limits.get(provider_name) != rate_limits:
+                    configure_rate_limiter(
+                        provider_name,
+                        requests_per_second=requests_per_second,
+                        images_per_second=images_per_second,
+                    )
+                    _rate_limits[provider_name] = rate_limits
+
+    return client
+
+
+class WorkerTransform(abc.ABC):
+    """
+    Базовый класс сериализуемой функции преобразования шага модерации.
+
+    Клиенты модерации создаются инициализатором процесса-обработчика (init_worker): при десериализации объекта
+    в процессе executor (multiprocessing, Ray) и шагом перед запуском в текущем процессе. Вызов функции
+    преобразования только берёт готовых клиентов.
+    """
+
+    # Клиенты модерации процесса-обработчика по ключу (название сервиса или уровень каскада), не сериализуются.
+    _clients: Optional[Dict[str, ImageModerationBase]] = None
+
+    @abc.abstractmethod
+    def _create_clients(self) -> Dict[str, ImageModerationBase]:
+        """
+        Метод создания клиентов модерации, файловой системы и ограничителей запросов в процессе-обработчике.
+
+        :return: клиенты модерации по ключу.
+        """
+
+    def init_worker(self) -> None:
+        """
+        Метод инициализации процесса-обработчика: создаёт клиентов модерации функции преобразования.
+        """
+
+        self._clients = self._create_clients()
+
+    def _get_clients(self) -> Dict[str, ImageModerationBase]:
+        if self._clients is None:
+            raise RuntimeError("Клиенты модерации не созданы: init_worker не вызван в процессе-обработчике!")
+
+        return self._clients
+
+    def __getstate__(self) -> Dict[str, Any]:
+        # Клиенты с gRPC-каналами не передаются в другие процессы.
+        state = self.__dict__.copy()
+        state.pop("_clients", None)
+        return state
+
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        self.__dict__.update(state)
+        self.init_worker()
+
+
+def _reset_after_fork() -> None:
+    # gRPC-каналы и соединения родительского процесса после fork не работают - создаём их заново.
+    global _worker_lock  # pylint: disable=global-statement
+
+    _worker_lock = threading.Lock()
+    _rate_limits.clear()
+    reset_rate_limiters()
+    client_registry.reset()
+    reset_file_systems()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
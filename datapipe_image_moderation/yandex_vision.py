@@ -1,34 +1,200 @@
-from typing import List, Optional
+import threading
+import time
+from typing import Dict, List, Optional, cast
 
+import grpc
+import grpc.aio
 import yandexcloud
 from yandex.cloud.ai.vision.v1.vision_service_pb2 import (
     AnalyzeSpec,
     BatchAnalyzeRequest,
+    BatchAnalyzeResponse,
     Feature,
     FeatureClassificationConfig,
 )
 from yandex.cloud.ai.vision.v1.vision_service_pb2_grpc import VisionServiceStub
+from yandex.cloud.iam.v1.iam_token_service_pb2 import CreateIamTokenRequest
+from yandex.cloud.iam.v1.iam_token_service_pb2_grpc import IamTokenServiceStub
 
-from datapipe_image_moderation.utils import get_bytes_images
+from datapipe_image_moderation import metrics
+from datapipe_image_moderation.base import ImageInput, ImageModerationBase
+from datapipe_image_moderation.providers import MAX_BATCH_SIZES, MODERATION_CLASSES
+from datapipe_image_moderation.rate_limit import RpcCall
+from datapipe_image_moderation.result import ModerationResult
 
+# Endpoint Yandex Cloud Vision gRPC.
+YANDEX_VISION_ENDPOINT = "vision.api.cloud.yandex.net:443"
 
-class ImageModerationYandex:
+# IAM-токен живёт до 12 часов, обновляем его заранее.
+YANDEX_IAM_TOKEN_REFRESH_INTERVAL = 60 * 60
+
+
+class YandexIamTokenRefresher(grpc.AuthMetadataPlugin):
+    """
+    Источник IAM-токена для gRPC-каналов Yandex Cloud с фоновым обновлением.
+
+    SDK yandexcloud запрашивает новый IAM-токен прямо в момент вызова (раз в 20 секунд),
+    здесь токен обменивается один раз и затем обновляется в фоновом потоке.
+    """
+
+    def __init__(self, oauth_token: str, refresh_interval: float = YANDEX_IAM_TOKEN_REFRESH_INTERVAL) -> None:
+        """
+        Метод инициализации класса YandexIamTokenRefresher.
+
+        :param oauth_token: Yandex Passport OAuth Token пользовательского аккаунта.
+        :param refresh_interval: период обновления IAM-токена в секундах.
+        """
+
+        self._oauth_token = oauth_token
+        self._refresh_interval = refresh_interval
+        self._iam_token_client = yandexcloud.SDK(token=oauth_token).client(IamTokenServiceStub)
+
+        self._iam_token: Optional[str] = None
+        self._lock = threading.Lock()
+        self._refresh_thread: Optional[threading.Thread] = None
+
+    def _refresh(self) -> str:
+        response = self._iam_token_client.Create(CreateIamTokenRequest(yandex_passport_oauth_token=self._oauth_token))
+        self._iam_token = response.iam_token
+        return response.iam_token
+
+    def _refresh_loop(self) -> None:
+        while True:
+            time.sleep(self._refresh_interval)
+            try:
+                self._refresh()
+            except Exception:  # pylint: disable=broad-except
+                # Любая ошибка не должна останавливать поток обновления: старый токен ещё действителен,
+                # повторим попытку на следующей итерации.
+                continue
+
+    def get_token(self) -> str:
+        """
+        Метод получения актуального IAM-токена (при первом вызове запускает фоновое обновление).
+
+        :return: IAM-токен.
+        """
+
+        if self._iam_token is not None:
+            return self._iam_token
+
+        with self._lock:
+            if self._iam_token is None:
+                self._refresh()
+                self._refresh_thread = threading.Thread(target=self._refresh_loop, daemon=True)
+                self._refresh_thread.start()
+
+        return self._iam_token  # type: ignore
+
+    def __call__(self, context: grpc.AuthMetadataContext, callback: grpc.AuthMetadataPluginCallback) -> None:
+        try:
+            callback((("authorization", f"Bearer {self.get_token()}"),), None)
+        except Exception as exception:  # pylint: disable=broad-except
+            callback((), exception)
+
+
+# Настройки gRPC-каналов Yandex Cloud Vision: держим соединение открытым между батчами.
+YANDEX_VISION_CHANNEL_OPTIONS = [
+    ("grpc.keepalive_time_ms", 30_000),
+    ("grpc.keepalive_permit_without_calls", 1),
+]
+
+
+def _get_yandex_channel_credentials(token_refresher: YandexIamTokenRefresher) -> grpc.ChannelCredentials:
+    return grpc.composite_channel_credentials(
+        grpc.ssl_channel_credentials(),
+        grpc.metadata_call_credentials(token_refresher),
+    )
+
+
+def create_yandex_vision_client(token_refresher: YandexIamTokenRefresher) -> VisionServiceStub:
+    """
+    Метод создания долгоживущего gRPC-клиента Yandex Cloud Vision.
+
+    :param token_refresher: источник IAM-токена.
+    :return: VisionServiceStub.
+    """
+
+    channel = grpc.secure_channel(
+        YANDEX_VISION_ENDPOINT,
+        _get_yandex_channel_credentials(token_refresher),
+        options=YANDEX_VISION_CHANNEL_OPTIONS,
+    )
+    # Повторы и дедлайны запросов выполняет ImageModerationBase (RetryPolicy), интерцептор SDK не нужен.
+    return VisionServiceStub(channel)
+
+
+def create_yandex_vision_async_client(token_refresher: YandexIamTokenRefresher) -> VisionServiceStub:
+    """
+    Метод создания асинхронного (grpc.aio) клиента Yandex Cloud Vision для текущего event loop.
+
+    :param token_refresher: источник IAM-токена.
+    :return: VisionServiceStub поверх grpc.aio канала.
+    """
+
+    channel = grpc.aio.secure_channel(
+        YANDEX_VISION_ENDPOINT,
+        _get_yandex_channel_credentials(token_refresher),
+        options=YANDEX_VISION_CHANNEL_OPTIONS,
+    )
+    return VisionServiceStub(channel)
+
+
+class ImageModerationYandex(ImageModerationBase):
     """
     Класс клиента модерации изображений в Yandex Cloud Vision gRPC.
     """
 
-    def __init__(self, oauth_token: str, folder_id: str) -> None:
+    provider_name = "yandex"
+    # Лимит количества изображений в одном запросе Yandex Cloud Vision gRPC.
+    max_batch_size = MAX_BATCH_SIZES["yandex"]
+    # Лимит размера gRPC-сообщения по умолчанию (4 МБ), оставляем запас на служебные поля запроса.
+    max_request_bytes = 4 * 1024 * 1024 - 64 * 1024
+    # Лимит размера одного изображения Yandex Cloud Vision - 1 МБ.
+    max_image_bytes = 1024 * 1024
+    # Форматы изображений, которые принимает Yandex Cloud Vision.
+    supported_formats = frozenset({"jpeg", "png", "pdf"})
+
+    def __init__(
+        self,
+        oauth_token: str,
+        folder_id: str,
+        vision_client: Optional[VisionServiceStub] = None,
+        token_refresher: Optional[YandexIamTokenRefresher] = None,
+    ) -> None:
         """
         Метод инициализации класса ImageModerationYandex.
 
         :param oauth_token: Yandex Passport OAuth Token пользовательского аккаунта.
         :param folder_id: Идентификатор каталога, к которому у вас есть доступ.
         Требуется для авторизации с пользовательским аккаунтом.
+        :param vision_client: готовый gRPC-клиент Yandex Cloud Vision (опционально).
+        :param token_refresher: источник IAM-токена (опционально).
         """
 
-        self._yandex_vision_client = yandexcloud.SDK(token=oauth_token).client(VisionServiceStub)
+        if vision_client is None:
+            # Клиент без интерцептора повторов SDK: повторы и дедлайны выполняет RetryPolicy.
+            if token_refresher is None:
+                token_refresher = YandexIamTokenRefresher(oauth_token=oauth_token)
+            vision_client = create_yandex_vision_client(token_refresher)
+
+        self._oauth_token = oauth_token
+        self._yandex_vision_client = vision_client
+        self._token_refresher = token_refresher
         self._folder_id = folder_id
 
+    def _create_async_client(self) -> VisionServiceStub:
+        """
+        Метод создания асинхронного клиента Yandex Cloud Vision (grpc.aio) для текущего event loop.
+
+        :return: VisionServiceStub поверх grpc.aio канала.
+        """
+
+        if self._token_refresher is None:
+            self._token_refresher = YandexIamTokenRefresher(oauth_token=self._oauth_token)
+
+        return create_yandex_vision_async_client(self._token_refresher)
+
     @staticmethod
     def _get_analyze_specs(bytes_images: List[bytes]) -> List[AnalyzeSpec]:
         """
@@ -54,49 +220,114 @@ class ImageModerationYandex:
 
         return analyze_specs
 
-    def moderate_batch(
-        self,
-        images: List[str],
-        file_system_name: str,
-        file_system_creds_path: Optional[str] = None,
-    ) -> List:
+    def _get_request(self, images: List[ImageInput]) -> BatchAnalyzeRequest:
         """
-        Метод массовой модерации изображений с помощью Yandex Cloud Vision gRPC.
+        Метод формирования запроса для Yandex Cloud Vision gRPC.
 
-        :param images: список изображений в виде URL или Bytes.
-        :param file_system_name: файловая система, где находится изображение.
-        :param file_system_creds_path: путь к credentials для файловой системы (опционально).
-        :return: результат модерации.
+        :param images: список изображений в формате bytes.
+        :return: BatchAnalyzeRequest.
         """
 
-        # Проверяем количество переданных изображений на соответствие лимитам Yandex Cloud Vision gRPC.
-        if len(images) > 5:
-            raise ValueError("Количество изображений должно быть меньше или равно 5!")
-
-        # Получаем список изображений в формате base64.
-        bytes_images = get_bytes_images(
-            image_url_list=images,
-            file_system_name=file_system_name,
-            file_system_creds_path=file_system_creds_path,
-        )
-
-        # Формируем запрос для Yandex Cloud Vision gRPC.
-        request = BatchAnalyzeRequest(
+        return BatchAnalyzeRequest(
             folder_id=self._folder_id,
-            analyze_specs=self._get_analyze_specs(bytes_images=bytes_images),
+            analyze_specs=self._get_analyze_specs(bytes_images=cast(List[bytes], images)),
         )
 
-        # Получаем результат batch-модерации изображений в Yandex Cloud Vision API.
-        response = self._yandex_vision_client.BatchAnalyze(request)
+    @staticmethod
+    def _parse_response(response: BatchAnalyzeResponse, images_count: int) -> List[ModerationResult]:
+        """
+        Метод формирования результатов модерации из ответа Yandex Cloud Vision gRPC.
 
-        # Формируем результаты модерации (заполняем default значения на случай ошибки в Yandex Cloud Vision).
-        details = [{"adult": 0, "gruesome": 0, "text": 0, "watermarks": 0} for _ in range(len(images))]
+        :param response: ответ Yandex Cloud Vision gRPC.
+        :param images_count: количество изображений в запросе.
+        :return: результат модерации по каждому изображению.
+        """
+
+        # Изображения, для которых сервис не вернул результат, можно отправить повторно.
+        results: List[ModerationResult] = [
+            ModerationResult.from_api_error(grpc.StatusCode.UNAVAILABLE.value[0], "Нет результата в ответе сервиса")
+            for _ in range(images_count)
+        ]
 
         # Заполняем данные из Yandex Vision gRPC API.
-        for i, result in enumerate(response.results):
-            properties = result.results[0].classification.properties
+        for i, result in enumerate(response.results[:images_count]):
+            if result.error.code != 0:
+                results[i] = ModerationResult.from_api_error(result.error.code, result.error.message)
+                continue
+
+            if len(result.results) == 0:
+                continue
+
+            feature_result = result.results[0]
+            if feature_result.error.code != 0:
+                results[i] = ModerationResult.from_api_error(feature_result.error.code, feature_result.error.message)
+                continue
+
+            details: Dict = dict.fromkeys(MODERATION_CLASSES, 0)
+            for prop in feature_result.classification.properties:
+                details[prop.name] = prop.probability
+
+            results[i] = ModerationResult.from_details(details)
+
+        return results
+
+    def _moderate_images(self, images: List[ImageInput], timeout: Optional[float] = None) -> List[ModerationResult]:
+        """
+        Метод модерации изображений одним запросом к Yandex Cloud Vision gRPC.
+
+        :param images: список изображений в формате bytes.
+        :param timeout: дедлайн запроса в секундах (опционально).
+        :return: результат модерации по каждому изображению.
+        """
+
+        with metrics.stage("request_build", self.provider_name):
+            request = self._get_request(images)
+
+        # Получаем результат batch-модерации изображений в Yandex Cloud Vision API.
+        with metrics.stage("rpc", self.provider_name):
+            response = self._yandex_vision_client.BatchAnalyze(request, timeout=timeout)
+
+        with metrics.stage("parse", self.provider_name):
+            return self._parse_response(response, len(images))
+
+    def _start_moderate_images(
+        self, images: List[ImageInput], timeout: Optional[float] = None
+    ) -> Optional[RpcCall[List[ModerationResult]]]:
+        """
+        Метод отправки запроса к Yandex Cloud Vision gRPC без ожидания ответа.
+
+        :param images: список изображений в формате bytes.
+        :param timeout: дедлайн запроса в секундах (опционально).
+        :return: отправленный запрос.
+        """
 
-            for prop in properties:
-                details[i][prop.name] = prop.probability
+        with metrics.stage("request_build", self.provider_name):
+            request = self._get_request(images)
+
+        return RpcCall(
+            self._yandex_vision_client.BatchAnalyze.future(request, timeout=timeout),
+            lambda response: self._parse_response(response, len(images)),
+        )
+
+    async def _moderate_images_async(
+        self, images: List[ImageInput], timeout: Optional[float] = None
+    ) -> List[ModerationResult]:
+        """
+        Асинхронный метод модерации изображений одним запросом к Yandex Cloud Vision gRPC.
+
+        :param images: список изображений в формате bytes.
+        :param timeout: дедлайн запроса в секундах (опционально).
+        :return: результат модерации по каждому изображению.
+        """
+
+        vision_async_client = self._get_loop_client(self._create_async_client)
+
+        with metrics.stage("request_build", self.provider_name):
+            request = self._get_request(images)
+
+        # Получаем результат batch-модерации изображений в Yandex Cloud Vision API.
+        with metrics.stage("rpc", self.provider_name):
+            response = await vision_async_client.BatchAnalyze(request, timeout=timeout)
 
-        return details
+        with metrics.stage("parse", self.provider_name):
+            return self._parse_response(response, len(images))
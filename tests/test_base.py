@@ -0,0 +1,142 @@
+import asyncio
+from typing import List, Optional
+
+import fsspec
+import grpc
+import pytest
+
+from datapipe_image_moderation.result import ImageModerationError, ImageStatus, ModerationResult
+from tests.utils import FakeImageModeration
+
+
+def test_moderate_chunk_splits_into_provider_batches() -> None:
+    """
+    Тест для проверки разбиения chunk на батчи по лимиту сервиса с сохранением порядка результатов.
+
+    :return: None.
+    """
+
+    file_system = fsspec.filesystem("memory")
+    image_urls = [f"memory://test_moderate_chunk/{i}.jpg" for i in range(40)]
+    for i, image_url in enumerate(image_urls):
+        file_system.pipe_file(image_url, b"x" * (i + 1))
+
+    moderation = FakeImageModeration()
+    details = moderation.moderate_chunk(
+        images=image_urls + image_urls[:3],
+        file_system_name="memory",
+        max_parallel_batches=3,
+    )
+
+    assert details == [{"size": i + 1} for i in range(40)] + [
+        {"size": 1},
+        {"size": 2},
+        {"size": 3},
+    ]
+    assert sorted(len(batch) for batch in moderation.sent_batches) == [10, 15, 15]
+
+
+def test_moderate_chunk_async() -> None:
+    """
+    Тест для проверки асинхронной модерации chunk с сохранением порядка результатов.
+
+    :return: None.
+    """
+
+    file_system = fsspec.filesystem("memory")
+    image_urls = [f"memory://test_moderate_chunk_async/{i}.jpg" for i in range(20)]
+    for i, image_url in enumerate(image_urls):
+        file_system.pipe_file(image_url, b"x" * (i + 1))
+
+    moderation = FakeImageModeration()
+    details = asyncio.run(
+        moderation.moderate_chunk_async(images=image_urls, file_system_name="memory", max_parallel_batches=2)
+    )
+
+    assert details == [{"size": i + 1} for i in range(20)]
+    assert sorted(len(batch) for batch in moderation.sent_batches) == [5, 15]
+
+
+def test_moderate_chunk_results_per_image_status() -> None:
+    """
+    Тест для проверки статуса по каждому изображению: ошибка загрузки одного изображения не влияет на остальные.
+
+    :return: None.
+    """
+
+    file_system = fsspec.filesystem("memory")
+    image_urls = [f"memory://test_moderate_chunk_results/{i}.jpg" for i in range(3)]
+    for i, image_url in enumerate(image_urls):
+        file_system.pipe_file(image_url, b"x" * (i + 1))
+
+    moderation = FakeImageModeration()
+    images = image_urls + ["memory://test_moderate_chunk_results/missing.jpg"]
+    results = moderation.moderate_chunk_results(images=images, file_system_name="memory")
+
+    assert [result.status for result in results] == [ImageStatus.OK] * 3 + [ImageStatus.FETCH_ERROR]
+    assert [result.details for result in results[:3]] == [
+        {"size": 1},
+        {"size": 2},
+        {"size": 3},
+    ]
+    assert not results[3].retryable
+    # Отсутствующий файл не повторяется.
+    assert len(moderation.sent_batches) == 1
+
+    with pytest.raises(ImageModerationError):
+        moderation.moderate_chunk(images=images, file_system_name="memory")
+
+
+class FlakyImageModeration(FakeImageModeration):
+    """
+    Клиент модерации для тестов: изображения длиной 2 байта с первой попытки получают повторяемую ошибку.
+    """
+
+    def __init__(self) -> None:
+        super().__init__()
+        self._failed = False
+
+    def _moderate_images(  # type: ignore
+        self, images: List[bytes], timeout: Optional[float] = None
+    ) -> List[ModerationResult]:
+        results = super()._moderate_images(images, timeout=timeout)
+        if self._failed:
+            return results
+
+        self._failed = True
+        return [
+            ModerationResult.from_api_error(grpc.StatusCode.UNAVAILABLE.value[0], "unavailable")
+            if len(image) == 2
+            else result
+            for image, result in zip(images, results)
+        ]
+
+
+def test_moderate_chunk_results_retries_only_failed_images() -> None:
+    """
+    Тест для проверки повторной отправки только изображений с повторяемыми ошибками.
+
+    :return: None.
+    """
+
+    file_system = fsspec.filesystem("memory")
+    image_urls = [f"memory://test_moderate_chunk_retries/{i}.jpg" for i in range(4)]
+    for i, image_url in enumerate(image_urls):
+        file_system.pipe_file(image_url, b"x" * (i + 1))
+
+    moderation = FlakyImageModeration()
+    results = moderation.moderate_chunk_results(images=image_urls, file_system_name="memory")
+
+    assert all(result.ok for result in results)
+    assert [sorted(batch) for batch in moderation.sent_batches] == [[b"x", b"xx", b"xxx", b"xxxx"], [b"xx"]]
+
+    moderation = FlakyImageModeration()
+    results = moderation.moderate_chunk_results(images=image_urls, file_system_name="memory", max_image_retries=0)
+
+    assert [result.status for result in results] == [
+        ImageStatus.OK,
+        ImageStatus.API_ERROR,
+        ImageStatus.OK,
+        ImageStatus.OK,
+    ]
+    assert results[1].retryable
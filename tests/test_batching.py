@@ -0,0 +1,114 @@
+import threading
+import time
+from typing import Any, List, Optional
+
+import fsspec
+import pytest
+
+from datapipe_image_moderation import base
+from datapipe_image_moderation.batching import ByteBudget, plan_batches
+from tests.utils import FakeImageModeration
+
+
+def test_plan_batches_packs_by_count_and_bytes() -> None:
+    """
+    Тест для проверки упаковки изображений в запросы по лимиту количества и суммарного размера.
+
+    :return: None.
+    """
+
+    sizes = {"a": 90, "b": 60, "c": 50, "d": 40, "e": 10, "f": 10, "g": 150}
+    batches = plan_batches(list(sizes), sizes, max_batch_size=3, max_request_bytes=100)
+
+    assert batches == [["g"], ["a", "e"], ["b", "d"], ["c", "f"]]
+    assert plan_batches(list(sizes), sizes, max_batch_size=3) == [["g", "a", "b"], ["c", "d", "e"], ["f"]]
+
+
+def test_byte_budget_limits_inflight_bytes() -> None:
+    """
+    Тест для проверки ограничения суммарного размера одновременно обрабатываемых батчей.
+
+    :return: None.
+    """
+
+    byte_budget = ByteBudget(max_bytes=100)
+    inflight = []
+    max_inflight = []
+    lock = threading.Lock()
+
+    def work(size: int) -> None:
+        with byte_budget.reserve(size):
+            with lock:
+                inflight.append(size)
+                max_inflight.append(sum(inflight))
+            time.sleep(0.01)
+            with lock:
+                inflight.remove(size)
+
+    threads = [threading.Thread(target=work, args=(size,)) for size in [60, 60, 30, 150, 10]]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    # Батч больше бюджета выполняется только в одиночку.
+    assert max(max_inflight) <= 150
+    assert all(value <= 100 or value == 150 for value in max_inflight)
+
+
+def test_moderate_chunk_respects_request_bytes() -> None:
+    """
+    Тест для проверки, что запросы к сервису не превышают лимит суммарного размера изображений.
+
+    :return: None.
+    """
+
+    file_system = fsspec.filesystem("memory")
+    image_sizes = [5, 70, 20, 45, 30, 80, 10, 35]
+    image_urls = [f"memory://test_request_bytes/{i}.jpg" for i in range(len(image_sizes))]
+    for image_url, size in zip(image_urls, image_sizes):
+        file_system.pipe_file(image_url, b"x" * size)
+
+    moderation = FakeImageModeration()
+    details = moderation.moderate_chunk(images=image_urls, file_system_name="memory", max_request_bytes=100)
+
+    assert details == [{"size": size} for size in image_sizes]
+    assert all(sum(len(image) for image in batch) <= 100 for batch in moderation.sent_batches)
+    assert len(moderation.sent_batches) == 3
+
+
+def test_moderate_chunk_size_lookup_only_when_enabled(monkeypatch: pytest.MonkeyPatch) -> None:
+    """
+    Тест для проверки, что размер изображений запрашивается у файловой системы до скачивания только с size_lookup.
+
+    :return: None.
+    """
+
+    file_system = fsspec.filesystem("memory")
+    image_sizes = [60, 50, 40]
+    image_urls = [f"memory://test_size_lookup/{i}.jpg" for i in range(len(image_sizes))]
+    for image_url, size in zip(image_urls, image_sizes):
+        file_system.pipe_file(image_url, b"x" * size)
+
+    lookups: List[List[str]] = []
+    get_image_sizes = base.get_image_sizes
+
+    def counting_get_image_sizes(image_url_list: List[str], **kwargs: Any) -> List[Optional[int]]:
+        lookups.append(list(image_url_list))
+        return get_image_sizes(image_url_list=image_url_list, **kwargs)
+
+    monkeypatch.setattr(base, "get_image_sizes", counting_get_image_sizes)
+
+    moderation = FakeImageModeration()
+    details = moderation.moderate_chunk(images=image_urls, file_system_name="memory", max_request_bytes=100)
+
+    # Без size_lookup запросы делятся по размеру загруженных bytes.
+    assert lookups == []
+    assert details == [{"size": size} for size in image_sizes]
+    assert sorted(len(batch) for batch in moderation.sent_batches) == [1, 2]
+
+    moderation = FakeImageModeration()
+    moderation.moderate_chunk(images=image_urls, file_system_name="memory", max_request_bytes=100, size_lookup=True)
+
+    assert lookups == [image_urls]
+    assert sorted(len(batch) for batch in moderation.sent_batches) == [1, 2]
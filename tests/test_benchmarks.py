@@ -0,0 +1,70 @@
+import json
+
+from benchmarks.fake_servers import (
+    FakeGoogleVisionServer,
+    FakeServerConfig,
+    FakeYandexVisionServer,
+    create_google_client,
+    create_yandex_client,
+)
+from benchmarks.run import main
+from datapipe_image_moderation.result import ImageStatus
+
+
+def test_fake_servers_per_image_errors() -> None:
+    """
+    Тест для проверки разбора ответов тестовых серверов клиентами Google и Yandex.
+
+    :return: None.
+    """
+
+    images = [f"image-{i}".encode() for i in range(5)]
+    for server, create_client in [
+        (FakeGoogleVisionServer(FakeServerConfig(image_error_rate=0.5)), create_google_client),
+        (FakeYandexVisionServer(FakeServerConfig(image_error_rate=0.5)), create_yandex_client),
+    ]:
+        with server:
+            results = create_client(server.address).moderate_images_results(images)  # type: ignore
+
+        assert {result.status for result in results} == {ImageStatus.OK, ImageStatus.API_ERROR}
+        assert all(result.retryable for result in results if not result.ok)
+        assert server.requests == 1
+
+
+def test_fake_servers_start_request() -> None:
+    """
+    Тест для проверки отправки запроса без ожидания ответа (для дублирования) клиентами Google и Yandex.
+
+    :return: None.
+    """
+
+    images = [f"image-{i}".encode() for i in range(5)]
+    for server, create_client in [
+        (FakeGoogleVisionServer(), create_google_client),
+        (FakeYandexVisionServer(), create_yandex_client),
+    ]:
+        with server:
+            call = create_client(server.address)._start_moderate_images(images, timeout=10.0)  # type: ignore
+            assert call is not None
+            results = call.result()
+
+        assert len(results) == len(images)
+        assert all(result.status == ImageStatus.OK for result in results)
+
+
+def test_benchmark_run(tmp_path) -> None:
+    """
+    Тест для проверки запуска бенчмарка и сохранения результатов.
+
+    :param tmp_path: временная директория (pytest).
+    :return: None.
+    """
+
+    output_path = str(tmp_path / "results.json")
+    args = ["--providers", "google", "--images", "20", "--image-sizes", "1024", "--batch-sizes", "10"]
+    results = main(args + ["--concurrency", "2", "--latency", "0", "--output", output_path])
+
+    assert [result["mode"] for result in results] == ["batch", "step"]
+    assert all(result["errors"] == 0 and result["images_per_second"] > 0 for result in results)
+    with open(output_path, encoding="utf-8") as output_file:
+        assert len(json.load(output_file)["results"]) == 2
@@ -0,0 +1,100 @@
+import multiprocessing
+import os
+import pickle
+
+import fsspec
+import pytest
+
+from datapipe_image_moderation.byte_cache import DiskByteCache
+from datapipe_image_moderation.utils import fetch_images, get_image_sizes
+
+
+def test_byte_cache_lru_eviction(tmp_path) -> None:
+    """
+    Тест для проверки вытеснения давно не читавшихся изображений при превышении лимита.
+
+    :param tmp_path: временная директория (pytest).
+    :return: None.
+    """
+
+    byte_cache = DiskByteCache(str(tmp_path / "images"), max_bytes=1000)
+    for i in range(3):
+        byte_cache.set(f"key-{i}", bytes([i]) * 300)
+        # Разное время записи, key-0 - самый старый.
+        os.utime(byte_cache._get_path(f"key-{i}"), (i, i))
+
+    # Чтение обновляет время доступа key-0.
+    assert byte_cache.get("key-0") == b"\x00" * 300
+    assert byte_cache.get("missing") is None
+
+    byte_cache.set("key-3", b"\x03" * 300)
+    byte_cache.evict()
+
+    assert byte_cache.get("key-1") is None
+    assert byte_cache.get("key-0") is not None
+    assert byte_cache.get("key-3") is not None
+    assert byte_cache.get_total_bytes() <= 1000
+    assert byte_cache.evictions >= 1
+    assert byte_cache.hits == 3
+    assert byte_cache.misses == 2
+    assert byte_cache.hit_rate == pytest.approx(0.6)
+
+    # Статистика не передаётся в другие процессы.
+    worker_byte_cache = pickle.loads(pickle.dumps(byte_cache))
+    assert worker_byte_cache.hits == 0
+    assert worker_byte_cache.get("key-3") == b"\x03" * 300
+
+
+def test_fetch_images_with_byte_cache(tmp_path) -> None:
+    """
+    Тест для проверки повторной загрузки изображений из кэша на диске без обращения к файловой системе.
+
+    :param tmp_path: временная директория (pytest).
+    :return: None.
+    """
+
+    fs = fsspec.filesystem("memory")
+    fs.pipe("/byte_cache/1.jpg", b"image-1")
+    image_urls = ["memory://byte_cache/1.jpg", "memory://byte_cache/missing.jpg"]
+    byte_cache = DiskByteCache(str(tmp_path / "images"))
+
+    fetched_images = fetch_images(image_urls, "memory", byte_cache=byte_cache)
+    assert fetched_images[0] == b"image-1"
+    assert isinstance(fetched_images[1], FileNotFoundError)
+
+    fs.rm("/byte_cache/1.jpg")
+    fetched_images = fetch_images(image_urls, "memory", byte_cache=byte_cache)
+    assert fetched_images[0] == b"image-1"
+    assert get_image_sizes(image_urls, "memory", byte_cache=byte_cache) == [7, None]
+    assert byte_cache.hits == 1
+
+
+def _fill_byte_cache(args) -> int:
+    directory, worker = args
+    byte_cache = DiskByteCache(directory, max_bytes=10_000)
+    for i in range(50):
+        byte_cache.set(f"worker-{worker}-{i}", b"x" * 500)
+        # Очистка в другом процессе может удалить только что записанное изображение, но недописанные файлы не читаются.
+        assert byte_cache.get(f"worker-{worker}-{i}") in (None, b"x" * 500)
+
+    return byte_cache.evictions
+
+
+@pytest.mark.skipif("fork" not in multiprocessing.get_all_start_methods(), reason="fork is not available")
+def test_byte_cache_multiple_processes(tmp_path) -> None:
+    """
+    Тест для проверки общего кэша на диске в нескольких процессах-обработчиках.
+
+    :param tmp_path: временная директория (pytest).
+    :return: None.
+    """
+
+    directory = str(tmp_path / "images")
+    with multiprocessing.get_context("fork").Pool(4) as pool:
+        evictions = pool.map(_fill_byte_cache, [(directory, worker) for worker in range(4)])
+
+    assert sum(evictions) > 0
+    byte_cache = DiskByteCache(directory, max_bytes=10_000)
+    byte_cache.evict()
+    assert byte_cache.get_total_bytes() <= 10_000
+    assert not any(name.startswith(".tmp-") for _, _, names in os.walk(directory) for name in names)
@@ -0,0 +1,75 @@
+import time
+
+import pytest
+from datapipe.store.database import DBConn
+
+from datapipe_image_moderation.cache import DBResultCache, InMemoryResultCache, ModerationResultCache
+from tests.utils import FakeImageModeration
+
+
+def test_duplicates_are_sent_once() -> None:
+    """
+    Тест для проверки дедупликации изображений внутри батча и между батчами через кэш.
+
+    :return: None.
+    """
+
+    moderation = FakeImageModeration()
+    result_cache = InMemoryResultCache()
+
+    details = moderation.moderate_images([b"a", b"bb", b"a"], result_cache=result_cache)
+    assert details == [{"size": 1}, {"size": 2}, {"size": 1}]
+    assert moderation.sent_images == [b"a", b"bb"]
+
+    moderation.moderate_images([b"bb", b"ccc"], result_cache=result_cache)
+    assert moderation.sent_images == [b"a", b"bb", b"ccc"]
+    assert (result_cache.hits, result_cache.misses) == (1, 3)
+
+
+def test_in_memory_cache_eviction() -> None:
+    """
+    Тест для проверки LRU-вытеснения и TTL кэша в памяти.
+
+    :return: None.
+    """
+
+    result_cache = InMemoryResultCache(max_size=2)
+    result_cache.set_many("fake", {"a": {"v": 1}, "b": {"v": 2}})
+    result_cache.get_many("fake", ["a"])
+    result_cache.set_many("fake", {"c": {"v": 3}})
+    assert set(result_cache.get_many("fake", ["a", "b", "c"])) == {"a", "c"}
+
+    result_cache = InMemoryResultCache(ttl=0.01)
+    result_cache.set_many("fake", {"a": {"v": 1}})
+    time.sleep(0.02)
+    assert result_cache.get_many("fake", ["a"]) == {}
+
+
+def test_db_cache(tmp_path) -> None:
+    """
+    Тест для проверки кэша результатов в таблице БД.
+
+    :param tmp_path: временная директория (pytest).
+    :return: None.
+    """
+
+    result_cache = DBResultCache(dbconn=DBConn(f"sqlite:///{tmp_path}/cache.sqlite"))
+    result_cache.set_many("fake", {"a": {"v": 1}})
+
+    assert result_cache.get_many("fake", ["a", "b"]) == {"a": {"v": 1}}
+    assert result_cache.get_many("other", ["a"]) == {}
+
+
+def test_cache_without_overrides_fails_on_construction() -> None:
+    """
+    Тест для проверки, что кэш без реализации чтения и записи нельзя создать.
+
+    :return: None.
+    """
+
+    class IncompleteResultCache(ModerationResultCache):
+        def set_many(self, provider, results) -> None:
+            pass
+
+    with pytest.raises(TypeError):
+        IncompleteResultCache()  # type: ignore
@@ -0,0 +1,55 @@
+from datapipe_image_moderation import clients
+from datapipe_image_moderation.clients import ModerationClientRegistry
+
+
+class FakeImageModerationGoogle:
+    def __init__(self, google_credentials_path=None) -> None:
+        self.google_credentials_path = google_credentials_path
+
+
+def test_registry_reuses_google_clients(monkeypatch) -> None:
+    """
+    Тест для проверки переиспользования клиентов Google Cloud Vision в реестре.
+
+    :param monkeypatch: pytest monkeypatch.
+    :return: None.
+    """
+
+    monkeypatch.setattr(clients, "ImageModerationGoogle", FakeImageModerationGoogle)
+    registry = ModerationClientRegistry()
+
+    client = registry.get_google("creds_a.json")
+
+    assert registry.get_google("creds_a.json") is client
+    assert registry.get_google("creds_b.json") is not client
+
+    registry.clear()
+
+    assert registry.get_google("creds_a.json") is not client
+
+
+def test_yandex_default_client_without_sdk_interceptor(monkeypatch) -> None:
+    """
+    Тест для проверки создания клиента Yandex Cloud Vision по умолчанию без интерцептора повторов SDK.
+
+    :param monkeypatch: pytest monkeypatch.
+    :return: None.
+    """
+
+    from datapipe_image_moderation import yandex_vision  # pylint: disable=import-outside-toplevel
+
+    token_refreshers = []
+
+    def create_yandex_vision_client(token_refresher):
+        token_refreshers.append(token_refresher)
+        return "vision_client"
+
+    # SDK yandexcloud при создании обращается к сети за списком endpoint.
+    monkeypatch.setattr(yandex_vision, "YandexIamTokenRefresher", lambda oauth_token: f"refresher-{oauth_token}")
+    monkeypatch.setattr(yandex_vision, "create_yandex_vision_client", create_yandex_vision_client)
+
+    moderation = yandex_vision.ImageModerationYandex(oauth_token="token", folder_id="folder")
+
+    assert moderation._yandex_vision_client == "vision_client"  # pylint: disable=protected-access
+    assert token_refreshers == ["refresher-token"]
+    assert moderation._token_refresher == "refresher-token"  # pylint: disable=protected-access
@@ -0,0 +1,80 @@
+import asyncio
+from typing import List
+
+import fsspec
+from google.cloud import vision
+
+from datapipe_image_moderation.google_vision import ImageModerationGoogle
+
+
+class FakeImageAnnotatorClient:
+    def __init__(self) -> None:
+        self.requests: List[vision.BatchAnnotateImagesRequest] = []
+
+    def batch_annotate_images(
+        self, request: vision.BatchAnnotateImagesRequest, **kwargs
+    ) -> vision.BatchAnnotateImagesResponse:
+        self.requests.append(request)
+        return vision.BatchAnnotateImagesResponse(
+            responses=[
+                vision.AnnotateImageResponse(
+                    safe_search_annotation=vision.SafeSearchAnnotation(adult=vision.Likelihood.VERY_UNLIKELY)
+                )
+                for _ in request.requests
+            ]
+        )
+
+
+def test_gcs_images_are_sent_by_uri() -> None:
+    """
+    Тест для проверки передачи изображений из GCS по URI, а остальных - в bytes, в одном запросе.
+
+    :return: None.
+    """
+
+    fsspec.filesystem("memory").pipe_file("memory://test_google_vision/image.png", b"image")
+    vision_client = FakeImageAnnotatorClient()
+    moderation = ImageModerationGoogle(vision_client=vision_client)  # type: ignore
+
+    details = moderation.moderate_batch(
+        images=["gs://bucket/image.png", "memory://test_google_vision/image.png"],
+        file_system_name="memory",
+        use_gcs_uri=True,
+    )
+
+    assert [image_details["adult"] for image_details in details] == ["VERY_UNLIKELY", "VERY_UNLIKELY"]
+
+    [request] = vision_client.requests
+    assert request.requests[0].image.source.image_uri == "gs://bucket/image.png"
+    assert request.requests[0].image.content == b""
+    assert request.requests[1].image.content == b"image"
+
+
+class FakeImageAnnotatorAsyncClient(FakeImageAnnotatorClient):
+    async def batch_annotate_images(  # type: ignore
+        self, request: vision.BatchAnnotateImagesRequest, **kwargs
+    ) -> vision.BatchAnnotateImagesResponse:
+        return super().batch_annotate_images(request, **kwargs)
+
+
+def test_moderate_batch_async(monkeypatch) -> None:
+    """
+    Тест для проверки асинхронной модерации изображений в Google Cloud Vision.
+
+    :param monkeypatch: pytest monkeypatch.
+    :return: None.
+    """
+
+    fsspec.filesystem("memory").pipe_file("memory://test_google_vision/async.png", b"image")
+    vision_async_client = FakeImageAnnotatorAsyncClient()
+    moderation = ImageModerationGoogle(vision_client=FakeImageAnnotatorClient())  # type: ignore
+    monkeypatch.setattr(moderation, "_create_async_client", lambda: vision_async_client)
+
+    details = asyncio.run(
+        moderation.moderate_batch_async(images=["memory://test_google_vision/async.png"], file_system_name="memory")
+    )
+
+    assert details == [
+        {"adult": "VERY_UNLIKELY", "spoof": "UNKNOWN", "medical": "UNKNOWN", "violence": "UNKNOWN", "racy": "UNKNOWN"}
+    ]
+    assert vision_async_client.requests[0].requests[0].image.content == b"image"
@@ -0,0 +1,62 @@
+import pytest
+
+from benchmarks.import_time import get_imported_sdk_modules, main
+from datapipe_image_moderation import clients
+from datapipe_image_moderation.providers import PROVIDERS, get_provider_class, register_provider
+
+
+@pytest.mark.parametrize(
+    "module",
+    [
+        "datapipe_image_moderation.pipeline",
+        "datapipe_image_moderation.clients",
+        "datapipe_image_moderation.worker",
+    ],
+)
+def test_pipeline_imports_without_provider_sdk(module) -> None:
+    """
+    Тест для проверки, что шаги пайплайна и реестр клиентов не импортируют SDK сервисов модерации.
+
+    :param module: название модуля.
+    :return: None.
+    """
+
+    assert get_imported_sdk_modules(module) == []
+
+
+def test_provider_registry() -> None:
+    """
+    Тест для проверки ленивого получения классов клиентов по названию сервиса.
+
+    :return: None.
+    """
+
+    from datapipe_image_moderation.google_vision import ImageModerationGoogle  # pylint: disable=import-outside-toplevel
+
+    assert get_provider_class("google") is ImageModerationGoogle
+    assert clients.ImageModerationGoogle is ImageModerationGoogle
+
+    register_provider("fake", "tests.utils:FakeImageModeration")
+    try:
+        client = clients.get_image_moderation("fake")
+        assert type(client).__name__ == "FakeImageModeration"
+        assert clients.get_image_moderation("fake") is client
+    finally:
+        clients.client_registry.clear()
+        PROVIDERS.pop("fake")
+
+    with pytest.raises(ValueError):
+        get_provider_class("unknown")
+
+
+def test_import_time_benchmark() -> None:
+    """
+    Тест для проверки запуска бенчмарка времени импорта.
+
+    :return: None.
+    """
+
+    results = main(["--modules", "datapipe_image_moderation.yandex_vision", "--repeat", "1"])
+
+    assert results["datapipe_image_moderation.yandex_vision"]["min_seconds"] > 0
+    assert "yandexcloud" in results["datapipe_image_moderation.yandex_vision"]["sdk_modules"]
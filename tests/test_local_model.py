@@ -0,0 +1,126 @@
+import io
+
+import fsspec
+import pandas as pd
+import pytest
+import sqlalchemy as sa
+from datapipe.compute import Catalog, Pipeline, Table, build_compute, run_steps
+from datapipe.datatable import DataStore
+from datapipe.store.database import DBConn, TableStoreDB
+
+from datapipe_image_moderation.local_model import ImageModerationLocal
+from datapipe_image_moderation.pipeline import LocalImageClassificationStep
+from datapipe_image_moderation.result import ImageStatus
+
+onnx = pytest.importorskip("onnx")
+pytest.importorskip("onnxruntime")
+Image = pytest.importorskip("PIL.Image")
+
+CLASS_NAMES = ("red", "green", "blue")
+
+
+@pytest.fixture
+def model_path(tmp_path) -> str:
+    """
+    Модель для тестов: оценка класса - средняя яркость канала RGB (вход NHWC).
+    """
+
+    from onnx import TensorProto, helper  # pylint: disable=import-outside-toplevel
+
+    graph = helper.make_graph(
+        [helper.make_node("ReduceMean", ["images"], ["scores"], axes=[1, 2], keepdims=0)],
+        "channel_mean",
+        [helper.make_tensor_value_info("images", TensorProto.FLOAT, [None, 8, 8, 3])],
+        [helper.make_tensor_value_info("scores", TensorProto.FLOAT, [None, 3])],
+    )
+    model = helper.make_model(graph, opset_imports=[helper.make_opsetid("", 13)])
+    model.ir_version = 8
+
+    path = tmp_path / "model.onnx"
+    onnx.save(model, str(path))
+    return str(path)
+
+
+def get_image(color) -> bytes:
+    output = io.BytesIO()
+    Image.new("RGB", (32, 16), color).save(output, format="PNG")
+    return output.getvalue()
+
+
+def test_local_moderate_images(model_path) -> None:
+    """
+    Тест для проверки модерации батча изображений локальной моделью.
+
+    :param model_path: путь к модели для тестов.
+    :return: None.
+    """
+
+    moderation = ImageModerationLocal(model_path, class_names=CLASS_NAMES, input_size=8, num_threads=1)
+    results = moderation.moderate_images_results([get_image((255, 0, 0)), b"not an image", get_image((0, 0, 255))])
+
+    assert [result.status for result in results] == [ImageStatus.OK, ImageStatus.API_ERROR, ImageStatus.OK]
+    assert not results[1].retryable
+    assert results[0].details == pytest.approx({"red": 1.0, "green": 0.0, "blue": 0.0})
+    assert results[2].details == pytest.approx({"red": 0.0, "green": 0.0, "blue": 1.0})
+
+    moderation = ImageModerationLocal(model_path, class_names=CLASS_NAMES, input_size=8, softmax=True)
+    details = moderation.moderate_images([get_image((0, 255, 0))])[0]
+    assert max(details, key=details.get) == "green"
+    assert sum(details.values()) == pytest.approx(1.0)
+
+
+def test_local_image_classification_step(tmp_path, model_path) -> None:
+    """
+    Тест для проверки шага пайплайна с локальной моделью и типизированными колонками.
+
+    :param tmp_path: временная директория (pytest).
+    :param model_path: путь к модели для тестов.
+    :return: None.
+    """
+
+    dbconn = DBConn(f"sqlite:///{tmp_path}/local.db")
+    ds = DataStore(dbconn, create_meta_table=True)
+    catalog = Catalog(
+        {
+            "images": Table(
+                store=TableStoreDB(
+                    dbconn=dbconn,
+                    name="images",
+                    data_sql_schema=[
+                        sa.Column("image_id", sa.String, primary_key=True),
+                        sa.Column("image_url", sa.String),
+                    ],
+                    create_table=True,
+                )
+            )
+        }
+    )
+    step = LocalImageClassificationStep(
+        input="images",
+        output="images_moderation",
+        dbconn=dbconn,
+        file_system_name="memory",
+        model_path=model_path,
+        class_names=CLASS_NAMES,
+        input_size=8,
+        status_field="status",
+        typed_output=True,
+    )
+
+    fs = fsspec.filesystem("memory")
+    fs.pipe("/local/red.png", get_image((255, 0, 0)))
+    fs.pipe("/local/broken.png", b"not an image")
+
+    steps = build_compute(ds, catalog, Pipeline([step]))
+    ds.get_table("images").store_chunk(
+        pd.DataFrame(
+            {"image_id": ["red", "broken"], "image_url": ["memory://local/red.png", "memory://local/broken.png"]}
+        )
+    )
+    run_steps(ds, steps)
+
+    output_df = ds.get_table("images_moderation").get_data().set_index("image_id")
+    assert output_df.loc["red", "red"] == pytest.approx(1.0)
+    assert output_df.loc["red", "status"] == "ok"
+    assert pd.isna(output_df.loc["broken", "red"])
+    assert output_df.loc["broken", "status"] == "api_error"
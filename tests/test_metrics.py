@@ -0,0 +1,150 @@
+from typing import List
+
+import fsspec
+import pytest
+
+from benchmarks.fake_servers import FakeGoogleVisionServer, create_google_client
+from benchmarks.run import Scenario, run_scenario
+from datapipe_image_moderation import metrics
+from datapipe_image_moderation.cache import InMemoryResultCache
+from datapipe_image_moderation.metrics import CallbackMetricsSink, MetricEvent, OpenTelemetryMetricsSink
+from tests.utils import FakeImageModeration
+
+
+@pytest.fixture
+def events():
+    events: List[MetricEvent] = []
+    sink = metrics.add_metrics_sink(CallbackMetricsSink(events.append))
+    yield events
+    metrics.remove_metrics_sink(sink)
+
+
+def get_stages(events: List[MetricEvent]) -> set:
+    return {event.attributes["stage"] for event in events if event.name == "stage_seconds"}
+
+
+def get_total(events: List[MetricEvent], name: str) -> float:
+    return sum(event.value for event in events if event.name == name)
+
+
+def test_metrics_disabled_by_default() -> None:
+    """
+    Тест для проверки, что без получателей метрик этапы не создают context manager.
+
+    :return: None.
+    """
+
+    assert not metrics.is_enabled()
+    assert metrics.stage("fetch", "fake") is metrics.stage("rpc", "fake")
+
+
+def test_chunk_metrics(events: List[MetricEvent]) -> None:
+    """
+    Тест для проверки метрик этапов, объёма данных и кэша при модерации chunk.
+
+    :return: None.
+    """
+
+    file_system = fsspec.filesystem("memory")
+    image_urls = [f"memory://test_chunk_metrics/{i}.jpg" for i in range(20)]
+    for i, image_url in enumerate(image_urls):
+        file_system.pipe_file(image_url, b"x" * (i + 1))
+
+    moderation = FakeImageModeration()
+    moderation.moderate_chunk(
+        images=image_urls, file_system_name="memory", result_cache=InMemoryResultCache(), size_lookup=True
+    )
+
+    assert {"size_lookup", "fetch", "cache_lookup", "cache_save"} <= get_stages(events)
+    assert get_total(events, "bytes_fetched") == sum(range(1, 21))
+    assert get_total(events, "bytes_sent") == sum(range(1, 21))
+    assert get_total(events, "images_per_rpc") == 20
+    assert get_total(events, "cache_misses") == 20
+    assert get_total(events, "images") == 20
+    assert all(event.attributes["provider"] == "fake" for event in events)
+
+
+def test_step_metrics(events: List[MetricEvent]) -> None:
+    """
+    Тест для проверки метрик этапов запроса к сервису и шага пайплайна.
+
+    :return: None.
+    """
+
+    scenario = Scenario(
+        provider="google",
+        mode="step",
+        images=30,
+        image_size=128,
+        batch_size=30,
+        concurrency=2,
+        latency=0.0,
+        error_rate=0.0,
+        quota=None,
+    )
+    run_scenario(scenario)
+
+    assert {"fetch", "request_build", "rpc", "parse", "transform", "write"} <= get_stages(events)
+    assert get_total(events, "bytes_sent") == 30 * 128
+
+
+def test_opentelemetry_sink() -> None:
+    """
+    Тест для проверки спанов и метрик OpenTelemetry.
+
+    :return: None.
+    """
+
+    sdk_metrics = pytest.importorskip("opentelemetry.sdk.metrics")
+    from opentelemetry.sdk.metrics.export import InMemoryMetricReader
+    from opentelemetry.sdk.trace import TracerProvider
+    from opentelemetry.sdk.trace.export import SimpleSpanProcessor
+    from opentelemetry.sdk.trace.export.in_memory_span_exporter import InMemorySpanExporter
+
+    span_exporter = InMemorySpanExporter()
+    tracer_provider = TracerProvider()
+    tracer_provider.add_span_processor(SimpleSpanProcessor(span_exporter))
+    metric_reader = InMemoryMetricReader()
+    meter_provider = sdk_metrics.MeterProvider(metric_readers=[metric_reader])
+
+    sink = metrics.add_metrics_sink(
+        OpenTelemetryMetricsSink(
+            tracer=tracer_provider.get_tracer("test"),
+            meter=meter_provider.get_meter("test"),
+        )
+    )
+    try:
+        with FakeGoogleVisionServer() as server:
+            create_google_client(server.address).moderate_images([b"a", b"b"])
+    finally:
+        metrics.remove_metrics_sink(sink)
+
+    span_names = {span.name for span in span_exporter.get_finished_spans()}
+    assert {"image_moderation.request_build", "image_moderation.rpc", "image_moderation.parse"} <= span_names
+
+    metric_names = {
+        metric.name
+        for resource_metrics in metric_reader.get_metrics_data().resource_metrics
+        for scope_metrics in resource_metrics.scope_metrics
+        for metric in scope_metrics.metrics
+    }
+    assert {"image_moderation.stage_seconds", "image_moderation.bytes_sent"} <= metric_names
+
+
+def test_prometheus_sink() -> None:
+    """
+    Тест для проверки метрик prometheus_client.
+
+    :return: None.
+    """
+
+    prometheus_client = pytest.importorskip("prometheus_client")
+
+    registry = prometheus_client.CollectorRegistry()
+    sink = metrics.add_metrics_sink(metrics.PrometheusMetricsSink(registry=registry))
+    try:
+        FakeImageModeration().moderate_images([b"abc"])
+    finally:
+        metrics.remove_metrics_sink(sink)
+
+    assert registry.get_sample_value("image_moderation_bytes_sent_total", {"provider": "fake"}) == 3
@@ -0,0 +1,383 @@
+from typing import List, Optional
+
+import fsspec
+import grpc
+import pandas as pd
+import pytest
+import sqlalchemy as sa
+from datapipe.compute import Catalog, Pipeline, Table, build_compute, run_steps
+from datapipe.datatable import DataStore
+from datapipe.store.database import DBConn, TableStoreDB
+
+from datapipe_image_moderation import clients, multi
+from datapipe_image_moderation.multi import (
+    GOOGLE_ESCALATION_POLICY,
+    YANDEX_ESCALATION_POLICY,
+    moderate_chunk_multi_results,
+)
+from datapipe_image_moderation.pipeline import CascadeImageClassificationStep, MultiProviderImageClassificationStep
+from datapipe_image_moderation.providers import PROVIDERS, register_provider
+from datapipe_image_moderation.result import ImageStatus, ModerationResult
+from tests.utils import FakeImageModeration
+
+
+class SmallBatchFakeImageModeration(FakeImageModeration):
+    """
+    Клиент модерации для тестов с маленьким батчем, первый запрос завершается повторяемой ошибкой.
+    """
+
+    provider_name = "fake_small"
+    max_batch_size = 2
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.failed = False
+
+    def _moderate_images(  # type: ignore
+        self, images: List[bytes], timeout: Optional[float] = None
+    ) -> List[ModerationResult]:
+        if not self.failed:
+            self.failed = True
+            return [ModerationResult.from_api_error(grpc.StatusCode.UNAVAILABLE.value[0], "unavailable")] * len(images)
+
+        return super()._moderate_images(images, timeout)
+
+
+@pytest.fixture
+def fake_providers():
+    register_provider("fake", "tests.utils:FakeImageModeration")
+    register_provider("fake_small", "tests.test_multi:SmallBatchFakeImageModeration")
+    yield
+    clients.client_registry.clear()
+    PROVIDERS.pop("fake")
+    PROVIDERS.pop("fake_small")
+
+
+@pytest.fixture
+def images() -> List[str]:
+    fs = fsspec.filesystem("memory")
+    image_urls = []
+    for i in range(5):
+        fs.pipe(f"/multi/{i}.jpg", b"image" * (i + 1))
+        image_urls.append(f"memory://multi/{i}.jpg")
+
+    return image_urls
+
+
+def test_moderate_chunk_multi_results(fake_providers, images, monkeypatch) -> None:
+    """
+    Тест для проверки однократной загрузки изображений и повтора только в сервис с ошибкой.
+
+    :param fake_providers: регистрация клиентов модерации для тестов.
+    :param images: URL изображений в памяти.
+    :param monkeypatch: monkeypatch (pytest).
+    :return: None.
+    """
+
+    fetched_urls: List[str] = []
+    fetch_images = multi.fetch_images
+
+    def fetch_images_spy(image_url_list: List[str], **kwargs):
+        fetched_urls.extend(image_url_list)
+        return fetch_images(image_url_list=image_url_list, **kwargs)
+
+    monkeypatch.setattr(multi, "fetch_images", fetch_images_spy)
+
+    moderation_clients = {
+        "fake": clients.get_image_moderation("fake"),
+        "fake_small": clients.get_image_moderation("fake_small"),
+    }
+    results = moderate_chunk_multi_results(
+        moderation_clients,
+        images=images + images[:1] + ["memory://multi/missing.jpg"],
+        file_system_name="memory",
+        window_size=2,
+    )
+
+    sizes = [5, 10, 15, 20, 25, 5]
+    for provider_name in ("fake", "fake_small"):
+        assert [result.details for result in results[provider_name][:-1]] == [{"size": size} for size in sizes]
+        assert results[provider_name][-1].status == ImageStatus.FETCH_ERROR
+
+    # Каждый URL загружается один раз, повторно - только изображения неудачного запроса (батч из двух).
+    assert sorted(set(fetched_urls)) == sorted(images + ["memory://multi/missing.jpg"])
+    assert len(fetched_urls) == len(images) + 1 + 2
+    assert len(moderation_clients["fake"].sent_images) == 5
+    assert all(len(batch) <= 2 for batch in moderation_clients["fake_small"].sent_batches)
+
+
+@pytest.mark.parametrize("separate_outputs", [False, True])
+def test_multi_provider_step(fake_providers, images, tmp_path, separate_outputs) -> None:
+    """
+    Тест для проверки шага модерации несколькими сервисами с результатом в одной или отдельных таблицах.
+
+    :param fake_providers: регистрация клиентов модерации для тестов.
+    :param images: URL изображений в памяти.
+    :param tmp_path: временная директория (pytest).
+    :param separate_outputs: писать ли результат каждого сервиса в отдельную таблицу.
+    :return: None.
+    """
+
+    dbconn = DBConn(f"sqlite:///{tmp_path}/multi.db")
+    ds = DataStore(dbconn, create_meta_table=True)
+    catalog = Catalog(
+        {
+            "images": Table(
+                store=TableStoreDB(
+                    dbconn=dbconn,
+                    name="images",
+                    data_sql_schema=[
+                        sa.Column("image_id", sa.String, primary_key=True),
+                        sa.Column("image_url", sa.String),
+                    ],
+                    create_table=True,
+                )
+            )
+        }
+    )
+    step = MultiProviderImageClassificationStep(
+        input="images",
+        output=(
+            {"fake": "images_fake", "fake_small": "images_fake_small"} if separate_outputs else "images_moderation"
+        ),
+        dbconn=dbconn,
+        file_system_name="memory",
+        providers={"fake": {}, "fake_small": {}},
+        status_field="status",
+    )
+
+    steps = build_compute(ds, catalog, Pipeline([step]))
+    ds.get_table("images").store_chunk(
+        pd.DataFrame({"image_id": [str(i) for i in range(len(images))], "image_url": images})
+    )
+    run_steps(ds, steps)
+
+    if separate_outputs:
+        for table_name in ("images_fake", "images_fake_small"):
+            output_df = ds.get_table(table_name).get_data().sort_values("image_id")
+            assert output_df["details"].tolist() == [{"size": 5 * (i + 1)} for i in range(5)]
+            assert output_df["status"].tolist() == ["ok"] * 5
+    else:
+        output_df = ds.get_table("images_moderation").get_data().sort_values("image_id")
+        assert output_df["fake_details"].tolist() == [{"size": 5 * (i + 1)} for i in range(5)]
+        assert output_df["fake_small_details"].tolist() == output_df["fake_details"].tolist()
+        assert output_df["fake_small_status"].tolist() == ["ok"] * 5
+
+
+def test_multi_provider_step_outputs_must_match_providers(tmp_path) -> None:
+    """
+    Тест для проверки ошибки при несоответствии таблиц результатов сервисам.
+
+    :param tmp_path: временная директория (pytest).
+    :return: None.
+    """
+
+    dbconn = DBConn(f"sqlite:///{tmp_path}/multi.db")
+    ds = DataStore(dbconn, create_meta_table=True)
+    catalog = Catalog(
+        {
+            "images": Table(
+                store=TableStoreDB(
+                    dbconn=dbconn,
+                    name="images",
+                    data_sql_schema=[sa.Column("image_id", sa.String, primary_key=True)],
+                    create_table=True,
+                )
+            )
+        }
+    )
+    step = MultiProviderImageClassificationStep(
+        input="images",
+        output={"google": "images_google"},
+        dbconn=dbconn,
+        file_system_name="memory",
+        providers={"google": {}, "yandex": {}},
+    )
+
+    with pytest.raises(ValueError):
+        build_compute(ds, catalog, Pipeline([step]))
+
+
+class ScoreFakeImageModeration(FakeImageModeration):
+    """
+    Клиент модерации для тестов: вероятность adult записана в самом изображении.
+    """
+
+    provider_name = "fake_score"
+
+    def _moderate_images(  # type: ignore
+        self, images: List[bytes], timeout: Optional[float] = None
+    ) -> List[ModerationResult]:
+        self.sent_images.extend(images)
+        return [ModerationResult.from_details({"adult": float(image)}) for image in images]
+
+
+def test_escalation_policy() -> None:
+    """
+    Тест для проверки неуверенных результатов по оценкам Yandex и вероятностям Google.
+
+    :return: None.
+    """
+
+    assert YANDEX_ESCALATION_POLICY.needs_escalation(ModerationResult.from_details({"adult": 0.5}))
+    assert not YANDEX_ESCALATION_POLICY.needs_escalation(ModerationResult.from_details({"adult": 0.05}))
+    assert not YANDEX_ESCALATION_POLICY.needs_escalation(ModerationResult.from_fetch_error(OSError("not found")))
+
+    assert GOOGLE_ESCALATION_POLICY.needs_escalation(
+        ModerationResult.from_details({"adult": "UNLIKELY", "racy": "POSSIBLE"})
+    )
+    assert not GOOGLE_ESCALATION_POLICY.needs_escalation(
+        ModerationResult.from_details({"adult": "VERY_UNLIKELY", "racy": "LIKELY"})
+    )
+
+
+def test_cascade_step(fake_providers, tmp_path) -> None:
+    """
+    Тест для проверки каскадного шага: во второй уровень попадают только неуверенные изображения.
+
+    :param fake_providers: регистрация клиентов модерации для тестов.
+    :param tmp_path: временная директория (pytest).
+    :return: None.
+    """
+
+    register_provider("fake_score", "tests.test_multi:ScoreFakeImageModeration")
+    fs = fsspec.filesystem("memory")
+    scores = ["0.01", "0.5", "0.95", "0.3", "0.02"]
+    for i, score in enumerate(scores):
+        fs.pipe(f"/cascade/{i}.jpg", score.encode())
+
+    dbconn = DBConn(f"sqlite:///{tmp_path}/cascade.db")
+    ds = DataStore(dbconn, create_meta_table=True)
+    catalog = Catalog(
+        {
+            "images": Table(
+                store=TableStoreDB(
+                    dbconn=dbconn,
+                    name="images",
+                    data_sql_schema=[
+                        sa.Column("image_id", sa.String, primary_key=True),
+                        sa.Column("image_url", sa.String),
+                    ],
+                    create_table=True,
+                )
+            )
+        }
+    )
+    step = CascadeImageClassificationStep(
+        input="images",
+        output="images_moderation",
+        dbconn=dbconn,
+        file_system_name="memory",
+        first_tier="fake_score",
+        second_tier="fake_small",
+        status_field="status",
+        window_size=2,
+    )
+
+    try:
+        steps = build_compute(ds, catalog, Pipeline([step]))
+        ds.get_table("images").store_chunk(
+            pd.DataFrame(
+                {
+                    "image_id": [str(i) for i in range(len(scores))],
+                    "image_url": [f"memory://cascade/{i}.jpg" for i in range(len(scores))],
+                }
+            )
+        )
+        run_steps(ds, steps)
+    finally:
+        PROVIDERS.pop("fake_score")
+
+    output_df = ds.get_table("images_moderation").get_data().sort_values("image_id")
+    assert output_df["tier"].tolist() == ["fake_score", "fake_small", "fake_score", "fake_small", "fake_score"]
+    assert output_df["details"].tolist() == [
+        {"adult": 0.01},
+        {"size": 3},
+        {"adult": 0.95},
+        {"size": 3},
+        {"adult": 0.02},
+    ]
+    assert output_df["status"].tolist() == ["ok"] * 5
+    assert output_df["escalation_status"].fillna("").tolist() == ["", "ok", "", "ok", ""]
+
+    # Неуверенные изображения из разных окон отправлены во второй уровень одним батчем (после повтора).
+    second_tier = clients.get_image_moderation("fake_small")
+    assert [sorted(batch) for batch in second_tier.sent_batches] == [[b"0.3", b"0.5"]]
+
+
+class FailingFakeImageModeration(FakeImageModeration):
+    """
+    Клиент модерации для тестов, который возвращает неповторяемую ошибку для всех изображений.
+    """
+
+    provider_name = "fake_failing"
+
+    def _moderate_images(  # type: ignore
+        self, images: List[bytes], timeout: Optional[float] = None
+    ) -> List[ModerationResult]:
+        return [ModerationResult.from_api_error(grpc.StatusCode.INVALID_ARGUMENT.value[0], "bad image")] * len(images)
+
+
+def test_cascade_step_keeps_first_tier_on_second_tier_error(fake_providers, tmp_path) -> None:
+    """
+    Тест для проверки записи результата первого уровня, если второй уровень вернул ошибку.
+
+    :param fake_providers: регистрация клиентов модерации для тестов.
+    :param tmp_path: временная директория (pytest).
+    :return: None.
+    """
+
+    register_provider("fake_score", "tests.test_multi:ScoreFakeImageModeration")
+    register_provider("fake_failing", "tests.test_multi:FailingFakeImageModeration")
+    fs = fsspec.filesystem("memory")
+    scores = ["0.01", "0.5"]
+    for i, score in enumerate(scores):
+        fs.pipe(f"/cascade_failing/{i}.jpg", score.encode())
+
+    dbconn = DBConn(f"sqlite:///{tmp_path}/cascade.db")
+    ds = DataStore(dbconn, create_meta_table=True)
+    catalog = Catalog(
+        {
+            "images": Table(
+                store=TableStoreDB(
+                    dbconn=dbconn,
+                    name="images",
+                    data_sql_schema=[
+                        sa.Column("image_id", sa.String, primary_key=True),
+                        sa.Column("image_url", sa.String),
+                    ],
+                    create_table=True,
+                )
+            )
+        }
+    )
+    step = CascadeImageClassificationStep(
+        input="images",
+        output="images_moderation",
+        dbconn=dbconn,
+        file_system_name="memory",
+        first_tier="fake_score",
+        second_tier="fake_failing",
+        status_field="status",
+    )
+
+    try:
+        steps = build_compute(ds, catalog, Pipeline([step]))
+        ds.get_table("images").store_chunk(
+            pd.DataFrame(
+                {
+                    "image_id": [str(i) for i in range(len(scores))],
+                    "image_url": [f"memory://cascade_failing/{i}.jpg" for i in range(len(scores))],
+                }
+            )
+        )
+        run_steps(ds, steps)
+    finally:
+        PROVIDERS.pop("fake_score")
+        PROVIDERS.pop("fake_failing")
+
+    output_df = ds.get_table("images_moderation").get_data().sort_values("image_id")
+    assert output_df["tier"].tolist() == ["fake_score", "fake_score"]
+    assert output_df["details"].tolist() == [{"adult": 0.01}, {"adult": 0.5}]
+    assert output_df["status"].tolist() == ["ok", "ok"]
+    assert output_df["escalation_status"].fillna("").tolist() == ["", "api_error"]
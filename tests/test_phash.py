@@ -0,0 +1,190 @@
+import io
+import pickle
+import random
+import time
+
+import numpy as np
+import pytest
+from datapipe.store.database import DBConn
+
+from datapipe_image_moderation.phash import BKTree, PerceptualHashCache, get_dhash, get_hamming_distance, get_phash
+from tests.utils import FakeImageModeration
+
+Image = pytest.importorskip("PIL.Image")
+
+
+def get_image(seed: int, size: int = 256, image_format: str = "PNG", quality: int = 95) -> bytes:
+    """
+    Метод создания гладкого случайного изображения (пятна цвета) для тестов.
+    """
+
+    pixels = np.random.RandomState(seed).randint(0, 256, (6, 6, 3), dtype=np.uint8)
+    output = io.BytesIO()
+    Image.fromarray(pixels).resize((size, size), Image.BICUBIC).save(output, format=image_format, quality=quality)
+    return output.getvalue()
+
+
+def test_bk_tree_search() -> None:
+    """
+    Тест для проверки поиска BK-дерева относительно полного перебора.
+
+    :return: None.
+    """
+
+    rng = random.Random(0)
+    values = [rng.getrandbits(16) for _ in range(500)]
+    tree = BKTree()
+    for i, value in enumerate(values):
+        tree.add(value, str(i))
+
+    assert len(tree) == len(values)
+    for query in [rng.getrandbits(16) for _ in range(20)]:
+        expected = sorted(
+            (get_hamming_distance(query, value), str(i))
+            for i, value in enumerate(values)
+            if get_hamming_distance(query, value) <= 3
+        )
+        assert tree.search(query, 3) == expected
+
+
+@pytest.mark.parametrize("get_hash", [get_phash, get_dhash])
+def test_perceptual_hash_variants(get_hash) -> None:
+    """
+    Тест для проверки близости хэшей уменьшенных и пережатых вариантов изображения.
+
+    :param get_hash: функция перцептивного хэша.
+    :return: None.
+    """
+
+    original = get_hash(get_image(0))
+    variant = get_hash(get_image(0, size=120, image_format="JPEG", quality=60))
+    other = get_hash(get_image(1))
+
+    assert get_hamming_distance(original, variant) <= 6
+    assert get_hamming_distance(original, other) > 12
+
+
+def test_perceptual_hash_cache(tmp_path) -> None:
+    """
+    Тест для проверки переиспользования результата модерации похожего изображения.
+
+    :param tmp_path: временная директория (pytest).
+    :return: None.
+    """
+
+    dbconn = DBConn(f"sqlite:///{tmp_path}/phash.db")
+    result_cache = PerceptualHashCache(dbconn, refresh_interval=0)
+    moderation = FakeImageModeration()
+
+    original = get_image(0)
+    moderation.moderate_images([original, b"not an image"], result_cache=result_cache)
+    assert moderation.sent_images == [original, b"not an image"]
+
+    variant = get_image(0, size=120, image_format="JPEG", quality=60)
+    other = get_image(1)
+    details = moderation.moderate_images([variant, other], result_cache=result_cache)
+
+    # Вариант получил результат оригинала без запроса к сервису.
+    assert details == [{"size": len(original)}, {"size": len(other)}]
+    assert moderation.sent_images == [original, b"not an image", other]
+    assert result_cache.near_hits == 1
+
+    # Другой процесс загружает хэши из таблицы.
+    worker_cache = pickle.loads(pickle.dumps(result_cache))
+    assert worker_cache.get_many_images("fake", {"variant": variant}) == {"variant": {"size": len(original)}}
+    assert worker_cache.get_many_images("other", {"variant": variant}) == {}
+
+
+def test_perceptual_hash_cache_late_rows(tmp_path) -> None:
+    """
+    Тест для проверки загрузки в BK-дерево строк другого процесса, закоммиченных после более новых строк.
+
+    :param tmp_path: временная директория (pytest).
+    :return: None.
+    """
+
+    dbconn = DBConn(f"sqlite:///{tmp_path}/phash.db")
+    result_cache = PerceptualHashCache(dbconn, refresh_interval=0)
+    writer_cache = pickle.loads(pickle.dumps(result_cache))
+
+    original, other = get_image(0), get_image(1)
+    result_cache.set_many_images("fake", {"other": {"size": 1}}, {"other": other})
+    assert result_cache.get_many_images("fake", {"variant": get_image(0, size=120)}) == {}
+
+    # Строка с created_at раньше уже загруженных (расхождение часов или долгая транзакция другого процесса).
+    writer_cache.set_many_images("fake", {"original": {"size": 2}}, {"original": original})
+    data_table = result_cache._table_store.data_table
+    with dbconn.con.begin() as con:
+        con.execute(
+            data_table.update().where(data_table.c.image_hash == "original").values(created_at=time.time() - 60)
+        )
+
+    variant = get_image(0, size=120, image_format="JPEG", quality=60)
+    assert result_cache.get_many_images("fake", {"variant": variant}) == {"variant": {"size": 2}}
+
+
+class LockCheckingDBConn:
+    """
+    Коннектор к БД, проверяющий, что запросы выполняются без блокировки индекса кэша.
+    """
+
+    def __init__(self, dbconn: DBConn, result_cache: PerceptualHashCache) -> None:
+        self._dbconn = dbconn
+        self._result_cache = result_cache
+
+    @property
+    def con(self) -> "LockCheckingDBConn":
+        return self
+
+    def begin(self):
+        assert not self._result_cache._index_lock.locked()
+        return self._dbconn.con.begin()
+
+    def __getattr__(self, name: str):
+        return getattr(self._dbconn, name)
+
+
+def test_perceptual_hash_cache_persists_near_hits(tmp_path, monkeypatch) -> None:
+    """
+    Тест для проверки сохранения результата похожего изображения под его content-hash и запросов к БД
+    без блокировки индекса.
+
+    :param tmp_path: временная директория (pytest).
+    :param monkeypatch: фикстура pytest.
+    :return: None.
+    """
+
+    dbconn = DBConn(f"sqlite:///{tmp_path}/phash.db")
+    result_cache = PerceptualHashCache(dbconn, refresh_interval=0)
+    monkeypatch.setattr(result_cache._table_store, "dbconn", LockCheckingDBConn(dbconn, result_cache))
+    result_cache.set_many_images("fake", {"original": {"size": 1}}, {"original": get_image(0)})
+
+    variant = get_image(0, size=120, image_format="JPEG", quality=60)
+    assert result_cache.get_many_images("fake", {"variant": variant}) == {"variant": {"size": 1}}
+    assert result_cache.near_hits == 1
+
+    # Повтор находится по content-hash: изображение не декодируется.
+    assert result_cache.get_many_images("fake", {"variant": b"not an image"}) == {"variant": {"size": 1}}
+    assert result_cache.near_hits == 1
+
+
+def test_perceptual_hash_cache_ttl(tmp_path) -> None:
+    """
+    Тест для проверки времени жизни результатов, в том числе сохранённых для похожих изображений.
+
+    :param tmp_path: временная директория (pytest).
+    :return: None.
+    """
+
+    dbconn = DBConn(f"sqlite:///{tmp_path}/phash.db")
+    result_cache = PerceptualHashCache(dbconn, refresh_interval=0, ttl=0.5)
+    result_cache.set_many_images("fake", {"original": {"size": 1}}, {"original": get_image(0)})
+    variant = get_image(0, size=120, image_format="JPEG", quality=60)
+    assert result_cache.get_many_images("fake", {"variant": variant}) == {"variant": {"size": 1}}
+
+    time.sleep(0.6)
+
+    # Результат похожего изображения живёт столько же, сколько исходный.
+    assert result_cache.get_many_images("fake", {"original": get_image(0), "variant": variant}) == {}
+    result_cache.evict_expired()
+    assert len(result_cache._table_store.read_rows()) == 0
@@ -0,0 +1,84 @@
+import pandas as pd
+import pytest
+import sqlalchemy as sa
+
+from datapipe_image_moderation.pipeline import (
+    GOOGLE_TYPED_COLUMNS,
+    YANDEX_TYPED_COLUMNS,
+    _get_chunk_size,
+    _get_output_schema,
+    _set_results,
+)
+from datapipe_image_moderation.result import ImageModerationError, ModerationResult
+
+
+def test_get_output_schema() -> None:
+    """
+    Тест для проверки колонок результата: JSON-поле или типизированные колонки с индексами.
+
+    :return: None.
+    """
+
+    columns = _get_output_schema("moderation", "status")
+    assert [(column.name, type(column.type)) for column in columns] == [
+        ("moderation", sa.JSON),
+        ("status", sa.String),
+    ]
+
+    columns = _get_output_schema("moderation", None, GOOGLE_TYPED_COLUMNS, ["adult", "racy"])
+    assert [column.name for column in columns] == ["adult", "spoof", "medical", "violence", "racy"]
+    assert all(isinstance(column.type, sa.SmallInteger) for column in columns)
+    assert [column.name for column in columns if column.index] == ["adult", "racy"]
+
+    with pytest.raises(ValueError):
+        _get_output_schema("moderation", None, YANDEX_TYPED_COLUMNS, ["racy"])
+
+
+def test_set_results_typed_columns() -> None:
+    """
+    Тест для проверки записи результатов в типизированные колонки.
+
+    :return: None.
+    """
+
+    details = {
+        "adult": "VERY_LIKELY",
+        "spoof": "UNKNOWN",
+        "medical": "UNLIKELY",
+        "violence": "POSSIBLE",
+        "racy": "LIKELY",
+    }
+    results = [ModerationResult.from_details(details), ModerationResult.from_fetch_error(OSError("not found"))]
+
+    output_df = _set_results(pd.DataFrame({"image_id": ["1", "2"]}), results, "details", "status", GOOGLE_TYPED_COLUMNS)
+    assert "details" not in output_df.columns
+    assert output_df["status"].tolist() == ["ok", "fetch_error"]
+    assert output_df.loc[0, ["adult", "spoof", "medical", "violence", "racy"]].tolist() == [5, 0, 2, 3, 4]
+    assert output_df["adult"].tolist() == [5, None]
+
+    output_df = _set_results(pd.DataFrame({"image_id": ["1"]}), results[:1], "details", None, GOOGLE_TYPED_COLUMNS)
+    assert output_df["adult"].dtype == "int64"
+
+    with pytest.raises(ImageModerationError):
+        _set_results(pd.DataFrame({"image_id": ["1", "2"]}), results, "details", None, GOOGLE_TYPED_COLUMNS)
+
+    output_df = _set_results(
+        pd.DataFrame({"image_id": ["1"]}),
+        [ModerationResult.from_details({"adult": 0.9, "gruesome": 0.1, "text": 0.0, "watermarks": 0.5})],
+        "details",
+        None,
+        YANDEX_TYPED_COLUMNS,
+    )
+    assert output_df.loc[0, ["adult", "gruesome", "text", "watermarks"]].tolist() == [0.9, 0.1, 0.0, 0.5]
+
+
+def test_get_chunk_size() -> None:
+    """
+    Тест для проверки размера chunk по умолчанию: один батч сервиса без status_field и 500 строк со status_field.
+
+    :return: None.
+    """
+
+    assert _get_chunk_size(None, None, 15) == 15
+    assert _get_chunk_size(None, "status", 15) == 500
+    assert _get_chunk_size(100, None, 15) == 100
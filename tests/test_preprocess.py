@@ -0,0 +1,99 @@
+import asyncio
+import io
+import random
+
+import fsspec
+import pytest
+
+from datapipe_image_moderation.preprocess import ImagePreprocessor
+from tests.utils import FakeImageModeration
+
+Image = pytest.importorskip("PIL.Image")
+
+
+def get_png_image(width: int, height: int) -> bytes:
+    random_generator = random.Random(0)
+    image = Image.frombytes("RGB", (width, height), random_generator.randbytes(width * height * 3))
+    output = io.BytesIO()
+    image.save(output, format="PNG")
+    return output.getvalue()
+
+
+def test_preprocessor_downscales_large_images() -> None:
+    """
+    Тест для проверки уменьшения больших изображений и сохранения маленьких изображений и URI без изменений.
+
+    :return: None.
+    """
+
+    large_image = get_png_image(1600, 1200)
+    small_image = get_png_image(8, 8)
+    preprocessor = ImagePreprocessor(max_side=256, min_bytes=1024, max_workers=0)
+
+    processed_images = preprocessor.process([large_image, small_image, "gs://bucket/image.jpg"])
+
+    assert processed_images[1:] == [small_image, "gs://bucket/image.jpg"]
+    with Image.open(io.BytesIO(processed_images[0])) as processed_image:
+        assert processed_image.format == "JPEG"
+        assert max(processed_image.size) == 256
+
+    assert preprocessor.bytes_before == len(large_image)
+    assert preprocessor.bytes_after == len(processed_images[0])
+    assert preprocessor.compression_ratio < 0.5
+
+
+def test_preprocessor_process_pool() -> None:
+    """
+    Тест для проверки обработки изображений в пуле процессов и в асинхронном режиме.
+
+    :return: None.
+    """
+
+    images = [get_png_image(640, 480), b"not an image" * 1000]
+    preprocessor = ImagePreprocessor(max_side=128, image_format="WEBP", min_bytes=1024, max_workers=2)
+    try:
+        processed_images = preprocessor.process(images)
+        assert asyncio.run(preprocessor.process_async(images)) == processed_images
+    finally:
+        preprocessor.close()
+
+    assert len(processed_images[0]) < len(images[0])
+    # Изображение, которое не удалось декодировать, отправляется без изменений.
+    assert processed_images[1] == images[1]
+
+
+def test_moderate_chunk_with_preprocessor() -> None:
+    """
+    Тест для проверки, что в сервис отправляются уменьшенные изображения, а кэш использует исходные.
+
+    :return: None.
+    """
+
+    file_system = fsspec.filesystem("memory")
+    image_url = "memory://test_moderate_chunk_with_preprocessor/0.png"
+    image = get_png_image(1000, 1000)
+    file_system.pipe_file(image_url, image)
+
+    moderation = FakeImageModeration()
+    preprocessor = ImagePreprocessor(max_side=100, min_bytes=1024, max_workers=0)
+    details = moderation.moderate_chunk(images=[image_url], file_system_name="memory", preprocessor=preprocessor)
+
+    assert details[0]["size"] < len(image)
+    assert moderation.sent_images[0] != image
+
+
+def test_moderate_images_async_with_preprocessor() -> None:
+    """
+    Тест для проверки уменьшения изображений в асинхронном moderate_images_async.
+
+    :return: None.
+    """
+
+    image = get_png_image(1000, 1000)
+    moderation = FakeImageModeration()
+    preprocessor = ImagePreprocessor(max_side=100, min_bytes=1024, max_workers=0)
+
+    details = asyncio.run(moderation.moderate_images_async(images=[image], preprocessor=preprocessor))
+
+    assert details[0]["size"] < len(image)
+    assert preprocessor.bytes_after < preprocessor.bytes_before
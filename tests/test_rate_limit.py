@@ -0,0 +1,192 @@
+import asyncio
+import time
+from concurrent.futures import Future
+from typing import List
+
+import pytest
+from google.api_core import exceptions
+
+from datapipe_image_moderation.rate_limit import (
+    HedgingPolicy,
+    LatencyTracker,
+    RateLimiter,
+    RetryPolicy,
+    RpcCall,
+    call_hedged_async,
+    call_with_retries,
+    call_with_retries_async,
+    get_latency_tracker,
+)
+
+
+def test_rate_limiter_spaces_requests() -> None:
+    """
+    Тест для проверки ограничения количества изображений в секунду.
+
+    :return: None.
+    """
+
+    rate_limiter = RateLimiter(images_per_second=100)
+
+    started_at = time.monotonic()
+    for _ in range(4):
+        rate_limiter.acquire(images_count=50)
+
+    # Первые 100 изображений - из запаса bucket, остальные 100 - за ~1 секунду.
+    assert 0.9 <= time.monotonic() - started_at < 1.5
+
+
+def test_retries_and_aimd_backoff_on_quota_errors() -> None:
+    """
+    Тест для проверки повторов и снижения скорости при ошибках квоты.
+
+    :return: None.
+    """
+
+    rate_limiter = RateLimiter(requests_per_second=1000)
+    retry_policy = RetryPolicy(max_retries=2, initial_backoff=0.001)
+    timeouts = []
+
+    def func(timeout):
+        timeouts.append(timeout)
+        if len(timeouts) < 3:
+            raise exceptions.ResourceExhausted("quota")
+        return "ok"
+
+    assert call_with_retries(func, images_count=1, rate_limiter=rate_limiter, retry_policy=retry_policy) == "ok"
+    assert timeouts == [retry_policy.rpc_timeout] * 3
+    assert rate_limiter.state.throttled == 2
+    assert rate_limiter.state.rate_factor < 1.0
+
+    def failing_func(timeout):
+        raise exceptions.InvalidArgument("bad image")
+
+    with pytest.raises(exceptions.InvalidArgument):
+        call_with_retries(failing_func, images_count=1, rate_limiter=rate_limiter, retry_policy=retry_policy)
+
+
+def test_latency_tracker_quantile_and_budget() -> None:
+    """
+    Тест для проверки квантиля задержки и ограничения доли дубликатов бюджетом.
+
+    :return: None.
+    """
+
+    latency_tracker = LatencyTracker(window_size=100)
+    hedging = HedgingPolicy(quantile=0.9, budget=0.1, min_samples=10, min_delay=0.0)
+    assert latency_tracker.get_hedge_delay(hedging) is None
+
+    for i in range(100):
+        latency_tracker.add(i / 100)
+
+    assert latency_tracker.get_quantile(0.5) == pytest.approx(0.5)
+    assert latency_tracker.get_hedge_delay(hedging) == pytest.approx(0.9)
+    for _ in range(18):
+        latency_tracker.get_hedge_delay(hedging)
+
+    # 20 запросов, бюджет 10% - не больше двух дубликатов.
+    assert [latency_tracker.try_acquire_hedge(hedging) for _ in range(3)] == [True, True, False]
+
+
+@pytest.mark.parametrize("use_async", [False, True])
+def test_hedged_request_uses_first_response(use_async: bool) -> None:
+    """
+    Тест для проверки отправки дубликата медленного запроса, использования первого ответа и отмены опоздавшего.
+
+    :param use_async: проверять асинхронный метод.
+    :return: None.
+    """
+
+    provider_name = f"hedging-{use_async}"
+    rate_limiter = RateLimiter(name=provider_name)
+    hedging = HedgingPolicy(quantile=0.95, budget=1.0, min_samples=5, min_delay=0.0)
+    retry_policy = RetryPolicy(max_retries=0, hedging=hedging)
+    latency_tracker = get_latency_tracker(provider_name)
+    for _ in range(5):
+        latency_tracker.add(0.01)
+
+    futures: List[Future] = []
+    cancelled = []
+
+    def start_func(timeout):
+        # Первый запрос зависает, дубликат отвечает сразу.
+        future: Future = Future()
+        futures.append(future)
+        if len(futures) > 1:
+            future.set_result(len(futures))
+        return RpcCall(future, lambda response: response)
+
+    async def async_func(timeout):
+        futures.append(Future())
+        number = len(futures)
+        try:
+            await asyncio.sleep(2.0 if number == 1 else 0.0)
+        except asyncio.CancelledError:
+            cancelled.append(number)
+            raise
+        return number
+
+    started_at = time.monotonic()
+    if use_async:
+        result = asyncio.run(call_with_retries_async(async_func, 1, rate_limiter, retry_policy))
+    else:
+        result = call_with_retries(lambda timeout: 0, 1, rate_limiter, retry_policy, start_func=start_func)
+        cancelled = [i + 1 for i, future in enumerate(futures) if future.cancelled()]
+
+    assert result == 2
+    assert cancelled == [1]
+    assert time.monotonic() - started_at < 1.0
+    assert latency_tracker.hedges == 1
+
+
+def test_hedged_request_without_start_func() -> None:
+    """
+    Тест для проверки запроса без дублирования, если сервис не умеет отправлять запрос без ожидания ответа.
+
+    :return: None.
+    """
+
+    provider_name = "hedging-without-start"
+    rate_limiter = RateLimiter(name=provider_name)
+    hedging = HedgingPolicy(quantile=0.95, budget=1.0, min_samples=1, min_delay=0.0)
+    retry_policy = RetryPolicy(max_retries=0, hedging=hedging)
+    get_latency_tracker(provider_name).add(0.01)
+
+    result = call_with_retries(lambda timeout: "ok", 1, rate_limiter, retry_policy, start_func=lambda timeout: None)
+
+    assert result == "ok"
+    assert get_latency_tracker(provider_name).hedges == 0
+
+
+def test_hedged_async_request_cancelled_by_caller() -> None:
+    """
+    Тест для проверки отмены запроса при отмене вызывающей корутины до отправки дубликата.
+
+    :return: None.
+    """
+
+    provider_name = "hedging-cancelled"
+    rate_limiter = RateLimiter(name=provider_name)
+    hedging = HedgingPolicy(quantile=0.95, budget=1.0, min_samples=1, min_delay=1.0)
+    latency_tracker = get_latency_tracker(provider_name)
+    latency_tracker.add(0.01)
+    cancelled = []
+
+    async def async_func(timeout):
+        try:
+            await asyncio.sleep(10.0)
+        except asyncio.CancelledError:
+            cancelled.append(True)
+            raise
+
+    async def run() -> None:
+        task = asyncio.ensure_future(call_hedged_async(async_func, None, 1, rate_limiter, hedging))
+        await asyncio.sleep(0.05)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        await asyncio.sleep(0)
+        # Проверяем до завершения event loop, который сам отменяет оставшиеся задачи.
+        assert cancelled == [True]
+
+    asyncio.run(run())
@@ -0,0 +1,177 @@
+import time
+
+import pandas as pd
+import pytest
+import sqlalchemy as sa
+from datapipe.compute import ComputeInput, DataStore
+from datapipe.store.database import DBConn, TableStoreDB
+
+from datapipe_image_moderation.pipeline import ModerationBatchTransformStep
+from datapipe_image_moderation.scheduling import PriorityScheduling
+
+UPLOADS_FIRST = sa.case((sa.column("source") == "upload", 1), else_=0)
+
+
+def _build_step(tmp_path, scheduling: PriorityScheduling, chunk_size: int):
+    dbconn = DBConn(f"sqlite:///{tmp_path}/scheduling.db")
+    ds = DataStore(dbconn, create_meta_table=True)
+    input_dt = ds.create_table(
+        "images",
+        TableStoreDB(
+            dbconn=dbconn,
+            name="images",
+            data_sql_schema=[
+                sa.Column("image_id", sa.String, primary_key=True),
+                sa.Column("image_url", sa.String),
+                sa.Column("source", sa.String),
+            ],
+            create_table=True,
+        ),
+    )
+    output_dt = ds.create_table(
+        "images_moderation",
+        TableStoreDB(
+            dbconn=dbconn,
+            name="images_moderation",
+            data_sql_schema=[sa.Column("image_id", sa.String, primary_key=True)],
+            create_table=True,
+        ),
+    )
+    step = ModerationBatchTransformStep(
+        ds=ds,
+        name="image_classification_fake",
+        input_dts=[ComputeInput(dt=input_dt, join_type="full")],
+        output_dts=[output_dt],
+        func=lambda df: df[["image_id"]],
+        provider_name="fake",
+        chunk_size=chunk_size,
+        scheduling=scheduling,
+    )
+    return ds, input_dt, step
+
+
+def _store_images(input_dt, image_ids, source: str) -> None:
+    input_dt.store_chunk(
+        pd.DataFrame(
+            {
+                "image_id": image_ids,
+                "image_url": [f"memory://{image_id}.jpg" for image_id in image_ids],
+                "source": source,
+            }
+        )
+    )
+
+
+def test_priority_order(tmp_path) -> None:
+    """
+    Тест для проверки порядка обработки изменённых строк по SQL-выражению приоритета.
+
+    :param tmp_path: временная директория (pytest).
+    :return: None.
+    """
+
+    scheduling = PriorityScheduling(priority=UPLOADS_FIRST)
+    ds, input_dt, step = _build_step(tmp_path, scheduling, chunk_size=3)
+    _store_images(input_dt, ["a", "b", "c", "d"], "backfill")
+    _store_images(input_dt, ["x", "y"], "upload")
+
+    chunk_count, idx_gen = step.get_full_process_ids(ds)
+
+    assert chunk_count == 2
+    assert [idx["image_id"].tolist() for idx in idx_gen] == [["x", "y", "a"], ["b", "c", "d"]]
+
+
+def test_fresh_uploads_ahead_of_backfill(tmp_path) -> None:
+    """
+    Тест для проверки отправки новых загрузок, появившихся во время бэкфилла, в следующем chunk
+    и резерва части chunk для них.
+
+    :param tmp_path: временная директория (pytest).
+    :return: None.
+    """
+
+    scheduling = PriorityScheduling(
+        priority=UPLOADS_FIRST,
+        high_priority_threshold=1,
+        reserved_capacity=0.5,
+    )
+    ds, input_dt, step = _build_step(tmp_path, scheduling, chunk_size=4)
+    _store_images(input_dt, [f"backfill-{i}" for i in range(6)], "backfill")
+
+    _, idx_gen = step.get_full_process_ids(ds)
+    chunks = []
+    for i, idx in enumerate(idx_gen):
+        chunks.append(idx["image_id"].tolist())
+        step.run_idx(ds, idx)
+        if i == 0:
+            _store_images(input_dt, ["upload-0", "upload-1", "upload-2"], "upload")
+
+    assert chunks == [
+        ["backfill-0", "backfill-1"],
+        ["upload-0", "upload-1", "upload-2", "backfill-2"],
+        ["backfill-3", "backfill-4"],
+        ["backfill-5"],
+    ]
+    assert len(ds.get_table("images_moderation").get_data()) == 9
+
+
+def test_priority_scheduling_validation() -> None:
+    """
+    Тест для проверки параметров резерва.
+
+    :return: None.
+    """
+
+    with pytest.raises(ValueError):
+        PriorityScheduling(priority="created_at", reserved_capacity=0.5)
+
+    with pytest.raises(ValueError):
+        PriorityScheduling(priority="created_at", order="up")  # type: ignore
+
+    with pytest.raises(ValueError):
+        PriorityScheduling(priority="created_at", high_priority_threshold=1, reserved_capacity=1.0)
+
+
+def test_priority_column_checked_on_step_build(tmp_path) -> None:
+    """
+    Тест для проверки колонок приоритета при создании шага и приоритета по колонке по возрастанию.
+
+    :param tmp_path: временная директория (pytest).
+    :return: None.
+    """
+
+    with pytest.raises(ValueError):
+        _build_step(tmp_path, PriorityScheduling(priority="created_at"), chunk_size=3)
+
+    with pytest.raises(ValueError):
+        _build_step(tmp_path, PriorityScheduling(priority=sa.column("created_at") + 1), chunk_size=3)
+
+    ds, input_dt, step = _build_step(tmp_path, PriorityScheduling(priority="image_url", order="asc"), chunk_size=2)
+    _store_images(input_dt, ["c", "a", "b"], "backfill")
+
+    _, idx_gen = step.get_full_process_ids(ds)
+
+    assert [idx["image_id"].tolist() for idx in idx_gen] == [["a", "b"], ["c"]]
+
+
+def test_backfill_pages_past_failed_rows(tmp_path) -> None:
+    """
+    Тест для проверки того, что строки с ошибкой не возвращаются повторно в том же запуске.
+
+    :param tmp_path: временная директория (pytest).
+    :return: None.
+    """
+
+    scheduling = PriorityScheduling(priority=UPLOADS_FIRST, high_priority_threshold=1)
+    ds, input_dt, step = _build_step(tmp_path, scheduling, chunk_size=2)
+    _store_images(input_dt, [f"backfill-{i}" for i in range(3)], "backfill")
+    _store_images(input_dt, ["upload-0"], "upload")
+
+    _, idx_gen = step.get_full_process_ids(ds)
+    chunks = []
+    for idx in idx_gen:
+        chunks.append(idx["image_id"].tolist())
+        # Ни одна строка не обработана успешно: все остаются изменёнными.
+        step.meta_table.mark_rows_processed_error(idx, process_ts=time.time(), error="error")
+
+    assert chunks == [["upload-0", "backfill-0"], ["backfill-1", "backfill-2"]]
@@ -0,0 +1,177 @@
+import asyncio
+from typing import List
+
+import fsspec
+import pytest
+
+from datapipe_image_moderation import base
+from datapipe_image_moderation.byte_cache import DiskByteCache
+from datapipe_image_moderation.result import ImageStatus
+from datapipe_image_moderation.screening import ImageScreening, sniff_image_format
+from tests.utils import FakeImageModeration
+
+JPEG = b"\xff\xd8\xff\xe0\x00\x10JFIF\x00" + b"\x00" * 100
+PNG = b"\x89PNG\r\n\x1a\n" + b"\x00" * 50
+
+
+@pytest.mark.parametrize(
+    "header,image_format",
+    [
+        (JPEG, "jpeg"),
+        (PNG, "png"),
+        (b"GIF89a\x01\x00", "gif"),
+        (b"RIFF\x00\x00\x00\x00WEBPVP8 ", "webp"),
+        (b"\x00\x00\x00\x18ftypheic\x00\x00", "heic"),
+        (b"\x00\x00\x00\x18ftypisom\x00\x00", "mp4"),
+        (b'<?xml version="1.0"?><svg', "svg"),
+        (b"  <svg xmlns=", "svg"),
+        (b"\x1a\x45\xdf\xa3\x01", "webm"),
+        (b"not an image", None),
+    ],
+)
+def test_sniff_image_format(header: bytes, image_format: str) -> None:
+    """
+    Тест для проверки определения формата по первым байтам.
+
+    :param header: первые байты файла.
+    :param image_format: ожидаемый формат.
+    :return: None.
+    """
+
+    assert sniff_image_format(header) == image_format
+
+
+class ScreenedFakeImageModeration(FakeImageModeration):
+    """
+    Клиент модерации для тестов с лимитами размера и формата изображений.
+    """
+
+    max_image_bytes = 100
+    supported_formats = frozenset({"jpeg", "png"})
+
+
+@pytest.fixture
+def images() -> List[str]:
+    fs = fsspec.filesystem("memory")
+    fs.pipe("/screening/ok.jpg", JPEG[:60])
+    fs.pipe("/screening/ok.png", PNG)
+    fs.pipe("/screening/large.jpg", JPEG)
+    fs.pipe("/screening/image.svg", b'<svg xmlns="http://www.w3.org/2000/svg"></svg>')
+    fs.pipe("/screening/empty.jpg", b"")
+    fs.pipe("/screening/broken.jpg", b"<html>Access denied</html>")
+    return [
+        "memory://screening/ok.jpg",
+        "memory://screening/ok.png",
+        "memory://screening/large.jpg",
+        "memory://screening/image.svg",
+        "memory://screening/empty.jpg",
+        "memory://screening/broken.jpg",
+        "memory://screening/missing.jpg",
+    ]
+
+
+@pytest.mark.parametrize("use_async", [False, True])
+def test_screening_before_download(images, monkeypatch, use_async: bool) -> None:
+    """
+    Тест для проверки отклонения изображений до загрузки по размеру и формату.
+
+    :param images: URL изображений в памяти.
+    :param monkeypatch: monkeypatch (pytest).
+    :param use_async: проверять асинхронный метод.
+    :return: None.
+    """
+
+    fetched_urls: List[str] = []
+    fetch_images, fetch_images_async = base.fetch_images, base.fetch_images_async
+
+    def fetch_images_spy(image_url_list: List[str], **kwargs):
+        fetched_urls.extend(image_url_list)
+        return fetch_images(image_url_list=image_url_list, **kwargs)
+
+    async def fetch_images_async_spy(image_url_list: List[str], **kwargs):
+        fetched_urls.extend(image_url_list)
+        return await fetch_images_async(image_url_list=image_url_list, **kwargs)
+
+    monkeypatch.setattr(base, "fetch_images", fetch_images_spy)
+    monkeypatch.setattr(base, "fetch_images_async", fetch_images_async_spy)
+
+    client = ScreenedFakeImageModeration()
+    params = dict(images=images, file_system_name="memory", screening=ImageScreening())
+    if use_async:
+        results = asyncio.run(client.moderate_chunk_results_async(**params))  # type: ignore
+    else:
+        results = client.moderate_chunk_results(**params)  # type: ignore
+
+    assert [result.status for result in results] == [
+        ImageStatus.OK,
+        ImageStatus.OK,
+        ImageStatus.REJECTED,
+        ImageStatus.REJECTED,
+        ImageStatus.REJECTED,
+        ImageStatus.REJECTED,
+        ImageStatus.FETCH_ERROR,
+    ]
+    assert [result.error.split(":")[0] for result in results[2:6]] == [  # type: ignore
+        "too_large",
+        "unsupported_format",
+        "empty",
+        "unknown_format",
+    ]
+    assert not any(result.retryable for result in results[2:6])
+    # Отклонённые изображения не загружаются, для отсутствующего ошибка получена при загрузке.
+    assert sorted(fetched_urls) == sorted([images[0], images[1], images[6]])
+
+
+def test_screening_limits() -> None:
+    """
+    Тест для проверки приоритета явных лимитов над лимитами сервиса.
+
+    :return: None.
+    """
+
+    provider_formats = frozenset({"jpeg"})
+    assert ImageScreening().get_limits(100, provider_formats) == (100, provider_formats)
+    assert ImageScreening(max_image_bytes=10, allowed_formats=["png"]).get_limits(100, provider_formats) == (
+        10,
+        frozenset({"png"}),
+    )
+    assert ImageScreening(use_provider_limits=False).get_limits(100, provider_formats) == (None, None)
+
+    client = ScreenedFakeImageModeration()
+    # С preprocessor изображения уменьшаются и перекодируются, лимиты размера и форматов сервиса не применяются.
+    assert client._get_screening_limits(preprocessor=object()) == {  # type: ignore
+        "provider_max_image_bytes": None,
+        "provider_formats": None,
+    }
+
+
+@pytest.mark.parametrize("use_async", [False, True])
+def test_screening_uses_byte_cache(tmp_path, use_async: bool) -> None:
+    """
+    Тест для проверки, что для изображений в кэше на диске размер и формат берутся из кэша без обращения к хранилищу.
+
+    :param tmp_path: временная директория (pytest).
+    :param use_async: проверять асинхронный метод.
+    :return: None.
+    """
+
+    byte_cache = DiskByteCache(str(tmp_path / "images"))
+    image_urls = ["memory://screening_cache/ok.jpg", "memory://screening_cache/image.svg"]
+    # В файловой системе изображений нет, они есть только в кэше.
+    byte_cache.set(byte_cache.get_key("memory", image_urls[0]), JPEG[:60])
+    svg = b'<svg xmlns="http://www.w3.org/2000/svg"></svg>'
+    byte_cache.set(byte_cache.get_key("memory", image_urls[1]), svg)
+
+    params = dict(
+        image_url_list=image_urls,
+        file_system_name="memory",
+        provider_formats=frozenset({"jpeg"}),
+        byte_cache=byte_cache,
+    )
+    if use_async:
+        screened = asyncio.run(ImageScreening().screen_async(**params))  # type: ignore
+    else:
+        screened = ImageScreening().screen(**params)  # type: ignore
+
+    assert screened == [(60, None), (len(svg), "unsupported_format: svg")]
+    assert byte_cache.hits == 0
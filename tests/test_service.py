@@ -0,0 +1,88 @@
+import asyncio
+
+import fsspec
+import pytest
+
+from datapipe_image_moderation.result import ImageStatus
+from datapipe_image_moderation.service import MicroBatcher, create_app
+from tests.utils import FakeImageModeration
+
+
+def test_micro_batcher_full_batches() -> None:
+    """
+    Тест для проверки объединения одиночных запросов в полные батчи сервиса с результатом каждому вызывающему.
+
+    :return: None.
+    """
+
+    client = FakeImageModeration()
+
+    async def run():
+        async with MicroBatcher(client, max_wait=0.5, max_parallel_batches=1) as batcher:
+            results = await asyncio.gather(*[batcher.moderate_image(b"x" * (i + 1)) for i in range(20)])
+        return batcher, results
+
+    batcher, results = asyncio.run(run())
+
+    assert [result.details for result in results] == [{"size": i + 1} for i in range(20)]
+    assert [len(batch) for batch in client.sent_batches] == [15, 5]
+    assert batcher.mean_batch_size == 10
+
+
+def test_micro_batcher_max_wait() -> None:
+    """
+    Тест для проверки отправки неполного батча через max_wait.
+
+    :return: None.
+    """
+
+    client = FakeImageModeration()
+
+    async def run():
+        async with MicroBatcher(client, max_wait=0.01) as batcher:
+            loop = asyncio.get_running_loop()
+            started_at = loop.time()
+            result = await batcher.moderate_image(b"image")
+            return result, loop.time() - started_at
+
+    result, seconds = asyncio.run(run())
+
+    assert result.details == {"size": 5}
+    assert seconds < 0.5
+    assert client.sent_batches == [[b"image"]]
+
+
+def test_service_endpoint() -> None:
+    """
+    Тест для проверки HTTP-сервиса: запрос по URL, изображение в теле запроса и неизвестный сервис.
+
+    :return: None.
+    """
+
+    test_utils = pytest.importorskip("aiohttp.test_utils")
+    fs = fsspec.filesystem("memory")
+    fs.pipe("/service/1.jpg", b"image-1")
+    client = FakeImageModeration()
+
+    async def run():
+        app = create_app({"fake": MicroBatcher(client, max_wait=0.01, file_system_name="memory")})
+        async with test_utils.TestClient(test_utils.TestServer(app)) as http_client:
+            responses = await asyncio.gather(
+                http_client.post("/moderate/fake", json={"image_url": "memory://service/1.jpg"}),
+                http_client.post("/moderate/fake", data=b"image-22", headers={"Content-Type": "image/jpeg"}),
+                http_client.post("/moderate/fake", json={"image_url": "memory://service/missing.jpg"}),
+            )
+            bodies = [await response.json() for response in responses]
+
+            unknown = await http_client.post("/moderate/unknown", data=b"image")
+            bad_request = await http_client.post("/moderate/fake", json={"url": "memory://service/1.jpg"})
+            return bodies, unknown.status, bad_request.status
+
+    bodies, unknown_status, bad_request_status = asyncio.run(run())
+
+    assert bodies[0] == {"status": "ok", "details": {"size": 7}, "error": None, "retryable": False}
+    assert bodies[1]["details"] == {"size": 8}
+    assert bodies[2]["status"] == ImageStatus.FETCH_ERROR.value
+    assert unknown_status == 404
+    assert bad_request_status == 400
+    assert sorted(len(batch) for batch in client.sent_batches) == [2]
@@ -0,0 +1,118 @@
+import asyncio
+import threading
+import time
+
+import fsspec
+import pytest
+
+from datapipe_image_moderation import utils
+from datapipe_image_moderation.utils import (
+    get_bytes_images,
+    get_file_system,
+    get_image_sizes,
+    get_image_sizes_async,
+    map_with_timeout,
+)
+
+
+def test_get_bytes_images_keeps_order() -> None:
+    """
+    Тест для проверки параллельной загрузки изображений с сохранением исходного порядка.
+
+    :return: None.
+    """
+
+    file_system = fsspec.filesystem("memory")
+    image_urls = [f"memory://test_get_bytes_images/{i}.jpg" for i in range(20)]
+    for i, image_url in enumerate(image_urls):
+        file_system.pipe_file(image_url, f"image-{i}".encode())
+
+    bytes_images = get_bytes_images(image_url_list=image_urls, file_system_name="memory", max_concurrency=4)
+
+    assert bytes_images == [f"image-{i}".encode() for i in range(20)]
+    assert get_file_system("memory") is get_file_system("memory")
+
+
+def test_get_image_sizes() -> None:
+    """
+    Тест для проверки получения размеров изображений без загрузки.
+
+    :return: None.
+    """
+
+    file_system = fsspec.filesystem("memory")
+    image_urls = [f"memory://test_get_image_sizes/{i}.jpg" for i in range(5)]
+    for i, image_url in enumerate(image_urls):
+        file_system.pipe_file(image_url, b"x" * i)
+
+    image_urls.append("memory://test_get_image_sizes/missing.jpg")
+
+    assert get_image_sizes(image_url_list=image_urls, file_system_name="memory") == [0, 1, 2, 3, 4, None]
+    assert asyncio.run(get_image_sizes_async(image_url_list=image_urls, file_system_name="memory")) == [
+        0,
+        1,
+        2,
+        3,
+        4,
+        None,
+    ]
+
+
+@pytest.mark.parametrize("max_concurrency", [1, 2])
+def test_map_with_timeout(max_concurrency: int) -> None:
+    """
+    Тест для проверки таймаута каждого запроса от начала вызова, в том числе для одного изображения
+    и последовательной загрузки.
+
+    :param max_concurrency: максимальное количество одновременных запросов.
+    :return: None.
+    """
+
+    delays = {"hung": 2.0, "fast-1": 0.1, "fast-2": 0.1, "fast-3": 0.1}
+
+    def fetch(image_url: str) -> str:
+        time.sleep(delays[image_url])
+        return image_url
+
+    started_at = time.monotonic()
+    assert map_with_timeout(fetch, ["hung"], max_concurrency, 0.2, lambda: "timeout") == ["timeout"]
+    results = map_with_timeout(fetch, list(delays), max_concurrency, 0.3, lambda: "timeout")
+
+    # Запросы, ожидавшие начала, получают полный таймаут, а не остаток таймаута зависшего запроса.
+    assert results == ["timeout", "fast-1", "fast-2", "fast-3"]
+    assert time.monotonic() - started_at < 1.5
+
+
+def test_map_with_timeout_hung_calls_outnumber_pool(monkeypatch) -> None:
+    """
+    Тест для проверки загрузки после зависания большего количества запросов, чем потоков в пуле,
+    и отсчёта таймаута от начала запроса в потоке пула.
+
+    :param monkeypatch: фикстура pytest.
+    :return: None.
+    """
+
+    monkeypatch.setattr(utils, "FILE_SYSTEM_MAX_WORKERS", 2)
+    monkeypatch.setattr(utils, "FILE_SYSTEM_MAX_ABANDONED", 4)
+    utils.reset_file_systems()
+    release = threading.Event()
+
+    def fetch(image_url: str) -> str:
+        if image_url.startswith("hung"):
+            release.wait(10)
+        else:
+            time.sleep(0.15)
+
+        return image_url
+
+    try:
+        hung_urls = [f"hung-{i}" for i in range(4)]
+        assert map_with_timeout(fetch, hung_urls, 4, 0.2, lambda: "timeout") == ["timeout"] * 4
+
+        # Три запроса по 0.15 с на двух местах пула не укладываются в 0.2 с от начала вызова, но каждый
+        # укладывается в таймаут от своего начала.
+        fast_urls = ["fast-1", "fast-2", "fast-3"]
+        assert map_with_timeout(fetch, fast_urls, 3, 0.2, lambda: "timeout") == fast_urls
+    finally:
+        release.set()
+        utils.reset_file_systems()
@@ -0,0 +1,125 @@
+import multiprocessing
+import pickle
+
+import fsspec
+import pandas as pd
+import pytest
+
+from datapipe_image_moderation import clients, pipeline, worker
+from datapipe_image_moderation.cache import InMemoryResultCache
+from datapipe_image_moderation.clients import client_registry
+from datapipe_image_moderation.pipeline import ImageClassificationTransform
+from datapipe_image_moderation.rate_limit import get_rate_limiter
+from tests.utils import FakeImageModeration
+
+
+@pytest.fixture
+def fake_provider(monkeypatch):
+    client = FakeImageModeration()
+    client_params = []
+    monkeypatch.setitem(clients._CLIENT_GETTERS, "fake", lambda **params: client_params.append(params) or client)
+    client.client_params = client_params
+    yield client
+    worker._rate_limits.pop("fake", None)
+    get_rate_limiter("fake").configure(requests_per_second=None, images_per_second=None)
+
+
+def test_transform_is_picklable(fake_provider) -> None:
+    """
+    Тест для проверки сериализации функции преобразования шага и получения клиента в процессе-обработчике.
+
+    :param fake_provider: клиент модерации для тестов.
+    :return: None.
+    """
+
+    result_cache = InMemoryResultCache()
+    result_cache.set_many("fake", {"hash": {"size": 1}})
+    transform = ImageClassificationTransform(
+        provider_name="fake",
+        client_params={"token": "worker-token"},
+        primary_keys=["image_id"],
+        image_field="image_url",
+        file_system_name="memory",
+        file_system_creds_path=None,
+        moderation_params={"result_cache": result_cache},
+        details_field="details",
+        status_field="status",
+        requests_per_second=100.0,
+    )
+
+    worker_transform = pickle.loads(pickle.dumps(transform))
+    # Кэш в памяти у процесса-обработчика свой.
+    assert len(worker_transform.moderation_params["result_cache"]) == 0
+
+    fs = fsspec.filesystem("memory")
+    fs.pipe("/worker/1.jpg", b"image-1")
+    fs.pipe("/worker/2.jpg", b"image-22")
+
+    output_df = worker_transform(
+        pd.DataFrame({"image_id": ["1", "2"], "image_url": ["memory://worker/1.jpg", "memory://worker/2.jpg"]})
+    )
+
+    assert output_df["details"].tolist() == [{"size": 7}, {"size": 8}]
+    assert output_df["status"].tolist() == ["ok", "ok"]
+    assert sorted(fake_provider.sent_images) == [b"image-1", b"image-22"]
+    assert fake_provider.client_params == [{"token": "worker-token"}]
+    assert get_rate_limiter("fake").state.requests_per_second == 100.0
+
+
+def test_transform_call_uses_worker_clients(fake_provider, monkeypatch) -> None:
+    """
+    Тест для проверки, что клиенты создаются инициализатором процесса-обработчика, а не при каждом вызове.
+
+    :param fake_provider: клиент модерации для тестов.
+    :param monkeypatch: фикстура pytest.
+    :return: None.
+    """
+
+    transform = ImageClassificationTransform(
+        provider_name="fake",
+        client_params={"token": "worker-token"},
+        primary_keys=["image_id"],
+        image_field="image_url",
+        file_system_name="memory",
+        file_system_creds_path=None,
+        moderation_params={},
+        details_field="details",
+        status_field="status",
+    )
+
+    fs = fsspec.filesystem("memory")
+    fs.pipe("/worker_init/1.jpg", b"image-1")
+    input_df = pd.DataFrame({"image_id": ["1"], "image_url": ["memory://worker_init/1.jpg"]})
+
+    with pytest.raises(RuntimeError):
+        transform(input_df)
+
+    transform.init_worker()
+    init_calls = []
+    monkeypatch.setattr(pipeline, "init_worker", lambda *args, **kwargs: init_calls.append(args))
+
+    for _ in range(3):
+        assert transform(input_df)["details"].tolist() == [{"size": 7}]
+
+    assert init_calls == []
+    assert fake_provider.client_params == [{"token": "worker-token"}]
+
+
+def _get_registry_size(_) -> int:
+    return len(client_registry._google_clients)
+
+
+@pytest.mark.skipif("fork" not in multiprocessing.get_all_start_methods(), reason="fork is not available")
+def test_registry_reset_after_fork() -> None:
+    """
+    Тест для проверки сброса клиентов модерации в дочернем процессе после fork.
+
+    :return: None.
+    """
+
+    client_registry.register_google(FakeImageModeration(), "fork-test.json")  # type: ignore
+    try:
+        with multiprocessing.get_context("fork").Pool(1) as pool:
+            assert pool.map(_get_registry_size, [None]) == [0]
+    finally:
+        client_registry.clear()
@@ -1,8 +1,12 @@
-import pandas as pd
+from typing import List, Optional
 
+import pandas as pd
 from datapipe.datatable import DataTable
 from datapipe.types import DataDF
 
+from datapipe_image_moderation.base import ImageModerationBase
+from datapipe_image_moderation.result import ModerationResult
+
 
 def assert_idx_equal(a, b):
     a = sorted(list(a))
@@ -37,3 +41,28 @@ def assert_df_equal(a: pd.DataFrame, b: pd.DataFrame, index_cols=["id"], check_o
 
 def assert_datatable_equal(a: DataTable, b: DataDF, check_only_idx=False) -> bool:
     return assert_df_equal(a.get_data(), b, index_cols=a.primary_keys, check_only_idx=check_only_idx)
+
+
+class FakeImageModeration(ImageModerationBase):
+    """
+    Клиент модерации для тестов: результат - размер изображения, отправленные изображения запоминаются.
+    """
+
+    provider_name = "fake"
+    max_batch_size = 15
+
+    def __init__(self) -> None:
+        self.sent_images: List[bytes] = []
+        self.sent_batches: List[List[bytes]] = []
+
+    def _moderate_images(  # type: ignore
+        self, images: List[bytes], timeout: Optional[float] = None
+    ) -> List[ModerationResult]:
+        self.sent_images.extend(images)
+        self.sent_batches.append(list(images))
+        return [ModerationResult.from_details({"size": len(image)}) for image in images]
+
+    async def _moderate_images_async(  # type: ignore
+        self, images: List[bytes], timeout: Optional[float] = None
+    ) -> List[ModerationResult]:
+        return self._moderate_images(images)